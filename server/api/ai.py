@@ -1,47 +1,171 @@
-from fastapi import APIRouter, Depends
+import json
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from schemas.ai import (
     EnrichTechRequest, EnrichTechResponse,
+    EnrichTechBatchRequest, EnrichTechBatchResponse, EnrichTechBatchItem,
     EnrichStackRequest, EnrichStackResponse,
     RerankRequest, RerankResponse
 )
 from middleware.internal_auth import verify_internal_key
+from lib.enrichment import enrich_stack, enrich_tech, enrich_tech_batch, stream_enrich_stack
+from lib.reranker import cascade_rerank
 
 router = APIRouter()
 
+MAX_BATCH_TECHNOLOGIES = 100
+MAX_RERANK_BUDGET_MS = 60000
+MAX_STACK_TECHNOLOGIES = 50
+
 
 @router.post("/enrich-tech", response_model=EnrichTechResponse, dependencies=[Depends(verify_internal_key)])
-async def enrich_technology(request: EnrichTechRequest):
-    """Generate structured JSON: tagline, pros, cons, features, metrics"""
-    # TODO: Implement via lib/ai_client.py
-    return EnrichTechResponse(
-        tagline=f"{request.tech_name} - A powerful technology",
-        pros=["Fast", "Scalable", "Easy to use"],
-        cons=["Learning curve", "Limited ecosystem"],
-        features=["Feature 1", "Feature 2"],
-        metrics={"popularity": "high", "maturity": "stable"},
-        use_cases=["Web apps", "APIs", "Microservices"]
+async def enrich_technology(request: EnrichTechRequest, response: Response):
+    """
+    Generate structured JSON: tagline, pros, cons, features, metrics
+
+    Profiles are cached per (model, prompt version, normalized name and
+    context); concurrent requests for the same profile share one generation.
+    X-Cache reports "hit", "miss" or "wait".
+    """
+    if not request.tech_name.strip():
+        raise HTTPException(status_code=400, detail="tech_name must not be empty")
+    try:
+        profile, status = await enrich_tech(request.tech_name, request.context)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to enrich technology")
+    response.headers["X-Cache"] = status
+    return EnrichTechResponse(**profile)
+
+
+@router.post("/enrich-tech/batch", response_model=EnrichTechBatchResponse,
+             dependencies=[Depends(verify_internal_key)])
+async def enrich_technologies(request: EnrichTechBatchRequest):
+    """
+    Enrich several technologies, packing many into each LLM call
+
+    Items are validated individually; ones that fail validation are retried
+    and, if they still fail, returned with profile=null and cache="failed".
+    """
+    if not 1 <= len(request.technologies) <= MAX_BATCH_TECHNOLOGIES:
+        raise HTTPException(status_code=400,
+                            detail=f"technologies must hold between 1 and {MAX_BATCH_TECHNOLOGIES} items")
+    if any(not item.tech_name.strip() for item in request.technologies):
+        raise HTTPException(status_code=400, detail="tech_name must not be empty")
+    try:
+        profiles, completions = await enrich_tech_batch(
+            [(item.tech_name, item.context) for item in request.technologies]
+        )
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to enrich technologies")
+    return batch_response(request.technologies, profiles, completions)
+
+
+def batch_response(technologies: List[EnrichTechRequest], profiles: List[Tuple[Optional[dict], str]],
+                   completions: int) -> EnrichTechBatchResponse:
+    results = [
+        EnrichTechBatchItem(
+            tech_name=item.tech_name,
+            context=item.context,
+            profile=EnrichTechResponse(**profile) if profile is not None else None,
+            cache=status
+        )
+        for item, (profile, status) in zip(technologies, profiles)
+    ]
+    return EnrichTechBatchResponse(
+        results=results,
+        completions=completions,
+        failed=sum(result.profile is None for result in results)
     )
 
 
+def check_stack(request: EnrichStackRequest) -> None:
+    if not 1 <= len(request.technologies) <= MAX_STACK_TECHNOLOGIES:
+        raise HTTPException(status_code=400,
+                            detail=f"technologies must hold between 1 and {MAX_STACK_TECHNOLOGIES} items")
+    if any(not name.strip() for name in request.technologies):
+        raise HTTPException(status_code=400, detail="technology names must not be empty")
+
+
 @router.post("/enrich-stack", response_model=EnrichStackResponse, dependencies=[Depends(verify_internal_key)])
-async def enrich_stack(request: EnrichStackRequest):
-    """Stack-level enrichment analysis"""
-    # TODO: Implement via lib/ai_client.py
-    return EnrichStackResponse(
-        compatibility_score=0.92,
-        strengths=["Well integrated", "Production ready"],
-        weaknesses=["Complex setup"],
-        recommendations=["Add monitoring", "Consider caching"]
+async def enrich_stack_analysis(request: EnrichStackRequest):
+    """
+    Stack-level enrichment analysis
+
+    compatibility_score comes from the pairwise compatibility matrix when
+    one is built, else from the model.
+    """
+    check_stack(request)
+    try:
+        analysis = await enrich_stack(request.technologies, request.project_type)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to analyze stack")
+    return EnrichStackResponse(**analysis)
+
+
+@router.post("/enrich-stack/stream", dependencies=[Depends(verify_internal_key)])
+async def enrich_stack_stream(request: EnrichStackRequest, accept: Optional[str] = Header(None)):
+    """
+    Stack analysis streamed while the model writes it
+
+    Server-Sent Events, or NDJSON ({"event", "data"} per line) with
+    Accept: application/x-ndjson.
+
+    Events:
+        token: {"text"}, every model delta as it arrives
+        score: {"compatibility_score"}
+        item: {"field", "index", "value"}, each strength, weakness or recommendation once complete
+        done: the validated EnrichStackResponse
+        error: {"detail"}, instead of done when generation fails or the output is invalid
+    """
+    check_stack(request)
+    ndjson = "application/x-ndjson" in (accept or "")
+
+    async def events():
+        async for name, data in stream_enrich_stack(request.technologies, request.project_type):
+            if name == "done":
+                data = EnrichStackResponse(**data).model_dump()
+            if ndjson:
+                yield json.dumps({"event": name, "data": data}) + "\n"
+            else:
+                yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        # No proxy buffering, so each event reaches the client as it is sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+def check_rerank(request: RerankRequest) -> None:
+    if request.top_k is not None and request.top_k < 0:
+        raise HTTPException(status_code=400, detail="top_k must not be negative")
+    if request.budget_ms is not None and not 0 < request.budget_ms <= MAX_RERANK_BUDGET_MS:
+        raise HTTPException(status_code=400, detail=f"budget_ms must be between 1 and {MAX_RERANK_BUDGET_MS}")
+
+
 @router.post("/rerank", response_model=RerankResponse, dependencies=[Depends(verify_internal_key)])
-async def rerank_results(request: RerankRequest):
-    """Rerank recommendation results using LLM"""
-    # TODO: Implement via lib/ai_client.py
-    # Generate scores matching candidates length
-    scores = [0.95 - (i * 0.07) for i in range(len(request.candidates))]
+async def rerank_results(request: RerankRequest, response: Response):
+    """
+    Rerank recommendation results: local scoring of every candidate, LLM on the top slice
+
+    The top_k best candidates by embedding and term match are rescored by the
+    LLM and ranked first. X-Rerank reports the LLM stage: "completed",
+    "deadline" (budget_ms passed), "failed" or "skipped"; in all but the
+    first, every score is local.
+    """
+    check_rerank(request)
+    try:
+        order, scores, stages, status = await cascade_rerank(
+            request.query, request.candidates, request.top_k, request.budget_ms
+        )
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to rerank candidates")
+    response.headers["X-Rerank"] = status
     return RerankResponse(
-        ranked_results=request.candidates,
-        scores=scores
+        ranked_results=[request.candidates[position] for position in order],
+        scores=scores,
+        stages=stages
     )
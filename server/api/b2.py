@@ -1,16 +1,28 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse, FileResponse
 from pydantic import BaseModel
+from typing import Optional, List
 from middleware.internal_auth import verify_internal_key
 from lib.b2_client import get_b2_client
-from utils.file_utils import sanitize_filename
+from lib.disk_cache import CacheEntry
+from lib.zip_stream import ZipEntry, stream_zip
+from utils.file_utils import sanitize_filename, hash_upload
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024  # 100MB
+MAX_ARCHIVE_FILES = 10000
+
 
 class UploadResponse(BaseModel):
     file_id: str
     file_name: str
     url: str
+    digest: Optional[str] = None  # Set in content-addressed mode
+    deduplicated: bool = False
 
 
 class PresignResponse(BaseModel):
@@ -34,6 +46,14 @@ class ListResponse(BaseModel):
     count: int
 
 
+class ArchiveRequest(BaseModel):
+    keys: List[str] = []
+    prefix: Optional[str] = None
+    archive_name: str = "export.zip"
+    compress: bool = False
+    prefetch: int = 4
+
+
 class DownloadResponse(BaseModel):
     file_name: str
     size: int
@@ -44,19 +64,33 @@ class DownloadResponse(BaseModel):
 async def upload_file(file: UploadFile = File(...)):
     """Upload small files to Backblaze B2"""
     try:
-        # Validate file size (max 100MB)
-        content = await file.read()
-        if len(content) > 100 * 1024 * 1024:
-            raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB")
-        
         # Sanitize filename
         safe_filename = sanitize_filename(file.filename or 'unnamed')
+        content_type = file.content_type or 'application/octet-stream'
         
         b2 = get_b2_client()
+        
+        if b2.content_addressed:
+            # Hash while streaming; duplicates skip the upload entirely
+            digest, size = await hash_upload(file, MAX_UPLOAD_SIZE)
+            result = await b2.upload_content_addressed(
+                file_obj=file.file,
+                digest=digest,
+                size=size,
+                file_name=safe_filename,
+                content_type=content_type
+            )
+            return UploadResponse(**result)
+        
+        # Validate file size (max 100MB)
+        content = await file.read()
+        if len(content) > MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB")
+        
         result = await b2.upload_file(
             file_content=content,
             file_name=safe_filename,
-            content_type=file.content_type or 'application/octet-stream'
+            content_type=content_type
         )
         
         return UploadResponse(**result)
@@ -98,7 +132,8 @@ async def get_signed_read_url(file_name: str, expires_in: int = 3600):
             raise HTTPException(status_code=400, detail="expires_in must be between 60 and 604800 seconds")
         
         b2 = get_b2_client()
-        result = await b2.generate_presigned_download_url(safe_filename, expires_in)
+        key = await b2.resolve_key(safe_filename)
+        result = await b2.generate_presigned_download_url(key, expires_in)
         return ReadResponse(**result)
     except HTTPException:
         raise
@@ -111,7 +146,7 @@ async def check_file_exists(file_name: str):
     """Check if object exists in B2"""
     try:
         b2 = get_b2_client()
-        exists = await b2.file_exists(file_name)
+        exists = await b2.file_exists(await b2.resolve_key(file_name))
         return ExistsResponse(exists=exists, file_name=file_name)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -122,7 +157,7 @@ async def delete_file(file_name: str):
     """Delete a file from B2"""
     try:
         b2 = get_b2_client()
-        success = await b2.delete_file(file_name)
+        success = await b2.delete_named(file_name)
         return {"success": success, "file_name": file_name}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -143,3 +178,81 @@ async def list_files(prefix: str = "", max_keys: int = 100):
         raise
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to list files")
+
+
+@router.get("/download", dependencies=[Depends(verify_internal_key)])
+async def download_file(file_name: str):
+    """Download file content, served from the local disk cache when enabled"""
+    try:
+        safe_filename = sanitize_filename(file_name)
+        b2 = get_b2_client()
+        
+        key = await b2.resolve_key(safe_filename)
+        
+        content = await b2.open_file(key)
+        if isinstance(content, CacheEntry):
+            # Served straight from disk (sendfile where the server supports it)
+            return FileResponse(content.path, media_type="application/octet-stream", filename=safe_filename.split('/')[-1])
+        
+        return StreamingResponse(content, media_type="application/octet-stream")
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to download file")
+
+
+@router.get("/cache/stats", dependencies=[Depends(verify_internal_key)])
+async def cache_stats():
+    """Disk cache hit ratio and bytes saved"""
+    b2 = get_b2_client()
+    if not b2.cache:
+        return {"enabled": False}
+    return {"enabled": True, **b2.cache.stats()}
+
+
+@router.post("/archive", dependencies=[Depends(verify_internal_key)])
+async def download_archive(request: ArchiveRequest):
+    """Stream many files (by file name list or name prefix) as a single ZIP archive"""
+    try:
+        if bool(request.keys) == bool(request.prefix):
+            raise HTTPException(status_code=400, detail="Provide either keys or prefix")
+        if not 1 <= request.prefetch <= 16:
+            raise HTTPException(status_code=400, detail="prefetch must be between 1 and 16")
+        if len(request.keys) > MAX_ARCHIVE_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_ARCHIVE_FILES} keys per archive")
+        
+        archive_name = sanitize_filename(request.archive_name).split('/')[-1]
+        b2 = get_b2_client()
+        
+        if request.prefix:
+            safe_prefix = sanitize_filename(request.prefix)
+            # sanitize_filename drops a trailing slash; keep it so "stacks/" does not match "stacks-other/"
+            if request.prefix.strip().endswith('/'):
+                safe_prefix += '/'
+            files = await b2.list_named_files(safe_prefix, MAX_ARCHIVE_FILES)
+            entries = [ZipEntry(f['key'], f['key'], f['last_modified_ts']) for f in files]
+        else:
+            safe_keys = list(dict.fromkeys(sanitize_filename(key) for key in request.keys))
+            entries = [ZipEntry(key, key) for key in safe_keys]
+        
+        if not entries:
+            raise HTTPException(status_code=404, detail="No files to archive")
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to prepare archive")
+    
+    async def body():
+        try:
+            async for chunk in stream_zip(entries, b2.iter_named_chunks, request.prefetch, request.compress):
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; abort so the client sees a truncated archive
+            logger.error(f"Archive streaming failed: {e}")
+            raise
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"'}
+    )
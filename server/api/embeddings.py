@@ -1,33 +1,178 @@
-from fastapi import APIRouter, Depends
+import logging
+import os
+import re
+from functools import partial
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
+from typing import List, Optional
 from schemas.embeddings import (
     TechEmbeddingRequest, TechEmbeddingResponse,
-    ProjectEmbeddingRequest, ProjectEmbeddingResponse
+    ProjectEmbeddingRequest, ProjectEmbeddingResponse,
+    ReadmeEmbeddingRequest, ReadmeEmbeddingResponse,
+    EmbeddingChunk
 )
 from middleware.internal_auth import verify_internal_key
+from lib.embeddings_client import get_embeddings_client, tech_text, project_text
+from lib import vector_codec
+from lib.chunking import embed_document
+from lib.github_client import get_github_client
+from lib.ingest import Checkpoint, IngestError, db_sink, ingest_stream, iter_ndjson
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+def wire_format(
+    encoding: Optional[str] = None,
+    dtype: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+) -> vector_codec.WireFormat:
+    """Negotiate the vector wire format (JSON list by default)"""
+    try:
+        return vector_codec.negotiate(accept, encoding, dtype)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def binary_response(embedding, fmt: vector_codec.WireFormat, metadata: dict) -> Response:
+    try:
+        body = vector_codec.binary_body(embedding, fmt, metadata)
+    except ImportError:
+        raise HTTPException(status_code=406, detail="msgpack encoding is not available")
+    return Response(content=body, media_type=fmt.media_type, headers=vector_codec.binary_headers(embedding, fmt))
+
+
 @router.post("/tech", response_model=TechEmbeddingResponse, dependencies=[Depends(verify_internal_key)])
-async def generate_tech_embedding(request: TechEmbeddingRequest):
+async def generate_tech_embedding(request: TechEmbeddingRequest, fmt: vector_codec.WireFormat = Depends(wire_format)):
     """Generate vector embedding for technology"""
-    # TODO: Implement via lib/embeddings_client.py
-    # Mock 1536-dimensional embedding (OpenAI text-embedding-3-small)
-    mock_embedding = [0.0] * 1536
+    try:
+        client = get_embeddings_client()
+        embedding = await client.embed(tech_text(request.tech_name, request.description))
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to generate embedding")
+    
+    if fmt.is_binary:
+        return binary_response(embedding, fmt, {"tech_name": request.tech_name})
     return TechEmbeddingResponse(
         tech_name=request.tech_name,
-        embedding=mock_embedding,
-        dimensions=1536
+        dimensions=int(embedding.shape[0]),
+        **vector_codec.json_fields(embedding, fmt)
     )
 
 
+async def embed_long_text(text: str):
+    """Chunk, embed and pool a document using the configured chunk sizes"""
+    settings = get_settings()
+    return await embed_document(
+        get_embeddings_client(),
+        text,
+        max_tokens=settings.embedding_chunk_tokens,
+        overlap_tokens=settings.embedding_chunk_overlap_tokens
+    )
+
+
+def chunk_fields(chunks, vectors, fmt: vector_codec.WireFormat) -> List[EmbeddingChunk]:
+    return [
+        EmbeddingChunk(
+            index=chunk.index,
+            heading=chunk.heading,
+            text=chunk.body,
+            tokens=chunk.tokens,
+            **vector_codec.json_fields(vector, fmt)
+        )
+        for chunk, vector in zip(chunks, vectors)
+    ]
+
+
 @router.post("/project", response_model=ProjectEmbeddingResponse, dependencies=[Depends(verify_internal_key)])
-async def generate_project_embedding(request: ProjectEmbeddingRequest):
-    """Generate vector embedding for project description"""
-    # TODO: Implement via lib/embeddings_client.py
-    # Mock 1536-dimensional embedding
-    mock_embedding = [0.0] * 1536
+async def generate_project_embedding(request: ProjectEmbeddingRequest, fmt: vector_codec.WireFormat = Depends(wire_format)):
+    """Generate vector embedding for project description (chunked and pooled when long)"""
+    try:
+        embedding, chunks, vectors = await embed_long_text(
+            project_text(request.project_description, request.requirements)
+        )
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to generate embedding")
+    
+    if fmt.is_binary:
+        return binary_response(embedding, fmt, {"chunk_count": len(chunks)})
     return ProjectEmbeddingResponse(
-        embedding=mock_embedding,
-        dimensions=1536
+        dimensions=int(embedding.shape[0]),
+        chunk_count=len(chunks),
+        chunks=chunk_fields(chunks, vectors, fmt) if request.return_chunks else None,
+        **vector_codec.json_fields(embedding, fmt)
     )
+
+
+@router.post("/readme", response_model=ReadmeEmbeddingResponse, dependencies=[Depends(verify_internal_key)])
+async def generate_readme_embedding(request: ReadmeEmbeddingRequest, fmt: vector_codec.WireFormat = Depends(wire_format)):
+    """Fetch a repository README and embed it section by section"""
+    try:
+        readme = await get_github_client().get_readme(request.owner, request.repo)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to fetch README")
+
+    try:
+        embedding, chunks, vectors = await embed_long_text(readme["content"])
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to generate embedding")
+
+    if fmt.is_binary:
+        return binary_response(
+            embedding, fmt, {"owner": request.owner, "repo": request.repo, "sha": readme["sha"], "chunk_count": len(chunks)}
+        )
+    return ReadmeEmbeddingResponse(
+        owner=request.owner,
+        repo=request.repo,
+        sha=readme["sha"],
+        dimensions=int(embedding.shape[0]),
+        chunk_count=len(chunks),
+        chunks=chunk_fields(chunks, vectors, fmt) if request.return_chunks else None,
+        **vector_codec.json_fields(embedding, fmt)
+    )
+
+
+@router.get("/cache/stats", dependencies=[Depends(verify_internal_key)])
+async def embedding_cache_stats():
+    """Embedding cache sizes and hit rates per tier"""
+    return get_embeddings_client().cache.stats()
+
+
+@router.post("/ingest", dependencies=[Depends(verify_internal_key)])
+async def ingest_catalog(
+    request: Request,
+    source_id: Optional[str] = Query(None, description="Stable id of the upload; enables resume after a failure"),
+    batch_size: int = Query(256, ge=1, le=2048),
+    concurrency: int = Query(4, ge=1, le=32)
+):
+    """
+    Bulk-ingest an NDJSON technology catalog streamed in the request body
+
+    Each line is {"tech_name", "description", ...}. Records are embedded in
+    batches and upserted into the technologies table as the body arrives.
+    With a source_id, re-sending the same body after a failure resumes after
+    the last stored line.
+    """
+    checkpoint = None
+    if source_id:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", source_id)
+        checkpoint = Checkpoint(os.path.join(get_settings().ingest_checkpoint_dir, f"{safe_id}.json"))
+
+    client = get_embeddings_client()
+    try:
+        stats = await ingest_stream(
+            iter_ndjson(request.stream()),
+            client.embed_many,
+            partial(db_sink, model_id=client.model_id),
+            batch_size=batch_size,
+            concurrency=concurrency,
+            checkpoint=checkpoint
+        )
+    except IngestError as e:
+        logger.error(f"Catalog ingestion failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to ingest catalog; stored through line {e.stats.checkpoint}"
+        )
+    return stats.as_dict()
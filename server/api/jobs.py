@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, ValidationError
+from schemas.ai import EnrichStackRequest, EnrichStackResponse, EnrichTechBatchRequest, RerankRequest, RerankResponse
+from schemas.github import RepoStatsResponse
+from schemas.jobs import IngestJobRequest, JobResponse, JobSubmitRequest, RepoStatsJobRequest
+from middleware.internal_auth import verify_internal_key
+from api.ai import MAX_BATCH_TECHNOLOGIES, batch_response, check_rerank, check_stack
+from lib.embeddings_client import get_embeddings_client
+from lib.enrichment import enrich_stack, enrich_tech_batch
+from lib.github_client import get_github_client
+from lib.ingest import IngestError, db_sink, ingest_stream
+from lib.jobs import CANCELLED, Progress, QueueFull, batched, get_job_runner, public_view, register_handler
+from lib.reranker import cascade_rerank
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_JOB_ITEMS = 5000  # Technologies, repositories or records per job
+GITHUB_CONCURRENCY = 8
+
+
+def _check_batch(request: EnrichTechBatchRequest) -> None:
+    if not 1 <= len(request.technologies) <= MAX_JOB_ITEMS:
+        raise HTTPException(status_code=400, detail=f"technologies must hold between 1 and {MAX_JOB_ITEMS} items")
+    if any(not item.tech_name.strip() for item in request.technologies):
+        raise HTTPException(status_code=400, detail="tech_name must not be empty")
+
+
+def _check_items(field: str) -> Callable[[BaseModel], None]:
+    def check(request: BaseModel) -> None:
+        if not 1 <= len(getattr(request, field)) <= MAX_JOB_ITEMS:
+            raise HTTPException(status_code=400, detail=f"{field} must hold between 1 and {MAX_JOB_ITEMS} items")
+    return check
+
+
+async def _enrich_tech_batch(payload: dict, progress: Progress) -> dict:
+    """Same result as /api/ai/enrich-tech/batch, for up to MAX_JOB_ITEMS technologies"""
+    request = EnrichTechBatchRequest(**payload)
+    completions = 0
+
+    async def run(items):
+        nonlocal completions
+        profiles, calls = await enrich_tech_batch([(item.tech_name, item.context) for item in items])
+        completions += calls
+        return profiles
+
+    profiles = await batched(request.technologies, MAX_BATCH_TECHNOLOGIES, run, progress)
+    return batch_response(request.technologies, profiles, completions).model_dump()
+
+
+async def _enrich_stack(payload: dict, progress: Progress) -> dict:
+    request = EnrichStackRequest(**payload)
+    analysis = await enrich_stack(request.technologies, request.project_type)
+    return EnrichStackResponse(**analysis).model_dump()
+
+
+async def _rerank(payload: dict, progress: Progress) -> dict:
+    request = RerankRequest(**payload)
+    order, scores, stages, status = await cascade_rerank(
+        request.query, request.candidates, request.top_k, request.budget_ms
+    )
+    response = RerankResponse(
+        ranked_results=[request.candidates[position] for position in order],
+        scores=scores,
+        stages=stages
+    )
+    return {**response.model_dump(), "rerank": status}
+
+
+async def _repo_stats(payload: dict, progress: Progress) -> dict:
+    """Stats of many repositories; a repository that fails has stats=null and its error"""
+    request = RepoStatsJobRequest(**payload)
+    github = get_github_client()
+
+    async def fetch(repo) -> dict:
+        try:
+            stats = await github.get_repo_stats(repo.owner, repo.repo)
+            return {"owner": repo.owner, "repo": repo.repo, "stats": RepoStatsResponse(**stats).model_dump(),
+                    "error": None}
+        except Exception as e:
+            return {"owner": repo.owner, "repo": repo.repo, "stats": None, "error": str(e)}
+
+    async def run(repos):
+        return await asyncio.gather(*(fetch(repo) for repo in repos))
+
+    results = await batched(request.repos, GITHUB_CONCURRENCY, run, progress)
+    return {"results": results, "failed": sum(result["stats"] is None for result in results)}
+
+
+async def _ingest(payload: dict, progress: Progress) -> dict:
+    """Same stats as /api/embeddings/ingest, for records sent in the payload"""
+    request = IngestJobRequest(**payload)
+    client = get_embeddings_client()
+    updates = []
+
+    async def lines():
+        for line_no, record in enumerate(request.records, 1):
+            yield line_no, json.dumps(record).encode()
+
+    def report(stats) -> None:
+        updates.append(asyncio.create_task(progress(stats.checkpoint, len(request.records),
+                                                    f"{stats.ingested} ingested")))
+
+    try:
+        stats = await ingest_stream(
+            lines(),
+            client.embed_many,
+            partial(db_sink, model_id=client.model_id),
+            batch_size=request.batch_size,
+            progress=report
+        )
+    except IngestError as e:
+        raise Exception(f"Failed to ingest catalog; stored through line {e.stats.checkpoint}")
+    finally:
+        await asyncio.gather(*updates)
+    return stats.as_dict()
+
+
+# kind -> (payload schema, submit-time check, handler)
+JOB_KINDS: Dict[str, Tuple[Type[BaseModel], Optional[Callable[[Any], None]],
+                           Callable[[dict, Progress], Awaitable[Any]]]] = {
+    "enrich-tech-batch": (EnrichTechBatchRequest, _check_batch, _enrich_tech_batch),
+    "enrich-stack": (EnrichStackRequest, check_stack, _enrich_stack),
+    "rerank": (RerankRequest, check_rerank, _rerank),
+    "github-repo-stats": (RepoStatsJobRequest, _check_items("repos"), _repo_stats),
+    "ingest": (IngestJobRequest, _check_items("records"), _ingest),
+}
+
+for _kind, (_, _, _handler) in JOB_KINDS.items():
+    register_handler(_kind, _handler)
+
+
+@router.post("", response_model=JobResponse, status_code=202, dependencies=[Depends(verify_internal_key)])
+async def submit_job(request: JobSubmitRequest, response: Response):
+    """
+    Queue a long-running job and return at once
+
+    The payload is the request body of the matching endpoint and is
+    validated now. Poll GET /api/jobs/{id} (Location header) or pass a
+    webhook_url to receive the finished job. 503 while the queue is full.
+    """
+    if request.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown job kind '{request.kind}' (use {', '.join(JOB_KINDS)})")
+    schema, check, _ = JOB_KINDS[request.kind]
+    try:
+        payload = schema(**request.payload)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        raise HTTPException(status_code=400, detail=f"Invalid {request.kind} payload: {errors}")
+    if check is not None:
+        check(payload)
+
+    try:
+        job = await get_job_runner().submit(
+            request.kind,
+            payload.model_dump(),
+            request.priority,
+            str(request.webhook_url) if request.webhook_url else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full", headers={"Retry-After": "30"})
+    except Exception as e:
+        logger.error(f"Failed to queue {request.kind} job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue job")
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return JobResponse(**public_view(job))
+
+
+@router.get("/{job_id}", response_model=JobResponse, dependencies=[Depends(verify_internal_key)])
+async def get_job(job_id: str):
+    """Status, progress and, once finished, the result or error of a job"""
+    try:
+        job = await get_job_runner().get(job_id)
+    except Exception as e:
+        logger.error(f"Failed to read job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read job")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**public_view(job))
+
+
+@router.delete("/{job_id}", response_model=JobResponse, dependencies=[Depends(verify_internal_key)])
+async def cancel_job(job_id: str):
+    """Cancel a job that has not started (409 once it is running or finished)"""
+    try:
+        job = await get_job_runner().cancel(job_id)
+    except Exception as e:
+        logger.error(f"Failed to cancel job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to cancel job")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+    return JobResponse(**public_view(job))
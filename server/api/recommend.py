@@ -1,44 +1,329 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from schemas.recommend import (
+    AutocompleteResponse,
+    AutocompleteSuggestion,
     RecommendationRequest,
     RecommendationResponse,
+    SimilarTechnologiesResponse,
+    SimilarTechnology,
     TechRecommendation
 )
 from middleware.internal_auth import verify_internal_key
+from lib.autocomplete import get_autocomplete_index
+from lib.embeddings_client import get_embeddings_client, project_text
+from lib.knn_graph import get_knn_graph
+from lib.metadata_index import normalize_constraints
+from lib.metrics import get_metrics
+from lib.recommender import Candidate, catalog_version, hybrid_search, rerank_candidates
+from lib.result_cache import get_result_cache, request_keys
+from lib.vector_index import get_vector_index
+from settings import get_settings
 
 router = APIRouter()
 
+MAX_LIMIT = 100
+MAX_EF_SEARCH = 1000
+MAX_DEADLINE_MS = 60000
 
-@router.post("", response_model=RecommendationResponse, dependencies=[Depends(verify_internal_key)])
-async def get_recommendations(request: RecommendationRequest):
-    """
-    Embed project text, run pgvector similarity search, return ranked technologies/stacks
-    """
-    # TODO: 
-    # 1. Generate embedding via lib/embeddings_client.py
-    # 2. Query pgvector via lib/db.py for cosine similarity
-    # 3. Optionally rerank via lib/ai_client.py
-    # 4. Return top N results
-    
-    mock_recommendations = [
-        TechRecommendation(
-            tech_id="tech_1",
-            tech_name="React",
-            similarity_score=0.95,
-            category="Frontend Framework",
-            reason="Best match for interactive web applications"
-        ),
-        TechRecommendation(
-            tech_id="tech_2",
-            tech_name="FastAPI",
-            similarity_score=0.89,
-            category="Backend Framework",
-            reason="High-performance async Python framework"
+
+def _reason(candidate) -> str:
+    similar = f"{candidate.similarity:.0%} similar to the project description"
+    if "lexical" not in candidate.retrievers:
+        return similar
+    return f"Matches terms in and is {similar}"
+
+
+class _Run:
+    """Validated request state shared by the plain and streaming endpoints"""
+
+    def __init__(self, request: RecommendationRequest, rerank: bool, deadline_header: Optional[int]):
+        if not 1 <= request.limit <= MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_LIMIT}")
+        if request.ef_search is not None and not request.limit <= request.ef_search <= MAX_EF_SEARCH:
+            raise HTTPException(status_code=400, detail=f"ef_search must be between limit and {MAX_EF_SEARCH}")
+        self.weights = {name: weight for name, weight in
+                        (("vector", request.vector_weight), ("lexical", request.lexical_weight)) if weight is not None}
+        if any(weight < 0 for weight in self.weights.values()):
+            raise HTTPException(status_code=400, detail="vector_weight and lexical_weight must not be negative")
+        try:
+            self.filters = normalize_constraints(request.constraints)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        settings = get_settings()
+        budgets = [value for value in (request.deadline_ms, deadline_header) if value is not None]
+        deadline_ms = min(budgets) if budgets else settings.recommend_deadline_ms
+        if not 0 < deadline_ms <= MAX_DEADLINE_MS:
+            raise HTTPException(status_code=400, detail=f"deadline_ms must be between 1 and {MAX_DEADLINE_MS}")
+
+        self.request = request
+        self.rerank = rerank
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_ms / 1000
+        # With a rerank, retrieve a deeper list for the model to reorder
+        self.depth = max(request.limit, settings.recommend_rerank_candidates) if rerank else request.limit
+        self.query_text = project_text(request.project_description, request.requirements)
+        self.query_vector = None
+        self.cache = get_result_cache()
+        self.cache_status: Optional[str] = None
+        self.cache_similarity: Optional[float] = None
+        if self.cache is not None:
+            self.version = catalog_version()
+            self.cache_key, self.scope = request_keys(
+                request.project_description,
+                request.requirements,
+                {"constraints": request.constraints, "limit": request.limit,
+                 "ef_search": request.ef_search, "weights": self.weights, "rerank": rerank},
+                request.query_embedding
+            )
+
+    @property
+    def elapsed_ms(self) -> int:
+        return int((time.monotonic() - self.started) * 1000)
+
+    def cached(self) -> Optional[RecommendationResponse]:
+        """Exact cache hit; checked before embedding"""
+        if self.cache is None:
+            return None
+        result = self.cache.get_exact(self.cache_key, self.version)
+        if result is not None:
+            get_metrics().incr("recommend_cache_exact_hits")
+            self.cache_status = "hit-exact"
+        return result
+
+    async def embed(self) -> Optional[RecommendationResponse]:
+        """Query embedding, then the semantic cache; returns the cached result on a semantic hit"""
+        try:
+            query_vector = self.request.query_embedding
+            if query_vector is None:
+                client = get_embeddings_client()
+                query_vector = await client.embed(self.query_text)
+        except Exception:
+            raise HTTPException(status_code=500, detail="Failed to generate embedding")
+
+        settings = get_settings()
+        if query_vector.shape[0] != settings.embedding_dimensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"query_embedding must have {settings.embedding_dimensions} dimensions"
+            )
+        self.query_vector = query_vector
+
+        if self.cache is not None:
+            similar = self.cache.get_similar(query_vector, self.scope, self.version)
+            if similar is not None:
+                get_metrics().incr("recommend_cache_semantic_hits")
+                self.cache_status = "hit-semantic"
+                result, self.cache_similarity = similar
+                return result
+            get_metrics().incr("recommend_cache_misses")
+            self.cache_status = "miss"
+        return None
+
+    async def search(self) -> Tuple[List[Candidate], str, int]:
+        """Cosine top-k (local memory-mapped index or pgvector HNSW) and BM25, fused by reciprocal rank"""
+        try:
+            return await hybrid_search(
+                self.query_text, self.query_vector, limit=self.depth, ef_search=self.request.ef_search,
+                filters=self.filters, weights=self.weights
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            raise HTTPException(status_code=500, detail="Failed to fetch recommendations")
+
+    async def rerank_within_deadline(self, candidates: List[Candidate]) -> Tuple[List[Candidate], str]:
+        """
+        LLM rerank cut off at the request deadline
+
+        Returns:
+            (candidates, "completed" | "deadline" | "failed"); the fused order
+            is kept unless the rerank completed
+        """
+        metrics = get_metrics()
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            metrics.incr("recommend_rerank_deadline")
+            return candidates, "deadline"
+        try:
+            reranked = await asyncio.wait_for(rerank_candidates(self.query_text, list(candidates)), remaining)
+        except asyncio.TimeoutError:
+            metrics.incr("recommend_rerank_deadline")
+            return candidates, "deadline"
+        except Exception:
+            metrics.incr("recommend_rerank_errors")
+            return candidates, "failed"
+        metrics.incr("recommend_rerank_completed")
+        return reranked, "completed"
+
+    def response(self, candidates: List[Candidate], engine: str, total: int, stage: str) -> RecommendationResponse:
+        recommendations = [
+            TechRecommendation(
+                tech_id=candidate.tech_id,
+                tech_name=candidate.name,
+                similarity_score=round(candidate.similarity, 4),
+                category=candidate.category or "",
+                reason=_reason(candidate),
+                retrievers=candidate.retrievers,
+                fusion_score=round(candidate.fusion_score, 6),
+                rerank_score=round(candidate.rerank_score, 4) if stage == "reranked" else None
+            )
+            for candidate in candidates[:self.request.limit]
+        ]
+        return RecommendationResponse(
+            recommendations=recommendations,
+            total_candidates=total,
+            query_embedding_dimensions=int(self.query_vector.shape[0]),
+            engine=engine,
+            stage=stage
         )
-    ]
-    
-    return RecommendationResponse(
-        recommendations=mock_recommendations[:request.limit],
-        total_candidates=50,
-        query_embedding_dimensions=1536
+
+    def store(self, result: RecommendationResponse, engine: str) -> None:
+        # Degraded answers (vector search unavailable) are not worth keeping
+        if self.cache is not None and engine != "lexical":
+            self.cache.put(self.cache_key, self.scope, self.query_vector, result, self.version)
+
+    def cache_headers(self) -> dict:
+        headers = {}
+        if self.cache_status is not None:
+            headers["X-Cache"] = self.cache_status
+        if self.cache_similarity is not None:
+            headers["X-Cache-Similarity"] = f"{self.cache_similarity:.4f}"
+        return headers
+
+
+@router.post("", response_model=RecommendationResponse, dependencies=[Depends(verify_internal_key)])
+async def get_recommendations(
+    request: RecommendationRequest,
+    response: Response,
+    x_deadline_ms: Optional[int] = Header(None)
+):
+    """
+    Embed project text, run vector and lexical retrieval, return technologies ranked by fused score
+
+    With rerank=true the fused results are reordered by the LLM, unless the
+    deadline (deadline_ms or X-Deadline-Ms) passes first; X-Rerank reports
+    "completed", "deadline" or "failed".
+
+    Results are cached; X-Cache reports "hit-exact" (same normalized request),
+    "hit-semantic" (a near-identical query embedding, see X-Cache-Similarity)
+    or "miss".
+    """
+    run = _Run(request, bool(request.rerank), x_deadline_ms)
+    result = run.cached() or await run.embed()
+    if result is None:
+        candidates, engine, total = await run.search()
+        stage = "retrieval"
+        if run.rerank:
+            candidates, status = await run.rerank_within_deadline(candidates)
+            response.headers["X-Rerank"] = status
+            stage = "reranked" if status == "completed" else stage
+        result = run.response(candidates, engine, total, stage)
+        if not run.rerank or stage == "reranked":
+            run.store(result, engine)
+    response.headers.update(run.cache_headers())
+    return result
+
+
+def _event(name: str, data) -> str:
+    payload = data.model_dump_json() if isinstance(data, RecommendationResponse) else json.dumps(data)
+    return f"event: {name}\ndata: {payload}\n\n"
+
+
+@router.post("/stream", dependencies=[Depends(verify_internal_key)])
+async def stream_recommendations(request: RecommendationRequest, x_deadline_ms: Optional[int] = Header(None)):
+    """
+    Progressive recommendations over Server-Sent Events
+
+    Events:
+        results: fused retrieval results, sent as soon as search finishes
+        reranked: the LLM-reranked results (only if the rerank beats the deadline)
+        done: {"rerank": "completed" | "deadline" | "failed" | "skipped" | "cached", "elapsed_ms"}
+
+    The rerank is on unless rerank=false. Request errors are returned as
+    plain HTTP errors before the stream starts.
+    """
+    run = _Run(request, request.rerank is not False, x_deadline_ms)
+    cached = run.cached() or await run.embed()
+    if cached is None:
+        candidates, engine, total = await run.search()
+        first = run.response(candidates, engine, total, "retrieval")
+        if not run.rerank:
+            run.store(first, engine)
+
+    async def events():
+        if cached is not None:
+            yield _event("results", cached)
+            yield _event("done", {"rerank": "cached", "elapsed_ms": run.elapsed_ms})
+            return
+        yield _event("results", first)
+        status = "skipped"
+        if run.rerank:
+            reranked, status = await run.rerank_within_deadline(candidates)
+            if status == "completed":
+                result = run.response(reranked, engine, total, "reranked")
+                run.store(result, engine)
+                yield _event("reranked", result)
+        yield _event("done", {"rerank": status, "elapsed_ms": run.elapsed_ms})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering, so each event reaches the client as it is sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **run.cache_headers()}
+    )
+
+
+@router.get("/similar/{tech_id}", response_model=SimilarTechnologiesResponse,
+            dependencies=[Depends(verify_internal_key)])
+async def similar_technologies(tech_id: str, limit: int = Query(10, ge=1, le=100)):
+    """
+    Alternatives to a technology, from the precomputed neighbour graph
+    (python -m lib.knn_graph build)
+    """
+    graph = await get_knn_graph()
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Similarity graph has not been built")
+    neighbours = graph.similar(tech_id, limit)
+    if neighbours is None:
+        raise HTTPException(status_code=404, detail=f"Technology '{tech_id}' not found")
+
+    index = get_vector_index()
+    similar = []
+    for neighbour_id, score in neighbours:
+        row = index.row_for(neighbour_id) if index is not None else None
+        if row is None:
+            # Deleted since the graph was built
+            continue
+        record = index.record(row)
+        similar.append(SimilarTechnology(
+            tech_id=neighbour_id,
+            tech_name=record["name"],
+            category=record.get("category") or "",
+            similarity_score=round(score, 4)
+        ))
+    return SimilarTechnologiesResponse(tech_id=tech_id, similar=similar, built_at=graph.meta.get("built_at"))
+
+
+@router.get("/autocomplete", response_model=AutocompleteResponse, dependencies=[Depends(verify_internal_key)])
+async def autocomplete(q: str = Query(..., max_length=100), limit: int = Query(10, ge=1, le=50)):
+    """
+    Technologies whose name or alias starts with q, most popular first;
+    typos are matched within one or two edits when nothing starts with q
+    """
+    index = await get_autocomplete_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Autocomplete index is not available")
+    started = time.perf_counter()
+    suggestions = index.suggest(q, limit)
+    get_metrics().observe("autocomplete_ms", (time.perf_counter() - started) * 1000)
+    return AutocompleteResponse(
+        query=q,
+        suggestions=[AutocompleteSuggestion(**suggestion) for suggestion in suggestions]
     )
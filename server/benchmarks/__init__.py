@@ -0,0 +1 @@
+# Standalone benchmark scripts (run from server/: python -m benchmarks.<name>)
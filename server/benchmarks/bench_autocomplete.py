@@ -0,0 +1,82 @@
+"""
+Microbenchmark: autocomplete build time and per-keystroke lookup latency
+
+Builds an AutocompleteIndex over a synthetic catalog (pronounceable names,
+aliases, Zipf-distributed stars/downloads), then replays every prefix of
+sampled names, plus the same names with one typo, as single lookups.
+
+Usage (from server/):
+    python -m benchmarks.bench_autocomplete --count 100000 --queries 2000
+"""
+import argparse
+import gc
+import time
+
+import numpy as np
+
+from lib.autocomplete import AutocompleteIndex
+
+SYLLABLES = ["ba", "co", "da", "fi", "go", "ka", "lo", "ma", "ne", "pi", "qu", "ra", "si", "to", "vu", "xe", "zo",
+             "js", "db", "ql", "ly", "io", "ex", "ct"]
+
+
+def catalog(count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(count):
+        word = "".join(rng.choice(SYLLABLES, rng.integers(2, 5)))
+        name = word.capitalize() if rng.random() < 0.7 else f"{word.capitalize()} {rng.choice(SYLLABLES)}kit"
+        records.append({
+            "id": f"t{i}",
+            "name": name,
+            "metadata": {
+                "stars": int(rng.zipf(1.6)) * 10,
+                "downloads": int(rng.zipf(1.4)) * 100,
+                "aliases": [word + "js"] if rng.random() < 0.2 else []
+            }
+        })
+    return records
+
+
+def typo(text: str, rng) -> str:
+    i = int(rng.integers(1, len(text) - 1))
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def percentiles(samples: list) -> str:
+    ms = np.array(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):.3f} ms  p99 {np.percentile(ms, 99):.3f} ms  max {ms.max():.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = catalog(args.count, args.seed)
+    start = time.perf_counter()
+    index = AutocompleteIndex(records)
+    print(f"build: {args.count} technologies, {len(index.keys)} keys in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(args.seed + 1)
+    names = [records[i]["name"].lower() for i in rng.choice(args.count, args.queries, replace=False)]
+    # The server keeps only the index; the source records would just slow the collector down here
+    del records
+    gc.collect()
+    for label, queries in (
+        ("prefix", [name[:length] for name in names for length in range(1, len(name) + 1)]),
+        ("fuzzy", [typo(name, rng) for name in names if len(name) >= 4])
+    ):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.suggest(query, args.limit)
+            samples.append(time.perf_counter() - start)
+        print(f"{label:<7} {len(queries):>7} lookups  {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: micro-batched embeddings vs one upstream call per request
+
+Fires N concurrent embedding requests (bounded client concurrency) at a local
+stub embedding server and reports throughput and upstream call counts.
+
+Usage (from server/):
+    python -m benchmarks.bench_embeddings_batcher --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_embedding_server import StubServer
+from lib.embedding_backends import OpenAIBackend
+from lib.embeddings_client import EmbeddingsClient
+
+
+async def run(client: EmbeddingsClient, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await client.embed(f"technology {i} description")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-concurrent-batches", type=int, default=8)
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        configs = [
+            ("per-request", dict(window_ms=0, min_window_ms=0, max_batch_size=1,
+                                 max_concurrent_batches=args.concurrency)),
+            ("micro-batched", dict(window_ms=args.window_ms, max_batch_size=args.max_batch_size,
+                                   max_concurrent_batches=args.max_concurrent_batches)),
+        ]
+        print(f"{args.requests} requests, client concurrency {args.concurrency}")
+        print(f"{'mode':<15}{'seconds':>10}{'req/s':>12}{'upstream calls':>16}")
+        for name, kwargs in configs:
+            backend = OpenAIBackend(api_key="stub", api_base=server.base_url)
+            client = EmbeddingsClient(backend, cache_memory_entries=0, **kwargs)
+            calls_before = server.calls
+            elapsed = asyncio.run(run(client, args.requests, args.concurrency))
+            print(f"{name:<15}{elapsed:>10.2f}{args.requests / elapsed:>12.0f}{server.calls - calls_before:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: recall vs speed/memory of truncated and quantized vector search
+
+Builds a synthetic corpus (clustered unit vectors whose variance decays with
+the dimension index, like Matryoshka-trained embeddings) as a float32 memmap,
+computes exact top-k neighbours with a full-precision scan, then compares
+storage configurations with and without full-precision re-ranking.
+
+Usage (from server/):
+    python -m benchmarks.bench_quantization --count 1000000 --dir /tmp/bench-vectors
+    python -m benchmarks.bench_quantization --count 100000   # quick run
+
+The corpus file is ~6 GB at 1M x 1536; it is reused from --dir when present.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from lib.quantization import QuantizedVectors, normalize
+
+# (dimensions, quantization); None keeps all dimensions
+CONFIGS = [
+    (None, "int8"),
+    (512, "int8"),
+    (256, "int8"),
+    (256, "float16"),
+    (128, "int8"),
+]
+
+BLOCK = 65536
+
+
+def spectrum(dimensions: int) -> np.ndarray:
+    """Per-dimension scale: leading dimensions carry most of the signal"""
+    return (1.0 / np.sqrt(1.0 + np.arange(dimensions) / 64.0)).astype(np.float32)
+
+
+def generate_corpus(path: str, count: int, dimensions: int, clusters: int, seed: int) -> np.ndarray:
+    """Write (or reopen) a normalized synthetic corpus as an .npy memmap"""
+    if os.path.exists(path):
+        corpus = np.load(path, mmap_mode="r")
+        if corpus.shape == (count, dimensions):
+            return corpus
+
+    rng = np.random.default_rng(seed)
+    weights = spectrum(dimensions)
+    centers = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    corpus = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(count, dimensions))
+    for start in range(0, count, BLOCK):
+        rows = min(BLOCK, count - start)
+        assignment = rng.integers(0, clusters, rows)
+        block = centers[assignment] + 1.5 * rng.standard_normal((rows, dimensions), dtype=np.float32)
+        corpus[start:start + rows] = normalize(block * weights)
+    corpus.flush()
+    return np.load(path, mmap_mode="r")
+
+
+def make_queries(corpus: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """Noisy copies of random corpus vectors"""
+    rng = np.random.default_rng(seed + 1)
+    picks = np.sort(rng.choice(corpus.shape[0], count, replace=False))
+    noise = 0.5 * rng.standard_normal((count, corpus.shape[1]), dtype=np.float32) / np.sqrt(corpus.shape[1])
+    return normalize(corpus[picks] + noise * spectrum(corpus.shape[1]))
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_queries(index: QuantizedVectors, queries: np.ndarray, k: int, rerank: int) -> float:
+    """Mean single-query latency in ms"""
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, k=k, rerank=rerank)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries used for recall")
+    parser.add_argument("--timed-queries", type=int, default=10, help="Single queries timed per config")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank", type=int, default=100)
+    parser.add_argument("--dir", default="/tmp/bench-vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    path = os.path.join(args.dir, f"corpus-{args.count}x{args.dimensions}-{args.seed}.npy")
+    start = time.perf_counter()
+    corpus = generate_corpus(path, args.count, args.dimensions, args.clusters, args.seed)
+    print(f"corpus: {args.count} x {args.dimensions} float32 ({corpus.nbytes / 2**20:.0f} MiB) "
+          f"ready in {time.perf_counter() - start:.1f}s")
+
+    queries = make_queries(corpus, args.queries, args.seed)
+    exact = QuantizedVectors(corpus, None, None, args.dimensions, "none")
+    start = time.perf_counter()
+    truth, _ = exact.search(queries, k=args.k, rerank=0)
+    print(f"exact top-{args.k} for {args.queries} queries in {time.perf_counter() - start:.1f}s\n")
+
+    timed = queries[:args.timed_queries]
+    header = f"{'config':<18} {'scan MiB':>9} {'build s':>8} {'recall':>7} {'ms/q':>8} {'+rerank':>8} {'ms/q':>8}"
+    print(header)
+    print("-" * len(header))
+    baseline_ms = time_queries(exact, timed, args.k, 0)
+    print(f"{'float32 x' + str(args.dimensions):<18} {corpus.nbytes / 2**20:>9.0f} {'-':>8} "
+          f"{1.0:>7.3f} {baseline_ms:>8.1f} {'-':>8} {'-':>8}")
+
+    for dimensions, quantization in CONFIGS:
+        start = time.perf_counter()
+        index = QuantizedVectors.build(corpus, dimensions, quantization)
+        build_seconds = time.perf_counter() - start
+        coarse, _ = index.search(queries, k=args.k, rerank=0)
+        reranked, _ = index.search(queries, k=args.k, rerank=args.rerank)
+        label = f"{quantization} x{index.dimensions}"
+        print(f"{label:<18} {index.nbytes / 2**20:>9.0f} {build_seconds:>8.1f} "
+              f"{recall(coarse, truth):>7.3f} {time_queries(index, timed, args.k, 0):>8.1f} "
+              f"{recall(reranked, truth):>8.3f} {time_queries(index, timed, args.k, args.rerank):>8.1f}")
+        del index
+
+
+if __name__ == "__main__":
+    main()
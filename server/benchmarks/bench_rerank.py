@@ -0,0 +1,184 @@
+"""
+Benchmark: cascade rerank (local scoring + LLM on the top slice) vs full-LLM rerank
+
+Replays a fixed fixture set (queries over a shared pool of 40 candidates,
+with the relevance an LLM assigned to every candidate) through
+lib.reranker.cascade_rerank for several top_k values. Reports latency and
+rank agreement with the full-LLM ranking: NDCG@10 using the LLM scores as
+gains, top-10 overlap, and Kendall's tau over pairs the LLM did not tie.
+
+By default the LLM is simulated from the recorded scores, with latency
+growing per candidate like a real completion (--llm-ms, --llm-ms-per-candidate).
+--live uses the configured chat model (AI_MODEL) for both sides instead.
+
+Usage (from server/):
+    python -m benchmarks.bench_rerank --top-k 0 5 10 20
+    python -m benchmarks.bench_rerank --live --repeat 1
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from lib import reranker
+from lib.embedding_backends import LocalHashingBackend
+from lib.embeddings_client import EmbeddingsClient
+
+POOL = [
+    ("React", "Frontend", "Component-based JavaScript library for building user interfaces"),
+    ("Vue.js", "Frontend", "Progressive JavaScript framework for reactive web interfaces"),
+    ("Svelte", "Frontend", "Compiler that turns components into small imperative JavaScript"),
+    ("Next.js", "Frontend", "React framework with server-side rendering and static generation"),
+    ("Tailwind CSS", "Frontend", "Utility-first CSS framework for rapid UI styling"),
+    ("React Native", "Mobile", "Build native iOS and Android apps with React"),
+    ("Flutter", "Mobile", "Dart UI toolkit for natively compiled mobile, web and desktop apps"),
+    ("FastAPI", "Backend", "High-performance Python web framework for APIs with type hints"),
+    ("Django", "Backend", "Batteries-included Python web framework with ORM and admin"),
+    ("Express", "Backend", "Minimal Node.js web framework for HTTP servers and REST APIs"),
+    ("Spring Boot", "Backend", "Opinionated Java framework for production microservices"),
+    ("Go", "Language", "Compiled language with goroutines for concurrent network services"),
+    ("Rust", "Language", "Memory-safe systems language without a garbage collector"),
+    ("gRPC", "Backend", "High-performance RPC framework over HTTP/2 with protocol buffers"),
+    ("GraphQL", "Backend", "Query language for APIs with a typed schema"),
+    ("PostgreSQL", "Database", "Relational database with transactions, JSON and extensions"),
+    ("MySQL", "Database", "Popular open-source relational database"),
+    ("MongoDB", "Database", "Document database storing flexible JSON-like records"),
+    ("Redis", "Database", "In-memory key-value store for caching, queues and pub/sub"),
+    ("Cassandra", "Database", "Wide-column store for massive write throughput across data centers"),
+    ("ClickHouse", "Database", "Column-oriented database for real-time analytical queries"),
+    ("TimescaleDB", "Database", "PostgreSQL extension for time-series data"),
+    ("Elasticsearch", "Search", "Distributed full-text search and analytics engine"),
+    ("pgvector", "Database", "Vector similarity search inside PostgreSQL"),
+    ("Qdrant", "Database", "Vector database for embedding similarity search"),
+    ("Apache Kafka", "Messaging", "Distributed event streaming platform with durable partitioned logs"),
+    ("RabbitMQ", "Messaging", "Message broker with queues, routing and acknowledgements"),
+    ("Apache Flink", "Data", "Stateful stream processing with event-time windows"),
+    ("Apache Spark", "Data", "Distributed batch and streaming data processing engine"),
+    ("Airflow", "Data", "Workflow scheduler for batch data pipelines as Python DAGs"),
+    ("dbt", "Data", "SQL transformations with tests and lineage in the warehouse"),
+    ("Docker", "DevOps", "Containers for packaging and running applications"),
+    ("Kubernetes", "DevOps", "Container orchestration with autoscaling and self-healing"),
+    ("Terraform", "DevOps", "Infrastructure as code for cloud provisioning"),
+    ("Prometheus", "Observability", "Metrics collection and alerting with a time-series database"),
+    ("Grafana", "Observability", "Dashboards and visualization for metrics and logs"),
+    ("OpenTelemetry", "Observability", "Vendor-neutral tracing, metrics and logs instrumentation"),
+    ("PyTorch", "ML", "Deep learning framework with dynamic computation graphs"),
+    ("LangChain", "ML", "Framework for composing LLM applications with tools and retrieval"),
+    ("Stripe", "Payments", "Payments API for online businesses"),
+]
+
+# LLM relevance per query; unlisted candidates scored 0.05
+FIXTURES = [
+    ("Event-driven order processing backend: services publish domain events, consumers must not lose messages, "
+     "throughput around 50k events per second", {
+         "Apache Kafka": 0.95, "RabbitMQ": 0.8, "Apache Flink": 0.7, "Go": 0.55, "gRPC": 0.45,
+         "PostgreSQL": 0.45, "Cassandra": 0.5, "Spring Boot": 0.5, "Redis": 0.4, "Kubernetes": 0.35,
+         "OpenTelemetry": 0.3, "Prometheus": 0.25, "Apache Spark": 0.3, "ClickHouse": 0.2, "Docker": 0.2}),
+    ("Marketing website with a blog, good SEO and a small team of frontend developers", {
+        "Next.js": 0.95, "React": 0.8, "Tailwind CSS": 0.75, "Vue.js": 0.65, "Svelte": 0.6,
+        "Express": 0.25, "Stripe": 0.2, "PostgreSQL": 0.15, "Docker": 0.1}),
+    ("Semantic search over support tickets with embeddings and an LLM answering questions", {
+        "pgvector": 0.9, "Qdrant": 0.9, "LangChain": 0.85, "Elasticsearch": 0.7, "PyTorch": 0.55,
+        "FastAPI": 0.6, "PostgreSQL": 0.55, "Redis": 0.3, "Apache Kafka": 0.15, "Docker": 0.2}),
+    ("IoT telemetry from thousands of sensors: store time series, dashboards and alerts on thresholds", {
+        "TimescaleDB": 0.95, "Grafana": 0.9, "Prometheus": 0.8, "ClickHouse": 0.75, "Apache Kafka": 0.7,
+        "Cassandra": 0.55, "Apache Flink": 0.55, "PostgreSQL": 0.5, "Go": 0.4, "Redis": 0.3,
+        "Kubernetes": 0.3, "Elasticsearch": 0.3}),
+    ("Cross-platform mobile app for booking fitness classes with payments", {
+        "Flutter": 0.9, "React Native": 0.9, "Stripe": 0.85, "FastAPI": 0.45, "Express": 0.45,
+        "PostgreSQL": 0.5, "Django": 0.45, "MongoDB": 0.35, "Redis": 0.2, "GraphQL": 0.35}),
+    ("Nightly analytics pipeline loading product events into a warehouse and building reporting tables", {
+        "Airflow": 0.9, "dbt": 0.9, "Apache Spark": 0.8, "ClickHouse": 0.75, "PostgreSQL": 0.5,
+        "Apache Kafka": 0.45, "Apache Flink": 0.35, "Grafana": 0.3, "Docker": 0.2, "Kubernetes": 0.2}),
+]
+
+
+class SimulatedLLM:
+    """Returns the recorded scores after a delay that grows with the number of candidates"""
+
+    def __init__(self, relevance: Dict[str, float], base_ms: float, per_candidate_ms: float):
+        self.relevance = relevance
+        self.base_ms = base_ms
+        self.per_candidate_ms = per_candidate_ms
+
+    async def rerank(self, query: str, candidates: List[Dict]) -> List[float]:
+        await asyncio.sleep((self.base_ms + self.per_candidate_ms * len(candidates)) / 1000)
+        return [self.relevance.get(candidate["name"], 0.05) for candidate in candidates]
+
+
+def ndcg(order: List[int], gains: np.ndarray, depth: int = 10) -> float:
+    discounts = 1 / np.log2(np.arange(2, depth + 2))
+    ideal = np.sort(gains)[::-1][:depth] @ discounts
+    return float(gains[order[:depth]] @ discounts[:len(order[:depth])] / ideal)
+
+
+def kendall_tau(order: List[int], gains: np.ndarray) -> float:
+    """Agreement over pairs the reference does not tie: 1 = same order, -1 = reversed"""
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    concordant = discordant = 0
+    for a in range(len(gains)):
+        for b in range(a + 1, len(gains)):
+            if gains[a] == gains[b]:
+                continue
+            if (gains[a] > gains[b]) == (rank[a] < rank[b]):
+                concordant += 1
+            else:
+                discordant += 1
+    return (concordant - discordant) / max(concordant + discordant, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[0, 5, 10, 20])
+    parser.add_argument("--budget-ms", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="Simulated LLM latency per call")
+    parser.add_argument("--llm-ms-per-candidate", type=float, default=40.0, help="Simulated latency per candidate")
+    parser.add_argument("--live", action="store_true", help="Use the configured chat model")
+    args = parser.parse_args()
+
+    candidates = [{"name": name, "category": category, "description": description}
+                  for name, category, description in POOL]
+    if not args.live:
+        embeddings = EmbeddingsClient(LocalHashingBackend())
+        reranker.get_embeddings_client = lambda: embeddings
+
+    async def run():
+        rows = {"full LLM": [], **{f"cascade k={k}": [] for k in args.top_k}}
+        for query, relevance in FIXTURES:
+            if not args.live:
+                llm = SimulatedLLM(relevance, args.llm_ms, args.llm_ms_per_candidate)
+                reranker.get_ai_client = lambda: llm
+            # The full-LLM ranking is the reference; live runs take its scores as the gains
+            start = time.perf_counter()
+            full, scores, _, status = await reranker.cascade_rerank(query, candidates, len(candidates),
+                                                                    args.budget_ms)
+            full_ms = (time.perf_counter() - start) * 1000
+            if status != "completed":
+                raise SystemExit(f"Full-LLM rerank {status}; raise --budget-ms")
+            gains = np.empty(len(candidates))
+            gains[full] = scores
+            rows["full LLM"].append((full_ms, 1.0, 1.0, 1.0))
+            for k in args.top_k:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    order, _, _, _ = await reranker.cascade_rerank(query, candidates, k, args.budget_ms)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    overlap = len(set(order[:10]) & set(full[:10])) / 10
+                    rows[f"cascade k={k}"].append((elapsed, ndcg(order, gains), overlap, kendall_tau(order, gains)))
+        return rows
+
+    rows = asyncio.run(run())
+    print(f"{len(FIXTURES)} queries x {len(candidates)} candidates ({'live' if args.live else 'simulated'} LLM)")
+    print(f"{'ranker':<16}{'p50 ms':>10}{'max ms':>10}{'NDCG@10':>10}{'top-10':>9}{'tau':>8}")
+    for label, samples in rows.items():
+        values = np.array(samples)
+        print(f"{label:<16}{np.percentile(values[:, 0], 50):>10.1f}{values[:, 0].max():>10.1f}"
+              f"{values[:, 1].mean():>10.3f}{values[:, 2].mean():>9.2f}{values[:, 3].mean():>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Microbenchmark: per-request cost of List[float] vs the NumPy-backed Vector type
+
+Measures, for a 1536-dim embedding response model:
+- validation from an upstream float32 array (what the endpoints produce)
+- validation from a JSON-decoded Python list (what request bodies carry)
+- JSON serialization of the validated model
+- peak allocation per request (tracemalloc)
+
+Usage (from server/):
+    python -m benchmarks.bench_vector_type --dimensions 1536 --iterations 2000
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+from typing import List
+
+import numpy as np
+from pydantic import BaseModel
+
+from schemas.vector import Vector
+
+
+class ListResponse(BaseModel):
+    embedding: List[float]
+    dimensions: int
+
+
+class VectorResponse(BaseModel):
+    embedding: Vector
+    dimensions: int
+
+
+def peak_bytes(fn) -> int:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    vector = np.random.default_rng(0).standard_normal(args.dimensions).astype(np.float32)
+    as_list = json.loads(json.dumps(vector.tolist()))
+
+    cases = {
+        "List[float]": {
+            # Before: upstream arrays had to become Python lists before validation
+            "from array": lambda: ListResponse(embedding=vector.tolist(), dimensions=args.dimensions),
+            "from list": lambda: ListResponse(embedding=as_list, dimensions=args.dimensions),
+        },
+        "Vector": {
+            "from array": lambda: VectorResponse(embedding=vector, dimensions=args.dimensions),
+            "from list": lambda: VectorResponse(embedding=as_list, dimensions=args.dimensions),
+        },
+    }
+
+    print(f"{args.dimensions}-dim vector, {args.iterations} iterations (microseconds per call, peak KB)")
+    print(f"{'type':<14}{'case':<14}{'validate':>10}{'serialize':>11}{'peak KB':>10}")
+    for type_name, builders in cases.items():
+        for case_name, build in builders.items():
+            model = build()
+            validate_us = timeit.timeit(build, number=args.iterations) / args.iterations * 1e6
+            serialize_us = timeit.timeit(model.model_dump_json, number=args.iterations) / args.iterations * 1e6
+            peak = peak_bytes(lambda: build().model_dump_json()) / 1024
+            print(f"{type_name:<14}{case_name:<14}{validate_us:>10.1f}{serialize_us:>11.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
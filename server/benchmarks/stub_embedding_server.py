@@ -0,0 +1,83 @@
+"""
+Local stub of an OpenAI-compatible /embeddings endpoint for benchmarks
+Simulates a fixed per-call latency plus a small per-input cost. Runs in a
+separate process so it does not compete with the client for the GIL.
+"""
+import array
+import asyncio
+import base64
+import hashlib
+import multiprocessing
+import socket
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+def create_app(dimensions: int = 1536, call_latency_ms: float = 40.0, per_input_ms: float = 0.05) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+    # A small pool of distinct vectors keeps response generation cheap
+    pool = [[((i * 31 + j) % 255) / 255.0 - 0.5 for j in range(dimensions)] for i in range(64)]
+    pool_b64 = [base64.b64encode(array.array("f", vector).tobytes()).decode("ascii") for vector in pool]
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.calls += 1
+        await asyncio.sleep((call_latency_ms + per_input_ms * len(inputs)) / 1000)
+
+        encoded = body.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(inputs):
+            slot = hashlib.sha256(text.encode("utf-8")).digest()[0] % len(pool)
+            vector = pool_b64[slot] if encoded else pool[slot]
+            data.append({"object": "embedding", "index": index, "embedding": vector})
+        return {"object": "list", "data": data, "model": body.get("model", "stub")}
+
+    @app.get("/v1/stats")
+    async def stats():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def _serve(port: int, app_kwargs: dict) -> None:
+    uvicorn.run(create_app(**app_kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+class StubServer:
+    """Runs the stub app with uvicorn in a child process"""
+
+    def __init__(self, **app_kwargs):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process = multiprocessing.Process(target=_serve, args=(self.port, app_kwargs), daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def calls(self) -> int:
+        return httpx.get(f"{self.base_url}/stats").json()["calls"]
+
+    def __enter__(self):
+        self.process.start()
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.calls
+                return self
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
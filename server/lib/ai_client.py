@@ -0,0 +1,496 @@
+"""
+LLM client
+OpenAI-compatible chat completions with JSON output, used to rerank
+recommendation candidates against the project description and to enrich
+technology profiles
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from settings import get_settings
+from lib.embeddings_client import estimate_tokens
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Description characters sent per rerank candidate; keeps prompts (and latency) bounded
+_RERANK_DESCRIPTION_CHARS = 200
+
+_RERANK_SYSTEM_PROMPT = (
+    "You rank software technologies for a project. For each numbered candidate, score how well it fits "
+    "the project from 0 (irrelevant) to 1 (ideal). Reply with JSON: "
+    '{"scores": [{"index": <candidate number>, "score": <0..1>}]} covering every candidate.'
+)
+
+_PAIR_SYSTEM_PROMPT = (
+    "You judge whether pairs of software technologies work well together in one stack. For each numbered pair, "
+    "score from 0 (incompatible or redundant) to 1 (commonly used together, first-class integration). Reply with "
+    'JSON: {"scores": [{"index": <pair number>, "score": <0..1>}]} covering every pair.'
+)
+
+# Bump when the enrichment prompt or its output shape changes; part of the response cache key
+ENRICH_TECH_PROMPT_VERSION = "1"
+
+_ENRICH_TECH_SYSTEM_PROMPT = (
+    "You write concise, factual profiles of software technologies for engineers comparing stacks. Reply with "
+    'JSON: {"tagline": <one sentence>, "pros": [<3-5 short strings>], "cons": [<2-4 short strings>], '
+    '"features": [<3-6 short strings>], "metrics": {"popularity": <low|medium|high>, '
+    '"maturity": <experimental|growing|stable|legacy>, "learning_curve": <low|medium|high>}, '
+    '"use_cases": [<3-5 short strings>]}.'
+)
+
+_ENRICH_TECH_BATCH_SYSTEM_PROMPT = (
+    "You write concise, factual profiles of software technologies for engineers comparing stacks. For each "
+    'numbered technology, write a profile: {"index": <technology number>, "tagline": <one sentence>, '
+    '"pros": [<3-5 short strings>], "cons": [<2-4 short strings>], "features": [<3-6 short strings>], '
+    '"metrics": {"popularity": <low|medium|high>, "maturity": <experimental|growing|stable|legacy>, '
+    '"learning_curve": <low|medium|high>}, "use_cases": [<3-5 short strings>]}. '
+    'Reply with JSON: {"profiles": [<profile>, ...]} covering every technology.'
+)
+
+_ENRICH_TECH_LISTS = ("pros", "cons", "features", "use_cases")
+
+_ENRICH_STACK_SYSTEM_PROMPT = (
+    "You assess how well a set of technologies works together as one stack. Reply with JSON, keys in this "
+    'order: {"compatibility_score": <0..1>, "strengths": [<2-5 short strings>], '
+    '"weaknesses": [<2-5 short strings>], "recommendations": [<2-5 short strings>]}.'
+)
+
+ENRICH_STACK_LISTS = ("strengths", "weaknesses", "recommendations")
+
+# Completion tokens budgeted per stack analysis
+STACK_TOKENS = 600
+
+# Completion tokens budgeted per profile
+PROFILE_TOKENS = 350
+
+# Rate-limited (429) completions are retried this many times, after the provider's Retry-After
+_RATE_LIMIT_RETRIES = 2
+_MAX_RETRY_AFTER_SECONDS = 30.0
+
+
+def _text(value) -> str:
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"expected a string, got {value!r}")
+
+
+def parse_profile(content: dict) -> dict:
+    """
+    Validate a model-written profile against the EnrichTechResponse shape
+
+    Args:
+        content: One profile object from the completion
+
+    Returns:
+        {tagline, pros, cons, features, metrics, use_cases} with string
+        values (numbers are converted)
+
+    Raises:
+        ValueError: On a missing field or a value of the wrong type
+    """
+    profile = {"tagline": _text(content.get("tagline"))}
+    for field in _ENRICH_TECH_LISTS:
+        values = content.get(field)
+        if not isinstance(values, list):
+            raise ValueError(f"{field} is not a list")
+        profile[field] = [_text(value) for value in values]
+    metrics = content.get("metrics")
+    if not isinstance(metrics, dict):
+        raise ValueError("metrics is not an object")
+    profile["metrics"] = {str(name): _text(value) for name, value in metrics.items()}
+    return profile
+
+
+def parse_stack(content: dict) -> dict:
+    """
+    Validate a model-written stack analysis against the EnrichStackResponse shape
+
+    Args:
+        content: Analysis object from the completion
+
+    Returns:
+        {compatibility_score (clamped to [0, 1]), strengths, weaknesses, recommendations}
+
+    Raises:
+        ValueError: On a missing field or a value of the wrong type
+    """
+    try:
+        score = float(content.get("compatibility_score"))
+    except (TypeError, ValueError):
+        raise ValueError("compatibility_score is not a number")
+    analysis = {"compatibility_score": min(max(score, 0.0), 1.0)}
+    for field in ENRICH_STACK_LISTS:
+        values = content.get(field)
+        if not isinstance(values, list):
+            raise ValueError(f"{field} is not a list")
+        analysis[field] = [_text(value) for value in values]
+    return analysis
+
+
+def _stack_prompt(technologies: List[str], project_type: Optional[str] = None) -> str:
+    """User message for a stack analysis"""
+    user = "Technologies: " + ", ".join(technologies)
+    if project_type:
+        user += f"\nProject type: {project_type}"
+    return user
+
+
+class _TokenBucket:
+    """Tokens-per-minute budget shared by all completions of a client"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def take(self, tokens: int) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # A request larger than the whole budget waits for a full bucket, then goes
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) * 60 / self.capacity)
+
+
+class AIClient:
+    """
+    OpenAI-compatible /chat/completions client
+
+    Completions are limited to max_concurrency in flight and, when
+    tokens_per_minute is set, to the provider's token rate (prompt plus
+    max_tokens per request), so batch jobs queue here instead of hitting 429s.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        api_base: str = "https://api.openai.com/v1",
+        timeout: float = 30.0,
+        max_concurrency: int = 4,
+        tokens_per_minute: int = 0
+    ):
+        self.model = model
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket = _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+
+    def _client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop; reused for keep-alive
+        if self._http is None:
+            self._http = httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+        return self._http
+
+    async def _admit(self, prompt: str, max_tokens: int) -> None:
+        """Wait for the token budget; the caller then holds the semaphore for each attempt of the request"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._bucket is not None:
+            await self._bucket.take(estimate_tokens(prompt) + max_tokens)
+
+    def _payload(self, system: str, user: str, max_tokens: int, **extra) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
+            "response_format": {"type": "json_object"},
+            "temperature": 0,
+            "max_tokens": max_tokens,
+            **extra
+        }
+
+    async def complete_json(self, system: str, user: str, max_tokens: int = 1000) -> dict:
+        """
+        One chat completion constrained to a JSON object
+
+        Args:
+            system: System prompt (describes the JSON shape)
+            user: User message
+            max_tokens: Completion token limit
+
+        Returns:
+            Parsed JSON object
+
+        Raises:
+            Exception: On HTTP errors or output that is not a JSON object
+        """
+        await self._admit(system + user, max_tokens)
+        start = time.perf_counter()
+        try:
+            for attempt in range(_RATE_LIMIT_RETRIES + 1):
+                async with self._semaphore:
+                    response = await self._client().post(
+                        f"{self.api_base}/chat/completions", json=self._payload(system, user, max_tokens)
+                    )
+                if response.status_code != 429 or attempt == _RATE_LIMIT_RETRIES:
+                    break
+                get_metrics().incr("ai_rate_limited")
+                # Backs off outside the semaphore so other callers keep using the slot
+                await asyncio.sleep(_retry_after(response))
+            response.raise_for_status()
+            text = response.json()["choices"][0]["message"]["content"]
+            # Refusals and tool calls come back without content
+            if text is None:
+                raise ValueError("completion has no content")
+            content = json.loads(text)
+            if not isinstance(content, dict):
+                raise ValueError("completion is not a JSON object")
+        except (httpx.HTTPError, KeyError, IndexError, TypeError, ValueError) as e:
+            logger.error(f"Chat completion error: {e}")
+            get_metrics().incr("ai_errors")
+            raise Exception(f"Failed to get completion: {str(e)}")
+
+        get_metrics().observe("ai_completion_ms", (time.perf_counter() - start) * 1000)
+        return content
+
+    async def stream_json(self, system: str, user: str, max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        One streamed chat completion constrained to a JSON object
+
+        Args:
+            system: System prompt (describes the JSON shape)
+            user: User message
+            max_tokens: Completion token limit
+
+        Yields:
+            Content deltas as the model produces them; together they form the JSON text
+
+        Raises:
+            Exception: On HTTP errors or a malformed event stream
+        """
+        await self._admit(system + user, max_tokens)
+        start = time.perf_counter()
+        first = True
+        try:
+            for attempt in range(_RATE_LIMIT_RETRIES + 1):
+                async with self._semaphore:
+                    async with self._client().stream(
+                        "POST", f"{self.api_base}/chat/completions",
+                        json=self._payload(system, user, max_tokens, stream=True)
+                    ) as response:
+                        if response.status_code == 429 and attempt < _RATE_LIMIT_RETRIES:
+                            get_metrics().incr("ai_rate_limited")
+                            delay = _retry_after(response)
+                        else:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    break
+                                # Usage-only chunks have no choices
+                                for choice in json.loads(data).get("choices") or []:
+                                    delta = (choice.get("delta") or {}).get("content")
+                                    if delta:
+                                        if first:
+                                            first = False
+                                            get_metrics().observe("ai_first_token_ms",
+                                                                  (time.perf_counter() - start) * 1000)
+                                        yield delta
+                            break
+                # Backs off outside the semaphore, as complete_json does
+                await asyncio.sleep(delay)
+        except (httpx.HTTPError, AttributeError, ValueError) as e:
+            logger.error(f"Chat completion stream error: {e}")
+            get_metrics().incr("ai_errors")
+            raise Exception(f"Failed to stream completion: {str(e)}")
+
+        get_metrics().observe("ai_completion_ms", (time.perf_counter() - start) * 1000)
+
+    async def rerank(self, query: str, candidates: List[Dict]) -> List[float]:
+        """
+        Score candidates for a query
+
+        Args:
+            query: Project description and requirements
+            candidates: Dicts with name and optionally category and description
+
+        Returns:
+            Scores in [0, 1] aligned with candidates (0 for any the model skipped)
+        """
+        lines = []
+        for number, candidate in enumerate(candidates, start=1):
+            description = (candidate.get("description") or "")[:_RERANK_DESCRIPTION_CHARS]
+            category = f" [{candidate['category']}]" if candidate.get("category") else ""
+            lines.append(f"{number}. {candidate['name']}{category}: {description}")
+        content = await self.complete_json(
+            _RERANK_SYSTEM_PROMPT,
+            f"Project:\n{query}\n\nCandidates:\n" + "\n".join(lines),
+            max_tokens=20 * len(candidates) + 50
+        )
+
+        scores = [0.0] * len(candidates)
+        for item in content.get("scores", []):
+            try:
+                position = int(item["index"]) - 1
+                score = float(item["score"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= position < len(candidates):
+                scores[position] = min(max(score, 0.0), 1.0)
+        return scores
+
+    async def score_pairs(self, pairs: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """
+        Compatibility of technology pairs
+
+        Args:
+            pairs: (technology, technology) names
+
+        Returns:
+            Scores in [0, 1] aligned with pairs (None for any the model skipped)
+        """
+        lines = [f"{number}. {a} + {b}" for number, (a, b) in enumerate(pairs, start=1)]
+        content = await self.complete_json(_PAIR_SYSTEM_PROMPT, "Pairs:\n" + "\n".join(lines),
+                                           max_tokens=20 * len(pairs) + 50)
+
+        scores: List[Optional[float]] = [None] * len(pairs)
+        for item in content.get("scores", []) if isinstance(content.get("scores"), list) else []:
+            try:
+                position = int(item["index"]) - 1
+                score = float(item["score"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= position < len(pairs):
+                scores[position] = min(max(score, 0.0), 1.0)
+        return scores
+
+    async def enrich_tech(self, tech_name: str, context: Optional[str] = None) -> dict:
+        """
+        Structured profile of a technology
+
+        Args:
+            tech_name: Technology name
+            context: Optional project context to tailor pros/cons to
+
+        Returns:
+            Profile validated by parse_profile
+
+        Raises:
+            Exception: On completion errors or an invalid profile
+        """
+        user = f"Technology: {tech_name}"
+        if context:
+            user += f"\nContext: {context}"
+        content = await self.complete_json(_ENRICH_TECH_SYSTEM_PROMPT, user, max_tokens=2 * PROFILE_TOKENS)
+        try:
+            return parse_profile(content)
+        except ValueError as e:
+            raise Exception(f"Failed to enrich {tech_name}: invalid profile ({e})")
+
+    async def enrich_tech_batch(self, items: List[Tuple[str, Optional[str]]]) -> List[Optional[dict]]:
+        """
+        Profiles for several technologies from one completion
+
+        Args:
+            items: (tech_name, context) pairs
+
+        Returns:
+            Profile per item, in order; None where the model skipped an item
+            or wrote an invalid profile (the caller retries those)
+
+        Raises:
+            Exception: If the completion itself fails
+        """
+        lines = [f"{number}. {name}" + (f" (context: {context})" if context else "")
+                 for number, (name, context) in enumerate(items, start=1)]
+        content = await self.complete_json(
+            _ENRICH_TECH_BATCH_SYSTEM_PROMPT,
+            "Technologies:\n" + "\n".join(lines),
+            max_tokens=PROFILE_TOKENS * len(items) + 50
+        )
+
+        profiles: List[Optional[dict]] = [None] * len(items)
+        for entry in content.get("profiles", []) if isinstance(content.get("profiles"), list) else []:
+            try:
+                position = int(entry["index"]) - 1
+                profile = parse_profile(entry)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+            if 0 <= position < len(items):
+                profiles[position] = profile
+        return profiles
+
+    async def enrich_stack(self, technologies: List[str], project_type: Optional[str] = None) -> dict:
+        """
+        Compatibility analysis of a technology stack
+
+        Args:
+            technologies: Technology names
+            project_type: Optional kind of project the stack is for
+
+        Returns:
+            Analysis validated by parse_stack
+
+        Raises:
+            Exception: On completion errors or an invalid analysis
+        """
+        content = await self.complete_json(_ENRICH_STACK_SYSTEM_PROMPT, _stack_prompt(technologies, project_type),
+                                           max_tokens=STACK_TOKENS)
+        try:
+            return parse_stack(content)
+        except ValueError as e:
+            raise Exception(f"Failed to analyze stack: invalid analysis ({e})")
+
+    def stream_enrich_stack(self, technologies: List[str], project_type: Optional[str] = None) -> AsyncIterator[str]:
+        """enrich_stack as raw JSON text deltas (see stream_json); validation is up to the caller"""
+        return self.stream_json(_ENRICH_STACK_SYSTEM_PROMPT, _stack_prompt(technologies, project_type),
+                                max_tokens=STACK_TOKENS)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds to wait before retrying a 429 (Retry-After, else 1s), capped"""
+    try:
+        seconds = float(response.headers.get("retry-after", 1))
+    except ValueError:
+        seconds = 1.0
+    return min(max(seconds, 0.0), _MAX_RETRY_AFTER_SECONDS)
+
+
+# Thread-safe singleton
+_ai_client: Optional[AIClient] = None
+_ai_lock = threading.Lock()
+
+
+def get_ai_client() -> AIClient:
+    """Get or create AI client instance (thread-safe)"""
+    global _ai_client
+    if _ai_client is None:
+        with _ai_lock:
+            if _ai_client is None:
+                settings = get_settings()
+                _ai_client = AIClient(
+                    api_key=settings.openai_api_key.get_secret_value(),
+                    model=settings.ai_model,
+                    api_base=settings.ai_api_base,
+                    timeout=settings.ai_timeout_seconds,
+                    max_concurrency=settings.ai_max_concurrency,
+                    tokens_per_minute=settings.ai_tokens_per_minute
+                )
+    return _ai_client
@@ -0,0 +1,274 @@
+"""
+Technology name autocomplete
+Sorted-array prefix index over technology names and aliases, ranked by
+popularity (GitHub stars, package downloads). When nothing starts with the
+typed text, it falls back to a bounded-edit-distance search that walks the same
+array as an implicit trie.
+"""
+import math
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from lib.catalog_view import CatalogView
+
+# Entry weight by kind; popularity adds up to 1.0 on top
+NAME_WEIGHT = 1.0
+ALIAS_WEIGHT = 0.6
+WORD_WEIGHT = 0.3  # Later words of a multi-word name ("kafka" in "Apache Kafka")
+EXACT_BONUS = 2.0  # Query equals the whole key
+FUZZY_PENALTY = 0.5  # Per edit
+
+# Prefixes up to this length have their ranking precomputed
+SHORT_PREFIX = 2
+SHORT_DEPTH = 64
+
+MIN_FUZZY_LENGTH = 3
+FUZZY_LOOKUP_BUDGET = 500  # Edited variants checked per fuzzy lookup
+
+_END = "\uffff"  # Sorts after any key character
+
+
+def normalize(text: str) -> str:
+    """Lowercased, single-spaced key"""
+    return " ".join(text.lower().split())
+
+
+def max_edits(query: str) -> int:
+    """Edit budget for a query: none under 3 characters, 1 up to 6, then 2"""
+    if len(query) < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if len(query) <= 6 else 2
+
+
+def popularity(metadata: dict) -> float:
+    """log10(1 + stars) + log10(1 + downloads); missing or malformed counts are 0"""
+    total = 0.0
+    for field in ("stars", "downloads"):
+        try:
+            total += math.log10(1 + max(float(metadata.get(field) or 0), 0.0))
+        except (TypeError, ValueError):
+            continue
+    return total
+
+
+def _keys(record: dict) -> List[Tuple[str, str, float]]:
+    """(key, display text, kind weight) for one record"""
+    name = record.get("name") or ""
+    aliases = (record.get("metadata") or {}).get("aliases") or []
+    keys = [(name, NAME_WEIGHT)] + [(str(alias), ALIAS_WEIGHT) for alias in aliases]
+    keys += [(word, WORD_WEIGHT) for word in name.split()[1:]]
+
+    entries = []
+    for text, weight in keys:
+        key = normalize(text)
+        if not key:
+            continue
+        entries.append((key, text, weight))
+        # "Node.js" is also found as "nodejs"
+        joined = re.sub(r"[.\- ]", "", key)
+        if joined != key:
+            entries.append((joined, text, weight))
+    return entries
+
+
+class AutocompleteIndex:
+    """
+    Immutable prefix index; build a new one to pick up catalog changes
+
+    Keys are kept in one sorted list, with parallel arrays holding each key's
+    technology and static score. A prefix lookup is two bisections plus a
+    partial sort of that slice.
+    """
+
+    def __init__(self, records: List[dict]):
+        self.ids = [str(record["id"]) for record in records]
+        self.names = [record.get("name") or "" for record in records]
+        self.categories = [record.get("category") or "" for record in records]
+
+        scores = np.array([popularity(record.get("metadata") or {}) for record in records], dtype=np.float32)
+        if len(scores) and scores.max() > 0:
+            scores /= scores.max()
+
+        best: Dict[Tuple[str, int], Tuple[float, str]] = {}
+        for tech, record in enumerate(records):
+            for key, text, weight in _keys(record):
+                if weight > best.get((key, tech), (-1.0, ""))[0]:
+                    best[(key, tech)] = (weight, text)
+        entries = sorted(best.items())
+
+        self.keys: List[str] = [key for (key, _), _ in entries]
+        self.matched: List[str] = [text for _, (_, text) in entries]
+        self.entry_tech = np.array([tech for (_, tech), _ in entries], dtype=np.int32)
+        self.entry_score = np.array([weight for _, (weight, _) in entries], dtype=np.float32)
+        if len(entries):
+            self.entry_score += scores[self.entry_tech]
+
+        # Short prefixes match large slices; rank those once here
+        self._short: Dict[str, np.ndarray] = {}
+        prefixes = {key[:length] for key in self.keys for length in range(1, SHORT_PREFIX + 1)}
+        for prefix in prefixes:
+            lo, hi = self._range(prefix)
+            self._short[prefix] = self._ranked(prefix, lo, hi, SHORT_DEPTH)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _range(self, prefix: str, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        """Slice of keys starting with prefix"""
+        hi = len(self.keys) if hi is None else hi
+        start = bisect_left(self.keys, prefix, lo, hi)
+        return start, bisect_left(self.keys, prefix + _END, start, hi)
+
+    def _ranked(self, query: str, lo: int, hi: int, depth: int) -> np.ndarray:
+        """Top-depth entry positions in keys[lo:hi], best first (exact matches of query get EXACT_BONUS)"""
+        scores = self.entry_score[lo:hi].copy()
+        # The exact matches sort first in the slice
+        exact = bisect_left(self.keys, query + "\x00", lo, hi) - lo
+        scores[:exact] += EXACT_BONUS
+        if len(scores) > depth:
+            top = np.argpartition(-scores, depth)[:depth]
+        else:
+            top = np.arange(len(scores))
+        return lo + top[np.argsort(-scores[top], kind="stable")]
+
+    def _children(self, prefix: str, lo: int, hi: int) -> List[str]:
+        """Distinct characters that follow prefix in keys[lo:hi]"""
+        chars = []
+        depth = len(prefix)
+        # Keys equal to prefix (one per technology) sort first
+        lo = bisect_left(self.keys, prefix + "\x00", lo, hi)
+        while lo < hi:
+            char = self.keys[lo][depth]
+            chars.append(char)
+            lo = bisect_left(self.keys, prefix + char + _END, lo, hi)
+        return chars
+
+    def _matched_length(self, text: str) -> int:
+        """Length of the longest prefix of text that starts some key"""
+        position = bisect_left(self.keys, text)
+        longest = 0
+        for key in self.keys[max(position - 1, 0):position + 1]:
+            common = 0
+            for a, b in zip(key, text):
+                if a != b:
+                    break
+                common += 1
+            longest = max(longest, common)
+        return longest
+
+    def _fuzzy(self, query: str, edits: int) -> Set[Tuple[int, int]]:
+        """
+        (lo, hi) slices whose keys start with something within `edits` of query
+
+        Applies edits left to right (deletion, adjacent transposition, and
+        substitution or insertion of a character that actually follows in the
+        keys). Only positions up to where the edited text stops matching any
+        key are tried, and the first character is never edited. At most
+        FUZZY_LOOKUP_BUDGET variants are checked.
+        """
+        found: Set[Tuple[int, int]] = set()
+        visited: Dict[Tuple[str, int], int] = {}
+
+        def expand(text: str, start: int, distance: int) -> None:
+            # text[:start] is fixed (already edited); edits apply from start on
+            if visited.get((text, start), edits + 1) <= distance or len(visited) >= FUZZY_LOOKUP_BUDGET:
+                return
+            visited[(text, start)] = distance
+            matched = self._matched_length(text)
+            if matched == len(text):
+                if distance:
+                    found.add(self._range(text))
+                return
+            if distance == edits:
+                return
+            for i in range(max(start, 1), matched + 1):
+                if len(visited) >= FUZZY_LOOKUP_BUDGET:
+                    return
+                head, char, tail = text[:i], text[i], text[i + 1:]
+                expand(head + tail, i, distance + 1)
+                if tail:
+                    expand(head + tail[0] + char + tail[1:], i + 2, distance + 1)
+                lo, hi = self._range(head)
+                for child in self._children(head, lo, hi):
+                    if child != char:
+                        expand(head + child + tail, i + 1, distance + 1)
+                    expand(head + child + char + tail, i + 1, distance + 1)
+
+        expand(query, 0, 0)
+        return found
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        """
+        Technologies whose name or alias starts with query, most popular first
+
+        Args:
+            query: Typed text (case and repeated spaces are ignored)
+            limit: Maximum suggestions
+
+        Returns:
+            [{tech_id, tech_name, category, matched, score, distance}], one per
+            technology; distance is the number of edits for fuzzy matches (0 otherwise)
+        """
+        query = normalize(query)
+        if not query or limit <= 0 or not self.keys:
+            return []
+
+        if query in self._short:
+            positions = self._short[query]
+        else:
+            lo, hi = self._range(query)
+            positions = self._ranked(query, lo, hi, limit * 4) if hi > lo else np.empty(0, dtype=np.int64)
+
+        suggestions: List[dict] = []
+        seen = set()
+        self._collect(positions, 0, limit, suggestions, seen)
+        if len(suggestions) < limit and len(positions) >= limit * 4 and query not in self._short:
+            # Many aliases of the same technologies crowded the partial sort
+            lo, hi = self._range(query)
+            self._collect(self._ranked(query, lo, hi, hi - lo), 0, limit, suggestions, seen)
+
+        edits = max_edits(query)
+        if not suggestions and edits:
+            # Nothing starts with the query: likely a typo
+            for distance in range(1, edits + 1):
+                # A second edit only if one finds nothing
+                found = self._fuzzy(query, distance)
+                if found:
+                    positions = np.concatenate([self._ranked(query, lo, hi, limit) for lo, hi in found])
+                    order = np.argsort(-self.entry_score[positions], kind="stable")
+                    self._collect(positions[order], distance, limit, suggestions, seen)
+                    break
+        return suggestions
+
+    def _collect(self, positions, distance: int, limit: int, suggestions: List[dict], seen: set) -> None:
+        for position in positions:
+            if len(suggestions) >= limit:
+                return
+            tech = int(self.entry_tech[position])
+            if tech in seen:
+                continue
+            seen.add(tech)
+            suggestions.append({
+                "tech_id": self.ids[tech],
+                "tech_name": self.names[tech],
+                "category": self.categories[tech],
+                "matched": self.matched[position],
+                "score": round(float(self.entry_score[position]) - FUZZY_PENALTY * distance, 4),
+                "distance": distance
+            })
+
+
+_catalog = CatalogView("Autocomplete index", AutocompleteIndex)
+
+
+async def get_autocomplete_index() -> Optional[AutocompleteIndex]:
+    """
+    Shared autocomplete index over the catalog
+
+    Returns:
+        AutocompleteIndex, or None if no build has succeeded yet
+    """
+    return await _catalog.get()
@@ -6,13 +6,30 @@ import boto3
 from botocore.client import Config
 from botocore.exceptions import ClientError
 from settings import get_settings
-from typing import Optional
+from lib.disk_cache import DiskCache, CacheEntry
+from typing import Optional, BinaryIO, AsyncIterator, Union
+from collections import OrderedDict
 import logging
 import asyncio
+import json
+import mmap
+import threading
+import time
 from functools import partial
 
 logger = logging.getLogger(__name__)
 
+# Key layout for content-addressed mode (nothing under CAS_ROOT is a user-facing name)
+CAS_ROOT = 'cas/'
+CONTENT_PREFIX = 'cas/sha256'
+MANIFEST_PREFIX = 'cas/manifests'
+
+# Default read size when streaming object bodies
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Upper bound on remembered digests (64 hex chars each, ~10 MB worst case)
+KNOWN_DIGESTS_MAX = 100_000
+
 
 class B2Client:
     """Backblaze B2 S3-compatible storage client"""
@@ -33,6 +50,20 @@ class B2Client:
             )
         )
         self.bucket_name = settings.b2_bucket
+        self.content_addressed = settings.b2_content_addressed
+        
+        # Digests confirmed to exist in the bucket (LRU, avoids repeated HEAD requests)
+        self._known_digests: OrderedDict = OrderedDict()
+        self._digests_lock = threading.Lock()
+        
+        # Optional read-through disk cache for downloads
+        self.cache: Optional[DiskCache] = None
+        self.cache_revalidate_seconds = settings.b2_cache_revalidate_seconds
+        if settings.b2_cache_dir:
+            self.cache = DiskCache(settings.b2_cache_dir, settings.b2_cache_max_bytes, metrics_prefix='b2_cache')
+    
+    def _public_url(self, key: str) -> str:
+        return f"https://{self.bucket_name}.{self.s3_client.meta.endpoint_url.split('//')[1]}/{key}"
     
     async def upload_file(self, file_content: bytes, file_name: str, content_type: str = 'application/octet-stream') -> dict:
         """
@@ -59,19 +90,192 @@ class B2Client:
                     ContentType=content_type
                 )
             )
-            
-            # Generate public URL
-            url = f"https://{self.bucket_name}.{self.s3_client.meta.endpoint_url.split('//')[1]}/{file_name}"
+            if self.cache:
+                self.cache.invalidate(file_name)
             
             return {
                 'file_id': response.get('ETag', '').strip('"'),
                 'file_name': file_name,
-                'url': url
+                'url': self._public_url(file_name)
             }
         except ClientError as e:
             logger.error(f"Error uploading file to B2: {e}")
             raise Exception(f"Failed to upload file: {str(e)}")
     
+    @staticmethod
+    def content_key(digest: str) -> str:
+        """Object key for content with the given SHA-256 hex digest"""
+        return f"{CONTENT_PREFIX}/{digest[:2]}/{digest}"
+    
+    @staticmethod
+    def manifest_key(file_name: str) -> str:
+        """Object key of the manifest entry for a user-facing file name"""
+        return f"{MANIFEST_PREFIX}/{file_name}.json"
+    
+    def _remember_digest(self, digest: str) -> None:
+        with self._digests_lock:
+            self._known_digests[digest] = True
+            self._known_digests.move_to_end(digest)
+            while len(self._known_digests) > KNOWN_DIGESTS_MAX:
+                self._known_digests.popitem(last=False)
+    
+    async def digest_exists(self, digest: str) -> bool:
+        """
+        Check whether content with this digest is already stored
+        
+        Positive results are cached in memory; content objects are immutable
+        so a digest seen once never needs another HEAD request.
+        
+        Args:
+            digest: SHA-256 hex digest of the content
+            
+        Returns:
+            bool indicating if the content object exists
+        """
+        with self._digests_lock:
+            if digest in self._known_digests:
+                self._known_digests.move_to_end(digest)
+                return True
+        
+        exists = await self.file_exists(self.content_key(digest))
+        if exists:
+            self._remember_digest(digest)
+        return exists
+    
+    async def upload_content_addressed(
+        self,
+        file_obj: BinaryIO,
+        digest: str,
+        size: int,
+        file_name: str,
+        content_type: str = 'application/octet-stream'
+    ) -> dict:
+        """
+        Store content under its digest and map file_name to it in the manifest
+        
+        The upload is skipped entirely when the digest already exists; only the
+        small manifest entry for file_name is written.
+        
+        Args:
+            file_obj: Readable file object positioned at the start of the content
+            digest: SHA-256 hex digest of the content (computed by the caller while reading)
+            size: Content length in bytes
+            file_name: User-facing name/path for the file
+            content_type: MIME type of the file
+            
+        Returns:
+            dict with file_id (the digest), file_name, url, digest and deduplicated flag
+        """
+        key = self.content_key(digest)
+        try:
+            deduplicated = await self.digest_exists(digest)
+            loop = asyncio.get_event_loop()
+            
+            if not deduplicated:
+                await loop.run_in_executor(
+                    None,
+                    partial(
+                        self.s3_client.put_object,
+                        Bucket=self.bucket_name,
+                        Key=key,
+                        Body=file_obj,
+                        ContentLength=size,
+                        ContentType=content_type
+                    )
+                )
+                self._remember_digest(digest)
+            
+            manifest = {
+                'file_name': file_name,
+                'digest': digest,
+                'key': key,
+                'size': size,
+                'content_type': content_type
+            }
+            await loop.run_in_executor(
+                None,
+                partial(
+                    self.s3_client.put_object,
+                    Bucket=self.bucket_name,
+                    Key=self.manifest_key(file_name),
+                    Body=json.dumps(manifest).encode('utf-8'),
+                    ContentType='application/json'
+                )
+            )
+            if self.cache:
+                self.cache.invalidate(self.manifest_key(file_name))
+            
+            return {
+                'file_id': digest,
+                'file_name': file_name,
+                'url': self._public_url(key),
+                'digest': digest,
+                'deduplicated': deduplicated
+            }
+        except ClientError as e:
+            logger.error(f"Error uploading content-addressed file to B2: {e}")
+            raise Exception(f"Failed to upload file: {str(e)}")
+    
+    async def get_manifest(self, file_name: str) -> Optional[dict]:
+        """
+        Look up the manifest entry for a content-addressed file
+        
+        Args:
+            file_name: User-facing name/path of the file
+            
+        Returns:
+            dict with digest, key, size and content_type, or None if not found
+        """
+        try:
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(
+                None,
+                partial(self.s3_client.get_object, Bucket=self.bucket_name, Key=self.manifest_key(file_name))
+            )
+            return json.loads(response['Body'].read())
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            logger.error(f"Error reading manifest: {e}")
+            raise Exception(f"Failed to read manifest: {str(e)}")
+    
+    async def resolve_key(self, file_name: str) -> str:
+        """
+        Object key holding the content of a user-facing file name
+        
+        In content-addressed mode this is the content object named by the
+        file's manifest entry; names without one (stored before the mode was
+        enabled) and plain mode map to themselves.
+        
+        Args:
+            file_name: User-facing name/path of the file
+            
+        Returns:
+            Object key to read
+        """
+        if self.content_addressed:
+            manifest = await self.get_manifest(file_name)
+            if manifest is not None:
+                return manifest['key']
+        return file_name
+    
+    async def delete_named(self, file_name: str) -> bool:
+        """
+        Delete a file by its user-facing name
+        
+        A content-addressed file only loses its manifest entry: other names
+        may point at the same content object.
+        
+        Args:
+            file_name: User-facing name/path of the file
+            
+        Returns:
+            bool indicating success
+        """
+        if await self.resolve_key(file_name) != file_name:
+            return await self.delete_file(self.manifest_key(file_name))
+        return await self.delete_file(file_name)
+    
     async def generate_presigned_upload_url(self, file_name: str, expires_in: int = 3600) -> dict:
         """
         Generate presigned URL for uploading files directly to B2
@@ -162,6 +366,8 @@ class B2Client:
         """
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_name)
+            if self.cache:
+                self.cache.invalidate(file_name)
             return True
         except ClientError as e:
             logger.error(f"Error deleting file: {e}")
@@ -200,27 +406,201 @@ class B2Client:
             logger.error(f"Error listing files: {e}")
             raise Exception(f"Failed to list files: {str(e)}")
     
-    async def download_file(self, file_name: str) -> bytes:
+    async def open_file(self, file_name: str) -> Union[CacheEntry, AsyncIterator[bytes]]:
+        """
+        Read-through lookup in the local disk cache
+        
+        Fresh entries are served without contacting B2. Older entries are
+        revalidated with a conditional GET (If-None-Match), which costs a round
+        trip but no egress when unchanged; entries of objects deleted upstream
+        are evicted. Misses stream the object to disk. Objects larger than the
+        cache budget are streamed from the same GET, so they are read once.
+        
+        Args:
+            file_name: Name/path of the file
+            
+        Returns:
+            CacheEntry for the local copy, or an iterator of content chunks if
+            caching is disabled or the object is larger than the cache budget
+        """
+        if not self.cache:
+            return self.iter_file_chunks(file_name)
+        
+        entry = self.cache.lookup(file_name)
+        if entry and time.monotonic() - entry.validated_at < self.cache_revalidate_seconds:
+            self.cache.record_hit(entry)
+            return entry
+        
+        params = {'Bucket': self.bucket_name, 'Key': file_name}
+        if entry:
+            params['IfNoneMatch'] = f'"{entry.etag}"'
+        
+        loop = asyncio.get_event_loop()
+        try:
+            response = await loop.run_in_executor(None, partial(self.s3_client.get_object, **params))
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if entry and code in ('304', 'NotModified'):
+                self.cache.mark_validated(entry)
+                self.cache.record_hit(entry)
+                return entry
+            if entry and code in ('404', 'NoSuchKey'):
+                self.cache.invalidate(file_name)
+            logger.error(f"Error downloading file: {e}")
+            raise Exception(f"Failed to download file: {str(e)}")
+        
+        body = response['Body']
+        if response.get('ContentLength', 0) > self.cache.max_bytes:
+            if entry:
+                self.cache.invalidate(file_name)
+            return self._iter_body(body)
+        
+        def _write_to_cache() -> str:
+            try:
+                with self.cache.new_temp_file() as tmp:
+                    for chunk in iter(partial(body.read, STREAM_CHUNK_SIZE), b''):
+                        tmp.write(chunk)
+                    return tmp.name
+            finally:
+                body.close()
+        
+        temp_path = await loop.run_in_executor(None, _write_to_cache)
+        entry = self.cache.commit(file_name, temp_path, response.get('ETag', '').strip('"'))
+        self.cache.record_miss(response.get('ContentLength', 0))
+        if entry is None:
+            # Only without a Content-Length: the object turned out too large once written
+            return self.iter_file_chunks(file_name)
+        return entry
+    
+    async def download_file(self, file_name: str) -> Union[bytes, mmap.mmap]:
         """
         Download file content from B2
         
+        With the disk cache enabled the content is returned as a read-only
+        memory map of the cached file (bytes-like, no copy into Python bytes).
+        
         Args:
             file_name: Name/path of the file
             
         Returns:
-            bytes of file content
+            bytes of file content, or a read-only mmap of the cached copy
+        """
+        content = await self.open_file(file_name)
+        if isinstance(content, CacheEntry):
+            return self.cache.open_mmap(content)
+        return b''.join([chunk async for chunk in content])
+
+    
+    async def list_all_files(self, prefix: str = '', max_files: int = 10000, skip_prefix: Optional[str] = None) -> list:
+        """
+        List files under a prefix, following pagination
+        
+        Args:
+            prefix: Filter files by prefix
+            max_files: Stop after this many files
+            skip_prefix: Leave out keys starting with this prefix
+            
+        Returns:
+            list of file objects (same shape as list_files)
         """
+        def _list() -> list:
+            files = []
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    if skip_prefix and obj['Key'].startswith(skip_prefix):
+                        continue
+                    files.append({
+                        'key': obj['Key'],
+                        'size': obj['Size'],
+                        'last_modified': obj['LastModified'].isoformat(),
+                        'last_modified_ts': obj['LastModified'].timestamp(),
+                        'etag': obj['ETag'].strip('"')
+                    })
+                    if len(files) >= max_files:
+                        return files
+            return files
+        
+        try:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, _list)
+        except ClientError as e:
+            logger.error(f"Error listing files: {e}")
+            raise Exception(f"Failed to list files: {str(e)}")
+    
+    async def list_named_files(self, prefix: str = '', max_files: int = 10000) -> list:
+        """
+        List files by user-facing name under a prefix, following pagination
+        
+        In content-addressed mode names come from the manifest entries,
+        followed by objects stored under their own name before the mode was
+        enabled; content objects themselves are not listed. Read the listed
+        keys through resolve_key (or iter_named_chunks).
+        
+        Args:
+            prefix: Filter file names by prefix
+            max_files: Stop after this many files
+            
+        Returns:
+            list of file objects (same shape as list_all_files) keyed by file name
+        """
+        if not self.content_addressed:
+            return await self.list_all_files(prefix, max_files)
+        
+        manifests = await self.list_all_files(f"{MANIFEST_PREFIX}/{prefix}", max_files)
+        files = [
+            dict(f, key=f['key'][len(MANIFEST_PREFIX) + 1:-len('.json')])
+            for f in manifests if f['key'].endswith('.json')
+        ]
+        if len(files) < max_files:
+            named = {f['key'] for f in files}
+            legacy = await self.list_all_files(prefix, max_files - len(files), skip_prefix=CAS_ROOT)
+            files.extend(f for f in legacy if f['key'] not in named)
+        return files
+    
+    async def iter_named_chunks(self, file_name: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Stream file content by user-facing name (see resolve_key)"""
+        async for chunk in self.iter_file_chunks(await self.resolve_key(file_name), chunk_size):
+            yield chunk
+    
+    async def iter_file_chunks(self, file_name: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """
+        Stream file content from B2 in chunks without buffering the whole object
+        
+        Args:
+            file_name: Name/path of the file
+            chunk_size: Bytes per chunk
+            
+        Yields:
+            Content chunks in order
+        """
+        loop = asyncio.get_event_loop()
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_name)
-            return response['Body'].read()
+            response = await loop.run_in_executor(
+                None,
+                partial(self.s3_client.get_object, Bucket=self.bucket_name, Key=file_name)
+            )
         except ClientError as e:
             logger.error(f"Error downloading file: {e}")
             raise Exception(f"Failed to download file: {str(e)}")
+        
+        async for chunk in self._iter_body(response['Body'], chunk_size):
+            yield chunk
+    
+    async def _iter_body(self, body, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Read an open object body in chunks off the event loop, closing it when done"""
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
 
 
 # Thread-safe singleton
-import threading
-
 _b2_client: Optional[B2Client] = None
 _b2_lock = threading.Lock()
 
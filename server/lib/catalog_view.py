@@ -0,0 +1,86 @@
+"""
+Catalog-derived in-memory structures
+Refresh logic shared by the indexes built from the technology catalog
+(BM25 search, autocomplete). Each one is built from the local vector index
+when it holds the catalog, otherwise from Postgres. Rebuilds run in a worker
+thread, and the result is swapped in whole, so readers never wait on a rebuild.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+import numpy as np
+
+from settings import get_settings
+from lib.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+async def catalog_records() -> List[dict]:
+    """Live catalog records (id, name, description, category, metadata)"""
+    vector_index = get_vector_index()
+    if vector_index is not None:
+        vector_index.refresh()
+        if vector_index.live_count:
+            return [vector_index.record(row) for row in np.flatnonzero(vector_index.live_mask())]
+    from lib import db
+    return await db.list_technologies()
+
+
+class CatalogView(Generic[T]):
+    """
+    Current `build(records)` result, rebuilt in the background when the catalog changes
+
+    The local vector index publishes a version on every write; Postgres is
+    polled every CATALOG_VIEW_REFRESH_SECONDS.
+    """
+
+    def __init__(self, name: str, build: Callable[[List[dict]], T]):
+        self.name = name
+        self.build = build
+        self.value: Optional[T] = None
+        self.key = None
+        self.built_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _source_key(self):
+        vector_index = get_vector_index()
+        if vector_index is not None:
+            vector_index.refresh()
+            if vector_index.live_count:
+                return ("local", vector_index.version)
+        if time.monotonic() - self.built_at < get_settings().catalog_view_refresh_seconds:
+            return self.key
+        return ("db", time.monotonic())
+
+    async def _rebuild(self, key) -> None:
+        try:
+            records = await catalog_records()
+            started = time.perf_counter()
+            value = await asyncio.to_thread(self.build, records)
+            # One reference swap; readers hold either the old or the new value
+            self.value = value
+            self.key = key
+            logger.info(f"{self.name} built: {len(records)} technologies in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.warning(f"{self.name} build failed: {e}")
+        self.built_at = time.monotonic()
+
+    async def get(self) -> Optional[T]:
+        """
+        Current value, starting a rebuild if the catalog changed
+
+        Returns:
+            The last successful build; None until the first one completes
+        """
+        key = self._source_key()
+        if key != self.key and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._rebuild(key))
+        if self.value is None and self._task is not None:
+            # First build: wait for it (shielded, so a timed-out request does not cancel it)
+            await asyncio.shield(self._task)
+        return self.value
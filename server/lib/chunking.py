@@ -0,0 +1,209 @@
+"""
+Long-document embedding
+Splits markdown (READMEs, long project descriptions) into heading-scoped
+chunks with overlap, embeds the chunks in batches and pools them into one
+document vector. Chunks are packed per section, so editing one section
+leaves every other chunk's text - and its cached embedding - unchanged.
+"""
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from lib.embeddings_client import EmbeddingsClient, estimate_tokens
+from lib.metrics import get_metrics
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class Chunk:
+    """A piece of a document as embedded"""
+
+    __slots__ = ("index", "heading", "body", "tokens")
+
+    def __init__(self, index: int, heading: str, body: str):
+        self.index = index
+        self.heading = heading
+        self.body = body
+        self.tokens = estimate_tokens(self.text)
+
+    @property
+    def text(self) -> str:
+        """Embedded text; the heading path gives each chunk its context"""
+        return f"{self.heading}\n{self.body}" if self.heading else self.body
+
+
+def _sections(text: str) -> List[Tuple[str, List[str]]]:
+    """Split markdown into (heading path, blocks) on headings outside code fences"""
+    sections: List[Tuple[str, List[str]]] = []
+    path: List[Tuple[int, str]] = []
+    blocks: List[str] = []
+    current: List[str] = []
+    in_fence = False
+
+    def end_block():
+        if current:
+            block = "\n".join(current).strip("\n")
+            if block.strip():
+                blocks.append(block)
+            current.clear()
+
+    def end_section():
+        end_block()
+        if blocks:
+            sections.append((" > ".join(title for _, title in path), list(blocks)))
+            blocks.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+            current.append(line)
+            if not in_fence:
+                end_block()
+            continue
+        heading = None if in_fence else _HEADING_RE.match(line)
+        if heading:
+            end_section()
+            level = len(heading.group(1))
+            path = [(lvl, title) for lvl, title in path if lvl < level] + [(level, heading.group(2))]
+        elif not in_fence and not line.strip():
+            end_block()
+        else:
+            current.append(line)
+    end_section()
+    return sections
+
+
+def _split_oversized(block: str, max_tokens: int) -> List[str]:
+    """Break a block larger than a chunk on sentences, then lines, then words"""
+    for pattern, separator in ((_SENTENCE_RE, " "), (re.compile(r"\n"), "\n"), (re.compile(r"\s+"), " ")):
+        pieces = [piece for piece in pattern.split(block) if piece.strip()]
+        if len(pieces) > 1:
+            break
+    else:
+        # One unbreakable token run; cut by characters
+        size = max_tokens * 4
+        return [block[i:i + size] for i in range(0, len(block), size)]
+
+    # Re-join neighbouring pieces up to the limit so chunks stay full
+    parts: List[str] = []
+    current = ""
+    for piece in pieces:
+        if estimate_tokens(piece) > max_tokens:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.extend(_split_oversized(piece, max_tokens))
+        elif current and estimate_tokens(current + separator + piece) > max_tokens:
+            parts.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _tail(text: str, tokens: int) -> str:
+    """Last ~tokens worth of words, used as overlap"""
+    if tokens <= 0:
+        return ""
+    words = text.split()
+    kept: List[str] = []
+    budget = tokens * 4
+    for word in reversed(words):
+        budget -= len(word) + 1
+        if budget < 0:
+            break
+        kept.append(word)
+    return " ".join(reversed(kept))
+
+
+def split_markdown(text: str, max_tokens: int = 512, overlap_tokens: int = 64) -> List[Chunk]:
+    """
+    Split markdown into chunks of at most ~max_tokens
+
+    Headings start new sections; paragraphs and code blocks within a section
+    are packed greedily, and oversized blocks are split on sentences, lines
+    or words. Consecutive chunks of the same section share ~overlap_tokens.
+
+    Args:
+        text: Markdown or plain text
+        max_tokens: Target chunk size (estimated tokens)
+        overlap_tokens: Tail of the previous chunk repeated at the start of the next
+
+    Returns:
+        Chunks in document order
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    chunks: List[Chunk] = []
+
+    for heading, blocks in _sections(text):
+        budget = max_tokens - (estimate_tokens(heading) if heading else 0)
+        pieces: List[str] = []
+        for block in blocks:
+            if estimate_tokens(block) > budget:
+                pieces.extend(_split_oversized(block, max(budget - overlap_tokens, 1)))
+            else:
+                pieces.append(block)
+
+        body: List[str] = []
+        size = 0
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if body and size + piece_tokens > budget:
+                previous = "\n\n".join(body)
+                chunks.append(Chunk(len(chunks), heading, previous))
+                overlap = _tail(previous, overlap_tokens)
+                body = [overlap] if overlap else []
+                size = estimate_tokens(overlap) if overlap else 0
+            body.append(piece)
+            size += piece_tokens
+        if body:
+            chunks.append(Chunk(len(chunks), heading, "\n\n".join(body)))
+
+    return chunks
+
+
+def pool_vectors(vectors: List[np.ndarray], weights: Optional[List[float]] = None) -> np.ndarray:
+    """Weighted mean of chunk vectors, L2-normalized"""
+    matrix = np.vstack(vectors).astype(np.float32, copy=False)
+    weights_array = np.asarray(weights if weights is not None else np.ones(len(vectors)), dtype=np.float32)
+    pooled = weights_array @ matrix / weights_array.sum()
+    norm = np.linalg.norm(pooled)
+    return pooled / norm if norm > 0 else pooled
+
+
+async def embed_document(
+    client: EmbeddingsClient,
+    text: str,
+    max_tokens: int = 512,
+    overlap_tokens: int = 64
+) -> Tuple[np.ndarray, List[Chunk], List[np.ndarray]]:
+    """
+    Embed a document of any length
+
+    All chunks are submitted together, so they share micro-batches (and cache
+    lookups) with each other and with concurrent requests. A document that
+    fits in one chunk is embedded exactly as a single text.
+
+    Args:
+        client: Embeddings client
+        text: Document text
+        max_tokens: Chunk size
+        overlap_tokens: Overlap between consecutive chunks of a section
+
+    Returns:
+        (document vector, chunks, chunk vectors)
+    """
+    if estimate_tokens(text) <= max_tokens:
+        vector = await client.embed(text)
+        return vector, [Chunk(0, "", text)], [vector]
+
+    chunks = split_markdown(text, max_tokens, overlap_tokens) or [Chunk(0, "", text)]
+    vectors = await client.embed_many([chunk.text for chunk in chunks])
+    get_metrics().incr("embedding_document_chunks", len(chunks))
+    # Token-weighted so a short trailing chunk does not count as much as a full one
+    return pool_vectors(vectors, [chunk.tokens for chunk in chunks]), chunks, vectors
@@ -0,0 +1,491 @@
+"""
+Pairwise technology compatibility
+Sparse symmetric matrix of how well two catalog technologies work together,
+built from the dependency lists collected from npm / Libraries.io (direct
+dependencies and co-occurrence in the same packages) blended with embedding
+affinity. A stack is scored by looking up each pair of its members; pairs
+without data are scored by the LLM once and written back, so later stacks
+sharing them reuse the result.
+
+CLI (from server/):
+    python -m lib.compatibility build
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib.ai_client import get_ai_client
+from lib.autocomplete import normalize
+from lib.generations import GenerationReader, load_generation, save_generation
+from lib.ingest import tech_id_for
+from lib.metrics import get_metrics
+from lib.vector_index import VectorIndex, get_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Where a stored score came from
+SOURCE_DEPENDENCIES = 1
+SOURCE_LLM = 2
+
+# Share of a stored score from dependency data; the rest is embedding cosine
+DEPENDENCY_WEIGHT = 0.7
+
+# Packages that must depend on both technologies for co-occurrence to count as data
+MIN_COOCCURRENCE = 2
+
+# Dependencies of one package considered (pairs grow quadratically)
+MAX_PACKAGE_DEPENDENCIES = 200
+
+# Pairs per blocked embedding product at build time
+_AFFINITY_BLOCK = 65536
+
+# Pairs per LLM scoring call
+_LLM_PAIRS_PER_CALL = 100
+
+
+def _dependency_names(metadata: dict) -> List[str]:
+    """Package names from metadata.dependencies: {name: version}, [name] or [{"name": ...}]"""
+    dependencies = metadata.get("dependencies") or []
+    if isinstance(dependencies, dict):
+        return [str(name) for name in dependencies]
+    if not isinstance(dependencies, list):
+        return []
+    names = []
+    for dependency in dependencies:
+        if isinstance(dependency, dict):
+            dependency = dependency.get("name") or dependency.get("project_name")
+        if isinstance(dependency, str) and dependency.strip():
+            names.append(dependency)
+    return names
+
+
+def _pair_key(a: int, b: int) -> int:
+    low, high = (a, b) if a < b else (b, a)
+    return (low << 32) | high
+
+
+def _cosine(index: Optional[VectorIndex], a: str, b: str) -> Optional[float]:
+    """Embedding cosine (negatives clipped) of two catalog technologies, if both are in the local index"""
+    if index is None:
+        return None
+    row_a, row_b = index.row_for(a), index.row_for(b)
+    if row_a is None or row_b is None:
+        return None
+    va, vb = index.vector(row_a), index.vector(row_b)
+    norm = float(np.linalg.norm(va) * np.linalg.norm(vb))
+    return min(max(float(va @ vb) / norm, 0.0), 1.0) if norm > 0 else None
+
+
+class PairStore:
+    """LLM-scored pairs in a local SQLite file shared by workers and folded into the next build"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pairs ("
+                " a TEXT NOT NULL, b TEXT NOT NULL, score REAL NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (a, b))"
+            )
+            self._conn.commit()
+
+    def get_many(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        """Stored scores of (a, b) pairs with a < b"""
+        found = {}
+        with self._lock:
+            for a, b in pairs:
+                row = self._conn.execute("SELECT score FROM pairs WHERE a = ? AND b = ?", (a, b)).fetchone()
+                if row:
+                    found[(a, b)] = row[0]
+        return found
+
+    def put_many(self, scores: Dict[Tuple[str, str], float]) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO pairs VALUES (?, ?, ?, ?)",
+                                   [(a, b, score, time.time()) for (a, b), score in scores.items()])
+            self._conn.commit()
+
+    def all(self) -> Dict[Tuple[str, str], float]:
+        with self._lock:
+            return {(a, b): score for a, b, score in self._conn.execute("SELECT a, b, score FROM pairs")}
+
+
+class CompatibilityMatrix:
+    """
+    Upper triangle of a sparse symmetric matrix over catalog technologies
+
+    Entry i of keys / scores / sources is the pair (keys[i] >> 32, keys[i] &
+    0xffffffff) of positions into ids, low position first; keys are sorted, so
+    a lookup is a binary search. Pairs scored after the build are kept in an
+    overlay keyed by technology ids, which also covers technologies outside
+    the catalog.
+    """
+
+    def __init__(self, ids: List[str], aliases: Dict[str, str], keys: np.ndarray, scores: np.ndarray,
+                 sources: np.ndarray, meta: dict):
+        self.ids = ids
+        self.aliases = aliases
+        self.keys = keys
+        self.scores = scores
+        self.sources = sources
+        self.meta = meta
+        self._positions: Dict[str, int] = {tech_id: position for position, tech_id in enumerate(ids)}
+        self._overlay: Dict[Tuple[str, str], float] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self._overlay)
+
+    def resolve(self, name: str) -> str:
+        """Catalog id for a technology name or alias (a derived id when it is not in the catalog)"""
+        tech_id = tech_id_for(name)
+        if tech_id in self._positions:
+            return tech_id
+        return self.aliases.get(normalize(name), tech_id)
+
+    def lookup(self, pairs: List[Tuple[str, str]]) -> List[Optional[float]]:
+        """
+        Stored scores of technology id pairs, in either order
+
+        Returns:
+            Score per pair, None where there is no data
+        """
+        results: List[Optional[float]] = [self._overlay.get(tuple(sorted(pair))) for pair in pairs]
+        wanted = [(number, self._positions.get(a), self._positions.get(b)) for number, (a, b) in enumerate(pairs)]
+        wanted = [(number, a, b) for number, a, b in wanted if a is not None and b is not None]
+        if wanted and len(self.keys):
+            keys = np.array([_pair_key(a, b) for _, a, b in wanted], dtype=np.int64)
+            found = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            for (number, _, _), slot, key in zip(wanted, found, keys):
+                if self.keys[slot] == key:
+                    results[number] = float(self.scores[slot])
+        return results
+
+    def remember(self, scores: Dict[Tuple[str, str], float]) -> None:
+        """Add scores of (a, b) id pairs with a < b until the next build folds them in"""
+        self._overlay.update(scores)
+
+    # Storage: arrays of one generation, published by rewriting meta.json
+
+    def save(self, directory: str) -> None:
+        self.meta = save_generation(
+            directory,
+            self.meta,
+            {"keys": self.keys, "scores": self.scores, "sources": self.sources},
+            {"ids": {"ids": self.ids, "aliases": self.aliases}}
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["CompatibilityMatrix"]:
+        """Latest saved generation, or None if nothing was built yet"""
+        saved = load_generation(directory, ["keys", "scores", "sources"], ["ids"])
+        if saved is None:
+            return None
+        meta, arrays, documents = saved
+        names = documents["ids"]
+        return cls(names["ids"], names["aliases"], arrays["keys"], arrays["scores"], arrays["sources"], meta)
+
+
+def build_matrix(
+    records: List[dict],
+    index: Optional[VectorIndex] = None,
+    llm_scores: Optional[Dict[Tuple[str, str], float]] = None
+) -> Tuple[CompatibilityMatrix, dict]:
+    """
+    Compute the compatibility matrix of the catalog
+
+    A pair has dependency data when one technology depends on the other, or
+    when at least MIN_COOCCURRENCE catalog packages depend on both. Its
+    dependency score is 1 for a direct dependency, else the co-occurrence
+    count over the geometric mean of the two technologies' dependent counts.
+    With both vectors in the local index, DEPENDENCY_WEIGHT of the stored
+    score is that and the rest embedding cosine.
+
+    Args:
+        records: Catalog records (id, name, metadata with dependencies and aliases)
+        index: Local vector index for embedding affinity
+        llm_scores: Previously LLM-scored (a, b) id pairs, kept where there is no dependency data
+
+    Returns:
+        (matrix, {"technologies", "packages", "pairs", "direct", "cooccurring", "llm", "seconds"})
+    """
+    started = time.perf_counter()
+    ids = [str(record["id"]) for record in records]
+    positions = {tech_id: position for position, tech_id in enumerate(ids)}
+    aliases: Dict[str, str] = {}
+    for record in records:
+        for alias in [record.get("name") or ""] + list((record.get("metadata") or {}).get("aliases") or []):
+            key = normalize(str(alias))
+            if key and tech_id_for(key) not in positions:
+                aliases.setdefault(key, str(record["id"]))
+
+    def position_of(package: str) -> Optional[int]:
+        position = positions.get(tech_id_for(package))
+        if position is None:
+            alias = aliases.get(normalize(package))
+            position = positions.get(alias) if alias is not None else None
+        return position
+
+    direct: List[int] = []
+    cooccurring: List[np.ndarray] = []
+    dependents = np.zeros(len(ids), dtype=np.int64)
+    packages = 0
+    for position, record in enumerate(records):
+        members = {position_of(name) for name in _dependency_names(record.get("metadata") or {})}
+        members = sorted(member for member in members if member is not None and member != position)
+        if not members:
+            continue
+        packages += 1
+        members = np.array(members[:MAX_PACKAGE_DEPENDENCIES], dtype=np.int64)
+        dependents[members] += 1
+        direct.extend(_pair_key(position, int(member)) for member in members)
+        low, high = np.triu_indices(len(members), k=1)
+        cooccurring.append((members[low] << 32) | members[high])
+
+    pair_keys, counts = np.unique(np.concatenate(cooccurring) if cooccurring else np.empty(0, dtype=np.int64),
+                                  return_counts=True)
+    keep = counts >= MIN_COOCCURRENCE
+    pair_keys, counts = pair_keys[keep], counts[keep]
+    low, high = pair_keys >> 32, pair_keys & 0xffffffff
+    dependency = counts / np.sqrt(np.maximum(dependents[low] * dependents[high], 1))
+
+    direct_keys = np.unique(np.array(direct, dtype=np.int64))
+    keys = np.union1d(pair_keys, direct_keys)
+    scores = np.zeros(len(keys), dtype=np.float64)
+    scores[np.searchsorted(keys, pair_keys)] = np.minimum(dependency, 1.0)
+    scores[np.searchsorted(keys, direct_keys)] = 1.0
+
+    if index is not None and len(keys):
+        vectors = index.matrix()
+        rows = np.array([-1 if (row := index.row_for(tech_id)) is None else row for tech_id in ids], dtype=np.int64)
+        rows_a, rows_b = rows[keys >> 32], rows[keys & 0xffffffff]
+        embedded = np.flatnonzero((rows_a >= 0) & (rows_b >= 0))
+        for start in range(0, len(embedded), _AFFINITY_BLOCK):
+            slots = embedded[start:start + _AFFINITY_BLOCK]
+            va, vb = vectors[rows_a[slots]], vectors[rows_b[slots]]
+            norms = np.linalg.norm(va, axis=1) * np.linalg.norm(vb, axis=1)
+            cosine = np.clip(np.einsum("ij,ij->i", va, vb) / np.maximum(norms, 1e-12), 0.0, 1.0)
+            scores[slots] = DEPENDENCY_WEIGHT * scores[slots] + (1 - DEPENDENCY_WEIGHT) * cosine
+    sources = np.full(len(keys), SOURCE_DEPENDENCIES, dtype=np.uint8)
+
+    # LLM scores only fill pairs the data does not cover
+    llm = {}
+    for (a, b), score in (llm_scores or {}).items():
+        if a in positions and b in positions:
+            llm[_pair_key(positions[a], positions[b])] = score
+    llm_keys = np.setdiff1d(np.array(sorted(llm), dtype=np.int64), keys)
+    if len(llm_keys):
+        keys = np.concatenate([keys, llm_keys])
+        scores = np.concatenate([scores, [llm[int(key)] for key in llm_keys]])
+        sources = np.concatenate([sources, np.full(len(llm_keys), SOURCE_LLM, dtype=np.uint8)])
+        order = np.argsort(keys, kind="stable")
+        keys, scores, sources = keys[order], scores[order], sources[order]
+
+    matrix = CompatibilityMatrix(ids, aliases, keys, scores.astype(np.float32), sources, {
+        "generation": -1,
+        "built_at": time.time()
+    })
+    stats = {
+        "technologies": len(ids),
+        "packages": packages,
+        "pairs": int(len(keys)),
+        "direct": int(len(direct_keys)),
+        "cooccurring": int(len(pair_keys)),
+        "llm": int(len(llm_keys)),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    return matrix, stats
+
+
+async def score_stack(technologies: List[str], llm_pairs: Optional[int] = None) -> Optional[dict]:
+    """
+    Compatibility of a stack: the mean score over pairs of its members
+
+    Pairs are looked up in the matrix, then in the LLM-scored pairs of other
+    workers. Up to llm_pairs of the remaining pairs are scored by the LLM and
+    written back; any left after that use embedding cosine when both
+    technologies are in the local index, and are skipped otherwise.
+
+    Args:
+        technologies: Technology names or aliases
+        llm_pairs: Pairs without data the LLM may score (defaults to COMPATIBILITY_LLM_PAIRS)
+
+    Returns:
+        {"compatibility_score", "pairs", "matrix", "llm", "embeddings", "unscored"},
+        or None when no matrix has been built
+    """
+    matrix = await get_compatibility_matrix()
+    if matrix is None:
+        return None
+    if llm_pairs is None:
+        llm_pairs = get_settings().compatibility_llm_pairs
+    metrics = get_metrics()
+
+    names: Dict[str, str] = {}
+    for name in technologies:
+        names.setdefault(matrix.resolve(name), name)
+    pairs = list(combinations(sorted(names), 2))
+    scores = dict(zip(pairs, matrix.lookup(pairs)))
+    stats = {"pairs": len(pairs), "matrix": sum(score is not None for score in scores.values()),
+             "llm": 0, "embeddings": 0, "unscored": 0}
+    missing = [pair for pair, score in scores.items() if score is None]
+
+    store = get_pair_store()
+    if missing and store is not None:
+        shared = await asyncio.to_thread(store.get_many, missing)
+        matrix.remember(shared)
+        scores.update(shared)
+        stats["matrix"] += len(shared)
+        missing = [pair for pair in missing if pair not in shared]
+
+    if missing and llm_pairs > 0:
+        asked = missing[:llm_pairs]
+        client = get_ai_client()
+        batches = [asked[start:start + _LLM_PAIRS_PER_CALL] for start in range(0, len(asked), _LLM_PAIRS_PER_CALL)]
+        outcomes = await asyncio.gather(
+            *(client.score_pairs([(names[a], names[b]) for a, b in batch]) for batch in batches),
+            return_exceptions=True
+        )
+        generated: Dict[Tuple[str, str], float] = {}
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.warning(f"LLM scoring of {len(batch)} technology pairs failed: {outcome}")
+                continue
+            generated.update((pair, score) for pair, score in zip(batch, outcome) if score is not None)
+        matrix.remember(generated)
+        if store is not None and generated:
+            await asyncio.to_thread(store.put_many, generated)
+        scores.update(generated)
+        stats["llm"] = len(generated)
+        metrics.incr("compatibility_llm_pairs", len(generated))
+        missing = [pair for pair in missing if pair not in generated]
+
+    index = get_vector_index()
+    for pair in missing:
+        cosine = _cosine(index, *pair)
+        if cosine is None:
+            stats["unscored"] += 1
+        else:
+            scores[pair] = cosine
+            stats["embeddings"] += 1
+    metrics.incr("compatibility_matrix_pairs", stats["matrix"])
+
+    known = [score for score in scores.values() if score is not None]
+    if not pairs:
+        stats["compatibility_score"] = 1.0
+    else:
+        stats["compatibility_score"] = round(sum(known) / len(known), 4) if known else None
+    return stats
+
+
+def compatibility_directory() -> Optional[str]:
+    """COMPATIBILITY_DIR, defaulting to compatibility/ beside the local vector index"""
+    settings = get_settings()
+    if settings.compatibility_dir:
+        return settings.compatibility_dir
+    if settings.vector_index_dir:
+        return os.path.join(settings.vector_index_dir, "compatibility")
+    return None
+
+
+async def rebuild_matrix(directory: str) -> Optional[dict]:
+    """
+    Build from the current catalog and publish a new generation
+
+    Serialized across processes by a lock file; returns None when another
+    process holds it.
+    """
+    from lib.catalog_view import catalog_records
+
+    os.makedirs(directory, exist_ok=True)
+    records = await catalog_records()
+    with open(os.path.join(directory, "matrix.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            previous = await asyncio.to_thread(CompatibilityMatrix.load, directory)
+            store = get_pair_store()
+            llm_scores = await asyncio.to_thread(store.all) if store is not None else {}
+            matrix, stats = await asyncio.to_thread(build_matrix, records, get_vector_index(), llm_scores)
+            if previous is not None:
+                matrix.meta["generation"] = previous.meta["generation"]
+            await asyncio.to_thread(matrix.save, directory)
+            logger.info(f"Compatibility matrix built: {stats}")
+            return stats
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Thread-safe singleton
+_pair_store: Optional[PairStore] = None
+_pair_store_lock = threading.Lock()
+
+
+def get_pair_store() -> Optional[PairStore]:
+    """Shared LLM-scored pairs, or None when no compatibility directory is configured"""
+    global _pair_store
+    directory = compatibility_directory()
+    if directory is None:
+        return None
+    if _pair_store is None:
+        with _pair_store_lock:
+            if _pair_store is None:
+                os.makedirs(directory, exist_ok=True)
+                _pair_store = PairStore(os.path.join(directory, "llm_pairs.sqlite3"))
+    return _pair_store
+
+
+# Shared reader, reloaded when a new generation is published
+_reader: GenerationReader[CompatibilityMatrix] = GenerationReader(CompatibilityMatrix.load)
+
+
+async def get_compatibility_matrix() -> Optional[CompatibilityMatrix]:
+    """Current matrix, or None when not configured or not built yet"""
+    directory = compatibility_directory()
+    if directory is None:
+        return None
+    return await _reader.get(directory)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Technology compatibility matrix maintenance")
+    parser.add_argument("command", choices=["build", "stats"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    directory = compatibility_directory()
+    if directory is None:
+        raise SystemExit("COMPATIBILITY_DIR (or VECTOR_INDEX_DIR) is not set")
+
+    if args.command == "build":
+        async def run():
+            from lib import db
+            try:
+                return await rebuild_matrix(directory)
+            finally:
+                await db.close_pool()
+
+        stats = asyncio.run(run())
+        print(json.dumps(stats if stats is not None else {"skipped": "another build is running"}))
+    matrix = CompatibilityMatrix.load(directory)
+    print(json.dumps(dict(matrix.meta, pairs=len(matrix)) if matrix is not None else {}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Postgres (Neon + pgvector) access
+asyncpg connection pool opened in the app lifespan, SQL migrations, bulk
+catalog writes and cosine top-k search over the technologies table
+
+CLI (from server/):
+    python -m lib.db migrate
+    python -m lib.db index --method hnsw --m 16 --ef-construction 64
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from settings import get_settings
+from lib.metadata_index import FILTER_FIELDS
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+VECTOR_INDEX = "technologies_embedding_idx"
+
+# (id, name, description, category, metadata, embedding, embedding_model)
+TechRow = Tuple[str, str, str, Optional[str], dict, np.ndarray, str]
+
+_STAGING_COLUMNS = ["id", "name", "description", "category", "metadata", "embedding", "embedding_model"]
+
+_SEARCH_COLUMNS = "id, name, description, category, metadata, 1 - (embedding <=> $1) AS similarity"
+
+# Filters over the catalog; metadata values may be scalars or lists. Each field is an
+# overlap with the row's "field:value" terms, served by the GIN index from migration 003
+_FILTER = "technology_filter_terms(category, metadata) && ${n}::text[]"
+
+# Unfiltered catalog size is cached briefly; it is needed on every filtered query
+_CATALOG_SIZE_TTL = 60.0
+_catalog_size: Tuple[float, int] = (0.0, 0)
+
+# Catalog writes made by this process; part of the recommendation cache key
+_catalog_writes = 0
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+
+def _encode_jsonb(value) -> bytes:
+    # Binary jsonb is a version byte followed by the JSON text; binary codecs
+    # are required for COPY ... FORMAT binary
+    return b"\x01" + json.dumps(value).encode("utf-8")
+
+
+def _decode_jsonb(data: bytes):
+    return json.loads(data[1:])
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    await register_vector(conn)
+    await conn.set_type_codec(
+        "jsonb", encoder=_encode_jsonb, decoder=_decode_jsonb, schema="pg_catalog", format="binary"
+    )
+
+
+async def init_pool(dsn: Optional[str] = None) -> asyncpg.Pool:
+    """
+    Open the shared connection pool (called from the app lifespan)
+
+    Args:
+        dsn: Connection string (defaults to DATABASE_URL)
+
+    Returns:
+        asyncpg.Pool
+    """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            settings = get_settings()
+            _pool = await asyncpg.create_pool(
+                dsn=dsn or settings.database_url.get_secret_value(),
+                min_size=settings.db_pool_min_size,
+                max_size=settings.db_pool_max_size,
+                statement_cache_size=settings.db_statement_cache_size,
+                command_timeout=settings.db_command_timeout,
+                init=_init_connection
+            )
+    return _pool
+
+
+async def get_pool() -> asyncpg.Pool:
+    """Shared pool; opened on first use when the lifespan did not (CLI, failed startup)"""
+    if _pool is None:
+        return await init_pool()
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def apply_migrations(directory: str = MIGRATIONS_DIR, dsn: Optional[str] = None) -> List[str]:
+    """
+    Apply pending NNN_name.sql migrations in order
+
+    Each file runs in its own transaction and is recorded in schema_migrations.
+    An advisory lock keeps concurrently starting instances from racing. Runs
+    on its own plain connection, not the pool: pooled connections register the
+    vector codec, which fails until migration 001 has created the extension.
+
+    Args:
+        directory: Folder of migration files
+        dsn: Connection string (defaults to DATABASE_URL)
+
+    Returns:
+        Versions applied by this call
+    """
+    applied: List[str] = []
+    conn = await asyncpg.connect(dsn or get_settings().database_url.get_secret_value())
+    try:
+        await conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version TEXT PRIMARY KEY,"
+            " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        await conn.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+        try:
+            done = {row["version"] for row in await conn.fetch("SELECT version FROM schema_migrations")}
+            for file_name in sorted(os.listdir(directory)):
+                version = file_name.split("_", 1)[0]
+                if not file_name.endswith(".sql") or version in done:
+                    continue
+                with open(os.path.join(directory, file_name)) as f:
+                    sql = f.read()
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", version)
+                logger.info(f"Applied migration {file_name}")
+                applied.append(version)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+    finally:
+        await conn.close()
+    return applied
+
+
+async def upsert_technologies(rows: List[TechRow]) -> int:
+    """
+    Bulk upsert technologies with their embeddings
+
+    Rows are streamed into a temporary staging table with binary COPY and
+    merged with a single INSERT ... ON CONFLICT, so a batch costs one round
+    trip for the data instead of one statement per row.
+
+    Args:
+        rows: Technology rows
+
+    Returns:
+        Number of rows written
+    """
+    if not rows:
+        return 0
+
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS technologies_staging "
+                    "(LIKE technologies INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                )
+                await conn.copy_records_to_table(
+                    "technologies_staging",
+                    records=rows,
+                    columns=_STAGING_COLUMNS
+                )
+                await conn.execute(
+                    "INSERT INTO technologies (id, name, description, category, metadata, embedding, embedding_model) "
+                    "SELECT DISTINCT ON (id) id, name, description, category, metadata, embedding, embedding_model "
+                    "FROM technologies_staging "
+                    "ON CONFLICT (id) DO UPDATE SET "
+                    "name = EXCLUDED.name, description = EXCLUDED.description, category = EXCLUDED.category, "
+                    "metadata = EXCLUDED.metadata, embedding = EXCLUDED.embedding, "
+                    "embedding_model = EXCLUDED.embedding_model, updated_at = now()"
+                )
+        global _catalog_writes
+        _catalog_writes += 1
+        return len(rows)
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error upserting {len(rows)} technologies: {e}")
+        raise Exception(f"Failed to upsert technologies: {str(e)}")
+
+
+def catalog_writes() -> int:
+    """Number of catalog upserts by this process (other workers' writes are not seen)"""
+    return _catalog_writes
+
+
+def _filter_sql(filters: Dict[str, Set[str]], first_param: int) -> Tuple[str, list]:
+    """AND of per-field term overlaps; field names come from the FILTER_FIELDS allowlist"""
+    clauses, params = [], []
+    for n, field in enumerate(sorted(filters), start=first_param):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field '{field}'")
+        clauses.append(_FILTER.replace("{n}", str(n)))
+        params.append([f"{field}:{value}" for value in sorted(filters[field])])
+    return " AND ".join(clauses), params
+
+
+async def list_technologies() -> List[dict]:
+    """
+    Embedded technologies without their vectors (for the lexical index)
+
+    Returns:
+        Records with id, name, description, category, metadata
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, name, description, category, metadata FROM technologies WHERE embedding IS NOT NULL"
+            )
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error listing technologies: {e}")
+        raise Exception(f"Failed to list technologies: {str(e)}")
+    return [dict(row) for row in rows]
+
+
+async def technology_similarities(query_vector: np.ndarray, tech_ids: List[str]) -> Dict[str, float]:
+    """
+    Cosine similarity of the query to specific technologies (primary key lookups)
+
+    Args:
+        query_vector: Query embedding
+        tech_ids: Technology ids
+
+    Returns:
+        {tech_id: similarity} for the ids that have an embedding
+    """
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, 1 - (embedding <=> $1) AS similarity FROM technologies "
+                "WHERE id = ANY($2::text[]) AND embedding IS NOT NULL",
+                np.asarray(query_vector, dtype=np.float32), tech_ids
+            )
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error scoring technologies: {e}")
+        raise Exception(f"Failed to score technologies: {str(e)}")
+    return {row["id"]: float(row["similarity"]) for row in rows}
+
+
+async def count_technologies(filters: Optional[Dict[str, Set[str]]] = None) -> int:
+    """
+    Embedded technologies matching the filters (the whole catalog without filters)
+
+    Args:
+        filters: {field: allowed values} from metadata_index.normalize_constraints
+
+    Returns:
+        Row count
+    """
+    global _catalog_size
+    if not filters and time.monotonic() - _catalog_size[0] < _CATALOG_SIZE_TTL:
+        return _catalog_size[1]
+
+    where, params = _filter_sql(filters or {}, 1)
+    sql = "SELECT count(*) FROM technologies WHERE embedding IS NOT NULL" + (f" AND {where}" if where else "")
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            count = await conn.fetchval(sql, *params)
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error counting technologies: {e}")
+        raise Exception(f"Failed to count technologies: {str(e)}")
+
+    if not filters:
+        _catalog_size = (time.monotonic(), count)
+    return count
+
+
+async def search_technologies(
+    query_vector: np.ndarray,
+    limit: int = 10,
+    ef_search: Optional[int] = None,
+    exact: bool = False,
+    filters: Optional[Dict[str, Set[str]]] = None,
+    fetch: Optional[int] = None
+) -> List[asyncpg.Record]:
+    """
+    Cosine top-k over technology embeddings
+
+    With filters, either scan the matching rows exactly (exact=True: selective
+    filters, found through the GIN filter-terms index) or take the `fetch` nearest from
+    the HNSW index and filter those (broad filters).
+
+    Args:
+        query_vector: Query embedding (same dimensions as the column)
+        limit: Number of results
+        ef_search: HNSW candidate list size for this query (higher = better
+            recall, slower); defaults to HNSW_EF_SEARCH
+        exact: Bypass the ANN index (sequential scan; for recall checks)
+        filters: {field: allowed values}
+        fetch: ANN candidates taken before filtering (defaults to limit)
+
+    Returns:
+        Records with id, name, description, category, metadata, similarity
+    """
+    settings = get_settings()
+    ef_search = ef_search or settings.hnsw_ef_search
+    start = time.perf_counter()
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # SET LOCAL scopes the knobs to this query's transaction; values are ints, not user text
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                await conn.execute(f"SET LOCAL ivfflat.probes = {int(settings.ivfflat_probes)}")
+                sql, params = _search_sql(limit, exact, filters, fetch)
+                rows = await conn.fetch(sql, np.asarray(query_vector, dtype=np.float32), *params)
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error searching technologies: {e}")
+        raise Exception(f"Failed to search technologies: {str(e)}")
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    get_metrics().observe("db_vector_search_ms", elapsed_ms)
+    return rows
+
+
+def _search_sql(limit: int, exact: bool, filters: Optional[Dict[str, Set[str]]],
+                fetch: Optional[int]) -> Tuple[str, list]:
+    # Statements are parameterized so each shape is prepared once per connection
+    # Exact scans order by similarity, which the HNSW index cannot serve (it only matches
+    # ORDER BY embedding <=> $1), so they read every candidate row without disabling other indexes
+    if not filters:
+        order = "similarity DESC" if exact else "embedding <=> $1"
+        return (f"SELECT {_SEARCH_COLUMNS} FROM technologies WHERE embedding IS NOT NULL "
+                f"ORDER BY {order} LIMIT $2"), [limit]
+    where, params = _filter_sql(filters, 3)
+    if exact:
+        return (f"SELECT {_SEARCH_COLUMNS} FROM technologies WHERE embedding IS NOT NULL AND {where} "
+                "ORDER BY similarity DESC LIMIT $2"), [limit, *params]
+    fetch_param = 3 + len(params)
+    return (f"SELECT * FROM (SELECT {_SEARCH_COLUMNS} FROM technologies WHERE embedding IS NOT NULL "
+            f"ORDER BY embedding <=> $1 LIMIT ${fetch_param}) AS nearest "
+            f"WHERE {where} ORDER BY similarity DESC LIMIT $2"), [limit, *params, max(fetch or limit, limit)]
+
+
+async def rebuild_vector_index(
+    method: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: int = 100,
+    maintenance_work_mem: str = "512MB"
+) -> None:
+    """
+    Rebuild the embedding index with new parameters without blocking writes
+
+    The new index is built CONCURRENTLY under a temporary name and swapped in.
+
+    Args:
+        method: "hnsw" or "ivfflat"
+        m: HNSW graph degree
+        ef_construction: HNSW build-time candidate list size
+        lists: IVFFlat list count (rule of thumb: rows / 1000)
+        maintenance_work_mem: Memory for the build (HNSW builds are much faster in memory)
+    """
+    if method == "hnsw":
+        options = f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    elif method == "ivfflat":
+        options = f"WITH (lists = {int(lists)})"
+    else:
+        raise ValueError(f"Unknown index method '{method}' (use 'hnsw' or 'ivfflat')")
+
+    pool = await get_pool()
+    temp_name = f"{VECTOR_INDEX}_new"
+    async with pool.acquire() as conn:
+        await conn.execute(f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {temp_name}")
+        await conn.execute(
+            f"CREATE INDEX CONCURRENTLY {temp_name} ON technologies "
+            f"USING {method} (embedding vector_cosine_ops) {options}"
+        )
+        async with conn.transaction():
+            await conn.execute(f"DROP INDEX IF EXISTS {VECTOR_INDEX}")
+            await conn.execute(f"ALTER INDEX {temp_name} RENAME TO {VECTOR_INDEX}")
+        await conn.execute("RESET maintenance_work_mem")
+    logger.info(f"Rebuilt {VECTOR_INDEX} using {method} {options}")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Apply pending migrations")
+    index = commands.add_parser("index", help="Rebuild the embedding index")
+    index.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+    index.add_argument("--m", type=int, default=16)
+    index.add_argument("--ef-construction", type=int, default=64)
+    index.add_argument("--lists", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        try:
+            if args.command == "migrate":
+                applied = await apply_migrations()
+                print(f"Applied {len(applied)} migration(s): {', '.join(applied) or '-'}")
+            else:
+                await rebuild_vector_index(args.method, args.m, args.ef_construction, args.lists)
+        finally:
+            await close_pool()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
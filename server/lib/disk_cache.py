@@ -0,0 +1,206 @@
+"""
+Size-bounded local disk cache
+LRU file cache with ETag metadata used as a read-through cache for B2 objects.
+Entries are plain files so they can be served via mmap or sendfile.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """A cached object on disk"""
+
+    def __init__(self, key: str, path: str, etag: str, size: int, validated_at: float):
+        self.key = key
+        self.path = path
+        self.etag = etag
+        self.size = size
+        self.validated_at = validated_at
+
+
+class DiskCache:
+    """LRU cache of objects on local disk with a byte budget"""
+
+    def __init__(self, directory: str, max_bytes: int, metrics_prefix: str = "disk_cache"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.metrics_prefix = metrics_prefix
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _paths(self, key: str):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, name)
+        return base + ".bin", base + ".json"
+
+    def _metric(self, name: str) -> str:
+        return f"{self.metrics_prefix}_{name}"
+
+    def _load(self) -> None:
+        """Rebuild the index from files left by a previous run, oldest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    meta = json.load(f)
+                data_path, _ = self._paths(meta["key"])
+                stat = os.stat(data_path)
+                found.append((stat.st_atime, CacheEntry(meta["key"], data_path, meta["etag"], stat.st_size, 0.0)))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._total_bytes += entry.size
+        self._evict()
+        self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        metrics = get_metrics()
+        metrics.set_gauge(self._metric("bytes"), self._total_bytes)
+        metrics.set_gauge(self._metric("entries"), len(self._entries))
+
+    def _remove(self, entry: CacheEntry) -> None:
+        self._total_bytes -= entry.size
+        for path in self._paths(entry.key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._remove(entry)
+            get_metrics().incr(self._metric("evictions"))
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """
+        Find a cached entry and mark it most recently used
+
+        Args:
+            key: Object key
+
+        Returns:
+            CacheEntry, or None if not cached (or its file has disappeared)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry.path):
+                del self._entries[key]
+                self._total_bytes -= entry.size
+                self._update_gauges()
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def new_temp_file(self):
+        """Open a temporary file in the cache directory for an incoming object"""
+        return tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False)
+
+    def commit(self, key: str, temp_path: str, etag: str) -> Optional[CacheEntry]:
+        """
+        Move a fully written temporary file into the cache
+
+        Args:
+            key: Object key
+            temp_path: Path returned by new_temp_file
+            etag: ETag of the stored object
+
+        Returns:
+            The new CacheEntry, or None if the object exceeds the whole budget
+        """
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.remove(temp_path)
+            return None
+
+        data_path, meta_path = self._paths(key)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.size
+
+            os.replace(temp_path, data_path)
+            with open(meta_path, "w") as f:
+                json.dump({"key": key, "etag": etag}, f)
+
+            entry = CacheEntry(key, data_path, etag, size, time.monotonic())
+            self._entries[key] = entry
+            self._total_bytes += size
+            self._evict()
+            self._update_gauges()
+            return entry
+
+    def mark_validated(self, entry: CacheEntry) -> None:
+        """Record that the entry's ETag was just confirmed upstream"""
+        entry.validated_at = time.monotonic()
+
+    def invalidate(self, key: str) -> None:
+        """Drop an entry (after writes or deletes of the object)"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._remove(entry)
+                self._update_gauges()
+
+    def open_mmap(self, entry: CacheEntry):
+        """
+        Memory-map a cached file read-only
+
+        The mapping stays valid even if the entry is evicted afterwards.
+
+        Returns:
+            mmap object (bytes-like), or b'' for empty files
+        """
+        if entry.size == 0:
+            return b""
+        with open(entry.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def record_hit(self, entry: CacheEntry) -> None:
+        metrics = get_metrics()
+        metrics.incr(self._metric("hits"))
+        metrics.incr(self._metric("bytes_saved"), entry.size)
+
+    def record_miss(self, size: int) -> None:
+        metrics = get_metrics()
+        metrics.incr(self._metric("misses"))
+        metrics.incr(self._metric("bytes_downloaded"), size)
+
+    def stats(self) -> dict:
+        """Cache size, hit ratio and bytes saved"""
+        metrics = get_metrics()
+        with self._lock:
+            entries = len(self._entries)
+            total = self._total_bytes
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": metrics.get(self._metric("hits")),
+            "misses": metrics.get(self._metric("misses")),
+            "hit_ratio": metrics.ratio(self._metric("hits"), self._metric("misses")),
+            "bytes_saved": metrics.get(self._metric("bytes_saved")),
+            "bytes_downloaded": metrics.get(self._metric("bytes_downloaded")),
+            "evictions": metrics.get(self._metric("evictions"))
+        }
@@ -0,0 +1,214 @@
+"""
+Embedding backends
+Pluggable producers of embedding vectors used by the embeddings client:
+the remote OpenAI-compatible API and a deterministic local CPU backend
+"""
+import asyncio
+import logging
+import re
+import time
+import zlib
+from typing import List, Optional
+
+import httpx
+import numpy as np
+
+from lib.vector_codec import decode_base64
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend:
+    """Base class for embedding backends"""
+
+    # Remote backends go through the micro-batcher and the embedding cache;
+    # local ones are cheaper to recompute than to look up
+    remote = True
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    @property
+    def model_id(self) -> str:
+        """Identity of the vector space this backend produces"""
+        raise NotImplementedError
+
+    async def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed a batch of texts
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            float32 vectors in input order
+        """
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """OpenAI-compatible /embeddings API"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 1536,
+        api_base: str = "https://api.openai.com/v1",
+        timeout: float = 30.0
+    ):
+        super().__init__(dimensions)
+        self.model = model
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+        self._http: Optional[httpx.AsyncClient] = None
+        self.calls = 0
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.model}:{self.dimensions}"
+
+    def _client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop; reused for keep-alive
+        if self._http is None:
+            self._http = httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+        return self._http
+
+    async def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """One batched call to the embeddings API"""
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            response = await self._client().post(
+                f"{self.api_base}/embeddings",
+                # base64 float32 is ~4x smaller than a JSON float list and much cheaper to parse
+                json={"model": self.model, "input": texts, "dimensions": self.dimensions, "encoding_format": "base64"}
+            )
+            response.raise_for_status()
+            data = sorted(response.json()["data"], key=lambda item: item["index"])
+            vectors = [decode_base64(item["embedding"]) for item in data]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            logger.error(f"Embeddings API error ({len(texts)} inputs): {e}")
+            raise Exception(f"Failed to generate embeddings: {str(e)}")
+
+        logger.debug(f"Embedded batch of {len(texts)} in {time.perf_counter() - start:.3f}s")
+        return vectors
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+_WORD_RE = re.compile(r"\w+")
+
+# Batches above this size are computed off the event loop
+_LOCAL_THREAD_THRESHOLD = 64
+
+
+class LocalHashingBackend(EmbeddingBackend):
+    """
+    Deterministic CPU embeddings without any model download or network
+
+    Each text becomes hashed sparse features (word unigrams, word bigrams and
+    character trigrams) with signed feature hashing and sublinear TF weights.
+    The batch feature matrix is projected to `dimensions` with a fixed seeded
+    Gaussian random projection and L2-normalized. Texts sharing vocabulary get
+    similar vectors; identical inputs always produce identical vectors.
+    """
+
+    remote = False
+
+    def __init__(self, dimensions: int = 1536, seed: int = 0, n_features: int = 2048):
+        super().__init__(dimensions)
+        self.seed = seed
+        self.n_features = n_features
+        self._projection: Optional[np.ndarray] = None
+
+    @property
+    def model_id(self) -> str:
+        return f"local-hash-v1:{self.dimensions}:{self.n_features}:{self.seed}"
+
+    @property
+    def projection(self) -> np.ndarray:
+        if self._projection is None:
+            rng = np.random.default_rng(self.seed)
+            self._projection = (
+                rng.standard_normal((self.n_features, self.dimensions), dtype=np.float32)
+                / np.float32(np.sqrt(self.dimensions))
+            )
+        return self._projection
+
+    def _features(self, text: str) -> List[int]:
+        """Stable 32-bit hashes of the text's n-gram features"""
+        words = _WORD_RE.findall(text.lower())
+        grams = [f"w:{w}" for w in words]
+        grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch synchronously
+
+        Returns:
+            (len(texts), dimensions) float32 matrix of unit vectors (zero rows for empty texts)
+        """
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            hashes = np.asarray(self._features(text), dtype=np.uint32)
+            rows.append(np.full(hashes.shape[0], row, dtype=np.int64))
+            cols.append((hashes % self.n_features).astype(np.int64))
+            # Top hash bit picks the sign so collisions tend to cancel rather than pile up
+            signs.append(np.where(hashes >> 31, -1.0, 1.0).astype(np.float32))
+
+        counts = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        if rows:
+            np.add.at(counts, (np.concatenate(rows), np.concatenate(cols)), np.concatenate(signs))
+
+        features = np.sign(counts) * np.log1p(np.abs(counts))
+        # Only project the columns in use; small batches touch a fraction of the features
+        active = np.flatnonzero(features.any(axis=0))
+        vectors = features[:, active] @ self.projection[active]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    async def embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        if len(texts) > _LOCAL_THREAD_THRESHOLD:
+            matrix = await asyncio.to_thread(self.embed_sync, texts)
+        else:
+            matrix = self.embed_sync(texts)
+        return list(matrix)
+
+
+def create_backend(name: str, settings) -> EmbeddingBackend:
+    """
+    Build a backend from settings
+
+    Args:
+        name: "openai" or "local"
+        settings: Application settings
+
+    Returns:
+        EmbeddingBackend
+
+    Raises:
+        ValueError: On an unknown backend name
+    """
+    if name == "openai":
+        return OpenAIBackend(
+            api_key=settings.openai_api_key.get_secret_value(),
+            model=settings.embedding_model,
+            dimensions=settings.embedding_dimensions,
+            api_base=settings.embedding_api_base
+        )
+    if name == "local":
+        return LocalHashingBackend(dimensions=settings.embedding_dimensions, seed=settings.local_embedding_seed)
+    raise ValueError(f"Unknown embedding backend '{name}' (use 'openai' or 'local')")
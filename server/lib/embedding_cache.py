@@ -0,0 +1,202 @@
+"""
+Two-tier embedding cache
+In-process LRU of float32 arrays in front of a persistent SQLite store, keyed
+by a hash of (model, normalized text) so identical inputs are never re-embedded
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different inputs share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_id: str, text: str) -> str:
+    """Cache key for an input embedded by a given model"""
+    return hashlib.sha256(f"{model_id}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class MemoryTier:
+    """Thread-safe LRU of embedding arrays"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """Persistent embedding store in a local SQLite file"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model_id TEXT NOT NULL,"
+                " dims INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="<f4")
+        return found
+
+    def put_many(self, model_id: str, items: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        rows = [
+            (key, model_id, int(vector.shape[0]), np.ascontiguousarray(vector, dtype="<f4").tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def purge_except(self, model_id: str) -> int:
+        """Delete vectors produced by any other model/version"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM embeddings WHERE model_id != ?", (model_id,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """
+    Memory LRU + optional persistent tier
+
+    The model id (model name, dimensions and a cache version) is part of every
+    key, and rows from other model ids are purged when the cache opens, so
+    switching models or bumping the version invalidates old vectors.
+    """
+
+    def __init__(self, model_id: str, memory_entries: int = 10000, path: Optional[str] = None):
+        self.model_id = model_id
+        self.memory = MemoryTier(memory_entries)
+        self.persistent: Optional[SQLiteTier] = None
+        if path:
+            self.persistent = SQLiteTier(path)
+            purged = self.persistent.purge_except(model_id)
+            if purged:
+                logger.info(f"Embedding cache: purged {purged} vectors from other model versions")
+
+    def key(self, text: str) -> str:
+        return cache_key(self.model_id, text)
+
+    async def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up vectors for several texts
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Cached vector or None per text, in input order
+        """
+        metrics = get_metrics()
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [self.memory.get(key) for key in keys]
+
+        memory_hits = sum(vector is not None for vector in results)
+        metrics.incr("embedding_cache_memory_hits", memory_hits)
+        metrics.incr("embedding_cache_memory_misses", len(keys) - memory_hits)
+
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing and self.persistent:
+            found = await asyncio.to_thread(self.persistent.get_many, [keys[i] for i in missing])
+            metrics.incr("embedding_cache_persistent_hits", len(found))
+            metrics.incr("embedding_cache_persistent_misses", len(missing) - len(found))
+            for i in missing:
+                vector = found.get(keys[i])
+                if vector is not None:
+                    results[i] = vector
+                    self.memory.put(keys[i], vector)
+
+        return results
+
+    async def put_many(self, texts: List[str], vectors: List[np.ndarray]) -> None:
+        """Store freshly computed vectors in both tiers"""
+        items = {self.key(text): vector for text, vector in zip(texts, vectors)}
+        for key, vector in items.items():
+            self.memory.put(key, vector)
+        if self.persistent:
+            await asyncio.to_thread(self.persistent.put_many, self.model_id, items)
+
+    def clear_memory(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> dict:
+        """Tier sizes and hit rates"""
+        metrics = get_metrics()
+        return {
+            "model_id": self.model_id,
+            "memory_entries": len(self.memory),
+            "persistent_entries": self.persistent.count() if self.persistent else None,
+            "memory_hit_rate": metrics.ratio("embedding_cache_memory_hits", "embedding_cache_memory_misses"),
+            "persistent_hit_rate": metrics.ratio("embedding_cache_persistent_hits", "embedding_cache_persistent_misses")
+        }
@@ -0,0 +1,288 @@
+"""
+Embeddings client
+Collects concurrent embedding requests into batched backend calls and fans
+the vectors back to callers. Vectors are float32 NumPy arrays; repeated
+inputs are served from the two-tier embedding cache.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from settings import get_settings
+from lib.embedding_backends import EmbeddingBackend, create_backend
+from lib.embedding_cache import EmbeddingCache
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def tech_text(tech_name: str, description: str) -> str:
+    """Text embedded for a technology"""
+    return f"{tech_name}\n{description}".strip()
+
+
+def project_text(project_description: str, requirements: Optional[List[str]] = None) -> str:
+    """Text embedded for a project description and its requirements"""
+    if requirements:
+        return f"{project_description}\nRequirements: {', '.join(requirements)}".strip()
+    return project_description.strip()
+
+
+class _Pending:
+    __slots__ = ("text", "tokens", "future")
+
+    def __init__(self, text: str, tokens: int, future: asyncio.Future):
+        self.text = text
+        self.tokens = tokens
+        self.future = future
+
+
+class MicroBatcher:
+    """
+    Adaptive micro-batcher for embedding requests
+
+    The first request of a batch opens a collection window. The batch is sent
+    when the window closes or as soon as it reaches max_batch_size inputs or
+    max_batch_tokens estimated tokens. The window adapts to traffic: it shrinks
+    towards min_window_ms when windows close with a single request (no point
+    waiting at low concurrency) and grows back to window_ms when batching pays off.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[str]], Awaitable[List[np.ndarray]]],
+        window_ms: float = 10.0,
+        min_window_ms: float = 1.0,
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 100_000,
+        max_concurrent_batches: int = 4
+    ):
+        self.process_batch = process_batch
+        self.window_ms = window_ms
+        self.min_window_ms = min(min_window_ms, window_ms)
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._window = window_ms
+        self._pending: List[_Pending] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+
+    @property
+    def current_window_ms(self) -> float:
+        return self._window
+
+    async def submit(self, text: str) -> np.ndarray:
+        """
+        Queue one text for embedding
+
+        Args:
+            text: Input text
+
+        Returns:
+            Embedding vector for the text
+        """
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(text)
+
+        # Flush first if this input would overflow the token budget
+        if self._pending and self._pending_tokens + tokens > self.max_batch_tokens:
+            self._flush(timed_out=False)
+
+        future = loop.create_future()
+        self._pending.append(_Pending(text, tokens, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_batch_size or self._pending_tokens >= self.max_batch_tokens:
+            self._flush(timed_out=False)
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window / 1000, self._flush, True)
+
+        return await future
+
+    def _flush(self, timed_out: bool) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = []
+        self._pending_tokens = 0
+
+        if timed_out:
+            if len(batch) == 1:
+                self._window = max(self.min_window_ms, self._window / 2)
+            else:
+                self._window = min(self.window_ms, self._window * 2)
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+
+        async with self._semaphore:
+            try:
+                vectors = await self.process_batch([item.text for item in batch])
+                if len(vectors) != len(batch):
+                    raise Exception(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                return
+
+        for item, vector in zip(batch, vectors):
+            if not item.future.done():
+                item.future.set_result(vector)
+
+
+class EmbeddingsClient:
+    """
+    Embeddings client over a pluggable backend
+
+    Remote backends get request micro-batching and the two-tier embedding
+    cache; local backends are called directly. An optional fallback backend
+    serves requests when the primary fails (degraded mode). Fallback vectors
+    live in a different vector space, so only use it where everything compared
+    against them was embedded with the same fallback backend.
+    """
+
+    def __init__(
+        self,
+        backend: EmbeddingBackend,
+        fallback: Optional[EmbeddingBackend] = None,
+        window_ms: float = 10.0,
+        min_window_ms: float = 1.0,
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 100_000,
+        max_concurrent_batches: int = 4,
+        cache_version: str = "1",
+        cache_memory_entries: int = 10000,
+        cache_path: Optional[str] = None
+    ):
+        self.backend = backend
+        self.fallback = fallback
+        self.cache_version = cache_version
+        self.batcher = MicroBatcher(
+            backend.embed_batch,
+            window_ms=window_ms,
+            min_window_ms=min_window_ms,
+            max_batch_size=max_batch_size,
+            max_batch_tokens=max_batch_tokens,
+            max_concurrent_batches=max_concurrent_batches
+        )
+        self.cache = EmbeddingCache(self.model_id, cache_memory_entries, cache_path)
+
+    @property
+    def dimensions(self) -> int:
+        return self.backend.dimensions
+
+    @property
+    def model_id(self) -> str:
+        """Identity of the vectors this client produces (cache key namespace)"""
+        return f"{self.backend.model_id}:v{self.cache_version}"
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single text (cached, batched with concurrent callers)
+
+        Args:
+            text: Input text
+
+        Returns:
+            float32 embedding vector
+        """
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Embed several texts; cache misses join the same batches as concurrent callers
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            float32 embedding vectors in input order
+        """
+        try:
+            if not self.backend.remote:
+                return await self.backend.embed_batch(texts)
+            return await self._embed_cached(texts)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Primary embedding backend failed, using fallback {self.fallback.model_id}: {e}")
+            get_metrics().incr("embeddings_fallback_requests")
+            return await self.fallback.embed_batch(texts)
+
+    async def _embed_cached(self, texts: List[str]) -> List[np.ndarray]:
+        results = await self.cache.get_many(texts)
+
+        # Embed each distinct (normalized) missing input once
+        missing = {}
+        for text, vector in zip(texts, results):
+            if vector is None:
+                missing.setdefault(self.cache.key(text), text)
+        if missing:
+            unique_texts = list(missing.values())
+            vectors = await asyncio.gather(*(self.batcher.submit(text) for text in unique_texts))
+            await self.cache.put_many(unique_texts, vectors)
+            computed = dict(zip(missing, vectors))
+            results = [
+                computed[self.cache.key(text)] if vector is None else vector
+                for text, vector in zip(texts, results)
+            ]
+
+        return results
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+        if self.fallback is not None:
+            await self.fallback.aclose()
+
+
+# Thread-safe singleton
+import threading
+
+_embeddings_client: Optional[EmbeddingsClient] = None
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings_client() -> EmbeddingsClient:
+    """Get or create embeddings client instance (thread-safe)"""
+    global _embeddings_client
+    if _embeddings_client is None:
+        with _embeddings_lock:
+            if _embeddings_client is None:
+                settings = get_settings()
+                fallback = None
+                if settings.embedding_fallback_backend:
+                    fallback = create_backend(settings.embedding_fallback_backend, settings)
+                _embeddings_client = EmbeddingsClient(
+                    backend=create_backend(settings.embedding_backend, settings),
+                    fallback=fallback,
+                    window_ms=settings.embedding_batch_window_ms,
+                    min_window_ms=settings.embedding_batch_min_window_ms,
+                    max_batch_size=settings.embedding_max_batch_size,
+                    max_batch_tokens=settings.embedding_max_batch_tokens,
+                    max_concurrent_batches=settings.embedding_max_concurrent_batches,
+                    cache_version=settings.embedding_cache_version,
+                    cache_memory_entries=settings.embedding_cache_size,
+                    cache_path=settings.embedding_cache_path
+                )
+    return _embeddings_client
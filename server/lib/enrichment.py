@@ -0,0 +1,325 @@
+"""
+Technology enrichment
+LLM-generated technology profiles served through the response cache, in
+single or batched calls, plus pre-warming of the most popular technologies
+in the catalog, and stack analyses streamed as they are generated
+
+CLI (from server/):
+    python -m lib.enrichment warm --top 200
+"""
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from settings import get_settings
+from lib.ai_client import (
+    ENRICH_STACK_LISTS, ENRICH_TECH_PROMPT_VERSION, PROFILE_TOKENS, get_ai_client, parse_stack
+)
+from lib.autocomplete import popularity
+from lib.catalog_view import catalog_records
+from lib.compatibility import score_stack
+from lib.embeddings_client import estimate_tokens
+from lib.json_stream import ObjectStream
+from lib.llm_cache import get_llm_cache, response_key
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Rounds of re-asking for items whose profile was missing or invalid
+BATCH_RETRIES = 2
+
+
+async def enrich_tech(tech_name: str, context: Optional[str] = None) -> Tuple[dict, str]:
+    """
+    Technology profile, generated at most once per (model, prompt version, inputs) until it expires
+
+    Args:
+        tech_name: Technology name
+        context: Optional project context
+
+    Returns:
+        (profile, cache status): "hit", "miss", "wait", or "off" when the cache is disabled
+
+    Raises:
+        Exception: If generation fails
+    """
+    client = get_ai_client()
+    cache = get_llm_cache()
+    if cache is None:
+        return await client.enrich_tech(tech_name, context), "off"
+    return await cache.get_or_create(_key(client.model, tech_name, context),
+                                     lambda: client.enrich_tech(tech_name, context))
+
+
+def _key(model: str, tech_name: str, context: Optional[str]) -> str:
+    # Single and batched prompts produce the same profile shape and share entries
+    return response_key(model, ENRICH_TECH_PROMPT_VERSION, kind="enrich-tech", tech_name=tech_name,
+                        context=context or None)
+
+
+def pack_batches(items: List[Tuple[str, Optional[str]]], max_tokens: int) -> List[List[int]]:
+    """
+    Group item positions into calls whose budgeted completion fits max_tokens
+
+    Each item is budgeted PROFILE_TOKENS plus its prompt line; every call
+    holds at least one item.
+
+    Returns:
+        Lists of positions into items
+    """
+    batches: List[List[int]] = []
+    used = 0
+    for position, (name, context) in enumerate(items):
+        cost = PROFILE_TOKENS + estimate_tokens(f"{name} {context or ''}")
+        if not batches or used + cost > max_tokens:
+            batches.append([])
+            used = 0
+        batches[-1].append(position)
+        used += cost
+    return batches
+
+
+async def enrich_tech_batch(
+    items: List[Tuple[str, Optional[str]]],
+    max_tokens: Optional[int] = None
+) -> Tuple[List[Tuple[Optional[dict], str]], int]:
+    """
+    Profiles for many technologies, several per completion
+
+    Cached profiles are served directly, and profiles another request is
+    already generating are shared with it. The rest are claimed in the cache,
+    so concurrent requests wait for this one, then packed into calls sized
+    by AI_BATCH_MAX_TOKENS and run concurrently (the AI client enforces the
+    provider limits). Items the model skipped or answered with an invalid
+    profile are re-packed and retried, up to BATCH_RETRIES more rounds;
+    valid profiles from a call are kept even if others in it failed.
+
+    Args:
+        items: (tech_name, context) pairs; duplicates are generated once
+        max_tokens: Completion budget per call (defaults to AI_BATCH_MAX_TOKENS)
+
+    Returns:
+        ([(profile or None, "hit" | "miss" | "wait" | "failed")] in input order, completions made)
+    """
+    client = get_ai_client()
+    cache = get_llm_cache()
+    max_tokens = max_tokens or get_settings().ai_batch_max_tokens
+    keys = [_key(client.model, name, context) for name, context in items]
+    results: Dict[str, Tuple[Optional[dict], str]] = {}
+    if cache is not None:
+        for key in set(keys):
+            profile = await cache.get(key)
+            if profile is not None:
+                results[key] = (profile, "hit")
+        get_metrics().incr("llm_cache_hits", len(results))
+
+    # One representative item (the first) per missing key
+    representatives: Dict[str, Tuple[str, Optional[str]]] = {}
+    for key, item in zip(keys, items):
+        if key not in results:
+            representatives.setdefault(key, item)
+    pending = list(representatives.items())
+    shared: Dict[str, Any] = {}
+    if cache is not None:
+        claimed = await cache.claim([key for key, _ in pending])
+        # Generating elsewhere: wait for that result (a single call if the other worker gives up)
+        shared = {
+            key: asyncio.ensure_future(cache.get_or_create(key, partial(client.enrich_tech, *item)))
+            for key, item in pending if key not in claimed
+        }
+        pending = [(key, item) for key, item in pending if key in claimed]
+    unsettled = {key for key, _ in pending} if cache is not None else set()
+
+    calls = 0
+    try:
+        for _ in range(1 + BATCH_RETRIES):
+            if not pending:
+                break
+            batches = pack_batches([item for _, item in pending], max_tokens)
+            outcomes = await asyncio.gather(
+                *(client.enrich_tech_batch([pending[position][1] for position in batch]) for batch in batches),
+                return_exceptions=True
+            )
+            calls += len(batches)
+            retry = []
+            for batch, outcome in zip(batches, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.warning(f"Batched enrichment of {len(batch)} technologies failed: {outcome}")
+                    outcome = [None] * len(batch)
+                for position, profile in zip(batch, outcome):
+                    key, item = pending[position]
+                    if profile is None:
+                        retry.append((key, item))
+                        continue
+                    results[key] = (profile, "miss")
+                    if cache is not None:
+                        unsettled.discard(key)
+                        await cache.settle(key, profile)
+            get_metrics().incr("ai_batch_retried_items", len(retry))
+            pending = retry
+
+        for key, outcome in zip(shared, await asyncio.gather(*shared.values(), return_exceptions=True)):
+            if isinstance(outcome, BaseException):
+                logger.warning(f"Shared enrichment failed: {outcome}")
+            else:
+                results[key] = outcome
+    finally:
+        for task in shared.values():
+            task.cancel()
+        for key in unsettled:
+            await cache.settle(key, None)
+
+    return [results.get(key, (None, "failed")) for key in keys], calls
+
+
+async def warm_enrichments(top: int) -> dict:
+    """
+    Generate (or refresh expired) context-free profiles for the most popular technologies
+
+    Popularity is log10(stars) + log10(downloads) from catalog metadata.
+    Profiles are generated in batches; failures are counted but do not stop the run.
+
+    Args:
+        top: Number of technologies
+
+    Returns:
+        {"technologies", "hits", "generated", "failed", "calls"}
+    """
+    records = await catalog_records()
+    names = [record["name"] for record in
+             sorted(records, key=lambda record: -popularity(record.get("metadata") or {}))[:top]]
+    profiles, calls = await enrich_tech_batch([(name, None) for name in names])
+    statuses = [status for _, status in profiles]
+    stats = {"technologies": len(names), "hits": statuses.count("hit"), "generated": statuses.count("miss"),
+             "failed": statuses.count("failed"), "calls": calls}
+    logger.info(f"Enrichment cache warmed: {stats}")
+    return stats
+
+
+async def stack_compatibility(technologies: List[str]) -> Optional[float]:
+    """Compatibility score from the pairwise matrix, or None without a matrix or any scored pair"""
+    try:
+        stats = await score_stack(technologies)
+    except Exception as e:
+        logger.warning(f"Compatibility matrix scoring failed: {e}")
+        return None
+    return stats["compatibility_score"] if stats is not None else None
+
+
+async def enrich_stack(technologies: List[str], project_type: Optional[str] = None) -> dict:
+    """
+    Stack analysis; the compatibility score comes from the pairwise matrix when it covers the stack
+
+    Raises:
+        Exception: If generation fails
+    """
+    analysis, score = await asyncio.gather(
+        get_ai_client().enrich_stack(technologies, project_type), stack_compatibility(technologies)
+    )
+    if score is not None:
+        analysis["compatibility_score"] = score
+    return analysis
+
+
+async def stream_enrich_stack(
+    technologies: List[str],
+    project_type: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stack analysis as it is generated
+
+    The compatibility score is computed from the pairwise matrix alongside
+    the generation and sent as soon as it is ready; the model's own score is
+    used only when the matrix has none.
+
+    Yields:
+        ("token", {"text"}) for every model delta;
+        ("score", {"compatibility_score"}) once;
+        ("item", {"field", "index", "value"}) as each strength, weakness or
+        recommendation is complete;
+        then ("done", analysis validated by parse_stack), or ("error", {"detail"})
+        if generation fails or the full output is invalid (earlier items may
+        already have been sent)
+    """
+    parser = ObjectStream()
+    text: List[str] = []
+    counts = {field: 0 for field in ENRICH_STACK_LISTS}
+    matrix_score = asyncio.create_task(stack_compatibility(technologies))
+    model_score: Optional[float] = None
+    sent: Optional[float] = None
+
+    def ready() -> Optional[float]:
+        # The matrix score once computed; the model's only when the matrix has none
+        if sent is not None or not matrix_score.done():
+            return None
+        return matrix_score.result() if matrix_score.result() is not None else model_score
+
+    # A stack the matrix covers in memory is scored here, before the first token
+    await asyncio.sleep(0)
+    try:
+        score = ready()
+        if score is not None:
+            sent = score
+            yield "score", {"compatibility_score": score}
+        events = []
+        async for delta in get_ai_client().stream_enrich_stack(technologies, project_type):
+            text.append(delta)
+            yield "token", {"text": delta}
+            for kind, field, value in parser.feed(delta):
+                if kind == "field" and field == "compatibility_score" and isinstance(value, (int, float)):
+                    model_score = min(max(float(value), 0.0), 1.0)
+                elif kind == "item" and field in counts and isinstance(value, str) and value.strip():
+                    events.append(("item", {"field": field, "index": counts[field], "value": value.strip()}))
+                    counts[field] += 1
+            # The score goes out ahead of this delta's items once it is known
+            score = ready()
+            if score is not None:
+                sent = score
+                yield "score", {"compatibility_score": score}
+            for event in events:
+                yield event
+            events = []
+        analysis = parse_stack(json.loads("".join(text)))
+        if sent is None:
+            score = await matrix_score
+            sent = score if score is not None else analysis["compatibility_score"]
+            yield "score", {"compatibility_score": sent}
+        analysis["compatibility_score"] = sent
+    except Exception as e:
+        logger.error(f"Streamed stack analysis failed: {e}")
+        get_metrics().incr("enrich_stack_stream_errors")
+        yield "error", {"detail": "Failed to analyze stack"}
+        return
+    finally:
+        matrix_score.cancel()
+    yield "done", analysis
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Technology enrichment cache")
+    parser.add_argument("command", choices=["warm"])
+    parser.add_argument("--top", type=int, default=None, help="Technologies to warm (default LLM_CACHE_WARM_TOP)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if get_llm_cache() is None:
+        raise SystemExit("LLM_CACHE_TTL_SECONDS is 0 (cache disabled)")
+    if get_llm_cache().persistent is None:
+        raise SystemExit("LLM_CACHE_PATH is not set; warmed entries would be lost on exit")
+
+    async def run():
+        from lib import db
+        try:
+            return await warm_enrichments(args.top or get_settings().llm_cache_warm_top or 100)
+        finally:
+            await db.close_pool()
+
+    print(json.dumps(asyncio.run(run())))
+
+
+if __name__ == "__main__":
+    main()
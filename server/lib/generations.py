@@ -0,0 +1,121 @@
+"""
+Generation-published artifact files
+Precomputed artifacts (similarity graph, compatibility matrix) are stored as
+arrays and JSON documents of one generation (name.N.npy / name.N.json) and
+published by atomically rewriting meta.json, so readers always load a
+complete generation while a writer builds the next one.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+# How often readers check for a new generation
+RELOAD_SECONDS = 5.0
+
+T = TypeVar("T")
+
+
+def read_meta(directory: str) -> Optional[dict]:
+    """Published meta.json, or None if nothing was saved yet"""
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_generation(directory: str, meta: dict, arrays: Dict[str, np.ndarray], documents: Dict[str, Any]) -> dict:
+    """
+    Write the next generation and publish it
+
+    Args:
+        directory: Artifact directory
+        meta: Current meta; its generation (if any) is the one being replaced
+        arrays: name -> array, stored as name.N.npy
+        documents: name -> JSON-serializable value, stored as name.N.json
+
+    Returns:
+        The published meta, with the new generation
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = meta.get("generation", -1) + 1
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.{generation}.npy"), array)
+    for name, document in documents.items():
+        with open(os.path.join(directory, f"{name}.{generation}.json"), "w") as f:
+            json.dump(document, f)
+    meta = dict(meta, generation=generation)
+    temp_path = os.path.join(directory, "meta.json.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, os.path.join(directory, "meta.json"))
+    # A reader that read the previous meta.json may not have opened its files
+    # yet, so that generation stays until the next save
+    for name in os.listdir(directory):
+        parts = name.split(".")
+        if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) < generation - 1:
+            os.remove(os.path.join(directory, name))
+    return meta
+
+
+def load_generation(
+    directory: str,
+    arrays: List[str],
+    documents: List[str]
+) -> Optional[Tuple[dict, Dict[str, np.ndarray], Dict[str, Any]]]:
+    """
+    Files of the latest published generation
+
+    Returns:
+        (meta, name -> array, name -> document), or None if nothing was saved yet
+    """
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+    generation = meta["generation"]
+    loaded = {name: np.load(os.path.join(directory, f"{name}.{generation}.npy")) for name in arrays}
+    parsed = {}
+    for name in documents:
+        with open(os.path.join(directory, f"{name}.{generation}.json")) as f:
+            parsed[name] = json.load(f)
+    return meta, loaded, parsed
+
+
+class GenerationReader(Generic[T]):
+    """
+    Shared reader of an artifact directory, reloaded when a new generation is published
+
+    At most every RELOAD_SECONDS the published generation is compared with
+    the loaded one; reading meta.json and loading a new generation run in a
+    worker thread, off the event loop.
+    """
+
+    def __init__(self, load: Callable[[str], Optional[T]]):
+        self._load = load
+        self._value: Optional[T] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    async def get(self, directory: str) -> Optional[T]:
+        """Loaded artifact, or None if nothing was saved yet"""
+        if self._value is not None and time.monotonic() - self._checked < RELOAD_SECONDS:
+            return self._value
+        return await asyncio.to_thread(self._refresh, directory)
+
+    def _refresh(self, directory: str) -> Optional[T]:
+        with self._lock:
+            now = time.monotonic()
+            if self._value is not None and now - self._checked < RELOAD_SECONDS:
+                return self._value
+            self._checked = now
+            meta = read_meta(directory)
+            if meta is None:
+                self._value = None
+            elif self._value is None or self._value.meta["generation"] != meta["generation"]:
+                self._value = self._load(directory)
+            return self._value
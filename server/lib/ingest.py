@@ -0,0 +1,357 @@
+"""
+Bulk catalog ingestion
+Streams NDJSON technology records, embeds them in batches with bounded
+concurrency and backpressure, and bulk-upserts the vectors. Progress is
+checkpointed by line number so an interrupted run resumes where it stopped.
+
+CLI (from server/):
+    python -m lib.ingest catalog.ndjson --checkpoint catalog.ckpt
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lib.embeddings_client import tech_text
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Stop collecting individual error details after this many
+MAX_REPORTED_ERRORS = 100
+
+# Optional record fields copied into the catalog
+_METADATA_FIELDS = ("aliases", "language", "license", "platform", "stars", "downloads", "dependencies")
+
+
+def tech_id_for(name: str) -> str:
+    """Stable catalog id derived from a technology name"""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class IngestRecord:
+    """One validated catalog record"""
+
+    __slots__ = ("line", "tech_id", "tech_name", "description", "category", "metadata")
+
+    def __init__(self, line: int, data: dict):
+        tech_name = data.get("tech_name")
+        description = data.get("description")
+        if not isinstance(tech_name, str) or not tech_name.strip():
+            raise ValueError("tech_name is required")
+        if not isinstance(description, str):
+            raise ValueError("description is required")
+
+        self.line = line
+        self.tech_name = tech_name.strip()
+        self.tech_id = data.get("tech_id") or tech_id_for(self.tech_name)
+        self.description = description
+        self.category = data.get("category")
+        self.metadata = {key: data[key] for key in _METADATA_FIELDS if key in data}
+
+
+class IngestError(Exception):
+    """Ingestion aborted; stats.checkpoint is the line to resume after"""
+
+    def __init__(self, message: str, stats: "IngestStats"):
+        super().__init__(message)
+        self.stats = stats
+
+
+class IngestStats:
+    """Counters reported while and after ingesting"""
+
+    def __init__(self, resumed_from: int = 0):
+        self.resumed_from = resumed_from
+        self.lines_read = 0
+        self.skipped = 0
+        self.ingested = 0
+        self.failed = 0
+        self.batches = 0
+        self.checkpoint = resumed_from
+        self.errors: List[dict] = []
+        self.started = time.monotonic()
+
+    def add_error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "resumed_from": self.resumed_from,
+            "lines_read": self.lines_read,
+            "skipped": self.skipped,
+            "ingested": self.ingested,
+            "failed": self.failed,
+            "batches": self.batches,
+            "checkpoint": self.checkpoint,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.ingested / elapsed, 1) if elapsed > 0 else None,
+            "errors": self.errors
+        }
+
+
+class Checkpoint:
+    """Last fully ingested line number, persisted atomically"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+
+    def load(self) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path) as f:
+                return int(json.load(f)["line"])
+        except (OSError, ValueError, KeyError):
+            logger.warning(f"Ignoring unreadable checkpoint {self.path}")
+            return 0
+
+    def save(self, line: int) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"line": line, "updated_at": time.time()}, f)
+        os.replace(temp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _Watermark:
+    """Highest line below which every batch has completed (batches finish out of order)"""
+
+    def __init__(self, start: int):
+        self.value = start
+        self._done: Dict[int, int] = {}  # first line of a completed batch -> last line
+
+    def complete(self, first: int, last: int) -> int:
+        self._done[first] = last
+        while self.value + 1 in self._done:
+            self.value = self._done.pop(self.value + 1)
+        return self.value
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into numbered NDJSON lines (1-based)
+
+    Blank lines are numbered but not yielded.
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+async def ingest_stream(
+    lines: AsyncIterator[Tuple[int, bytes]],
+    embed_many: Callable[[List[str]], Awaitable[List[np.ndarray]]],
+    sink: Callable[[List[IngestRecord], List[np.ndarray]], Awaitable[None]],
+    batch_size: int = 256,
+    concurrency: int = 4,
+    checkpoint: Optional[Checkpoint] = None,
+    progress: Optional[Callable[[IngestStats], None]] = None
+) -> IngestStats:
+    """
+    Embed and store a stream of NDJSON records
+
+    Records are grouped into batches; at most `concurrency` batches are being
+    embedded/written at a time and at most `concurrency` more wait in the
+    queue, after which reading the input pauses (backpressure). Lines at or
+    before the checkpoint are skipped. The checkpoint only advances past a
+    line once every batch up to it has been stored, and is cleared once the
+    whole stream has been ingested.
+
+    Args:
+        lines: Numbered raw NDJSON lines
+        embed_many: Embeds a list of texts
+        sink: Stores a batch of records with their vectors
+        batch_size: Records per batch
+        concurrency: Batches in flight
+        checkpoint: Where to resume from and record progress
+        progress: Called after every completed batch
+
+    Returns:
+        IngestStats
+
+    Raises:
+        IngestError: If embedding or storing a batch fails (invalid records
+            are counted and skipped instead)
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    resume_line = checkpoint.load()
+    stats = IngestStats(resumed_from=resume_line)
+    watermark = _Watermark(resume_line)
+    metrics = get_metrics()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            first, last, records = item
+            try:
+                if records:
+                    vectors = await embed_many([tech_text(r.tech_name, r.description) for r in records])
+                    await sink(records, vectors)
+                    stats.ingested += len(records)
+                    metrics.incr("ingest_records", len(records))
+            except Exception as e:
+                logger.error(f"Ingest batch for lines {first}-{last} failed: {e}")
+                for record in records:
+                    stats.add_error(record.line, str(e))
+                raise
+            stats.batches += 1
+            stats.checkpoint = watermark.complete(first, last)
+            checkpoint.save(stats.checkpoint)
+            if progress:
+                progress(stats)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+
+    async def submit(item: Optional[Tuple[int, int, List[IngestRecord]]]) -> None:
+        # Blocks while the queue is full, but raises as soon as a worker fails: a dead
+        # worker stops draining the queue, so a plain put could wait forever
+        put = asyncio.create_task(queue.put(item))
+        try:
+            while not put.done():
+                running = [task for task in workers if not task.done()]
+                await asyncio.wait([put, *running], return_when=asyncio.FIRST_COMPLETED)
+                for task in workers:
+                    if task.done() and task.exception() is not None:
+                        raise task.exception()
+        finally:
+            if not put.done():
+                put.cancel()
+
+    try:
+        batch: List[IngestRecord] = []
+        first_line = resume_line + 1
+        last_line = resume_line
+
+        async for line_no, raw in lines:
+            stats.lines_read += 1
+            if line_no <= resume_line:
+                stats.skipped += 1
+                continue
+            last_line = line_no
+            try:
+                batch.append(IngestRecord(line_no, json.loads(raw)))
+            except (ValueError, TypeError, AttributeError) as e:
+                stats.add_error(line_no, f"Invalid record: {e}")
+
+            if len(batch) >= batch_size:
+                await submit((first_line, last_line, batch))
+                batch = []
+                first_line = last_line + 1
+
+        if last_line >= first_line:
+            await submit((first_line, last_line, batch))
+
+        for _ in workers:
+            await submit(None)
+        await asyncio.gather(*workers)
+    except Exception as e:
+        raise IngestError(f"Ingestion stopped after line {stats.checkpoint}: {e}", stats)
+    finally:
+        for task in workers:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Mark as retrieved; the first failure is already being raised
+
+    checkpoint.clear()
+    return stats
+
+
+async def db_sink(records: List[IngestRecord], vectors: List[np.ndarray], model_id: str) -> None:
+    """Bulk upsert a batch into the technologies table"""
+    from lib import db
+    await db.upsert_technologies([
+        (r.tech_id, r.tech_name, r.description, r.category, r.metadata, vector, model_id)
+        for r, vector in zip(records, vectors)
+    ])
+
+
+async def _file_chunks(path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def main() -> None:
+    import argparse
+    from functools import partial
+
+    from lib.embeddings_client import get_embeddings_client
+
+    parser = argparse.ArgumentParser(description="Ingest an NDJSON technology catalog ({tech_name, description} per line)")
+    parser.add_argument("path", help="NDJSON file")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.ckpt)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Embed only, do not write to the database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.path}.ckpt")
+    if args.restart:
+        checkpoint.clear()
+
+    def report(stats: IngestStats) -> None:
+        summary = stats.as_dict()
+        print(f"line {summary['checkpoint']}: {summary['ingested']} ingested, {summary['failed']} failed, "
+              f"{summary['records_per_second']} rec/s", flush=True)
+
+    async def run() -> IngestStats:
+        client = get_embeddings_client()
+
+        async def discard(records, vectors):
+            pass
+
+        sink = discard if args.dry_run else partial(db_sink, model_id=client.model_id)
+        try:
+            return await ingest_stream(
+                iter_ndjson(_file_chunks(args.path)),
+                client.embed_many,
+                sink,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                checkpoint=checkpoint,
+                progress=report
+            )
+        finally:
+            await client.aclose()
+
+    stats = asyncio.run(run())
+    print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
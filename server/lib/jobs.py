@@ -0,0 +1,529 @@
+"""
+Background jobs
+Long-running work (bulk enrichment, ingestion, GitHub fan-out) is submitted
+over HTTP and runs on a bounded pool of workers. Jobs wait in per-priority
+FIFO queues; their records (status, progress, result) live in a pluggable
+store: process memory, or Redis so that every worker process shares one
+queue and any of them can answer a poll.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+from lib.metrics import get_metrics
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ("high", "normal", "low")  # Dequeued strictly in this order
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+WEBHOOK_ATTEMPTS = 3
+
+Progress = Callable[[int, int, Optional[str]], Awaitable[None]]
+Handler = Callable[[dict, Progress], Awaitable[Any]]
+
+# Job kind -> handler(payload, progress) returning a JSON-serializable result
+HANDLERS: Dict[str, Handler] = {}
+
+
+class QueueFull(Exception):
+    """Raised by JobRunner.submit when max_queued jobs are already waiting"""
+
+
+def register_handler(kind: str, handler: Handler) -> None:
+    """Make a job kind available to the runner"""
+    HANDLERS[kind] = handler
+
+
+class MemoryJobStore:
+    """
+    Jobs and queues in this process
+
+    Records are lost on restart and not visible to other worker processes;
+    use RedisJobStore when running more than one.
+    """
+
+    # Jobs die with the process that runs them, so nothing is leased
+    lease_seconds: Optional[float] = None
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, str] = {}  # id -> JSON record, copied like a remote store would
+        self._expires: Dict[str, float] = {}  # Finished jobs only
+        self._queues: Dict[str, Deque[str]] = {priority: deque() for priority in PRIORITIES}
+        self._available: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._swept = time.monotonic()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One count per queued id; rebuilt if the store outlives its event loop (e.g. between test clients)
+        loop = asyncio.get_running_loop()
+        if self._available is None or self._loop is not loop:
+            self._available = asyncio.Semaphore(sum(len(queue) for queue in self._queues.values()))
+            self._loop = loop
+        return self._available
+
+    async def put(self, job: dict) -> None:
+        self._jobs[job["id"]] = json.dumps(job)
+        if job["status"] in FINISHED:
+            self._expires[job["id"]] = time.monotonic() + self.ttl_seconds
+        now = time.monotonic()
+        if now - self._swept > 60:
+            self._swept = now
+            for job_id in [job_id for job_id, expires in self._expires.items() if expires <= now]:
+                del self._jobs[job_id], self._expires[job_id]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        expires = self._expires.get(job_id)
+        if expires is not None and expires <= time.monotonic():
+            return None
+        record = self._jobs.get(job_id)
+        return json.loads(record) if record is not None else None
+
+    async def replace(self, job: dict, expected: str) -> bool:
+        # Nothing is awaited between the check and the write
+        current = await self.get(job["id"])
+        if current is None or current["status"] != expected:
+            return False
+        await self.put(job)
+        return True
+
+    async def push(self, job_id: str, priority: str, front: bool = False) -> None:
+        available = self._semaphore()
+        if front:
+            self._queues[priority].appendleft(job_id)
+        else:
+            self._queues[priority].append(job_id)
+        available.release()
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            await asyncio.wait_for(self._semaphore().acquire(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        for priority in PRIORITIES:
+            if self._queues[priority]:
+                return self._queues[priority].popleft()
+        return None
+
+    async def requeue(self, job: dict) -> None:
+        await self.put(job)
+        await self.push(job["id"], job["priority"], front=True)
+
+    async def renew(self, job_id: str) -> None:
+        pass
+
+    async def ack(self, job_id: str) -> None:
+        pass
+
+    async def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisJobStore:
+    """
+    Jobs in Redis: a JSON string per job, a list per priority and a sorted
+    set of leases
+
+    Requires the redis package (redis.asyncio). Popping a job leases it to
+    the worker, which renews the lease while the job runs and releases it
+    once the job is finished; a job whose worker died is handed out again
+    when its lease expires. Status changes that race another worker are
+    compare-and-set (WATCH/MULTI). Unfinished jobs never expire; finished
+    ones are kept for ttl_seconds.
+    """
+
+    def __init__(self, url: Optional[str] = None, ttl_seconds: int = 86400, prefix: str = "jobs",
+                 client: Any = None, lease_seconds: float = 60.0, poll_seconds: float = 0.5):
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(url or "redis://localhost:6379/0")
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._redis = client
+        self._queue_keys = [f"{prefix}:queue:{priority}" for priority in PRIORITIES]
+        self._leases_key = f"{prefix}:leases"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def _ttl(self, job: dict) -> Optional[int]:
+        return self.ttl_seconds if job["status"] in FINISHED else None
+
+    async def put(self, job: dict) -> None:
+        await self._redis.set(self._job_key(job["id"]), json.dumps(job), ex=self._ttl(job))
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        record = await self._redis.get(self._job_key(job_id))
+        return json.loads(record) if record is not None else None
+
+    async def replace(self, job: dict, expected: str) -> bool:
+        key = self._job_key(job["id"])
+
+        async def swap(pipe) -> bool:
+            record = await pipe.get(key)
+            if record is None or json.loads(record)["status"] != expected:
+                return False
+            pipe.multi()
+            pipe.set(key, json.dumps(job), ex=self._ttl(job))
+            return True
+
+        return await self._redis.transaction(swap, key, value_from_callable=True)
+
+    async def push(self, job_id: str, priority: str, front: bool = False) -> None:
+        key = f"{self.prefix}:queue:{priority}"
+        if front:
+            await self._redis.lpush(key, job_id)
+        else:
+            await self._redis.rpush(key, job_id)
+
+    async def _take(self, pipe) -> Optional[Any]:
+        # Expired leases first, then the queues in PRIORITIES order
+        now = time.time()
+        expired = await pipe.zrangebyscore(self._leases_key, "-inf", now, start=0, num=1)
+        source = None
+        if expired:
+            job_id = expired[0]
+        else:
+            for key in self._queue_keys:
+                job_id = await pipe.lindex(key, 0)
+                if job_id is not None:
+                    source = key
+                    break
+            else:
+                return None
+        pipe.multi()
+        if source is not None:
+            pipe.lpop(source)
+        pipe.zadd(self._leases_key, {job_id: now + self.lease_seconds})
+        return job_id
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        # The id leaves its queue in the same transaction that leases it, so a
+        # worker that dies (or is cancelled) after this only delays the job
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = await self._redis.transaction(
+                self._take, self._leases_key, *self._queue_keys, value_from_callable=True
+            )
+            if job_id is not None:
+                return job_id.decode() if isinstance(job_id, bytes) else job_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(self.poll_seconds, remaining))
+
+    async def requeue(self, job: dict) -> None:
+        async def back(pipe) -> None:
+            pipe.multi()
+            pipe.set(self._job_key(job["id"]), json.dumps(job), ex=self._ttl(job))
+            pipe.lpush(f"{self.prefix}:queue:{job['priority']}", job["id"])
+            pipe.zrem(self._leases_key, job["id"])
+
+        await self._redis.transaction(back)
+
+    async def renew(self, job_id: str) -> None:
+        await self._redis.zadd(self._leases_key, {job_id: time.time() + self.lease_seconds}, xx=True)
+
+    async def ack(self, job_id: str) -> None:
+        await self._redis.zrem(self._leases_key, job_id)
+
+    async def queued(self) -> int:
+        return sum([await self._redis.llen(key) for key in self._queue_keys])
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_store(name: str, settings) -> Any:
+    """
+    Build a job store from settings
+
+    Args:
+        name: "memory" or "redis"
+        settings: Application settings
+
+    Returns:
+        MemoryJobStore or RedisJobStore
+
+    Raises:
+        ValueError: On an unknown backend name
+    """
+    if name == "memory":
+        return MemoryJobStore(ttl_seconds=settings.job_ttl_seconds)
+    if name == "redis":
+        return RedisJobStore(url=settings.redis_url, ttl_seconds=settings.job_ttl_seconds,
+                             lease_seconds=settings.job_lease_seconds)
+    raise ValueError(f"Unknown job backend '{name}' (use 'memory' or 'redis')")
+
+
+def sign(secret: str, body: bytes) -> str:
+    """X-Job-Signature value for a webhook body"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class JobRunner:
+    """
+    Bounded worker pool over a job store
+
+    At most `workers` jobs run at once per process; the rest wait in their
+    priority queue. Handlers report progress through the callback they are
+    given. A finished job with a webhook_url is POSTed there (the public
+    record, signed with X-Job-Signature when a secret is set) with retries.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        handlers: Optional[Dict[str, Handler]] = None,
+        workers: int = 4,
+        max_queued: int = 10000,
+        timeout_seconds: Optional[float] = None,
+        webhook_secret: Optional[str] = None,
+        webhook_timeout: float = 10.0,
+        webhook_backoff: float = 1.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.store = store
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout_seconds = timeout_seconds
+        self.webhook_secret = webhook_secret
+        self.webhook_timeout = webhook_timeout
+        self.webhook_backoff = webhook_backoff
+        self._transport = transport
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, kind: str, payload: dict, priority: str = "normal",
+                     webhook_url: Optional[str] = None) -> dict:
+        """
+        Queue a job
+
+        Returns:
+            The job record (status "queued")
+
+        Raises:
+            ValueError: On an unknown kind or priority
+            QueueFull: If max_queued jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (use {', '.join(PRIORITIES)})")
+        if await self.store.queued() >= self.max_queued:
+            get_metrics().incr("jobs_rejected")
+            raise QueueFull(f"{self.max_queued} jobs already queued")
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "priority": priority,
+            "status": QUEUED,
+            "payload": payload,
+            "progress": {"done": 0, "total": 0, "message": None},
+            "result": None,
+            "error": None,
+            "webhook_url": webhook_url,
+            "webhook": None,  # "delivered" or "failed" once attempted
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+        await self.store.put(job)
+        await self.store.push(job["id"], priority)
+        get_metrics().incr("jobs_submitted")
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a job that has not started
+
+        Returns:
+            The job record, unchanged unless it was still queued; None if unknown
+        """
+        job = await self.store.get(job_id)
+        while job is not None and job["status"] == QUEUED:
+            cancelled = dict(job, status=CANCELLED, finished_at=time.time())
+            # A worker may be starting the job at the same moment
+            if await self.store.replace(cancelled, QUEUED):
+                get_metrics().incr("jobs_cancelled")
+                return cancelled
+            job = await self.store.get(job_id)
+        return job
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running go back to the front of their queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job_id = await self.store.pop(timeout=5)
+                if job_id is None:
+                    continue
+                job = await self.store.get(job_id)
+                if job is None or job["status"] in FINISHED:
+                    # Cancelled or expired while queued, or finished by a worker that died before releasing it
+                    await self.store.ack(job_id)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job queue unavailable: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job["status"] == RUNNING:
+                logger.warning(f"Job {job_id} ({job['kind']}) lost its worker; running it again")
+            await self.run(job)
+
+    async def run(self, job: dict) -> dict:
+        """
+        Run one job to completion, recording status, progress and result
+
+        Returns:
+            The finished job record
+        """
+        metrics = get_metrics()
+        read_status = job["status"]
+        job["status"] = RUNNING
+        job["started_at"] = time.time()
+        if not await self.store.replace(job, read_status):
+            # Cancelled since it was read
+            await self.store.ack(job["id"])
+            return await self.store.get(job["id"])
+        metrics.observe("job_wait_ms", (job["started_at"] - job["created_at"]) * 1000)
+
+        async def progress(done: int, total: int, message: Optional[str] = None) -> None:
+            job["progress"] = {"done": done, "total": total, "message": message}
+            await self.store.put(job)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"])) if self.store.lease_seconds else None
+        try:
+            work = self.handlers[job["kind"]](job["payload"], progress)
+            result = await asyncio.wait_for(work, self.timeout_seconds)
+            job["result"] = json.loads(json.dumps(result))
+            job["status"] = SUCCEEDED
+        except asyncio.CancelledError:
+            # Worker shutdown: leave the job for the next worker
+            job["status"] = QUEUED
+            job["started_at"] = None
+            await self.store.requeue(job)
+            raise
+        except asyncio.TimeoutError:
+            job["status"] = FAILED
+            job["error"] = f"Timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+            job["status"] = FAILED
+            job["error"] = str(e) or type(e).__name__
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+        job["finished_at"] = time.time()
+        metrics.incr(f"jobs_{job['status']}")
+        metrics.observe("job_run_ms", (job["finished_at"] - job["started_at"]) * 1000)
+        await self.store.put(job)
+        await self.store.ack(job["id"])
+
+        if job["webhook_url"]:
+            job["webhook"] = "delivered" if await self._notify(job) else "failed"
+            await self.store.put(job)
+        return job
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew the job's lease while it runs"""
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                await self.store.renew(job_id)
+            except Exception as e:
+                logger.warning(f"Failed to renew lease of job {job_id}: {e}")
+
+    async def _notify(self, job: dict) -> bool:
+        body = json.dumps(public_view(job)).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            headers["X-Job-Signature"] = sign(self.webhook_secret, body)
+        async with httpx.AsyncClient(timeout=self.webhook_timeout, transport=self._transport) as client:
+            for attempt in range(WEBHOOK_ATTEMPTS):
+                try:
+                    response = await client.post(job["webhook_url"], content=body, headers=headers)
+                    # Client errors will not change on retry
+                    if response.status_code < 500:
+                        if response.is_success:
+                            get_metrics().incr("job_webhooks_delivered")
+                            return True
+                        break
+                except httpx.HTTPError as e:
+                    logger.warning(f"Webhook for job {job['id']} failed (attempt {attempt + 1}): {e}")
+                if attempt + 1 < WEBHOOK_ATTEMPTS:
+                    await asyncio.sleep(self.webhook_backoff * 2 ** attempt)
+        logger.error(f"Failed to deliver webhook for job {job['id']} to {job['webhook_url']}")
+        get_metrics().incr("job_webhooks_failed")
+        return False
+
+
+def public_view(job: dict) -> dict:
+    """The job record without its payload and webhook address"""
+    return {key: value for key, value in job.items() if key not in ("payload", "webhook_url")}
+
+
+async def batched(
+    items: List[Any],
+    size: int,
+    run: Callable[[List[Any]], Awaitable[List[Any]]],
+    progress: Progress
+) -> List[Any]:
+    """Run a large list through `run` in slices of `size`, reporting progress after each"""
+    results: List[Any] = []
+    for start in range(0, len(items), size):
+        results.extend(await run(items[start:start + size]))
+        await progress(len(results), len(items), None)
+    return results
+
+
+# Thread-safe singleton
+_job_runner: Optional[JobRunner] = None
+_job_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Get or create the job runner for this process (thread-safe)"""
+    global _job_runner
+    if _job_runner is None:
+        with _job_lock:
+            if _job_runner is None:
+                settings = get_settings()
+                _job_runner = JobRunner(
+                    create_store(settings.job_backend, settings),
+                    workers=settings.job_workers,
+                    max_queued=settings.job_max_queued,
+                    timeout_seconds=settings.job_timeout_seconds or None,
+                    webhook_secret=settings.internal_api_key.get_secret_value(),
+                    webhook_timeout=settings.job_webhook_timeout_seconds
+                )
+    return _job_runner
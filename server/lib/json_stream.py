@@ -0,0 +1,117 @@
+"""
+Incremental JSON object parsing
+Reads a JSON object as it is streamed (e.g. a chat completion) and reports
+each top-level field, and each item of a top-level array, as soon as its
+text is complete, without waiting for the closing brace.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class ObjectStream:
+    """
+    Push parser for one streamed JSON object
+
+    Text before the opening brace is skipped. Scalars and nested objects are
+    reported once complete; arrays report every item and then the whole
+    list. Malformed text raises ValueError from feed.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key: Optional[str] = None  # Top-level key whose value is being read
+        self._buffer: List[str] = []  # Text of the current key, value or array item
+        self._items: Optional[list] = None  # Items so far when the value is an array
+
+    def feed(self, text: str) -> List[Tuple[str, str, Any]]:
+        """
+        Consume the next chunk
+
+        Args:
+            text: Next piece of the JSON text (any split, even inside a string)
+
+        Returns:
+            Events completed by this chunk, in order: ("item", key, value) for
+            each array item and ("field", key, value) for each top-level field
+
+        Raises:
+            ValueError: On text that cannot be part of a JSON object
+        """
+        events: List[Tuple[str, str, Any]] = []
+        for char in text:
+            if self.done:
+                break
+            if self._in_string:
+                self._buffer.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                continue
+            if char == '"':
+                self._in_string = True
+                self._buffer.append(char)
+            elif self._depth == 1:
+                self._top_level(char, events)
+            elif self._depth == 2 and self._items is not None and char in ",]":
+                self._end_item(events)
+                if char == "]":
+                    self._depth = 1
+                    events.append(("field", self._key, self._items))
+            else:
+                if char in "[{":
+                    self._depth += 1
+                elif char in "]}":
+                    self._depth -= 1
+                self._buffer.append(char)
+        return events
+
+    def _top_level(self, char: str, events: List[Tuple[str, str, Any]]) -> None:
+        text = "".join(self._buffer).strip()
+        if char == ":" and self._key is None:
+            self._key = _loads(text)
+            if not isinstance(self._key, str):
+                raise ValueError(f"object key is not a string: {text}")
+            self._buffer = []
+        elif char in ",}":
+            if self._key is not None and self._items is None:
+                events.append(("field", self._key, _loads(text)))
+            elif text:
+                raise ValueError(f"unexpected text in object: {text}")
+            self._key, self._items, self._buffer = None, None, []
+            if char == "}":
+                self.done = True
+        elif char == "[" and self._key is not None and not text:
+            self._items = []
+            self._depth = 2
+        else:
+            if char == "{":
+                self._depth += 1
+            elif char in "]}":
+                raise ValueError(f"unexpected {char!r} in object")
+            self._buffer.append(char)
+
+    def _end_item(self, events: List[Tuple[str, str, Any]]) -> None:
+        text = "".join(self._buffer).strip()
+        self._buffer = []
+        # An empty array ends on "]" without an item
+        if text:
+            value = _loads(text)
+            self._items.append(value)
+            events.append(("item", self._key, value))
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON value {text[:50]!r}: {e.msg}")
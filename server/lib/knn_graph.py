@@ -0,0 +1,292 @@
+"""
+Precomputed similar-technology graph
+Top-k cosine neighbours of every catalog technology, computed in batch
+from the local vector index with blocked matrix products and stored as
+int32 neighbour / float16 score arrays, so "alternatives to X" is a lookup.
+Updates recompute only technologies that were added or re-embedded, plus
+those that lost a neighbour.
+
+CLI (from server/):
+    python -m lib.knn_graph build
+    python -m lib.knn_graph update
+"""
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib.generations import GenerationReader, load_generation, save_generation
+from lib.quantization import QuantizedVectors
+from lib.vector_index import VectorIndex, get_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Query rows per blocked product (each block scores against the whole catalog)
+_QUERY_BLOCK = 256
+
+# Rows of unchanged technologies merged against the changed ones per step
+_MERGE_BLOCK = 8192
+
+# Above this share of changed technologies an update rebuilds from scratch
+_REBUILD_RATIO = 0.1
+
+# Re-embedded vectors are detected by their projection on a fixed random vector
+_FINGERPRINT_TOLERANCE = 1e-4
+
+
+def _fingerprints(matrix: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    probe = np.random.default_rng(0).standard_normal(matrix.shape[1]).astype(np.float32)
+    out = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), 65536):
+        out[start:start + 65536] = matrix[rows[start:start + 65536]] @ probe
+    return out
+
+
+def _neighbours(
+    matrix: np.ndarray,
+    live: np.ndarray,
+    position_of_row: np.ndarray,
+    query_rows: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k graph positions and scores for the given vector-index rows (self excluded)"""
+    scan = QuantizedVectors(matrix, None, None, matrix.shape[1], "none")
+    neighbours = np.full((len(query_rows), k), -1, dtype=np.int32)
+    scores = np.full((len(query_rows), k), -np.inf, dtype=np.float32)
+    for start in range(0, len(query_rows), _QUERY_BLOCK):
+        rows = query_rows[start:start + _QUERY_BLOCK]
+        found, found_scores = scan.search(matrix[rows], k + 1, rerank=0, mask=live)
+        for i, row in enumerate(rows):
+            keep = (found[i] != row) & np.isfinite(found_scores[i])
+            hits, hit_scores = found[i][keep][:k], found_scores[i][keep][:k]
+            neighbours[start + i, :len(hits)] = position_of_row[hits]
+            scores[start + i, :len(hits)] = hit_scores
+    return neighbours, scores
+
+
+class KnnGraph:
+    """
+    Neighbour lists keyed by technology id
+
+    Row p of `neighbors` / `scores` belongs to ids[p]; entries are graph
+    positions best first, padded with -1 when the catalog is smaller than k.
+    """
+
+    def __init__(self, ids: List[str], neighbors: np.ndarray, scores: np.ndarray,
+                 fingerprints: np.ndarray, meta: dict):
+        self.ids = ids
+        self.neighbors = neighbors
+        self.scores = scores
+        self.fingerprints = fingerprints
+        self.meta = meta
+        self._positions: Dict[str, int] = {tech_id: position for position, tech_id in enumerate(ids)}
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def similar(self, tech_id: str, limit: Optional[int] = None) -> Optional[List[Tuple[str, float]]]:
+        """
+        Nearest technologies to one in the catalog
+
+        Args:
+            tech_id: Technology id
+            limit: At most this many (up to k)
+
+        Returns:
+            [(tech_id, cosine similarity)] best first, or None for an unknown id
+        """
+        position = self._positions.get(tech_id)
+        if position is None:
+            return None
+        row = self.neighbors[position, :limit]
+        return [(self.ids[neighbor], float(score))
+                for neighbor, score in zip(row, self.scores[position, :limit]) if neighbor >= 0]
+
+    # Storage: arrays of one generation, published by rewriting meta.json
+
+    def save(self, directory: str) -> None:
+        self.meta = save_generation(
+            directory,
+            self.meta,
+            {"neighbors": self.neighbors, "scores": self.scores, "fingerprints": self.fingerprints},
+            {"ids": self.ids}
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["KnnGraph"]:
+        """Latest saved generation, or None if nothing was built yet"""
+        saved = load_generation(directory, ["neighbors", "scores", "fingerprints"], ["ids"])
+        if saved is None:
+            return None
+        meta, arrays, documents = saved
+        return cls(documents["ids"], arrays["neighbors"], arrays["scores"], arrays["fingerprints"], meta)
+
+
+def build_graph(index: VectorIndex, k: int = 20, previous: Optional[KnnGraph] = None) -> Tuple[KnnGraph, dict]:
+    """
+    Compute the neighbour graph of the live catalog
+
+    With a previous graph of the same k, only technologies that are new,
+    re-embedded or lost a neighbour get a full search; the rest merge the
+    changed technologies into their existing lists. Large changes rebuild.
+
+    Args:
+        index: Local vector index holding the catalog
+        k: Neighbours per technology
+        previous: Graph to update incrementally
+
+    Returns:
+        (graph, {"technologies", "recomputed", "merged", "full"})
+    """
+    started = time.perf_counter()
+    index.refresh()
+    matrix = index.matrix()
+    live = index.live_mask()
+    rows = np.flatnonzero(live)
+    ids = [index.record(row)["id"] for row in rows]
+    position_of_row = np.full(len(matrix), -1, dtype=np.int32)
+    position_of_row[rows] = np.arange(len(rows), dtype=np.int32)
+    fingerprints = _fingerprints(matrix, rows)
+    count = len(rows)
+
+    neighbors = np.full((count, k), -1, dtype=np.int32)
+    scores = np.full((count, k), -np.inf, dtype=np.float32)
+    recompute = np.arange(count)
+    merged = 0
+
+    if previous is not None and previous.k == k and count:
+        old_position = np.array([previous._positions.get(tech_id, -1) for tech_id in ids], dtype=np.int64)
+        unchanged = old_position >= 0
+        unchanged[unchanged] = np.abs(previous.fingerprints[old_position[unchanged]]
+                                      - fingerprints[unchanged]) <= _FINGERPRINT_TOLERANCE
+        # Old positions that still hold the same vector, mapped to their new positions
+        new_of_old = np.full(len(previous), -1, dtype=np.int32)
+        new_of_old[old_position[unchanged]] = np.flatnonzero(unchanged)
+        changed = np.flatnonzero(~unchanged)
+
+        if len(changed) + (len(previous) - int(unchanged.sum())) <= _REBUILD_RATIO * count:
+            kept = np.flatnonzero(unchanged)
+            old_lists = previous.neighbors[old_position[kept]]
+            remapped = np.where(old_lists >= 0, new_of_old[np.maximum(old_lists, 0)], -1)
+            # A list that lost a neighbour (deleted or re-embedded) is recomputed in full;
+            # so is one that was short because the catalog was smaller than k
+            intact = (remapped >= 0).all(axis=1)
+            neighbors[kept[intact]] = remapped[intact]
+            scores[kept[intact]] = previous.scores[old_position[kept[intact]]]
+            recompute = np.concatenate([changed, kept[~intact]])
+
+            # Changed technologies may now be closer than the kth neighbour of an intact row
+            targets = kept[intact]
+            if len(changed) and len(targets):
+                changed_vectors = matrix[rows[changed]]
+                for start in range(0, len(targets), _MERGE_BLOCK):
+                    block = targets[start:start + _MERGE_BLOCK]
+                    merge_scores = np.concatenate([scores[block], matrix[rows[block]] @ changed_vectors.T], axis=1)
+                    merge_ids = np.concatenate([neighbors[block], np.broadcast_to(changed, (len(block), len(changed)))],
+                                               axis=1)
+                    top = np.argsort(-merge_scores, axis=1, kind="stable")[:, :k]
+                    neighbors[block] = np.take_along_axis(merge_ids, top, axis=1)
+                    scores[block] = np.take_along_axis(merge_scores, top, axis=1)
+                merged = len(targets)
+
+    if len(recompute):
+        neighbors[recompute], scores[recompute] = _neighbours(matrix, live, position_of_row, rows[recompute], k)
+
+    graph = KnnGraph(ids, neighbors, scores.astype(np.float16), fingerprints, {
+        "k": k,
+        "generation": -1,
+        "index_version": index.version,
+        "built_at": time.time()
+    })
+    stats = {
+        "technologies": count,
+        "recomputed": int(len(recompute)),
+        "merged": merged,
+        "full": bool(len(recompute) == count),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    return graph, stats
+
+
+def update_graph(directory: str, index: VectorIndex, k: int, full: bool = False) -> Optional[dict]:
+    """
+    Build or incrementally update the saved graph
+
+    Serialized across processes by a lock file; returns None when another
+    process holds it (its update covers the same changes).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "graph.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            previous = KnnGraph.load(directory)
+            index.refresh()
+            if previous is not None and not full and previous.meta.get("index_version") == index.version:
+                return {"technologies": len(previous), "recomputed": 0, "merged": 0, "full": False, "seconds": 0}
+            graph, stats = build_graph(index, k, None if full else previous)
+            if previous is not None:
+                graph.meta["generation"] = previous.meta["generation"]
+            graph.save(directory)
+            logger.info(f"Similarity graph updated: {stats}")
+            return stats
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def graph_directory() -> Optional[str]:
+    """KNN_GRAPH_DIR, defaulting to knn/ beside the local vector index"""
+    settings = get_settings()
+    if settings.knn_graph_dir:
+        return settings.knn_graph_dir
+    if settings.vector_index_dir:
+        return os.path.join(settings.vector_index_dir, "knn")
+    return None
+
+
+# Shared reader, reloaded when a new generation is published
+_reader: GenerationReader[KnnGraph] = GenerationReader(KnnGraph.load)
+
+
+async def get_knn_graph() -> Optional[KnnGraph]:
+    """Current graph, or None when not configured or not built yet"""
+    directory = graph_directory()
+    if directory is None:
+        return None
+    return await _reader.get(directory)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Similar-technology graph maintenance")
+    parser.add_argument("command", choices=["build", "update", "stats"])
+    parser.add_argument("--k", type=int, default=None, help="Neighbours per technology (default KNN_GRAPH_K)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = get_vector_index()
+    directory = graph_directory()
+    if index is None or directory is None:
+        raise SystemExit("VECTOR_INDEX_DIR is not set")
+
+    if args.command in ("build", "update"):
+        stats = update_graph(directory, index, args.k or get_settings().knn_graph_k, full=args.command == "build")
+        print(json.dumps(stats if stats is not None else {"skipped": "another update is running"}))
+    graph = KnnGraph.load(directory)
+    print(json.dumps(graph.meta if graph is not None else {}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Lexical technology index
+In-memory BM25 over technology names, aliases and descriptions, so exact
+mentions in a project description ("must use Kafka") are retrieved even
+when embedding similarity ranks them low
+"""
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from lib.catalog_view import CatalogView
+from lib.metadata_index import record_matches
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9]*(?:[.+#-][a-z0-9]+)*[+#]*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have in into is it its must need needs of on or our "
+    "should that the this to use used using we will with".split()
+)
+
+# Term repeats per field; a name match outweighs a passing mention in a description
+NAME_BOOST = 3
+ALIAS_BOOST = 2
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms; "Node.js" also yields "nodejs" and "C++"/"C#" keep their suffix
+
+    Args:
+        text: Free text
+
+    Returns:
+        Terms in order (stopwords dropped)
+    """
+    terms: List[str] = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        joined = re.sub(r"[.\-]", "", token)
+        if joined != token:
+            terms.append(joined)
+    return terms
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over catalog records
+
+    Each posting stores its precomputed BM25 term weight, so a query is a
+    bincount over the postings of its terms.
+    """
+
+    def __init__(self, records: List[dict], k1: float = 1.2, b: float = 0.75):
+        self.records = records
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(records), dtype=np.float32)
+        for doc, record in enumerate(records):
+            aliases = (record.get("metadata") or {}).get("aliases") or []
+            terms = (tokenize(record.get("name") or "") * NAME_BOOST
+                     + tokenize(" ".join(str(alias) for alias in aliases)) * ALIAS_BOOST
+                     + tokenize(record.get("description") or ""))
+            lengths[doc] = len(terms)
+            for term in terms:
+                counts = postings.setdefault(term, {})
+                counts[doc] = counts.get(doc, 0) + 1
+
+        average = float(lengths.mean()) if len(records) else 0.0
+        norms = k1 * (1 - b + b * lengths / average) if average else np.full(len(records), k1, dtype=np.float32)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, counts in postings.items():
+            docs = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            idf = math.log(1 + (len(records) - len(docs) + 0.5) / (len(docs) + 0.5))
+            self._postings[term] = (docs, (idf * tf * (k1 + 1) / (tf + norms[docs])).astype(np.float32))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def search(
+        self,
+        text: str,
+        k: int = 10,
+        filters: Optional[Dict[str, Set[str]]] = None
+    ) -> List[Tuple[dict, float]]:
+        """
+        Top-k records by BM25 score
+
+        Args:
+            text: Query text
+            k: Number of results
+            filters: {field: allowed values}; non-matching records are skipped
+
+        Returns:
+            (record, score) pairs, best first; only records sharing a term with the query
+        """
+        scores = self._scores(text)
+        if scores is None or k <= 0:
+            return []
+        candidates = np.flatnonzero(scores)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        hits: List[Tuple[dict, float]] = []
+        for doc in order:
+            record = self.records[doc]
+            if filters and not record_matches(record, filters):
+                continue
+            hits.append((record, float(scores[doc])))
+            if len(hits) == k:
+                break
+        return hits
+
+    def count(self, text: str, filters: Optional[Dict[str, Set[str]]] = None) -> int:
+        """Number of records sharing a term with the query and matching the filters (before any top-k cut)"""
+        scores = self._scores(text)
+        if scores is None:
+            return 0
+        candidates = np.flatnonzero(scores)
+        if not filters:
+            return len(candidates)
+        return sum(1 for doc in candidates if record_matches(self.records[doc], filters))
+
+    def _scores(self, text: str) -> Optional[np.ndarray]:
+        """BM25 score of every record, or None if no query term is indexed"""
+        matched = [self._postings[term] for term in set(tokenize(text)) if term in self._postings]
+        if not matched:
+            return None
+        docs = np.concatenate([docs for docs, _ in matched])
+        return np.bincount(docs, weights=np.concatenate([weights for _, weights in matched]),
+                           minlength=len(self.records))
+
+
+_catalog = CatalogView("Lexical index", LexicalIndex)
+
+
+async def get_lexical_index() -> Optional[LexicalIndex]:
+    """
+    Shared lexical index over the catalog
+
+    Built from the local vector index when it holds the catalog, otherwise from
+    Postgres every CATALOG_VIEW_REFRESH_SECONDS. A stale index keeps serving
+    while its replacement is built.
+
+    Returns:
+        LexicalIndex, or None if no build has succeeded yet
+    """
+    return await _catalog.get()
@@ -0,0 +1,298 @@
+"""
+LLM response cache
+Memory LRU in front of a persistent SQLite store, keyed by a hash of
+(model, prompt template version, normalized inputs) with a TTL. Concurrent
+misses for one key share a single generation: within a process through a
+shared task, and across workers through a lease row in the SQLite file.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from settings import get_settings
+from lib.embedding_cache import normalize_text
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# How often a worker waiting on another worker's generation re-checks the store
+_LEASE_POLL_SECONDS = 0.1
+
+
+def response_key(model: str, template_version: str, **inputs) -> str:
+    """Cache key for a prompt template applied to inputs (case- and whitespace-insensitive)"""
+    normalized = {name: normalize_text(str(value)).casefold() if value is not None else None
+                  for name, value in inputs.items()}
+    payload = json.dumps([model, template_version, normalized], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteResponses:
+    """Persistent responses plus generation leases in a local SQLite file"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[dict, float]]:
+        """(value, expires_at) if stored and not expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, key: str, value: dict, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value), time.time(), expires_at))
+            self._conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def acquire(self, key: str, owner: str, seconds: float) -> bool:
+        """Take the generation lease for key unless another owner holds an unexpired one"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = self._conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?)", (key, owner, now + seconds))
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """
+    Memory LRU + optional persistent tier with single-flight generation
+
+    Expired entries are never served; a failed generation is not cached and
+    its error reaches every caller that was waiting on it.
+    """
+
+    def __init__(self, ttl_seconds: float, memory_entries: int = 2000, path: Optional[str] = None,
+                 lease_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.lease_seconds = lease_seconds
+        self.persistent: Optional[SQLiteResponses] = None
+        if path:
+            self.persistent = SQLiteResponses(path)
+            purged = self.persistent.purge_expired()
+            if purged:
+                logger.info(f"LLM cache: purged {purged} expired responses")
+        self._memory: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # Shared generations: get_or_create tasks, and futures of keys claimed by a batch
+        self._inflight: Dict[str, Union[asyncio.Task, asyncio.Future]] = {}
+        self._owner = f"{os.getpid()}-{id(self)}"
+
+    def _remember(self, key: str, value: dict, expires_at: float) -> None:
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Cached value for key, from memory or the persistent tier"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._memory.move_to_end(key)
+                return entry[0]
+            del self._memory[key]
+        if self.persistent is not None:
+            stored = await asyncio.to_thread(self.persistent.get, key)
+            if stored is not None:
+                self._remember(key, *stored)
+                return stored[0]
+        return None
+
+    async def put(self, key: str, value: dict) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.put, key, value, expires_at)
+
+    async def get_or_create(self, key: str, generate: Callable[[], Awaitable[dict]]) -> Tuple[dict, str]:
+        """
+        Cached value, or the result of one shared call to generate
+
+        Args:
+            key: Cache key (see response_key)
+            generate: Coroutine factory producing the value on a miss
+
+        Returns:
+            (value, status): "hit", "miss" (this caller generated it) or
+            "wait" (another caller's generation was shared)
+
+        Raises:
+            Exception: Whatever generate raised, for the generating caller and its waiters
+        """
+        metrics = get_metrics()
+        value = await self.get(key)
+        if value is not None:
+            metrics.incr("llm_cache_hits")
+            return value, "hit"
+
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.incr("llm_cache_waits")
+            status = "wait"
+        else:
+            # A task, not the caller's coroutine, so a disconnecting caller does not cancel the shared generation
+            task = asyncio.create_task(self._generate(key, generate))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            status = "miss"
+        value, generated = await asyncio.shield(task)
+        return value, status if generated else "wait"
+
+    async def _generate(self, key: str, generate: Callable[[], Awaitable[dict]]) -> Tuple[dict, bool]:
+        """(value, whether this process generated it rather than another worker)"""
+        metrics = get_metrics()
+        if self.persistent is not None:
+            waited_until = time.monotonic() + self.lease_seconds
+            while not await asyncio.to_thread(self.persistent.acquire, key, self._owner, self.lease_seconds):
+                # Another worker is generating this key; use its result when it lands
+                await asyncio.sleep(_LEASE_POLL_SECONDS)
+                value = await self.get(key)
+                if value is not None:
+                    metrics.incr("llm_cache_waits")
+                    return value, False
+                if time.monotonic() > waited_until:
+                    break
+
+        metrics.incr("llm_cache_misses")
+        try:
+            value = await generate()
+            await self.put(key, value)
+            return value, True
+        finally:
+            if self.persistent is not None:
+                await asyncio.to_thread(self.persistent.release, key, self._owner)
+
+    async def claim(self, keys: List[str]) -> Set[str]:
+        """
+        Take over the generation of several keys for a caller that generates them together
+
+        Keys already being generated, in this process or under another
+        worker's lease, are not claimed; get_or_create shares those. Until a
+        claimed key is settled, get_or_create callers of it wait for the
+        claiming caller's result.
+
+        Returns:
+            Keys the caller now generates; each must be passed to settle()
+        """
+        candidates = [key for key in dict.fromkeys(keys) if key not in self._inflight]
+        if self.persistent is not None:
+            leased = await asyncio.to_thread(
+                lambda: [key for key in candidates if self.persistent.acquire(key, self._owner, self.lease_seconds)]
+            )
+        else:
+            leased = candidates
+        claimed: Set[str] = set()
+        loop = asyncio.get_running_loop()
+        for key in leased:
+            # Started here while the leases were taken; that generation goes ahead
+            if key in self._inflight:
+                await asyncio.to_thread(self.persistent.release, key, self._owner)
+                continue
+            self._inflight[key] = loop.create_future()
+            claimed.add(key)
+        get_metrics().incr("llm_cache_misses", len(claimed))
+        return claimed
+
+    async def settle(self, key: str, value: Optional[dict]) -> None:
+        """
+        Store the value generated for a claimed key and pass it to the callers waiting on it
+
+        Args:
+            key: A key returned by claim()
+            value: Generated value, or None if generation failed (waiters get an error)
+        """
+        future = self._inflight.pop(key)
+        if value is not None:
+            await self.put(key, value)
+            future.set_result((value, True))
+            return
+        future.set_exception(Exception("Failed to generate response in batch"))
+        # Marked as retrieved; waiters still raise it
+        future.exception()
+        if self.persistent is not None:
+            await asyncio.to_thread(self.persistent.release, key, self._owner)
+
+    def stats(self) -> dict:
+        """Tier sizes and hit rate"""
+        return {
+            "memory_entries": len(self._memory),
+            "persistent_entries": self.persistent.count() if self.persistent else None,
+            "inflight": len(self._inflight),
+            "hit_rate": get_metrics().ratio("llm_cache_hits", "llm_cache_misses")
+        }
+
+
+# Thread-safe singleton
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Shared LLM response cache; None when LLM_CACHE_TTL_SECONDS is 0"""
+    global _llm_cache
+    settings = get_settings()
+    if settings.llm_cache_ttl_seconds <= 0:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache(
+                    ttl_seconds=settings.llm_cache_ttl_seconds,
+                    memory_entries=settings.llm_cache_size,
+                    path=settings.llm_cache_path,
+                    # A generation is abandoned by other workers once the request would have timed out
+                    lease_seconds=settings.ai_timeout_seconds * 2
+                )
+    return _llm_cache
@@ -0,0 +1,122 @@
+"""
+Metadata inverted indexes
+Per-field bitmaps (value -> packed bit per index row) over the local vector
+index, so recommendation constraints such as {"license": "MIT",
+"language": ["Go", "Rust"]} select candidate rows before the similarity scan
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Constraint keys that are filters; other constraint keys are left to later stages
+FILTER_FIELDS = ("category", "language", "license", "platform")
+
+
+def normalize_constraints(constraints: Optional[dict]) -> Dict[str, Set[str]]:
+    """
+    Filterable constraints as {field: allowed values}, case-insensitive
+
+    A field matches any of its values; all fields must match.
+
+    Raises:
+        ValueError: On a filter value that is not a string or list of strings
+    """
+    filters: Dict[str, Set[str]] = {}
+    for field in FILTER_FIELDS:
+        value = (constraints or {}).get(field)
+        if value is None or value == []:
+            continue
+        values = value if isinstance(value, list) else [value]
+        if not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Constraint '{field}' must be a string or a list of strings")
+        filters[field] = {v.strip().lower() for v in values}
+    return filters
+
+
+def record_values(record: dict, field: str) -> List[str]:
+    """Normalized values of a filter field on a catalog record (lists allowed)"""
+    value = record.get("category") if field == "category" else (record.get("metadata") or {}).get(field)
+    if value is None:
+        return []
+    values = value if isinstance(value, list) else [value]
+    return [str(v).strip().lower() for v in values]
+
+
+def record_matches(record: dict, filters: Dict[str, Set[str]]) -> bool:
+    """Whether a record satisfies every field filter"""
+    return all(not values.isdisjoint(record_values(record, field)) for field, values in filters.items())
+
+
+class MetadataIndex:
+    """
+    Bitmaps over the rows of a VectorIndex
+
+    Bitmaps are packed (1 bit per row) and extended as rows are appended;
+    a new index generation (growth/compaction renumbers rows) rebuilds them.
+    """
+
+    def __init__(self, vector_index):
+        self.vector_index = vector_index
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self._rows = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        index = self.vector_index
+        index.refresh()
+        with self._lock:
+            if index.generation != self._generation:
+                self._bitmaps = {field: {} for field in FILTER_FIELDS}
+                self._rows = 0
+                self._generation = index.generation
+            count = index.count
+            if count == self._rows:
+                return
+            size = (count + 7) // 8
+            for values in self._bitmaps.values():
+                for value, bitmap in list(values.items()):
+                    if bitmap.shape[0] < size:
+                        values[value] = np.concatenate([bitmap, np.zeros(size - bitmap.shape[0], dtype=np.uint8)])
+            for row in range(self._rows, count):
+                record = index.record(row)
+                for field in FILTER_FIELDS:
+                    for value in record_values(record, field):
+                        bitmap = self._bitmaps[field].get(value)
+                        if bitmap is None:
+                            bitmap = self._bitmaps[field][value] = np.zeros(size, dtype=np.uint8)
+                        bitmap[row >> 3] |= 0x80 >> (row & 7)
+            self._rows = count
+
+    def match(self, filters: Dict[str, Set[str]]) -> Tuple[np.ndarray, int]:
+        """
+        Rows matching every field filter (and not deleted)
+
+        Args:
+            filters: Output of normalize_constraints
+
+        Returns:
+            (boolean row mask, number of matching live rows)
+        """
+        self.refresh()
+        with self._lock:
+            rows = self._rows
+            size = (rows + 7) // 8
+            combined = None
+            for field, values in filters.items():
+                field_bits = np.zeros(size, dtype=np.uint8)
+                for value in values:
+                    bitmap = self._bitmaps[field].get(value)
+                    if bitmap is not None:
+                        field_bits |= bitmap[:size]
+                combined = field_bits if combined is None else combined & field_bits
+        mask = np.unpackbits(combined, count=rows).astype(bool) if combined is not None else np.ones(rows, dtype=bool)
+        mask &= self.vector_index.live_mask()[:rows]
+        return mask, int(mask.sum())
+
+    def values(self, field: str) -> Iterable[str]:
+        """Known values of a field (for discovery/autocomplete)"""
+        self.refresh()
+        return sorted(self._bitmaps.get(field, {}))
+
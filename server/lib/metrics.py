@@ -0,0 +1,84 @@
+"""
+In-process metrics registry
+Thread-safe counters, gauges and latency percentiles exposed through the
+/metrics endpoint
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+import numpy as np
+
+# Recent samples kept per latency series
+LATENCY_WINDOW = 2048
+
+
+class Metrics:
+    """Named counters, gauges and latency series"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a sample (e.g. a latency in ms); only the most recent LATENCY_WINDOW are kept"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=LATENCY_WINDOW)
+            samples.append(value)
+
+    def percentiles(self, name: str, points: Iterable[float] = (50, 95, 99)) -> Optional[dict]:
+        """{"count", "p50", "p95", ...} over the recent samples, or None without samples"""
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        if not samples:
+            return None
+        values = np.percentile(samples, list(points))
+        summary = {"count": len(samples)}
+        summary.update({f"p{point:g}": round(float(value), 3) for point, value in zip(points, values)})
+        return summary
+
+    def get(self, name: str) -> float:
+        """Current value of a counter or gauge (0 if unset)"""
+        with self._lock:
+            return self._counters.get(name, self._gauges.get(name, 0))
+
+    def ratio(self, hits: str, misses: str) -> Optional[float]:
+        """hits / (hits + misses), or None before any lookups"""
+        with self._lock:
+            h = self._counters.get(hits, 0)
+            m = self._counters.get(misses, 0)
+        return h / (h + m) if h + m else None
+
+    def snapshot(self) -> dict:
+        """Copy of all counters and gauges, with percentiles of each latency series"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            series = list(self._samples)
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "latencies": {name: self.percentiles(name) for name in series}
+        }
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Process-wide metrics registry"""
+    return _metrics
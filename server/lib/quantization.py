@@ -0,0 +1,223 @@
+"""
+Compressed vector storage
+Matryoshka-style dimension truncation and int8/float16 scalar quantization
+of embeddings, with a quantization-aware search that scans the compact codes
+and re-ranks the best candidates against the full-precision vectors
+"""
+import json
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+# Rows per top-k merge step; bounds the (queries x rows) score matrix
+_BLOCK_ROWS = 65536
+
+# Size of the float32 scratch buffer compact codes are widened into; small
+# enough to stay in cache, so widening costs little over reading float32
+_SCRATCH_BYTES = 4 * 2**20
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def truncate(vectors: np.ndarray, dimensions: Optional[int]) -> np.ndarray:
+    """
+    Keep the leading dimensions and renormalize
+
+    Matryoshka-trained models (text-embedding-3-*) front-load information,
+    so a 256-dim prefix keeps most of the ranking quality of the full vector.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dimensions is None or dimensions >= vectors.shape[-1]:
+        return normalize(vectors)
+    return normalize(vectors[..., :dimensions])
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric int8 quantization with one scale per vector
+
+    Returns:
+        (codes int8 matrix, float32 scales) where vector ~= codes * scale
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    safe = np.where(scales > 0, scales, 1.0)
+    codes = np.clip(np.rint(vectors / safe[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+class QuantizedVectors:
+    """
+    Compact search copy of an embedding matrix
+
+    `codes` hold the truncated (and optionally quantized) vectors that are
+    scanned for every query; `full` is the original float32 matrix, typically
+    a read-only memmap, touched only to re-rank a few candidates per query.
+    """
+
+    def __init__(
+        self,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray],
+        full: Optional[np.ndarray],
+        dimensions: int,
+        quantization: str
+    ):
+        self.codes = codes
+        self.scales = scales
+        self.full = full
+        self.dimensions = dimensions
+        self.quantization = quantization
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        dimensions: Optional[int] = None,
+        quantization: str = "int8",
+        keep_full: bool = True
+    ) -> "QuantizedVectors":
+        """
+        Compress a (n, d) matrix block by block (works on memmaps larger than RAM)
+
+        Args:
+            vectors: Full-precision embeddings
+            dimensions: Truncate to this many leading dimensions (None keeps all)
+            quantization: "none" (float32), "float16" or "int8"
+            keep_full: Keep a reference to `vectors` for re-ranking
+
+        Returns:
+            QuantizedVectors
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}' (use one of {', '.join(QUANTIZATIONS)})")
+        count, full_dimensions = vectors.shape
+        dimensions = min(dimensions or full_dimensions, full_dimensions)
+
+        dtype = {"none": np.float32, "float16": np.float16, "int8": np.int8}[quantization]
+        codes = np.empty((count, dimensions), dtype=dtype)
+        scales = np.empty(count, dtype=np.float32) if quantization == "int8" else None
+
+        for start in range(0, count, _BLOCK_ROWS):
+            block = truncate(vectors[start:start + _BLOCK_ROWS], dimensions)
+            if quantization == "int8":
+                codes[start:start + len(block)], scales[start:start + len(block)] = quantize_int8(block)
+            else:
+                codes[start:start + len(block)] = block
+
+        return cls(codes, scales, vectors if keep_full else None, dimensions, quantization)
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes scanned per query (codes + scales)"""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def coarse_scores(self, queries: np.ndarray, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Approximate cosine scores of (m, dimensions) truncated queries against rows start:stop"""
+        block = self.codes[start:stop]
+        if block.dtype == np.float32:
+            scores = block @ queries.T
+        else:
+            scores = np.empty((block.shape[0], queries.shape[0]), dtype=np.float32)
+            step = max(256, _SCRATCH_BYTES // (4 * self.dimensions))
+            scratch = np.empty((step, self.dimensions), dtype=np.float32)
+            for offset in range(0, block.shape[0], step):
+                rows = block[offset:offset + step]
+                np.copyto(scratch[:len(rows)], rows, casting="unsafe")
+                np.matmul(scratch[:len(rows)], queries.T, out=scores[offset:offset + len(rows)])
+        if self.scales is not None:
+            scores *= self.scales[start:stop, None]
+        return scores.T
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        rerank: int = 100,
+        mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine neighbours for one or more queries
+
+        The compact codes are scanned for the best `max(k, rerank)` candidates,
+        which are then re-scored with the full-precision vectors. With
+        rerank=0 (or no full vectors) the approximate scores are returned.
+
+        Args:
+            queries: (d,) or (m, d) full-dimension query vectors
+            k: Results per query
+            rerank: Candidates re-scored at full precision
+            mask: Boolean array of rows allowed in the results; excluded rows
+                score -inf (callers drop non-finite results)
+
+        Returns:
+            (indices, scores), each (m, k), best first
+        """
+        queries = normalize(np.atleast_2d(queries))
+        short = truncate(queries, self.dimensions)
+        count = len(self)
+        k = min(k, count)
+        pool = min(max(k, rerank), count)
+
+        # Running top-`pool` per query, merged block by block to bound memory
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, count, _BLOCK_ROWS):
+            scores = self.coarse_scores(short, start, start + _BLOCK_ROWS)
+            if mask is not None:
+                scores[:, ~mask[start:start + _BLOCK_ROWS]] = -np.inf
+            take = min(pool, scores.shape[1])
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_idx = np.concatenate([best_idx, top + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            if best_idx.shape[1] > pool:
+                keep = np.argpartition(-best_scores, pool - 1, axis=1)[:, :pool]
+                best_idx = np.take_along_axis(best_idx, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        if rerank and self.full is not None:
+            for row, query in enumerate(queries):
+                # Sorted row order keeps memmap reads sequential
+                order = np.argsort(best_idx[row])
+                best_idx[row] = best_idx[row][order]
+                best_scores[row] = normalize(self.full[best_idx[row]]) @ query
+            if mask is not None:
+                best_scores[~mask[best_idx]] = -np.inf
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        return np.take_along_axis(best_idx, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def save(self, directory: str) -> None:
+        """Write codes/scales (the full vectors are stored by their owner)"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "codes.npy"), self.codes)
+        if self.scales is not None:
+            np.save(os.path.join(directory, "scales.npy"), self.scales)
+        with open(os.path.join(directory, "quantization.json"), "w") as f:
+            json.dump({"dimensions": self.dimensions, "quantization": self.quantization}, f)
+
+    @classmethod
+    def load(cls, directory: str, full: Optional[np.ndarray] = None, mmap: bool = True) -> "QuantizedVectors":
+        """Open saved codes (memory-mapped by default) alongside the full vectors"""
+        mode = "r" if mmap else None
+        with open(os.path.join(directory, "quantization.json")) as f:
+            meta = json.load(f)
+        codes = np.load(os.path.join(directory, "codes.npy"), mmap_mode=mode)
+        scales_path = os.path.join(directory, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+        return cls(codes, scales, full, meta["dimensions"], meta["quantization"])
@@ -0,0 +1,384 @@
+"""
+Recommendation retrieval
+Routes vector search to the in-process index for small catalogs and to
+pgvector otherwise, falling back to the local index when Postgres fails.
+Metadata constraints are applied as filters before (or, for broad filters,
+during) the similarity scan, so filtered queries still return `limit` hits.
+Hybrid search runs the vector and BM25 retrievers concurrently and merges
+their rankings with weighted reciprocal rank fusion.
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib import db
+from lib.ai_client import get_ai_client
+from lib.lexical_index import get_lexical_index
+from lib.metrics import get_metrics
+from lib.quantization import normalize
+from lib.vector_index import get_vector_index
+
+logger = logging.getLogger(__name__)
+
+# Local scans above this many rows run in a worker thread
+_THREAD_THRESHOLD = 20000
+
+# pgvector over-fetch for broad filters: candidates per expected match, and
+# the most candidates one HNSW scan can return (hnsw.ef_search upper bound)
+_OVERFETCH_FACTOR = 2.0
+_MAX_FETCH = 1000
+
+
+RETRIEVERS = ("vector", "lexical")
+
+
+class Candidate:
+    """A technology returned by a retriever"""
+
+    __slots__ = ("tech_id", "name", "description", "category", "metadata", "similarity",
+                 "retrievers", "fusion_score", "rerank_score")
+
+    def __init__(self, tech_id: str, name: str, description: str, category: Optional[str],
+                 metadata: dict, similarity: Optional[float]):
+        self.tech_id = tech_id
+        self.name = name
+        self.description = description
+        self.category = category
+        self.metadata = metadata or {}
+        # Cosine similarity to the query; None until scored for lexical-only hits
+        self.similarity = similarity
+        self.retrievers: List[str] = []
+        self.fusion_score = 0.0
+        self.rerank_score: Optional[float] = None
+
+
+async def _local_search(
+    query_vector: np.ndarray,
+    limit: int,
+    filters: Dict[str, Set[str]]
+) -> Tuple[List[Candidate], int]:
+    index = get_vector_index()
+    rows = mask = None
+    if filters:
+        mask, total = index.metadata.match(filters)
+        if total == 0:
+            return [], 0
+        # Few matches: score just those rows; many: mask a full (or coarse) scan
+        if total < get_settings().filter_prefilter_ratio * max(index.live_count, 1):
+            rows, mask = np.flatnonzero(mask), None
+            get_metrics().incr("recommend_filter_prefilter")
+        else:
+            get_metrics().incr("recommend_filter_mask")
+    else:
+        total = index.live_count
+
+    scanned = len(rows) if rows is not None else index.count
+    if scanned > _THREAD_THRESHOLD:
+        hits = await asyncio.to_thread(index.search, query_vector, limit, rows, mask)
+    else:
+        hits = index.search(query_vector, limit, rows, mask)
+    return [
+        Candidate(hit.record["id"], hit.record["name"], hit.record.get("description", ""),
+                  hit.record.get("category"), hit.record.get("metadata"), hit.score)
+        for hit in hits
+    ], total
+
+
+async def _pgvector_search(
+    query_vector: np.ndarray,
+    limit: int,
+    ef_search: Optional[int],
+    filters: Dict[str, Set[str]]
+) -> Tuple[List[Candidate], int]:
+    settings = get_settings()
+    exact = False
+    fetch = None
+    if filters:
+        total = await db.count_technologies(filters)
+        if total == 0:
+            return [], 0
+        if total <= settings.filter_exact_max_rows:
+            # Selective filter: exact scan of the matching rows, found via the GIN filter-terms index
+            exact = True
+            get_metrics().incr("recommend_filter_exact")
+        else:
+            # Broad filter: take enough HNSW neighbours that ~limit of them match
+            selectivity = total / max(await db.count_technologies(), total)
+            fetch = min(math.ceil(limit * _OVERFETCH_FACTOR / selectivity), _MAX_FETCH)
+            ef_search = max(ef_search or settings.hnsw_ef_search, fetch)
+            get_metrics().incr("recommend_filter_overfetch")
+    else:
+        total = await db.count_technologies()
+
+    rows = await db.search_technologies(query_vector, limit=limit, ef_search=ef_search,
+                                        exact=exact, filters=filters, fetch=fetch)
+    return [
+        Candidate(row["id"], row["name"], row["description"], row["category"], row["metadata"], float(row["similarity"]))
+        for row in rows
+    ], total
+
+
+def choose_engine() -> str:
+    """"local" or "pgvector" for the configured engine and current catalog size"""
+    settings = get_settings()
+    index = get_vector_index()
+    if settings.recommend_engine == "local" and index is not None:
+        return "local"
+    if settings.recommend_engine == "auto" and index is not None:
+        index.refresh()
+        if 0 < index.live_count <= settings.local_index_max_rows:
+            return "local"
+    return "pgvector"
+
+
+def catalog_version() -> Tuple[Optional[int], int]:
+    """Changes whenever the catalog served from this process may have changed"""
+    index = get_vector_index()
+    if index is not None:
+        index.refresh()
+    return (index.version if index is not None else None, db.catalog_writes())
+
+
+async def vector_search(
+    query_vector: np.ndarray,
+    limit: int = 10,
+    ef_search: Optional[int] = None,
+    filters: Optional[Dict[str, Set[str]]] = None
+) -> Tuple[List[Candidate], str, int]:
+    """
+    Cosine top-k technologies
+
+    Args:
+        query_vector: Query embedding
+        limit: Number of results
+        ef_search: HNSW breadth when pgvector serves the query
+        filters: {field: allowed values} from metadata_index.normalize_constraints
+
+    Returns:
+        (candidates best first, engine that answered: "local", "pgvector" or
+        "local-fallback", number of technologies matching the filters)
+    """
+    metrics = get_metrics()
+    filters = filters or {}
+    engine = choose_engine()
+    if engine == "local":
+        metrics.incr("recommend_engine_local")
+        candidates, total = await _local_search(query_vector, limit, filters)
+        return candidates, engine, total
+
+    try:
+        candidates, total = await _pgvector_search(query_vector, limit, ef_search, filters)
+        metrics.incr("recommend_engine_pgvector")
+        return candidates, engine, total
+    except Exception as e:
+        index = get_vector_index()
+        if index is None or index.live_count == 0:
+            raise
+        logger.warning(f"pgvector search failed, serving from the local index: {e}")
+        metrics.incr("recommend_engine_local_fallback")
+        candidates, total = await _local_search(query_vector, limit, filters)
+        return candidates, "local-fallback", total
+
+
+async def lexical_search(
+    query_text: str,
+    limit: int = 10,
+    filters: Optional[Dict[str, Set[str]]] = None
+) -> List[Candidate]:
+    """
+    BM25 top-k technologies for the query text
+
+    Returns:
+        Candidates best first (similarity not yet known)
+    """
+    index = await get_lexical_index()
+    if index is None:
+        return []
+    if len(index) > _THREAD_THRESHOLD:
+        hits = await asyncio.to_thread(index.search, query_text, limit, filters)
+    else:
+        hits = index.search(query_text, limit, filters)
+    return [
+        Candidate(record["id"], record["name"], record.get("description", ""), record.get("category"),
+                  record.get("metadata"), None)
+        for record, _ in hits
+    ]
+
+
+async def lexical_count(query_text: str, filters: Optional[Dict[str, Set[str]]] = None) -> int:
+    """Number of technologies the lexical retriever matches for the query text, before its top-k cut"""
+    index = await get_lexical_index()
+    if index is None:
+        return 0
+    if len(index) > _THREAD_THRESHOLD:
+        return await asyncio.to_thread(index.count, query_text, filters)
+    return index.count(query_text, filters)
+
+
+def fuse_rankings(rankings: Dict[str, List[Candidate]], weights: Dict[str, float], k: int = 60) -> List[Candidate]:
+    """
+    Weighted reciprocal rank fusion
+
+    A candidate scores sum(weight / (k + rank)) over the retrievers that
+    returned it, so agreement between retrievers outranks a single high rank.
+
+    Args:
+        rankings: {retriever: candidates best first}
+        weights: {retriever: weight}
+        k: Rank damping constant
+
+    Returns:
+        Distinct candidates by fused score, with retrievers and fusion_score set
+    """
+    merged: Dict[str, Candidate] = {}
+    for name, candidates in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, candidate in enumerate(candidates, start=1):
+            fused = merged.get(candidate.tech_id)
+            if fused is None:
+                fused = merged[candidate.tech_id] = candidate
+                fused.retrievers = []
+                fused.fusion_score = 0.0
+            elif fused.similarity is None:
+                fused.similarity = candidate.similarity
+            fused.retrievers.append(name)
+            fused.fusion_score += weight / (k + rank)
+    return sorted(merged.values(), key=lambda candidate: -candidate.fusion_score)
+
+
+async def _score_missing(query_vector: np.ndarray, candidates: List[Candidate]) -> None:
+    """Fill in cosine similarity for candidates only the lexical retriever found"""
+    missing = [candidate for candidate in candidates if candidate.similarity is None]
+    if not missing:
+        return
+    index = get_vector_index()
+    if index is not None:
+        query = normalize(np.asarray(query_vector, dtype=np.float32).reshape(-1))
+        for candidate in missing:
+            row = index.row_for(candidate.tech_id)
+            if row is not None:
+                candidate.similarity = float(index.vector(row) @ query)
+        missing = [candidate for candidate in missing if candidate.similarity is None]
+    if missing:
+        try:
+            scores = await db.technology_similarities(query_vector, [candidate.tech_id for candidate in missing])
+        except Exception as e:
+            logger.warning(f"Could not score lexical-only candidates: {e}")
+            scores = {}
+        for candidate in missing:
+            candidate.similarity = scores.get(candidate.tech_id, 0.0)
+
+
+async def _timed(name: str, coroutine):
+    started = time.perf_counter()
+    try:
+        return await coroutine
+    finally:
+        get_metrics().observe(f"recommend_{name}_ms", (time.perf_counter() - started) * 1000)
+
+
+async def hybrid_search(
+    query_text: str,
+    query_vector: np.ndarray,
+    limit: int = 10,
+    ef_search: Optional[int] = None,
+    filters: Optional[Dict[str, Set[str]]] = None,
+    weights: Optional[Dict[str, float]] = None
+) -> Tuple[List[Candidate], str, int]:
+    """
+    Vector and lexical retrieval in parallel, merged by reciprocal rank fusion
+
+    Both retrievers share one latency budget (HYBRID_BUDGET_MS); one that
+    fails or runs over is dropped and the other's ranking is served alone.
+    A retriever with weight 0 is not run.
+
+    Args:
+        query_text: Project description and requirements
+        query_vector: Query embedding
+        limit: Number of results
+        ef_search: HNSW breadth when pgvector serves the query
+        filters: {field: allowed values}
+        weights: {"vector": w, "lexical": w} overriding the configured weights
+
+    Returns:
+        (candidates by fused score, vector engine or "lexical" if only BM25
+        answered, number of technologies matching the filters, and for
+        "lexical" the query terms too)
+
+    Raises:
+        Exception: When no retriever produced results
+    """
+    settings = get_settings()
+    metrics = get_metrics()
+    weights = {"vector": settings.hybrid_vector_weight, "lexical": settings.hybrid_lexical_weight, **(weights or {})}
+    # Fuse deeper lists than requested; a result ranked low by one retriever can win on agreement
+    depth = max(limit, settings.hybrid_depth)
+
+    tasks: Dict[str, asyncio.Task] = {}
+    if weights["vector"] > 0:
+        tasks["vector"] = asyncio.create_task(_timed("vector", vector_search(
+            query_vector, depth, max(ef_search, depth) if ef_search else None, filters
+        )))
+    if weights["lexical"] > 0 and query_text.strip():
+        tasks["lexical"] = asyncio.create_task(_timed("lexical", lexical_search(query_text, depth, filters)))
+    if not tasks:
+        raise ValueError("At least one retriever needs a positive weight")
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=settings.hybrid_budget_ms / 1000)
+    results = {}
+    error: Optional[BaseException] = None
+    for name, task in tasks.items():
+        if task in pending:
+            task.cancel()
+            metrics.incr(f"recommend_{name}_timeouts")
+            logger.warning(f"{name} retrieval exceeded the {settings.hybrid_budget_ms} ms budget")
+        elif task.exception() is not None:
+            error = task.exception()
+            metrics.incr(f"recommend_{name}_errors")
+            logger.warning(f"{name} retrieval failed: {error}")
+        else:
+            results[name] = task.result()
+
+    if "vector" in results:
+        vector_candidates, engine, total = results["vector"]
+    elif "lexical" in results:
+        # Counted only on this fallback; the lexical search itself stops at its top-k
+        vector_candidates, engine, total = [], "lexical", await lexical_count(query_text, filters)
+    else:
+        raise error or Exception("Failed to retrieve recommendations within the latency budget")
+
+    rankings = {"vector": vector_candidates}
+    if "lexical" in results:
+        rankings["lexical"] = results["lexical"]
+    candidates = fuse_rankings(rankings, weights, settings.rrf_k)[:limit]
+    await _score_missing(query_vector, candidates)
+    return candidates, engine, total
+
+
+async def rerank_candidates(query_text: str, candidates: List[Candidate]) -> List[Candidate]:
+    """
+    Reorder candidates by LLM relevance to the project
+
+    Args:
+        query_text: Project description and requirements
+        candidates: Fused candidates, best first
+
+    Returns:
+        The same candidates with rerank_score set, best first (ties keep fused order)
+    """
+    if not candidates:
+        return []
+    started = time.perf_counter()
+    scores = await get_ai_client().rerank(query_text, [
+        {"name": candidate.name, "category": candidate.category, "description": candidate.description}
+        for candidate in candidates
+    ])
+    get_metrics().observe("recommend_rerank_ms", (time.perf_counter() - started) * 1000)
+    for candidate, score in zip(candidates, scores):
+        candidate.rerank_score = score
+    return sorted(candidates, key=lambda candidate: -candidate.rerank_score)
@@ -0,0 +1,151 @@
+"""
+Cascade reranker
+Every candidate is scored by a cheap local stage (embedding cosine plus
+query term overlap, computed for the whole batch at once). Only the best
+top_k are sent to the chat model, within a time budget; the rest, or all of
+them when the model misses the budget, keep their local scores.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib.ai_client import get_ai_client
+from lib.embeddings_client import get_embeddings_client, tech_text
+from lib.lexical_index import tokenize
+from lib.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Share of the local score from query term overlap; the rest is embedding cosine
+LEXICAL_WEIGHT = 0.3
+
+
+def _name(candidate: Dict) -> str:
+    # Recommendation results carry tech_name, catalog records name
+    return str(candidate.get("name") or candidate.get("tech_name") or "")
+
+
+def candidate_text(candidate: Dict) -> str:
+    """Text a candidate is embedded and matched by"""
+    return tech_text(_name(candidate), str(candidate.get("description") or ""))
+
+
+def term_overlap(query: str, texts: List[str]) -> np.ndarray:
+    """
+    Share of the query's distinct terms found in each text
+
+    Returns:
+        float32 array aligned with texts (zeros if the query has no terms)
+    """
+    columns = {term: column for column, term in enumerate(sorted(set(tokenize(query))))}
+    if not columns:
+        return np.zeros(len(texts), dtype=np.float32)
+    incidence = np.zeros((len(texts), len(columns)), dtype=np.float32)
+    for row, text in enumerate(texts):
+        present = [columns[term] for term in set(tokenize(text)) if term in columns]
+        incidence[row, present] = 1.0
+    return incidence.mean(axis=1)
+
+
+def local_scores(query_vector: np.ndarray, candidate_vectors: np.ndarray, overlap: np.ndarray) -> np.ndarray:
+    """
+    Local relevance in [0, 1]: cosine (negatives clipped) blended with term overlap
+
+    Args:
+        query_vector: Query embedding
+        candidate_vectors: One candidate embedding per row
+        overlap: term_overlap of the candidates
+
+    Returns:
+        float32 scores aligned with the rows
+    """
+    norms = np.linalg.norm(candidate_vectors, axis=1) * np.linalg.norm(query_vector)
+    cosine = candidate_vectors @ query_vector / np.maximum(norms, 1e-12)
+    return ((1 - LEXICAL_WEIGHT) * np.clip(cosine, 0.0, 1.0) + LEXICAL_WEIGHT * overlap).astype(np.float32)
+
+
+async def score_locally(query: str, candidates: List[Dict]) -> np.ndarray:
+    """Local stage for all candidates (query and candidate texts embedded in one call)"""
+    texts = [candidate_text(candidate) for candidate in candidates]
+    vectors = await get_embeddings_client().embed_many([query] + texts)
+    return local_scores(vectors[0], np.stack(vectors[1:]), term_overlap(query, texts))
+
+
+async def cascade_rerank(
+    query: str,
+    candidates: List[Dict],
+    top_k: Optional[int] = None,
+    budget_ms: Optional[int] = None
+) -> Tuple[List[int], List[float], List[str], str]:
+    """
+    Rerank candidates locally, then the best top_k with the chat model
+
+    The LLM-scored slice is ranked first, by LLM score (ties keep the local
+    order), followed by the remaining candidates in local order.
+
+    Args:
+        query: Project description and requirements
+        candidates: Dicts with name (or tech_name) and optionally category and description
+        top_k: Candidates sent to the LLM (defaults to RERANK_LLM_TOP_K; 0 = local only)
+        budget_ms: Time allowed for the LLM stage (defaults to RERANK_LLM_BUDGET_MS)
+
+    Returns:
+        (order as positions into candidates, scores, stage of each score
+        ("llm" | "local"), LLM outcome "completed" | "deadline" | "failed" | "skipped")
+
+    Raises:
+        Exception: If the local stage fails
+    """
+    if not candidates:
+        return [], [], [], "skipped"
+    metrics = get_metrics()
+    if top_k is None or budget_ms is None:
+        settings = get_settings()
+        top_k = settings.rerank_llm_top_k if top_k is None else top_k
+        budget_ms = settings.rerank_llm_budget_ms if budget_ms is None else budget_ms
+
+    started = time.perf_counter()
+    try:
+        scores = await score_locally(query, candidates)
+    except Exception as e:
+        logger.error(f"Local rerank stage failed: {e}")
+        raise Exception(f"Failed to score candidates: {str(e)}")
+    local_order = np.argsort(-scores, kind="stable")
+    metrics.observe("rerank_local_ms", (time.perf_counter() - started) * 1000)
+
+    head = [int(position) for position in local_order[:top_k]]
+    tail = [int(position) for position in local_order[top_k:]]
+    if not head:
+        status = "skipped"
+    else:
+        started = time.perf_counter()
+        try:
+            llm_scores = await asyncio.wait_for(
+                get_ai_client().rerank(query, [
+                    {"name": _name(candidates[position]), "category": candidates[position].get("category"),
+                     "description": candidates[position].get("description")}
+                    for position in head
+                ]),
+                budget_ms / 1000
+            )
+            status = "completed"
+        except asyncio.TimeoutError:
+            status = "deadline"
+        except Exception as e:
+            logger.warning(f"LLM rerank stage failed, keeping local scores: {e}")
+            status = "failed"
+        metrics.observe("rerank_llm_ms", (time.perf_counter() - started) * 1000)
+        metrics.incr(f"rerank_llm_{status}")
+
+    if status != "completed":
+        order = [int(position) for position in local_order]
+        return order, [round(float(scores[position]), 4) for position in order], ["local"] * len(order), status
+
+    ranked = sorted(zip(head, llm_scores), key=lambda item: -item[1])
+    order = [position for position, _ in ranked] + tail
+    final = [round(score, 4) for _, score in ranked] + [round(float(scores[position]), 4) for position in tail]
+    return order, final, ["llm"] * len(head) + ["local"] * len(tail), status
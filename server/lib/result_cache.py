@@ -0,0 +1,192 @@
+"""
+Recommendation result cache
+An exact tier keyed by the normalized request, then a semantic tier that
+reuses the result of an earlier query whose embedding is within a cosine
+threshold. Entries expire after a TTL and are dropped when the catalog changes.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib.embedding_cache import normalize_text
+from lib.metrics import get_metrics
+from lib.quantization import normalize
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def request_keys(
+    project_description: str,
+    requirements: List[str],
+    params: dict,
+    query_embedding: Optional[np.ndarray] = None
+) -> Tuple[str, str]:
+    """
+    (exact key, scope) for a recommendation request
+
+    The exact key covers everything; the scope covers everything but the query
+    text, so semantic hits are only shared between requests with the same
+    constraints, limit and search parameters.
+
+    Args:
+        project_description: Free text (case and whitespace are normalized)
+        requirements: Requirement strings (order and duplicates ignored)
+        params: Remaining request parameters (constraints, limit, ...)
+        query_embedding: Caller-supplied embedding, which replaces the text
+    """
+    scope = _digest(params)
+    if query_embedding is not None:
+        text = hashlib.sha256(np.ascontiguousarray(query_embedding, dtype="<f4").tobytes()).hexdigest()
+    else:
+        text = [normalize_text(project_description).lower(),
+                sorted({normalize_text(requirement).lower() for requirement in requirements})]
+    return _digest([text, scope]), scope
+
+
+class _Entry:
+    __slots__ = ("value", "scope", "slot", "expires_at")
+
+    def __init__(self, value: Any, scope: str, slot: int, expires_at: float):
+        self.value = value
+        self.scope = scope
+        self.slot = slot
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """
+    LRU of results with a matrix of their query embeddings
+
+    Each entry owns a row of the matrix; a semantic lookup is one
+    matrix-vector product over the rows of the same scope.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_scopes: List[Optional[str]] = [None] * max_entries
+        self._slot_expiry = np.zeros(max_entries, dtype=np.float64)
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version) -> None:
+        # Caller holds the lock
+        if version != self._version:
+            if self._entries:
+                get_metrics().incr("recommend_cache_invalidations")
+            self._clear()
+            self._version = version
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._slot_scopes = [None] * self.max_entries
+        self._slot_keys = [None] * self.max_entries
+        self._slot_expiry[:] = 0
+        self._free = list(range(self.max_entries - 1, -1, -1))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._slot_scopes[entry.slot] = None
+        self._slot_keys[entry.slot] = None
+        self._slot_expiry[entry.slot] = 0
+        self._free.append(entry.slot)
+
+    def get_exact(self, key: str, version) -> Optional[Any]:
+        """Result stored under exactly this request key"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def get_similar(self, vector: np.ndarray, scope: str, version) -> Optional[Tuple[Any, float]]:
+        """
+        Result of the most similar cached query in the same scope
+
+        Returns:
+            (value, cosine similarity) when the best match reaches the threshold
+        """
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or not self._entries:
+                return None
+            slots = np.flatnonzero(self._slot_expiry > time.time())
+            slots = slots[[self._slot_scopes[slot] == scope for slot in slots]] if len(slots) else slots
+            if not len(slots):
+                return None
+            query = normalize(np.asarray(vector, dtype=np.float32).reshape(-1))
+            if query.shape[0] != self._vectors.shape[1]:
+                return None
+            scores = self._vectors[slots] @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            key = self._slot_keys[slots[best]]
+            self._entries.move_to_end(key)
+            return self._entries[key].value, float(scores[best])
+
+    def put(self, key: str, scope: str, vector: np.ndarray, value: Any, version) -> None:
+        """Store a result under its exact key and query embedding"""
+        if self.max_entries <= 0:
+            return
+        vector = normalize(np.asarray(vector, dtype=np.float32).reshape(-1))
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._clear()
+            if key in self._entries:
+                self._remove(key)
+            while not self._free:
+                self._remove(next(iter(self._entries)))
+            slot = self._free.pop()
+            expires_at = time.time() + self.ttl_seconds
+            self._entries[key] = _Entry(value, scope, slot, expires_at)
+            self._vectors[slot] = vector
+            self._slot_scopes[slot] = scope
+            self._slot_keys[slot] = key
+            self._slot_expiry[slot] = expires_at
+            get_metrics().set_gauge("recommend_cache_entries", len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Thread-safe singleton
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Shared recommendation cache, or None when RECOMMEND_CACHE_SIZE is 0"""
+    global _cache
+    settings = get_settings()
+    if settings.recommend_cache_size <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    settings.recommend_cache_size,
+                    settings.recommend_cache_ttl_seconds,
+                    settings.recommend_cache_similarity
+                )
+    return _cache
@@ -0,0 +1,162 @@
+"""
+Compact wire formats for embedding vectors
+Content negotiation between JSON float lists (default), base64-encoded
+little-endian float32/float16, raw application/octet-stream and msgpack
+"""
+import base64
+from typing import Dict, Optional
+
+import numpy as np
+
+MEDIA_JSON = "application/json"
+MEDIA_OCTET = "application/octet-stream"
+MEDIA_MSGPACK = "application/msgpack"
+
+# Accepted spellings of the msgpack media type
+_MSGPACK_TYPES = {MEDIA_MSGPACK, "application/x-msgpack", "application/vnd.msgpack"}
+
+# Wire dtypes are always little-endian
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+ENCODING_FLOAT = "float"
+ENCODING_BASE64 = "base64"
+
+
+class WireFormat:
+    """Negotiated representation for a vector response"""
+
+    def __init__(self, media_type: str = MEDIA_JSON, encoding: str = ENCODING_FLOAT, dtype: str = "float32"):
+        self.media_type = media_type
+        self.encoding = encoding
+        self.dtype = dtype
+
+    @property
+    def is_binary(self) -> bool:
+        return self.media_type != MEDIA_JSON
+
+
+def _parse_accept(accept: str):
+    """Yield (media_type, params) from an Accept header, highest q first"""
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        pieces = [p.strip() for p in part.split(";")]
+        if not pieces[0]:
+            continue
+        params = {}
+        for piece in pieces[1:]:
+            if "=" in piece:
+                name, value = piece.split("=", 1)
+                params[name.strip().lower()] = value.strip().strip('"')
+        try:
+            q = float(params.pop("q", 1))
+        except ValueError:
+            q = 0
+        ranges.append((-q, position, pieces[0].lower(), params))
+    for _, _, media_type, params in sorted(ranges):
+        yield media_type, params
+
+
+def negotiate(accept: Optional[str], encoding: Optional[str] = None, dtype: Optional[str] = None) -> WireFormat:
+    """
+    Pick the wire format for a vector response
+
+    Binary media types are chosen via Accept (optionally with a dtype parameter,
+    e.g. `application/octet-stream; dtype=float16`). For JSON responses the
+    `encoding` query parameter selects a float list or a base64 string.
+
+    Args:
+        accept: Accept header value
+        encoding: "float" (default) or "base64" for JSON responses
+        dtype: "float32" (default) or "float16"
+
+    Returns:
+        WireFormat
+
+    Raises:
+        ValueError: On an unknown encoding or dtype
+    """
+    if encoding is not None and encoding not in (ENCODING_FLOAT, ENCODING_BASE64):
+        raise ValueError(f"Unsupported encoding '{encoding}' (use 'float' or 'base64')")
+    if dtype is not None and dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}' (use 'float32' or 'float16')")
+
+    for media_type, params in _parse_accept(accept or ""):
+        if media_type == MEDIA_OCTET or media_type in _MSGPACK_TYPES:
+            wire_dtype = dtype or params.get("dtype", "float32")
+            if wire_dtype not in DTYPES:
+                raise ValueError(f"Unsupported dtype '{wire_dtype}' (use 'float32' or 'float16')")
+            return WireFormat(MEDIA_OCTET if media_type == MEDIA_OCTET else MEDIA_MSGPACK, ENCODING_BASE64, wire_dtype)
+        if media_type in (MEDIA_JSON, "application/*", "*/*"):
+            break
+
+    if encoding == ENCODING_BASE64:
+        return WireFormat(MEDIA_JSON, ENCODING_BASE64, dtype or "float32")
+    if dtype == "float16":
+        raise ValueError("dtype=float16 requires encoding=base64 or a binary Accept type")
+    return WireFormat()
+
+
+def to_bytes(vector: np.ndarray, dtype: str = "float32") -> bytes:
+    """Little-endian bytes of a vector (or matrix) in the wire dtype"""
+    return np.ascontiguousarray(vector, dtype=DTYPES[dtype]).tobytes()
+
+
+def from_bytes(data, dtype: str = "float32", dimensions: Optional[int] = None) -> np.ndarray:
+    """
+    Decode wire bytes without copying
+
+    The result is a read-only view over `data` (float16 is returned as-is;
+    call .astype(np.float32) if float32 math is needed).
+
+    Args:
+        data: bytes-like buffer
+        dtype: Wire dtype
+        dimensions: Reshape to (-1, dimensions) when decoding several vectors
+
+    Returns:
+        NumPy array view
+    """
+    array = np.frombuffer(data, dtype=DTYPES[dtype])
+    if dimensions is not None and array.shape[0] != dimensions:
+        array = array.reshape(-1, dimensions)
+    return array
+
+
+def encode_base64(vector: np.ndarray, dtype: str = "float32") -> str:
+    """Base64 string of the little-endian vector bytes"""
+    return base64.b64encode(to_bytes(vector, dtype)).decode("ascii")
+
+
+def decode_base64(data: str, dtype: str = "float32") -> np.ndarray:
+    """Decode a base64 vector into a NumPy view over the decoded buffer"""
+    return from_bytes(base64.b64decode(data), dtype)
+
+
+def json_fields(vector: np.ndarray, fmt: WireFormat) -> Dict:
+    """Embedding fields for a JSON response body"""
+    if fmt.encoding == ENCODING_BASE64:
+        return {"embedding": encode_base64(vector, fmt.dtype), "encoding": ENCODING_BASE64, "dtype": fmt.dtype}
+    # The array itself; the Vector schema type serializes it to a JSON list
+    return {"embedding": vector, "encoding": ENCODING_FLOAT, "dtype": "float32"}
+
+
+def binary_body(vector: np.ndarray, fmt: WireFormat, metadata: Dict) -> bytes:
+    """
+    Body for a binary response
+
+    octet-stream bodies are the raw vector bytes (metadata travels in headers);
+    msgpack bodies are a map of the metadata plus the vector as a bin field.
+    """
+    raw = to_bytes(vector, fmt.dtype)
+    if fmt.media_type == MEDIA_OCTET:
+        return raw
+    import msgpack
+    return msgpack.packb({**metadata, "embedding": raw, "dtype": fmt.dtype}, use_bin_type=True)
+
+
+def binary_headers(vector: np.ndarray, fmt: WireFormat) -> Dict[str, str]:
+    return {
+        "X-Embedding-Dimensions": str(int(np.shape(vector)[-1])),
+        "X-Embedding-Dtype": fmt.dtype,
+        "Vary": "Accept"
+    }
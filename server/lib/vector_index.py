@@ -0,0 +1,533 @@
+"""
+In-process exact vector index
+Normalized float32 vectors in a memory-mapped .npy file, shared through the
+page cache by every uvicorn worker, with top-k by matrix-vector product and
+argpartition. One writer (sync/ingest) appends rows and tombstones deletes
+under a file lock; readers pick changes up from meta.json.
+
+Layout of the index directory:
+    meta.json                  count, capacity, dimensions, generation, ...
+    vectors.<generation>.npy   (capacity, dimensions) float32
+    deleted.<generation>.npy   (capacity,) uint8 tombstones
+    records.<generation>.jsonl one {id, name, description, category, metadata} per row
+
+CLI (from server/):
+    python -m lib.vector_index sync | compact | stats
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from settings import get_settings
+from lib.metadata_index import MetadataIndex
+from lib.quantization import QuantizedVectors, normalize
+
+logger = logging.getLogger(__name__)
+
+_INITIAL_CAPACITY = 1024
+
+# Compact when this share of rows is tombstoned
+COMPACT_RATIO = 0.2
+
+# Each sync re-reads rows updated this long before the previous watermark. updated_at is
+# the writer's transaction start, so a write that began before a sync but committed after
+# it is dated before the watermark; this must exceed the longest catalog write.
+SYNC_OVERLAP_SECONDS = 300
+
+
+class SearchHit:
+    """One search result"""
+
+    __slots__ = ("row", "score", "record")
+
+    def __init__(self, row: int, score: float, record: dict):
+        self.row = row
+        self.score = score
+        self.record = record
+
+
+class VectorIndex:
+    """
+    Memory-mapped exact cosine index
+
+    Readers map the files read-only, so N workers share one copy of the
+    vectors. Appends write past `count` and publish by rewriting meta.json;
+    growth and compaction write a new generation of files, which readers
+    switch to on their next query.
+    """
+
+    def __init__(self, directory: str, dimensions: int, quantization: str = "none",
+                 quantized_dimensions: Optional[int] = None, rerank: int = 100):
+        self.directory = directory
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.quantized_dimensions = quantized_dimensions
+        self.rerank = rerank
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._meta: dict = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._deleted: Optional[np.ndarray] = None
+        self._records: List[dict] = []
+        self._rows_by_id: Dict[str, int] = {}
+        self._records_offset = 0
+        self._coarse: Optional[QuantizedVectors] = None
+        self._coarse_count = -1
+        # Constraint bitmaps, built on first filtered query
+        self.metadata = MetadataIndex(self)
+
+        if not os.path.exists(self._path("meta.json")):
+            with self._write_lock():
+                if not os.path.exists(self._path("meta.json")):
+                    self._create_generation(0, _INITIAL_CAPACITY)
+                    self._write_meta({"count": 0, "capacity": _INITIAL_CAPACITY, "dimensions": dimensions,
+                                      "generation": 0, "deleted": 0, "synced_at": None})
+        self.refresh()
+        if self._meta["dimensions"] != dimensions:
+            raise ValueError(
+                f"Vector index at {directory} has {self._meta['dimensions']} dimensions, expected {dimensions}"
+            )
+
+    # Files
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _files(self, generation: int) -> Tuple[str, str, str]:
+        return (self._path(f"vectors.{generation}.npy"),
+                self._path(f"deleted.{generation}.npy"),
+                self._path(f"records.{generation}.jsonl"))
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across processes"""
+        with open(self._path("index.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_meta(self, meta: dict) -> None:
+        # Callers hold the write lock and have refreshed, so self._meta is current
+        meta = dict(meta, version=self._meta.get("version", 0) + 1)
+        temp_path = self._path("meta.json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self._path("meta.json"))
+
+    def _create_generation(self, generation: int, capacity: int) -> None:
+        vectors_path, deleted_path, records_path = self._files(generation)
+        np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32, shape=(capacity, self.dimensions)).flush()
+        np.lib.format.open_memmap(deleted_path, mode="w+", dtype=np.uint8, shape=(capacity,)).flush()
+        open(records_path, "a").close()
+
+    def _remove_generation(self, generation: int) -> None:
+        for path in self._files(generation):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Reading
+
+    def refresh(self) -> None:
+        """Pick up appends, deletes, growth and compaction by other processes"""
+        with self._lock:
+            # A few hundred bytes; cheaper than the scan it precedes, and
+            # unlike mtimes the version cannot miss two quick writes
+            with open(self._path("meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("version") == self._meta.get("version"):
+                return
+
+            if meta["generation"] != self._meta.get("generation"):
+                vectors_path, deleted_path, _ = self._files(meta["generation"])
+                self._vectors = np.load(vectors_path, mmap_mode="r")
+                self._deleted = np.load(deleted_path, mmap_mode="r")
+                self._records = []
+                self._rows_by_id = {}
+                self._records_offset = 0
+
+            self._read_records(meta["generation"], meta["count"])
+            self._meta = meta
+
+    def _read_records(self, generation: int, count: int) -> None:
+        _, _, records_path = self._files(generation)
+        with open(records_path, "rb") as f:
+            f.seek(self._records_offset)
+            while len(self._records) < count:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                self._rows_by_id[record["id"]] = len(self._records)
+                self._records.append(record)
+            self._records_offset = f.tell()
+
+    @property
+    def version(self) -> int:
+        """Bumped on every write; changes whenever rows or tombstones do"""
+        return self._meta.get("version", 0)
+
+    @property
+    def generation(self) -> int:
+        return self._meta["generation"]
+
+    @property
+    def count(self) -> int:
+        """Rows written, including tombstoned ones"""
+        return self._meta["count"]
+
+    @property
+    def live_count(self) -> int:
+        return self._meta["count"] - self._meta["deleted"]
+
+    @property
+    def synced_at(self) -> Optional[float]:
+        return self._meta.get("synced_at")
+
+    def live_mask(self) -> np.ndarray:
+        """Boolean mask of non-deleted rows"""
+        return self._deleted[:self.count] == 0
+
+    def live_ids(self) -> List[str]:
+        self.refresh()
+        return [tech_id for tech_id, row in self._rows_by_id.items() if not self._deleted[row]]
+
+    def record(self, row: int) -> dict:
+        return self._records[row]
+
+    def row_for(self, tech_id: str) -> Optional[int]:
+        row = self._rows_by_id.get(tech_id)
+        if row is None or self._deleted[row]:
+            return None
+        return row
+
+    def vector(self, row: int) -> np.ndarray:
+        return self._vectors[row]
+
+    def matrix(self) -> np.ndarray:
+        """Read-only view of all written rows, tombstoned ones included (see live_mask)"""
+        return self._vectors[:self.count]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        rows: Optional[np.ndarray] = None,
+        mask: Optional[np.ndarray] = None
+    ) -> List[SearchHit]:
+        """
+        Top-k live rows by cosine similarity
+
+        Args:
+            query: Query vector (normalized here)
+            k: Number of results
+            rows: Scan only these row numbers (pre-filtering; cheapest for few rows)
+            mask: Boolean array of allowed rows, applied during a full scan
+
+        Returns:
+            Hits, best first
+        """
+        self.refresh()
+        with self._lock:
+            # Snapshot under the lock; the scan itself runs unlocked so
+            # concurrent queries (in threads) overlap
+            count = self.count
+            vectors, records = self._vectors, self._records
+            live = self.live_mask()
+            if mask is not None:
+                allowed = np.zeros(count, dtype=bool)
+                allowed[:min(count, len(mask))] = mask[:count]
+                live &= allowed
+            coarse = self._coarse_index(count) if self.quantization != "none" and rows is None and count else None
+
+        if count == 0 or k <= 0:
+            return []
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        if query.shape[0] != self.dimensions:
+            raise ValueError(f"Query has {query.shape[0]} dimensions, index has {self.dimensions}")
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            rows = np.sort(rows[live[rows]])
+            scores = vectors[rows] @ query
+        elif coarse is not None:
+            indices, coarse_scores = coarse.search(query, k, self.rerank, mask=live)
+            rows, scores = indices[0], coarse_scores[0]
+        else:
+            rows = np.arange(count)
+            scores = vectors[:count] @ query
+            scores[~live] = -np.inf
+
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            SearchHit(int(rows[i]), float(scores[i]), records[rows[i]])
+            for i in top if np.isfinite(scores[i])
+        ]
+
+    def _coarse_index(self, count: int) -> QuantizedVectors:
+        # Per-process compact copy, rebuilt after appends
+        if self._coarse is None or self._coarse_count != count or self._coarse.full is not self._vectors:
+            self._coarse = QuantizedVectors.build(self._vectors[:count], self.quantized_dimensions, self.quantization)
+            self._coarse.full = self._vectors
+            self._coarse_count = count
+        return self._coarse
+
+    # Writing
+
+    def upsert(self, records: List[dict], vectors: Iterable[np.ndarray]) -> int:
+        """
+        Append records; an existing id is tombstoned and re-appended
+
+        Args:
+            records: {id, name, description, category, metadata} dicts
+            vectors: One vector per record
+
+        Returns:
+            Rows appended
+        """
+        matrix = normalize(np.vstack([np.asarray(v, dtype=np.float32) for v in vectors]))
+        if matrix.shape != (len(records), self.dimensions):
+            raise ValueError(f"Expected {len(records)} vectors of {self.dimensions} dimensions, got {matrix.shape}")
+        # Last occurrence of an id within the batch wins
+        latest = {record["id"]: i for i, record in enumerate(records)}
+        if len(latest) < len(records):
+            keep = sorted(latest.values())
+            records, matrix = [records[i] for i in keep], matrix[keep]
+
+        with self._write_lock(), self._lock:
+            self.refresh()
+            meta = dict(self._meta)
+            if meta["count"] + len(records) > meta["capacity"]:
+                meta = self._grow(meta, meta["count"] + len(records))
+
+            vectors_path, deleted_path, records_path = self._files(meta["generation"])
+            deleted = np.load(deleted_path, mmap_mode="r+")
+            for record in records:
+                row = self._rows_by_id.get(record["id"])
+                if row is not None and not deleted[row]:
+                    deleted[row] = 1
+                    meta["deleted"] += 1
+            deleted.flush()
+
+            start = meta["count"]
+            writable = np.load(vectors_path, mmap_mode="r+")
+            writable[start:start + len(records)] = matrix
+            writable.flush()
+            with open(records_path, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+            meta["count"] = start + len(records)
+            self._write_meta(meta)
+            self.refresh()
+        return len(records)
+
+    def delete(self, tech_ids: Iterable[str]) -> int:
+        """Tombstone rows by id; returns how many were live"""
+        with self._write_lock(), self._lock:
+            self.refresh()
+            meta = dict(self._meta)
+            _, deleted_path, _ = self._files(meta["generation"])
+            deleted = np.load(deleted_path, mmap_mode="r+")
+            removed = 0
+            for tech_id in tech_ids:
+                row = self._rows_by_id.get(tech_id)
+                if row is not None and not deleted[row]:
+                    deleted[row] = 1
+                    removed += 1
+            if removed:
+                deleted.flush()
+                meta["deleted"] += removed
+                self._write_meta(meta)
+                self.refresh()
+        return removed
+
+    def _grow(self, meta: dict, needed: int) -> dict:
+        capacity = meta["capacity"]
+        while capacity < needed:
+            capacity *= 2
+        return self._rewrite(meta, np.arange(meta["count"]), capacity)
+
+    def _rewrite(self, meta: dict, keep: np.ndarray, capacity: int) -> dict:
+        """Copy the kept rows into a new generation and publish it"""
+        old_generation = meta["generation"]
+        generation = old_generation + 1
+        self._create_generation(generation, capacity)
+        vectors_path, deleted_path, records_path = self._files(generation)
+
+        vectors = np.load(vectors_path, mmap_mode="r+")
+        deleted = np.load(deleted_path, mmap_mode="r+")
+        for start in range(0, len(keep), 65536):
+            block = keep[start:start + 65536]
+            vectors[start:start + len(block)] = self._vectors[block]
+            deleted[start:start + len(block)] = self._deleted[block]
+        vectors.flush()
+        deleted.flush()
+        with open(records_path, "w") as f:
+            for row in keep:
+                f.write(json.dumps(self._records[row], separators=(",", ":")) + "\n")
+
+        meta = dict(meta, generation=generation, capacity=capacity, count=len(keep),
+                    deleted=int((self._deleted[keep] != 0).sum()))
+        self._write_meta(meta)
+        self.refresh()
+        # A reader that read the previous meta.json may not have mapped its
+        # files yet, so that generation stays until the next rewrite; readers
+        # still holding an older mapping keep reading the unlinked inode
+        self._remove_generation(old_generation - 1)
+        return meta
+
+    def compact(self, force: bool = False) -> bool:
+        """Drop tombstoned rows once they exceed COMPACT_RATIO (or always with force)"""
+        with self._write_lock(), self._lock:
+            self.refresh()
+            meta = dict(self._meta)
+            if not meta["deleted"] or (not force and meta["deleted"] < COMPACT_RATIO * meta["count"]):
+                return False
+            keep = np.flatnonzero(self.live_mask())
+            capacity = max(_INITIAL_CAPACITY, 1 << int(np.ceil(np.log2(max(len(keep), 1) * 1.25))))
+            self._rewrite(meta, keep, capacity)
+            logger.info(f"Compacted vector index: {meta['count']} -> {len(keep)} rows")
+            return True
+
+    def set_synced_at(self, timestamp: float) -> None:
+        with self._write_lock(), self._lock:
+            self.refresh()
+            self._write_meta(dict(self._meta, synced_at=timestamp))
+            self.refresh()
+
+    def stats(self) -> dict:
+        self.refresh()
+        return {
+            "directory": self.directory,
+            "rows": self.count,
+            "live_rows": self.live_count,
+            "deleted_rows": self._meta["deleted"],
+            "capacity": self._meta["capacity"],
+            "dimensions": self.dimensions,
+            "generation": self._meta["generation"],
+            "quantization": self.quantization,
+            "synced_at": self.synced_at,
+            "vector_bytes": self.count * self.dimensions * 4
+        }
+
+
+async def sync_from_db(index: VectorIndex, page_size: int = 2000) -> dict:
+    """
+    Bring the index up to date with the technologies table
+
+    Rows updated since the last sync (less SYNC_OVERLAP_SECONDS) are upserted;
+    ids no longer in the table are tombstoned; the index is compacted when
+    enough rows are dead. The watermark is the database clock, the same clock
+    that sets updated_at.
+
+    Returns:
+        {"upserted", "deleted", "compacted"}
+    """
+    from lib import db
+
+    since = index.synced_at
+    pool = await db.get_pool()
+    upserted = 0
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # Transaction start: every row committed before the read below is dated earlier
+            started = await conn.fetchval("SELECT extract(epoch FROM now())::float8")
+            cursor = conn.cursor(
+                "SELECT id, name, description, category, metadata, embedding FROM technologies "
+                "WHERE embedding IS NOT NULL AND ($1::float8 IS NULL OR updated_at >= to_timestamp($1 - $2)) "
+                "ORDER BY updated_at",
+                since, float(SYNC_OVERLAP_SECONDS)
+            )
+            batch: List = []
+            async for row in cursor:
+                batch.append(row)
+                if len(batch) >= page_size:
+                    upserted += _upsert_rows(index, batch)
+                    batch = []
+            if batch:
+                upserted += _upsert_rows(index, batch)
+        current_ids = {row["id"] for row in await conn.fetch("SELECT id FROM technologies WHERE embedding IS NOT NULL")}
+
+    missing = [tech_id for tech_id in index.live_ids() if tech_id not in current_ids]
+    deleted = index.delete(missing) if missing else 0
+    compacted = index.compact()
+    # Rows written while this sync ran are picked up again next time (upserts are idempotent)
+    index.set_synced_at(started)
+    return {"upserted": upserted, "deleted": deleted, "compacted": compacted}
+
+
+def _upsert_rows(index: VectorIndex, rows: List) -> int:
+    records = [
+        {"id": row["id"], "name": row["name"], "description": row["description"],
+         "category": row["category"], "metadata": row["metadata"] or {}}
+        for row in rows
+    ]
+    return index.upsert(records, [row["embedding"] for row in rows])
+
+
+# Thread-safe singleton
+_vector_index: Optional[VectorIndex] = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """Shared local index, or None when VECTOR_INDEX_DIR is not configured"""
+    global _vector_index
+    settings = get_settings()
+    if not settings.vector_index_dir:
+        return None
+    if _vector_index is None:
+        with _vector_index_lock:
+            if _vector_index is None:
+                _vector_index = VectorIndex(
+                    settings.vector_index_dir,
+                    settings.embedding_dimensions,
+                    quantization=settings.vector_index_quantization,
+                    quantized_dimensions=settings.vector_index_quantized_dimensions
+                )
+    return _vector_index
+
+
+def main() -> None:
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Local vector index maintenance")
+    parser.add_argument("command", choices=["sync", "compact", "stats"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = get_vector_index()
+    if index is None:
+        raise SystemExit("VECTOR_INDEX_DIR is not set")
+
+    if args.command == "sync":
+        from lib import db
+
+        async def run():
+            try:
+                return await sync_from_db(index)
+            finally:
+                await db.close_pool()
+
+        print(json.dumps(asyncio.run(run())))
+    elif args.command == "compact":
+        print(json.dumps({"compacted": index.compact(force=True)}))
+    print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
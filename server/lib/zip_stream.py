@@ -0,0 +1,148 @@
+"""
+Incremental ZIP archive streaming
+Builds a ZIP archive entry by entry from async byte sources so the full
+archive never sits in memory, with bounded concurrent prefetch of entries
+"""
+import asyncio
+import io
+import logging
+import time
+import zipfile
+from typing import AsyncIterator, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chunks buffered per prefetched entry before its producer blocks
+DEFAULT_QUEUE_CHUNKS = 4
+
+_END = object()
+
+
+class ZipEntry:
+    """A file to place in the archive"""
+
+    def __init__(self, arcname: str, key: str, last_modified: Optional[float] = None):
+        self.arcname = arcname
+        self.key = key
+        self.last_modified = last_modified
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that collects zipfile output until drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._offset += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _produce(source: AsyncIterator[bytes], queue: asyncio.Queue) -> None:
+    try:
+        async for chunk in source:
+            await queue.put(chunk)
+        await queue.put(_END)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        await queue.put(e)
+
+
+async def stream_zip(
+    entries: List[ZipEntry],
+    open_source: Callable[[str], AsyncIterator[bytes]],
+    prefetch: int = 4,
+    compress: bool = False,
+    queue_chunks: int = DEFAULT_QUEUE_CHUNKS
+) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive of the given entries
+
+    Up to `prefetch` entries are fetched concurrently ahead of the one being
+    written. Each fetch buffers at most `queue_chunks` chunks, so memory stays
+    bounded by prefetch * queue_chunks * chunk size regardless of archive size.
+    Entries are written with data descriptors and ZIP64 headers, so sizes do
+    not need to be known up front.
+
+    Args:
+        entries: Files to archive, in output order
+        open_source: Returns an async iterator of content chunks for a key
+        prefetch: Number of entries fetched concurrently
+        compress: Deflate entries (CPU-bound; stored by default)
+        queue_chunks: Chunks buffered per in-flight entry
+
+    Yields:
+        Archive bytes as they are produced
+    """
+    prefetch = max(1, prefetch)
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, mode='w', compression=compression, allowZip64=True)
+
+    queues: List[asyncio.Queue] = []
+    tasks: List[asyncio.Task] = []
+
+    def start_next() -> None:
+        entry = entries[len(tasks)]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_chunks)
+        queues.append(queue)
+        tasks.append(asyncio.create_task(_produce(open_source(entry.key), queue)))
+
+    try:
+        for index, entry in enumerate(entries):
+            while len(tasks) < min(len(entries), index + prefetch):
+                start_next()
+
+            timestamp = time.localtime(entry.last_modified) if entry.last_modified else time.localtime()
+            info = zipfile.ZipInfo(entry.arcname, date_time=timestamp[:6])
+            info.compress_type = compression
+
+            with archive.open(info, mode='w', force_zip64=True) as member:
+                queue = queues[index]
+                while True:
+                    item = await queue.get()
+                    if item is _END:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if compress:
+                        await asyncio.to_thread(member.write, item)
+                    else:
+                        member.write(item)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            # Release the finished entry's queue
+            queues[index] = None
+            data = sink.drain()
+            if data:
+                yield data
+
+        archive.close()
+        data = sink.drain()
+        if data:
+            yield data
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        if archive.fp is not None:
+            # Aborted mid-archive; close without emitting the rest
+            archive.close()
+            sink.drain()
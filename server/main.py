@@ -1,11 +1,20 @@
-from fastapi import FastAPI, Request
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import time
 import logging
 
-from api import github, npm, libraries, stackoverflow, b2, ai, embeddings, recommend
+from api import github, npm, libraries, stackoverflow, b2, ai, embeddings, recommend, jobs
 from settings import get_settings
+from middleware.internal_auth import verify_internal_key
+from lib.metrics import get_metrics
+from lib import db
+from lib.enrichment import warm_enrichments
+from lib.jobs import get_job_runner
+from lib.knn_graph import graph_directory, update_graph
+from lib.vector_index import get_vector_index, sync_from_db
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,13 +35,72 @@ if IS_PRODUCTION and settings.enable_dev_mode:
         "Authentication bypass is active!"
     )
 
+
+async def sync_vector_index(index, interval: int):
+    """Keep the local vector index (and the similar-technology graph) in step with Postgres"""
+    while True:
+        try:
+            result = await sync_from_db(index)
+            logger.info(f"Vector index sync: {result}")
+            if settings.knn_graph_auto_update:
+                await asyncio.to_thread(update_graph, graph_directory(), index, settings.knn_graph_k)
+        except Exception as e:
+            logger.warning(f"Vector index sync failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def warm_llm_cache(top: int):
+    """Pre-generate enrichments for the most popular technologies (workers share them via LLM_CACHE_PATH)"""
+    try:
+        await warm_enrichments(top)
+    except Exception as e:
+        logger.warning(f"Enrichment cache warm-up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the DB pool up front; routes that need it retry lazily if it is down now.
+    # Migrations go first: pooled connections need the vector type from migration 001
+    try:
+        if settings.db_auto_migrate:
+            await db.apply_migrations()
+        await db.init_pool()
+    except Exception as e:
+        logger.warning(f"Database not available at startup: {e}")
+
+    sync_task = None
+    index = get_vector_index()
+    if index is not None and settings.vector_index_sync_seconds > 0:
+        sync_task = asyncio.create_task(sync_vector_index(index, settings.vector_index_sync_seconds))
+    warm_task = None
+    if settings.llm_cache_warm_top > 0 and settings.llm_cache_ttl_seconds > 0:
+        warm_task = asyncio.create_task(warm_llm_cache(settings.llm_cache_warm_top))
+    runner = None
+    if settings.job_workers > 0:
+        try:
+            runner = get_job_runner()
+            runner.start()
+        except Exception as e:
+            logger.warning(f"Job workers not started: {e}")
+    yield
+    for task in (sync_task, warm_task):
+        if task is not None:
+            task.cancel()
+    if runner is not None:
+        # Jobs still running go back to the queue (kept across restarts with the redis backend)
+        await runner.stop()
+        await runner.store.close()
+    await db.close_pool()
+
+
 app = FastAPI(
     title="Stack Compare Backend API",
     description="Production-grade backend for Stack Compare - handles GitHub, npm, Libraries.io, StackOverflow, Backblaze B2, and AI/ML operations",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # CORS middleware with validation and edge case handling
@@ -88,6 +156,12 @@ async def health_check():
     return {"status": "healthy", "service": "stack-compare-backend"}
 
 
+# In-process metrics (cache hit ratios, bytes saved, ...)
+@app.get("/metrics", dependencies=[Depends(verify_internal_key)])
+async def metrics():
+    return get_metrics().snapshot()
+
+
 # Include routers
 app.include_router(github.router, prefix="/api/github", tags=["GitHub"])
 app.include_router(npm.router, prefix="/api/npm", tags=["npm"])
@@ -97,6 +171,7 @@ app.include_router(b2.router, prefix="/api/b2", tags=["Backblaze B2"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI/LLM"])
 app.include_router(embeddings.router, prefix="/api/embeddings", tags=["Embeddings"])
 app.include_router(recommend.router, prefix="/api/recommend", tags=["Recommendations"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 
 
 # Global exception handler
@@ -0,0 +1,13 @@
+-- Technology catalog with embeddings (pgvector)
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS technologies (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    category TEXT,
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+    embedding vector(1536),
+    embedding_model TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,11 @@
+-- Approximate cosine top-k index on technology embeddings.
+-- m / ef_construction trade build time and memory for recall; rebuild with
+-- different parameters via `python -m lib.db index`. Query-time recall is
+-- tuned per query with hnsw.ef_search (HNSW_EF_SEARCH).
+SET LOCAL maintenance_work_mem = '512MB';
+
+CREATE INDEX IF NOT EXISTS technologies_embedding_idx
+    ON technologies USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+ANALYZE technologies;
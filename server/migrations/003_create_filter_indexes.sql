@@ -0,0 +1,30 @@
+-- Index for recommendation constraint filters (lib.db._filter_sql).
+-- Selective filters are answered by an exact scan of the matching rows, which
+-- the planner finds through this index instead of reading the whole table.
+-- technology_filter_terms() flattens category and the language, license and
+-- platform metadata (scalar or list) into lowercase "field:value" terms; each
+-- filter is an overlap (&&) with a GIN index on them.
+-- The field list must match lib.metadata_index.FILTER_FIELDS.
+CREATE OR REPLACE FUNCTION technology_filter_terms(category TEXT, metadata JSONB)
+RETURNS TEXT[] LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT term), '{}')
+    FROM (
+        SELECT 'category:' || lower(category) AS term
+        UNION ALL
+        SELECT field || ':' || lower(value)
+        FROM unnest(ARRAY['language', 'license', 'platform']) AS field
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(metadata->field) = 'array' THEN metadata->field END
+        ) AS value
+        UNION ALL
+        SELECT field || ':' || lower(metadata->>field)
+        FROM unnest(ARRAY['language', 'license', 'platform']) AS field
+        WHERE jsonb_typeof(metadata->field) <> 'array'
+    ) AS terms
+    WHERE term IS NOT NULL
+$$;
+
+CREATE INDEX IF NOT EXISTS technologies_filter_terms_idx
+    ON technologies USING gin (technology_filter_terms(category, metadata));
+
+ANALYZE technologies;
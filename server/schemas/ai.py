@@ -16,6 +16,23 @@ class EnrichTechResponse(BaseModel):
     use_cases: List[str]
 
 
+class EnrichTechBatchRequest(BaseModel):
+    technologies: List[EnrichTechRequest]
+
+
+class EnrichTechBatchItem(BaseModel):
+    tech_name: str
+    context: Optional[str] = None
+    profile: Optional[EnrichTechResponse] = None  # None when generation failed
+    cache: str  # "hit", "miss" (generated by this request), "wait" (shared another request's) or "failed"
+
+
+class EnrichTechBatchResponse(BaseModel):
+    results: List[EnrichTechBatchItem]
+    completions: int  # LLM calls made for this request
+    failed: int
+
+
 class EnrichStackRequest(BaseModel):
     technologies: List[str]
     project_type: Optional[str] = None
@@ -31,8 +48,11 @@ class EnrichStackResponse(BaseModel):
 class RerankRequest(BaseModel):
     query: str
     candidates: List[Dict]
+    top_k: Optional[int] = None  # Candidates reranked by the LLM after local scoring (defaults to RERANK_LLM_TOP_K)
+    budget_ms: Optional[int] = None  # Time allowed for the LLM stage (defaults to RERANK_LLM_BUDGET_MS)
 
 
 class RerankResponse(BaseModel):
     ranked_results: List[Dict]
     scores: List[float]
+    stages: List[str]  # "llm" or "local": which stage produced each score
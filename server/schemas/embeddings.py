@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional, Union
+from schemas.vector import Vector
 
 
 class TechEmbeddingRequest(BaseModel):
@@ -9,15 +10,48 @@ class TechEmbeddingRequest(BaseModel):
 
 class TechEmbeddingResponse(BaseModel):
     tech_name: str
-    embedding: List[float]
+    embedding: Union[Vector, str]  # float list, or base64 little-endian when encoding="base64"
     dimensions: int
+    encoding: str = "float"
+    dtype: str = "float32"
 
 
 class ProjectEmbeddingRequest(BaseModel):
     project_description: str
     requirements: List[str] = []
+    return_chunks: bool = False  # Include per-chunk vectors for long descriptions
+
+
+class EmbeddingChunk(BaseModel):
+    index: int
+    heading: str
+    text: str
+    tokens: int
+    embedding: Union[Vector, str]
 
 
 class ProjectEmbeddingResponse(BaseModel):
-    embedding: List[float]
+    embedding: Union[Vector, str]  # Pooled over chunks for long descriptions
+    dimensions: int
+    encoding: str = "float"
+    dtype: str = "float32"
+    chunk_count: int = 1
+    chunks: Optional[List[EmbeddingChunk]] = None
+
+
+class ReadmeEmbeddingRequest(BaseModel):
+    owner: str
+    repo: str
+    return_chunks: bool = False
+
+
+class ReadmeEmbeddingResponse(BaseModel):
+    owner: str
+    repo: str
+    sha: str
+    embedding: Union[Vector, str]
     dimensions: int
+    encoding: str = "float"
+    dtype: str = "float32"
+    chunk_count: int
+    chunks: Optional[List[EmbeddingChunk]] = None
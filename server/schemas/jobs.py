@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, HttpUrl
+from typing import Any, Dict, List, Optional
+from schemas.github import RepoStatsRequest
+
+
+class JobSubmitRequest(BaseModel):
+    kind: str  # "enrich-tech-batch", "enrich-stack", "rerank", "github-repo-stats" or "ingest"
+    payload: Dict[str, Any] = {}  # The kind's request body
+    priority: str = "normal"  # "high", "normal" or "low"
+    webhook_url: Optional[HttpUrl] = None  # Receives the finished job as a POST
+
+
+class JobProgress(BaseModel):
+    done: int
+    total: int
+    message: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    priority: str
+    status: str  # "queued", "running", "succeeded", "failed" or "cancelled"
+    progress: JobProgress
+    result: Optional[Any] = None  # The kind's response body once succeeded
+    error: Optional[str] = None
+    webhook: Optional[str] = None  # "delivered" or "failed" once attempted
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class RepoStatsJobRequest(BaseModel):
+    repos: List[RepoStatsRequest]
+
+
+class IngestJobRequest(BaseModel):
+    records: List[Dict[str, Any]]  # {"tech_name", "description", ...} as in /api/embeddings/ingest
+    batch_size: int = Field(256, ge=1, le=2048)  # Same bounds as /api/embeddings/ingest
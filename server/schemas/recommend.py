@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+from schemas.vector import Vector
 
 
 class RecommendationRequest(BaseModel):
@@ -7,6 +8,12 @@ class RecommendationRequest(BaseModel):
     requirements: List[str] = []
     constraints: Optional[Dict] = {}
     limit: int = 10
+    query_embedding: Optional[Vector] = None  # Precomputed project embedding; skips the embedding call
+    ef_search: Optional[int] = None  # HNSW search breadth for this query (defaults to HNSW_EF_SEARCH)
+    vector_weight: Optional[float] = None  # Fusion weight of embedding similarity (defaults to HYBRID_VECTOR_WEIGHT)
+    lexical_weight: Optional[float] = None  # Fusion weight of name/description matches (defaults to HYBRID_LEXICAL_WEIGHT)
+    rerank: Optional[bool] = None  # LLM rerank of the fused results (default: on for /stream, off otherwise)
+    deadline_ms: Optional[int] = None  # Request budget; a rerank that would exceed it is dropped (or X-Deadline-Ms)
 
 
 class TechRecommendation(BaseModel):
@@ -15,9 +22,41 @@ class TechRecommendation(BaseModel):
     similarity_score: float
     category: str
     reason: str
+    retrievers: List[str] = []  # "vector" and/or "lexical": which retrievers returned this result
+    fusion_score: Optional[float] = None  # Reciprocal rank fusion score (the order unless reranked)
+    rerank_score: Optional[float] = None  # LLM relevance in [0, 1] when the results were reranked
 
 
 class RecommendationResponse(BaseModel):
     recommendations: List[TechRecommendation]
     total_candidates: int
     query_embedding_dimensions: int
+    engine: Optional[str] = None  # "local", "pgvector", "local-fallback" or "lexical" (vector search unavailable)
+    stage: Optional[str] = None  # "retrieval" (fused order) or "reranked"
+
+
+class SimilarTechnology(BaseModel):
+    tech_id: str
+    tech_name: str
+    category: str
+    similarity_score: float
+
+
+class SimilarTechnologiesResponse(BaseModel):
+    tech_id: str
+    similar: List[SimilarTechnology]
+    built_at: Optional[float] = None  # When the neighbour graph was computed (unix time)
+
+
+class AutocompleteSuggestion(BaseModel):
+    tech_id: str
+    tech_name: str
+    category: str
+    matched: str  # Name or alias that matched the typed text
+    score: float
+    distance: int = 0  # Edits for fuzzy matches
+
+
+class AutocompleteResponse(BaseModel):
+    query: str
+    suggestions: List[AutocompleteSuggestion]
@@ -0,0 +1,54 @@
+from typing import Annotated, Any, Optional
+
+import numpy as np
+from pydantic import GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic_core import core_schema
+
+
+class VectorSchema:
+    """
+    Pydantic annotation for float32 vectors backed by a contiguous NumPy array
+
+    Input (list, tuple or ndarray) is converted and validated once as a whole:
+    1-D, optional fixed length, all finite. JSON output is a float list;
+    Python-mode dumps keep the array.
+    """
+
+    def __init__(self, dimensions: Optional[int] = None):
+        self.dimensions = dimensions
+
+    def validate(self, value: Any) -> np.ndarray:
+        if isinstance(value, (str, bytes)):
+            raise ValueError("vector must be a list of numbers")
+        try:
+            array = np.ascontiguousarray(value, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("vector must be a list of numbers")
+        if array.ndim != 1:
+            raise ValueError(f"vector must be 1-dimensional, got shape {array.shape}")
+        if self.dimensions is not None and array.shape[0] != self.dimensions:
+            raise ValueError(f"vector must have {self.dimensions} dimensions, got {array.shape[0]}")
+        if not np.isfinite(array).all():
+            raise ValueError("vector must contain only finite values")
+        return array
+
+    @staticmethod
+    def serialize(array: np.ndarray) -> list:
+        # The float64 value of each float32 parses back to the same float32;
+        # fixed-decimal rounding would drop digits of small components
+        return array.astype(np.float64).tolist()
+
+    def __get_pydantic_core_schema__(self, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            self.validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(self.serialize, when_used="json")
+        )
+
+    def __get_pydantic_json_schema__(self, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler) -> dict:
+        json_schema = {"type": "array", "items": {"type": "number"}}
+        if self.dimensions is not None:
+            json_schema.update(minItems=self.dimensions, maxItems=self.dimensions)
+        return json_schema
+
+
+Vector = Annotated[np.ndarray, VectorSchema()]
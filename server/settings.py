@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import SecretStr
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -8,12 +9,57 @@ class Settings(BaseSettings):
     
     # Database
     database_url: SecretStr
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_statement_cache_size: int = 1024  # Prepared statements cached per connection; 0 behind transaction-mode PgBouncer
+    db_command_timeout: float = 10.0
+    db_auto_migrate: bool = False  # Apply pending migrations/ at startup
+    hnsw_ef_search: int = 40  # Default HNSW candidate list size per query (recall vs latency)
+    ivfflat_probes: int = 10  # Lists searched per query when the index is rebuilt as IVFFlat
+    
+    # Recommendation engine
+    recommend_engine: str = "auto"  # "auto", "local" (in-process index) or "pgvector"
+    vector_index_dir: Optional[str] = None  # Memory-mapped local index (disabled when unset)
+    local_index_max_rows: int = 300000  # "auto" serves catalogs up to this size from the local index
+    vector_index_sync_seconds: int = 0  # Background sync from Postgres (0 = CLI/cron only)
+    vector_index_quantization: str = "none"  # "none" (exact), "int8" or "float16" coarse scan with re-ranking
+    vector_index_quantized_dimensions: Optional[int] = None  # Truncate the coarse copy, e.g. 256
+    filter_prefilter_ratio: float = 0.25  # Local index: score only matching rows below this match ratio, else mask the scan
+    filter_exact_max_rows: int = 20000  # pgvector: exact scan of matches up to this many, else over-fetch from HNSW
+    hybrid_vector_weight: float = 1.0  # Reciprocal rank fusion weight of the embedding retriever
+    hybrid_lexical_weight: float = 1.0  # Reciprocal rank fusion weight of the BM25 retriever (0 disables it)
+    rrf_k: int = 60  # Rank damping in reciprocal rank fusion
+    hybrid_depth: int = 50  # Results taken from each retriever before fusion
+    hybrid_budget_ms: int = 1000  # Latency budget shared by the parallel retrievers
+    catalog_view_refresh_seconds: int = 300  # Rebuild interval of the BM25 and autocomplete indexes when loaded from Postgres
+    recommend_cache_size: int = 1000  # Cached recommendation results (0 disables the cache)
+    recommend_cache_ttl_seconds: int = 600
+    recommend_cache_similarity: float = 0.95  # Query embeddings at least this cosine-similar share a cached result
+    recommend_deadline_ms: int = 8000  # Default per-request budget; a rerank still running at the deadline is dropped
+    recommend_rerank_candidates: int = 20  # Fused results passed to the LLM rerank
+    knn_graph_dir: Optional[str] = None  # Similar-technology graph (defaults to knn/ in VECTOR_INDEX_DIR)
+    knn_graph_k: int = 20  # Neighbours stored per technology
+    knn_graph_auto_update: bool = False  # Update the graph after each background vector index sync
+    compatibility_dir: Optional[str] = None  # Pairwise compatibility matrix (defaults to compatibility/ in VECTOR_INDEX_DIR)
+    compatibility_llm_pairs: int = 100  # Pairs without data the LLM may score per stack (0 = never)
     
     # External API Keys
     github_token: SecretStr
     stackoverflow_api_key: SecretStr
     libraries_io_api_key: SecretStr
     openai_api_key: SecretStr
+    ai_model: str = "gpt-4o-mini"  # Chat model for reranking and enrichment
+    ai_api_base: str = "https://api.openai.com/v1"
+    ai_timeout_seconds: float = 30.0
+    ai_max_concurrency: int = 4  # Chat completions in flight per process
+    ai_tokens_per_minute: int = 0  # Provider TPM limit to stay under (0 = unlimited)
+    ai_batch_max_tokens: int = 4000  # Completion budget per batched enrichment call
+    rerank_llm_top_k: int = 10  # /api/ai/rerank candidates passed to the chat model after local scoring (0 = local only)
+    rerank_llm_budget_ms: int = 3000  # Time allowed for that LLM stage; past it the local scores are returned
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600  # Generated enrichments are reused this long (0 disables the cache)
+    llm_cache_size: int = 2000  # In-process LRU entries
+    llm_cache_path: Optional[str] = None  # SQLite file shared by workers and restarts (memory only when unset)
+    llm_cache_warm_top: int = 0  # Enrich the N most popular technologies in the background at startup
     
     # Backblaze B2
     b2_key_id: SecretStr
@@ -21,6 +67,39 @@ class Settings(BaseSettings):
     b2_bucket: str
     b2_bucket_id: str
     b2_endpoint: str
+    b2_content_addressed: bool = False  # Store uploads under their SHA-256 digest and skip duplicates
+    b2_cache_dir: Optional[str] = None  # Local read-through download cache (disabled when unset)
+    b2_cache_max_bytes: int = 1024 * 1024 * 1024
+    b2_cache_revalidate_seconds: int = 60  # Serve without an ETag check for this long after validation
+    
+    # Embeddings
+    embedding_backend: str = "openai"  # "openai" or "local" (offline, deterministic)
+    embedding_fallback_backend: Optional[str] = None  # e.g. "local" for degraded mode when the primary fails
+    local_embedding_seed: int = 0
+    embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 1536
+    embedding_api_base: str = "https://api.openai.com/v1"
+    embedding_batch_window_ms: float = 10.0  # Max time a request waits for batch-mates
+    embedding_batch_min_window_ms: float = 1.0  # Window floor at low concurrency
+    embedding_max_batch_size: int = 256
+    embedding_max_batch_tokens: int = 100000
+    embedding_max_concurrent_batches: int = 4
+    embedding_cache_size: int = 10000  # In-process LRU entries
+    embedding_cache_path: Optional[str] = None  # SQLite file for the persistent tier (disabled when unset)
+    embedding_cache_version: str = "1"  # Bump to invalidate all cached vectors
+    embedding_chunk_tokens: int = 512  # Long documents are split into chunks of about this size
+    embedding_chunk_overlap_tokens: int = 64
+    ingest_checkpoint_dir: str = ".ingest_checkpoints"  # Resume points for /api/embeddings/ingest sources
+    
+    # Background jobs
+    job_backend: str = "memory"  # "memory" (single process) or "redis" (shared by all workers)
+    redis_url: Optional[str] = None  # e.g. redis://localhost:6379/0 for the "redis" job backend
+    job_workers: int = 4  # Jobs run at once per process (0 = accept jobs but run none here)
+    job_max_queued: int = 10000  # Submissions are refused with 503 beyond this backlog
+    job_timeout_seconds: int = 1800  # A job running longer fails (0 = no limit)
+    job_ttl_seconds: int = 24 * 3600  # Finished jobs can be polled this long
+    job_lease_seconds: int = 60  # A job whose worker stops renewing this lease runs again ("redis" backend)
+    job_webhook_timeout_seconds: float = 10.0
     
     # Auth
     neon_auth_secret: SecretStr
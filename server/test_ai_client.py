@@ -0,0 +1,386 @@
+"""Test suite for lib.ai_client reranking and enrichment"""
+import asyncio
+import json
+
+import httpx
+import pytest
+from lib import enrichment, llm_cache, recommender, reranker
+from lib.ai_client import PROFILE_TOKENS, AIClient, parse_profile, parse_stack
+from lib.embedding_backends import LocalHashingBackend
+from lib.embeddings_client import EmbeddingsClient
+from lib.enrichment import pack_batches
+from lib.llm_cache import LLMCache
+from lib.metrics import Metrics
+from lib.recommender import Candidate, rerank_candidates
+
+CANDIDATES = [
+    {"name": "React", "category": "Frontend", "description": "UI library"},
+    {"name": "Kafka", "category": "Messaging", "description": "Event streaming"},
+    {"name": "Redis", "category": None, "description": "In-memory store"},
+]
+
+PROFILE = {"tagline": "Event streaming platform", "pros": ["Durable"], "cons": ["Operational overhead"],
+           "features": ["Partitions"], "metrics": {"popularity": "high"}, "use_cases": ["Event sourcing"]}
+
+
+STACK = {"compatibility_score": 0.85, "strengths": ["Mature drivers", "One event model"],
+         "weaknesses": ["Two datastores"], "recommendations": ["Add tracing"]}
+
+
+def completion(content):
+    return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(content)}}]})
+
+
+def streamed(deltas):
+    chunks = [{"choices": [{"delta": {"content": delta}}]} for delta in deltas] + [{"choices": []}]
+    body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+    return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+
+class TestAIClient:
+    """Test cases for AIClient"""
+
+    def test_rerank_aligns_scores_with_candidates(self):
+        """Test that scores map back by candidate number and bad entries are ignored"""
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return completion({"scores": [{"index": 2, "score": 0.9}, {"index": 1, "score": 1.7},
+                                          {"index": 9, "score": 0.5}, {"index": "x"}]})
+
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        scores = asyncio.run(client.rerank("event-driven backend", CANDIDATES))
+        assert scores == [1.0, 0.9, 0.0]
+        prompt = requests[0]["messages"][1]["content"]
+        assert "2. Kafka [Messaging]: Event streaming" in prompt and "3. Redis: In-memory store" in prompt
+        assert requests[0]["response_format"] == {"type": "json_object"}
+
+    def test_rerank_candidates_orders_by_score(self, monkeypatch):
+        """Test that candidates are reordered by model score, ties keeping fused order"""
+        class FakeClient:
+            async def rerank(self, query, candidates):
+                return [0.2, 0.8, 0.2]
+
+        monkeypatch.setattr(recommender, "get_ai_client", lambda: FakeClient())
+        candidates = [Candidate(c["name"].lower(), c["name"], c["description"], c["category"], {}, 0.5)
+                      for c in CANDIDATES]
+        reranked = asyncio.run(rerank_candidates("event-driven backend", candidates))
+        assert [c.tech_id for c in reranked] == ["kafka", "react", "redis"]
+        assert reranked[0].rerank_score == 0.8
+
+    def test_score_pairs(self):
+        """Test that pair scores are clamped, aligned by number, and None where skipped"""
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return completion({"scores": [{"index": 1, "score": 1.3}, {"index": 3, "score": "x"}]})
+
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        scores = asyncio.run(client.score_pairs([("Express", "Mongoose"), ("React", "Django"), ("Vue", "Vite")]))
+        assert scores == [1.0, None, None]
+        assert "2. React + Django" in requests[0]["messages"][1]["content"]
+
+    def test_parse_profile(self):
+        """Test that profiles are validated against the response shape, numbers becoming strings"""
+        profile = parse_profile(dict(PROFILE, tagline=" Event streaming ", metrics={"stars": 27000}))
+        assert profile["tagline"] == "Event streaming" and profile["metrics"] == {"stars": "27000"}
+        for broken in ({"tagline": ""}, {"cons": "none"}, {"pros": ["ok", None]}, {"metrics": []}):
+            with pytest.raises(ValueError):
+                parse_profile(dict(PROFILE, **broken))
+
+    def test_enrich_tech_rejects_invalid_profile(self):
+        """Test that an invalid single profile is an error"""
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: completion({"pros": []})))
+        with pytest.raises(Exception, match="invalid profile"):
+            asyncio.run(client.enrich_tech("Kafka"))
+
+    def test_enrich_tech_batch_keeps_valid_items(self):
+        """Test that batch profiles map back by number and invalid ones come back as None"""
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return completion({"profiles": [dict(PROFILE, index=3), dict(PROFILE, index=1, pros="bad"),
+                                            dict(PROFILE, index=7), "junk"]})
+
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        profiles = asyncio.run(client.enrich_tech_batch([("Kafka", None), ("React", "mobile"), ("Redis", None)]))
+        assert profiles[0] is None and profiles[1] is None and profiles[2]["tagline"] == PROFILE["tagline"]
+        assert "2. React (context: mobile)" in requests[0]["messages"][1]["content"]
+        assert requests[0]["max_tokens"] == 3 * PROFILE_TOKENS + 50
+
+    def test_rate_limited_completion_is_retried(self, monkeypatch):
+        """Test that a 429 is retried after Retry-After"""
+        responses = [httpx.Response(429, headers={"retry-after": "0"}), completion({"scores": []})]
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+        assert asyncio.run(client.complete_json("system", "user")) == {"scores": []}
+        assert responses == []
+
+    def test_rate_limit_backoff_releases_the_slot(self):
+        """Test that a caller backing off from a 429 does not hold the concurrency slot"""
+        order = []
+
+        def handler(request):
+            user = json.loads(request.content)["messages"][1]["content"]
+            order.append(user)
+            if user == "first" and order.count("first") == 1:
+                return httpx.Response(429, headers={"retry-after": "0.2"})
+            return completion({"user": user})
+
+        async def run(client):
+            first = asyncio.create_task(client.complete_json("system", "first"))
+            await asyncio.sleep(0.05)
+            second = await client.complete_json("system", "second")
+            return second, await first
+
+        client = AIClient("key", max_concurrency=1)
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert asyncio.run(run(client)) == ({"user": "second"}, {"user": "first"})
+        assert order == ["first", "second", "first"]
+
+    def test_null_content_is_a_completion_error(self):
+        """Test that a refusal without content is reported like other bad completions"""
+        refusal = httpx.Response(200, json={"choices": [{"message": {"content": None, "refusal": "No"}}]})
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: refusal))
+        with pytest.raises(Exception, match="Failed to get completion: completion has no content"):
+            asyncio.run(client.complete_json("system", "user"))
+
+
+    def test_stream_json_yields_deltas(self):
+        """Test that content deltas are forwarded in order, request streaming, and skip empty chunks"""
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return streamed(['{"a"', ": [1", "]}"])
+
+        async def collect(client):
+            return [delta async for delta in client.stream_json("system", "user")]
+
+        client = AIClient("key")
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        assert asyncio.run(collect(client)) == ['{"a"', ": [1", "]}"]
+        assert requests[0]["stream"] is True
+
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+        with pytest.raises(Exception, match="Failed to stream completion"):
+            asyncio.run(collect(client))
+
+    def test_parse_stack(self):
+        """Test that analyses are clamped and validated"""
+        assert parse_stack(dict(STACK, compatibility_score="1.4"))["compatibility_score"] == 1.0
+        with pytest.raises(ValueError, match="weaknesses"):
+            parse_stack(dict(STACK, weaknesses="none"))
+        with pytest.raises(ValueError, match="compatibility_score"):
+            parse_stack(dict(STACK, compatibility_score=None))
+
+
+class TestStreamEnrichStack:
+    """Test cases for the streamed stack analysis"""
+
+    def run(self, monkeypatch, deltas, matrix_score=None):
+        async def score_stack(technologies):
+            return {"compatibility_score": matrix_score} if matrix_score is not None else None
+
+        class FakeClient:
+            async def stream_enrich_stack(self, technologies, project_type):
+                for delta in deltas:
+                    if isinstance(delta, Exception):
+                        raise delta
+                    yield delta
+
+        async def collect():
+            return [event async for event in enrichment.stream_enrich_stack(["Kafka", "PostgreSQL"])]
+
+        monkeypatch.setattr(enrichment, "get_ai_client", lambda: FakeClient())
+        monkeypatch.setattr(enrichment, "score_stack", score_stack)
+        return asyncio.run(collect())
+
+    def test_items_stream_before_done(self, monkeypatch):
+        """Test that each item is emitted right after the delta that completes it, then the validated analysis"""
+        text = json.dumps(STACK)
+        deltas = [text[start:start + 7] for start in range(0, len(text), 7)]
+        events = self.run(monkeypatch, deltas)
+        assert [data["text"] for name, data in events if name == "token"] == deltas
+        content = [(name, data) for name, data in events if name != "token"]
+        assert content == [
+            ("score", {"compatibility_score": 0.85}),
+            ("item", {"field": "strengths", "index": 0, "value": "Mature drivers"}),
+            ("item", {"field": "strengths", "index": 1, "value": "One event model"}),
+            ("item", {"field": "weaknesses", "index": 0, "value": "Two datastores"}),
+            ("item", {"field": "recommendations", "index": 0, "value": "Add tracing"}),
+            ("done", STACK),
+        ]
+        # The first item follows the delta holding its closing quote, well before the end
+        names = [name for name, _ in events]
+        first_item = names.index("item")
+        assert "Mature drivers\"" in "".join(deltas[:names[:first_item].count("token")])
+        assert first_item < len(names) / 2
+
+    def test_matrix_score_replaces_the_model_score(self, monkeypatch):
+        """Test that a compatibility matrix score is sent before the first token and kept in done"""
+        events = self.run(monkeypatch, [json.dumps(STACK)], matrix_score=0.6)
+        assert events[0] == ("score", {"compatibility_score": 0.6})
+        assert [name for name, _ in events].count("score") == 1
+        assert events[-1] == ("done", dict(STACK, compatibility_score=0.6))
+
+    def test_invalid_or_failed_generation_ends_with_error(self, monkeypatch):
+        """Test that invalid output or a failing stream ends with an error event instead of done"""
+        events = self.run(monkeypatch, ['{"compatibility_score": 0.5, "strengths": ["ok"]}'])
+        assert events[-1] == ("error", {"detail": "Failed to analyze stack"})
+        assert ("item", {"field": "strengths", "index": 0, "value": "ok"}) in events
+        events = self.run(monkeypatch, ['{"compat', Exception("Failed to stream completion: reset")])
+        assert [name for name, _ in events] == ["token", "error"]
+
+
+class TestEnrichmentBatch:
+    """Test cases for batched enrichment"""
+
+    def test_pack_batches_respects_budget(self):
+        """Test that calls are filled up to the token budget and oversized items travel alone"""
+        items = [("Kafka", None)] * 5 + [("Huge", "x" * 8000), ("React", None)]
+        batches = pack_batches(items, max_tokens=3 * PROFILE_TOKENS + 10)
+        assert batches == [[0, 1, 2], [3, 4], [5], [6]]
+
+    def test_retries_only_failed_items(self, monkeypatch):
+        """Test that only skipped or invalid items are re-asked, duplicates once, and cache hits skip the model"""
+        calls = []
+
+        class FakeClient:
+            model = "test-model"
+
+            async def enrich_tech_batch(self, items):
+                calls.append([name for name, _ in items])
+                # Redis fails validation the first time it is asked
+                return [None if name == "Redis" and len(calls) == 1 else dict(PROFILE, tagline=name)
+                        for name, _ in items]
+
+        cache = LLMCache(ttl_seconds=60)
+        monkeypatch.setattr(enrichment, "get_ai_client", lambda: FakeClient())
+        monkeypatch.setattr(enrichment, "get_llm_cache", lambda: cache)
+        asyncio.run(cache.put(enrichment._key("test-model", "React", None), dict(PROFILE, tagline="cached")))
+
+        results, completions = asyncio.run(enrichment.enrich_tech_batch(
+            [("Kafka", None), ("Redis", None), ("React", None), ("kafka ", None)], max_tokens=4000
+        ))
+        assert calls == [["Kafka", "Redis"], ["Redis"]] and completions == 2
+        assert [(profile["tagline"], status) for profile, status in results] == [
+            ("Kafka", "miss"), ("Redis", "miss"), ("cached", "hit"), ("Kafka", "miss")]
+
+    def test_shares_generations_with_single_requests(self, monkeypatch):
+        """Test that single and batch requests for the same technology make one call and misses are counted"""
+        calls = []
+
+        class FakeClient:
+            model = "test-model"
+
+            async def enrich_tech(self, name, context):
+                calls.append(name)
+                await asyncio.sleep(0.05)
+                return dict(PROFILE, tagline=name)
+
+            async def enrich_tech_batch(self, items):
+                calls.append([name for name, _ in items])
+                await asyncio.sleep(0.05)
+                return [dict(PROFILE, tagline=name) for name, _ in items]
+
+        cache = LLMCache(ttl_seconds=60)
+        metrics = Metrics()
+        monkeypatch.setattr(enrichment, "get_ai_client", lambda: FakeClient())
+        monkeypatch.setattr(enrichment, "get_llm_cache", lambda: cache)
+        monkeypatch.setattr(enrichment, "get_metrics", lambda: metrics)
+        monkeypatch.setattr(llm_cache, "get_metrics", lambda: metrics)
+
+        async def scenario():
+            # Kafka is generating for a single request; Redis is claimed by the batch
+            single = asyncio.ensure_future(enrichment.enrich_tech("Kafka"))
+            await asyncio.sleep(0)
+            batch = asyncio.ensure_future(enrichment.enrich_tech_batch([("Kafka", None), ("Redis", None)], max_tokens=4000))
+            await asyncio.sleep(0.01)
+            follower = await enrichment.enrich_tech("Redis")
+            return await single, await batch, follower
+
+        single, (results, completions), follower = asyncio.run(scenario())
+        assert calls == ["Kafka", ["Redis"]] and completions == 1
+        assert single == (dict(PROFILE, tagline="Kafka"), "miss")
+        assert [status for _, status in results] == ["wait", "miss"]
+        assert follower == (dict(PROFILE, tagline="Redis"), "wait")
+        assert metrics.get("llm_cache_misses") == 2 and cache.stats()["hit_rate"] == 0.0
+
+    def test_items_failing_every_round_are_reported(self, monkeypatch):
+        """Test that items still invalid after the retries come back as failed"""
+        class FakeClient:
+            model = "test-model"
+
+            async def enrich_tech_batch(self, items):
+                raise Exception("Failed to get completion: upstream 500")
+
+        monkeypatch.setattr(enrichment, "get_ai_client", lambda: FakeClient())
+        monkeypatch.setattr(enrichment, "get_llm_cache", lambda: None)
+        results, completions = asyncio.run(enrichment.enrich_tech_batch([("Kafka", None)], max_tokens=4000))
+        assert results == [(None, "failed")] and completions == 1 + enrichment.BATCH_RETRIES
+
+
+class TestCascadeRerank:
+    """Test cases for the local + LLM cascade reranker"""
+
+    QUERY = "event streaming backend with durable message queues"
+    POOL = CANDIDATES + [
+        {"name": "RabbitMQ", "category": "Messaging", "description": "Message queues and routing"},
+        {"tech_name": "Pulsar", "category": "Messaging", "description": "Durable event streaming and queues"},
+    ]
+
+    @pytest.fixture(autouse=True)
+    def local_embeddings(self, monkeypatch):
+        client = EmbeddingsClient(LocalHashingBackend(dimensions=64))
+        monkeypatch.setattr(reranker, "get_embeddings_client", lambda: client)
+
+    def test_term_overlap(self):
+        """Test the share of distinct query terms present in each text"""
+        overlap = reranker.term_overlap("kafka event streaming", ["Kafka\nEvent streaming", "Kafka", "React"])
+        assert overlap.tolist() == pytest.approx([1.0, 1 / 3, 0.0])
+        assert reranker.term_overlap("the", ["anything"]).tolist() == [0.0]
+
+    def test_only_top_k_reach_the_llm(self, monkeypatch):
+        """Test that the LLM sees the best local candidates only and its slice is ranked first"""
+        seen = []
+
+        class FakeClient:
+            async def rerank(self, query, candidates):
+                seen.extend(candidate["name"] for candidate in candidates)
+                return [0.1 * number for number in range(1, len(candidates) + 1)]
+
+        monkeypatch.setattr(reranker, "get_ai_client", lambda: FakeClient())
+        local, _, _, _ = asyncio.run(reranker.cascade_rerank(self.QUERY, self.POOL, top_k=0, budget_ms=1000))
+        order, scores, stages, status = asyncio.run(
+            reranker.cascade_rerank(self.QUERY, self.POOL, top_k=2, budget_ms=1000))
+        assert status == "completed" and stages == ["llm", "llm", "local", "local", "local"]
+        assert seen == [reranker._name(self.POOL[position]) for position in local[:2]]
+        assert order == [local[1], local[0]] + local[2:] and scores[:2] == [0.2, 0.1]
+        assert {self.POOL[position].get("name") for position in local[2:]} >= {"React", "Redis"}
+
+    def test_llm_over_budget_keeps_local_scores(self, monkeypatch):
+        """Test that a slow or failing LLM leaves the local ranking in place"""
+        class SlowClient:
+            async def rerank(self, query, candidates):
+                await asyncio.sleep(1)
+
+        class BrokenClient:
+            async def rerank(self, query, candidates):
+                raise Exception("Failed to get completion: upstream 500")
+
+        local = asyncio.run(reranker.cascade_rerank(self.QUERY, self.POOL, top_k=0, budget_ms=1000))
+        assert local[3] == "skipped" and local[2] == ["local"] * 5 and local[1] == sorted(local[1], reverse=True)
+        for client, expected in ((SlowClient(), "deadline"), (BrokenClient(), "failed")):
+            monkeypatch.setattr(reranker, "get_ai_client", lambda: client)
+            order, scores, stages, status = asyncio.run(
+                reranker.cascade_rerank(self.QUERY, self.POOL, top_k=3, budget_ms=20))
+            assert status == expected and (order, scores, stages) == local[:3]
@@ -0,0 +1,69 @@
+"""Test suite for lib.autocomplete prefix and fuzzy lookups"""
+from lib.autocomplete import AutocompleteIndex, max_edits, popularity
+
+CATALOG = [
+    {"id": "react", "name": "React", "category": "Frontend", "metadata": {"stars": 220000, "downloads": 20000000}},
+    {"id": "preact", "name": "Preact", "category": "Frontend", "metadata": {"stars": 36000}},
+    {"id": "react-native", "name": "React Native", "category": "Mobile", "metadata": {"stars": 110000}},
+    {"id": "redux", "name": "Redux", "category": "Frontend", "metadata": {"stars": 60000, "downloads": 8000000}},
+    {"id": "kafka", "name": "Apache Kafka", "category": "Messaging", "metadata": {"stars": 27000}},
+    {"id": "nodejs", "name": "Node.js", "category": "Backend", "metadata": {"stars": 100000, "aliases": ["node"]}},
+    {"id": "postgresql", "name": "PostgreSQL", "category": "Database",
+     "metadata": {"stars": 15000, "aliases": ["postgres", "pg"]}},
+    {"id": "r", "name": "R", "category": "Language", "metadata": {"stars": "unknown"}},
+]
+
+
+def ids(suggestions):
+    return [suggestion["tech_id"] for suggestion in suggestions]
+
+
+class TestAutocompleteIndex:
+    """Test cases for AutocompleteIndex"""
+
+    def test_prefix_ranked_by_popularity(self):
+        """Test that prefix matches come back most popular first, one per technology"""
+        index = AutocompleteIndex(CATALOG)
+        assert ids(index.suggest("re", 10)) == ["react", "redux", "react-native"]
+        assert ids(index.suggest("REACT  ", 10)) == ["react", "react-native"]
+        assert ids(index.suggest("re", 2)) == ["react", "redux"]
+
+    def test_exact_match_ranks_first(self):
+        """Test that a key equal to the query outranks more popular prefix matches"""
+        index = AutocompleteIndex(CATALOG)
+        assert ids(index.suggest("r", 10))[0] == "r"
+
+    def test_aliases_and_words(self):
+        """Test lookups by alias, by a later word of the name and without punctuation"""
+        index = AutocompleteIndex(CATALOG)
+        [postgres] = index.suggest("pg", 10)
+        assert postgres["tech_id"] == "postgresql" and postgres["matched"] == "pg"
+        assert ids(index.suggest("kaf", 10)) == ["kafka"]
+        assert ids(index.suggest("nodej", 10)) == ["nodejs"]
+
+    def test_fuzzy_fallback(self):
+        """Test that typos within the edit budget match when nothing starts with the query"""
+        index = AutocompleteIndex(CATALOG)
+        [suggestion] = index.suggest("postgers", 10)
+        assert suggestion["tech_id"] == "postgresql" and suggestion["distance"] == 1
+        assert ids(index.suggest("raect", 10)) == ["react", "react-native"]
+        assert ids(index.suggest("kafak", 10)) == ["kafka"]
+        # Two edits only from seven characters; the first character is never edited
+        assert ids(index.suggest("postgrse sql", 10)) == ["postgresql"]
+        assert index.suggest("kfzz", 10) == []
+        assert index.suggest("eract", 10) == []
+
+    def test_edit_budget(self):
+        """Test the edit budget by query length"""
+        assert [max_edits("ab"), max_edits("abc"), max_edits("abcdef"), max_edits("abcdefg")] == [0, 1, 1, 2]
+
+    def test_popularity_tolerates_bad_metadata(self):
+        """Test that missing or malformed counts score zero"""
+        assert popularity({}) == 0.0
+        assert popularity({"stars": "lots", "downloads": -5}) == 0.0
+        assert popularity({"stars": 9}) == 1.0
+
+    def test_empty(self):
+        """Test empty catalogs and queries"""
+        assert AutocompleteIndex([]).suggest("react", 10) == []
+        assert AutocompleteIndex(CATALOG).suggest("   ", 10) == []
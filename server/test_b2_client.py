@@ -0,0 +1,191 @@
+"""Test suite for content-addressed uploads in lib.b2_client"""
+import asyncio
+import hashlib
+import io
+import zipfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, UploadFile
+from lib import b2_client
+from lib.b2_client import B2Client
+from lib.disk_cache import CacheEntry
+from utils.file_utils import hash_upload
+
+
+class FakeS3:
+    """In-memory stand-in for the boto3 S3 client calls B2Client makes"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = []
+        self.gets = []
+        self.meta = SimpleNamespace(endpoint_url="https://s3.example.com")
+
+    def _missing(self, operation):
+        return ClientError({"Error": {"Code": "404"}}, operation)
+
+    def put_object(self, Bucket, Key, Body, ContentType, ContentLength=None):
+        data = Body if isinstance(Body, bytes) else Body.read()
+        self.objects[Key] = data
+        self.puts.append(Key)
+        return {"ETag": '"etag"'}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing("HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.gets.append(Key)
+        if Key not in self.objects:
+            raise self._missing("GetObject")
+        etag = f'"{hashlib.md5(self.objects[Key]).hexdigest()}"'
+        if IfNoneMatch == etag:
+            raise ClientError({"Error": {"Code": "304"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": etag, "ContentLength": len(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, operation):
+        def paginate(Bucket, Prefix):
+            modified = datetime(2026, 1, 1, tzinfo=timezone.utc)
+            yield {"Contents": [{"Key": key, "Size": len(data), "LastModified": modified, "ETag": '"etag"'}
+                                for key, data in sorted(self.objects.items()) if key.startswith(Prefix)]}
+        return SimpleNamespace(paginate=paginate)
+
+
+def make_client(monkeypatch, **overrides):
+    settings = SimpleNamespace(**{
+        "b2_endpoint": "s3.example.com",
+        "b2_key_id": SimpleNamespace(get_secret_value=lambda: "key"),
+        "b2_app_key": SimpleNamespace(get_secret_value=lambda: "secret"),
+        "b2_bucket": "bucket",
+        "b2_content_addressed": True,
+        "b2_cache_revalidate_seconds": 60,
+        "b2_cache_dir": None,
+        "b2_cache_max_bytes": 0,
+        **overrides
+    })
+    monkeypatch.setattr(b2_client, "get_settings", lambda: settings)
+    client = B2Client()
+    client.s3_client = FakeS3()
+    return client
+
+
+@pytest.fixture
+def client(monkeypatch):
+    return make_client(monkeypatch)
+
+
+async def upload(client, data, file_name):
+    file = UploadFile(file=io.BytesIO(data), filename=file_name)
+    digest, size = await hash_upload(file, max_size=1024, chunk_size=4)
+    return await client.upload_content_addressed(file.file, digest, size, file_name, "text/plain")
+
+
+class TestHashUpload:
+    """Test cases for hash_upload"""
+
+    def test_digest_size_and_rewind(self):
+        """Test that the digest matches the content and the upload can be read again"""
+        data = b"hello content-addressed world"
+        file = UploadFile(file=io.BytesIO(data), filename="a.txt")
+        digest, size = asyncio.run(hash_upload(file, max_size=1024, chunk_size=4))
+        assert digest == hashlib.sha256(data).hexdigest() and size == len(data)
+        assert file.file.read() == data
+
+    def test_too_large(self):
+        """Test that an upload past max_size is rejected with 413"""
+        file = UploadFile(file=io.BytesIO(b"x" * 100), filename="big.bin")
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(hash_upload(file, max_size=10, chunk_size=8))
+        assert exc_info.value.status_code == 413
+
+
+class TestContentAddressed:
+    """Test cases for content-addressed uploads, manifests and name resolution"""
+
+    def test_duplicate_content_skips_upload(self, client):
+        """Test that identical content is stored once and each name gets its own manifest entry"""
+        s3 = client.s3_client
+        first = asyncio.run(upload(client, b"same bytes", "docs/a.txt"))
+        second = asyncio.run(upload(client, b"same bytes", "docs/b.txt"))
+        key = B2Client.content_key(first["digest"])
+        assert first["deduplicated"] is False and second["deduplicated"] is True
+        assert first["digest"] == second["digest"] and s3.puts.count(key) == 1
+        assert s3.objects[key] == b"same bytes"
+
+    def test_manifest_round_trip_and_resolution(self, client):
+        """Test that a name resolves through its manifest, and unknown names map to themselves"""
+        result = asyncio.run(upload(client, b"report", "reports/q1.txt"))
+        manifest = asyncio.run(client.get_manifest("reports/q1.txt"))
+        assert manifest == {"file_name": "reports/q1.txt", "digest": result["digest"],
+                            "key": B2Client.content_key(result["digest"]), "size": 6, "content_type": "text/plain"}
+        assert asyncio.run(client.get_manifest("missing.txt")) is None
+        assert asyncio.run(client.resolve_key("reports/q1.txt")) == manifest["key"]
+        assert asyncio.run(client.resolve_key("legacy.txt")) == "legacy.txt"
+        assert asyncio.run(client.download_file(manifest["key"])) == b"report"
+
+    def test_delete_named_keeps_shared_content(self, client):
+        """Test that deleting a name removes only its manifest entry"""
+        result = asyncio.run(upload(client, b"shared", "a.txt"))
+        asyncio.run(upload(client, b"shared", "b.txt"))
+        assert asyncio.run(client.delete_named("a.txt")) is True
+        assert asyncio.run(client.get_manifest("a.txt")) is None
+        assert asyncio.run(client.resolve_key("b.txt")) == B2Client.content_key(result["digest"])
+        assert asyncio.run(client.file_exists(B2Client.content_key(result["digest"])))
+
+    def test_archive_by_name_and_prefix(self, client, monkeypatch):
+        """Test that archives read files by name and a "dir/" prefix lists names under that directory only"""
+        from api import b2 as b2_api
+        from api.b2 import ArchiveRequest, download_archive
+
+        asyncio.run(upload(client, b"first", "stacks/a.txt"))
+        asyncio.run(upload(client, b"other", "stacks-other/b.txt"))
+        client.s3_client.objects["stacks/legacy.txt"] = b"legacy"
+        monkeypatch.setattr(b2_api, "get_b2_client", lambda: client)
+
+        async def archive(request):
+            response = await download_archive(request)
+            return zipfile.ZipFile(io.BytesIO(b"".join([chunk async for chunk in response.body_iterator])))
+
+        by_prefix = asyncio.run(archive(ArchiveRequest(prefix="stacks/")))
+        assert by_prefix.namelist() == ["stacks/a.txt", "stacks/legacy.txt"]
+        assert by_prefix.read("stacks/a.txt") == b"first"
+        by_name = asyncio.run(archive(ArchiveRequest(keys=["stacks-other/b.txt"])))
+        assert by_name.read("stacks-other/b.txt") == b"other"
+
+
+class TestCachedReads:
+    """Test cases for reads through the local disk cache"""
+
+    @pytest.fixture
+    def cached(self, monkeypatch, tmp_path):
+        return make_client(monkeypatch, b2_content_addressed=False, b2_cache_dir=str(tmp_path),
+                           b2_cache_max_bytes=64, b2_cache_revalidate_seconds=0)
+
+    def test_cached_read_is_revalidated_without_download(self, cached):
+        """Test that a cached object is served as a memory map and revalidated by ETag"""
+        cached.s3_client.objects["small.txt"] = b"small"
+        assert bytes(asyncio.run(cached.download_file("small.txt"))) == b"small"
+        assert isinstance(asyncio.run(cached.open_file("small.txt")), CacheEntry)
+        assert cached.s3_client.gets == ["small.txt", "small.txt"]
+
+    def test_oversize_object_is_read_once(self, cached):
+        """Test that an object over the cache budget is streamed from the GET that found its size"""
+        cached.s3_client.objects["big.bin"] = b"x" * 1000
+        assert asyncio.run(cached.download_file("big.bin")) == b"x" * 1000
+        assert cached.s3_client.gets == ["big.bin"] and cached.cache.lookup("big.bin") is None
+
+    def test_deleted_object_is_evicted(self, cached):
+        """Test that a 404 on revalidation drops the local copy"""
+        cached.s3_client.objects["gone.txt"] = b"gone"
+        asyncio.run(cached.download_file("gone.txt"))
+        del cached.s3_client.objects["gone.txt"]
+        with pytest.raises(Exception, match="Failed to download file"):
+            asyncio.run(cached.download_file("gone.txt"))
+        assert cached.cache.lookup("gone.txt") is None
@@ -0,0 +1,143 @@
+"""Test suite for lib.compatibility pairwise matrix and stack scoring"""
+import asyncio
+
+import numpy as np
+import pytest
+from lib import compatibility
+from lib.compatibility import SOURCE_LLM, CompatibilityMatrix, PairStore, build_matrix, score_stack
+from lib.vector_index import VectorIndex
+
+
+def record(tech_id, name, dependencies=None, aliases=None):
+    metadata = {}
+    if dependencies is not None:
+        metadata["dependencies"] = dependencies
+    if aliases:
+        metadata["aliases"] = aliases
+    return {"id": tech_id, "name": name, "description": "", "metadata": metadata}
+
+
+CATALOG = [
+    record("react", "React"),
+    record("redux", "Redux", {"react": "^18.0.0"}),
+    record("next-js", "Next.js", ["react", "react-dom"]),
+    record("react-dom", "React DOM", ["react"]),
+    record("express", "Express"),
+    record("mongoose", "Mongoose"),
+    record("postgresql", "PostgreSQL", aliases=["postgres"]),
+    # Two packages using both express and mongoose; one using express and postgres
+    record("app-a", "App A", [{"name": "express"}, {"name": "mongoose"}, {"name": "dotenv"}]),
+    record("app-b", "App B", ["Express", "mongoose"]),
+    record("app-c", "App C", ["express", "postgres"]),
+]
+
+
+class TestBuildMatrix:
+    """Test cases for build_matrix"""
+
+    def test_direct_dependencies_and_cooccurrence(self):
+        """Test that direct dependencies score 1 and co-occurrence counts from MIN_COOCCURRENCE packages"""
+        matrix, stats = build_matrix(CATALOG)
+        assert matrix.lookup([("redux", "react"), ("react", "redux")]) == [1.0, 1.0]
+        # Both used by app-a and app-b, and by nothing else
+        assert matrix.lookup([("mongoose", "express")]) == [pytest.approx(2 / np.sqrt(3 * 2))]
+        # express and postgres share only one package; unknown technologies have no data
+        assert matrix.lookup([("express", "postgresql"), ("react", "vue"), ("express", "express")]) == [
+            None, None, None]
+        assert stats["packages"] == 6 and stats["cooccurring"] == 1 and stats["pairs"] == len(matrix)
+
+    def test_embedding_affinity_blend(self, tmp_path):
+        """Test that pairs with both vectors blend dependency data with embedding cosine"""
+        index = VectorIndex(str(tmp_path / "index"), 2)
+        index.upsert(CATALOG[:2], np.array([[1.0, 0.0], [0.6, 0.8]], dtype=np.float32))
+        matrix, _ = build_matrix(CATALOG, index)
+        weight = compatibility.DEPENDENCY_WEIGHT
+        assert matrix.lookup([("react", "redux")])[0] == pytest.approx(weight + (1 - weight) * 0.6)
+        assert matrix.lookup([("react", "next-js")]) == [1.0]
+
+    def test_llm_scores_fill_gaps_only(self):
+        """Test that earlier LLM scores are folded in only where there is no dependency data"""
+        matrix, stats = build_matrix(CATALOG, llm_scores={("express", "postgresql"): 0.8, ("react", "redux"): 0.1,
+                                                          ("express", "vue"): 0.5})
+        assert matrix.lookup([("postgresql", "express"), ("react", "redux")]) == [pytest.approx(0.8), 1.0]
+        assert stats["llm"] == 1 and (matrix.sources == SOURCE_LLM).sum() == 1
+
+    def test_resolve_and_round_trip(self, tmp_path):
+        """Test name and alias resolution and that a saved matrix loads unchanged"""
+        matrix, _ = build_matrix(CATALOG)
+        assert [matrix.resolve(name) for name in ("Next.js", "postgres", "React DOM", "Svelte")] == [
+            "next-js", "postgresql", "react-dom", "svelte"]
+        matrix.save(str(tmp_path))
+        loaded = CompatibilityMatrix.load(str(tmp_path))
+        assert loaded.ids == matrix.ids and loaded.aliases == matrix.aliases
+        assert loaded.lookup([("redux", "react")]) == [1.0]
+        assert CompatibilityMatrix.load(str(tmp_path / "missing")) is None
+
+
+class TestScoreStack:
+    """Test cases for score_stack"""
+
+    @pytest.fixture
+    def setup(self, tmp_path, monkeypatch):
+        matrix, _ = build_matrix(CATALOG)
+        store = PairStore(str(tmp_path / "pairs.sqlite3"))
+        calls = []
+
+        class FakeClient:
+            async def score_pairs(self, pairs):
+                calls.append(pairs)
+                return [None if "Svelte" in pair else 0.4 for pair in pairs]
+
+        async def current_matrix():
+            return matrix
+
+        monkeypatch.setattr(compatibility, "get_compatibility_matrix", current_matrix)
+        monkeypatch.setattr(compatibility, "get_pair_store", lambda: store)
+        monkeypatch.setattr(compatibility, "get_vector_index", lambda: None)
+        monkeypatch.setattr(compatibility, "get_ai_client", lambda: FakeClient())
+        return matrix, store, calls
+
+    def test_known_stack_needs_no_llm(self, setup):
+        """Test that a stack covered by the matrix is scored from lookups alone"""
+        _, _, calls = setup
+        stats = asyncio.run(score_stack(["React", "React DOM", "Next.js", "react"], llm_pairs=10))
+        assert stats["compatibility_score"] == 1.0 and stats["pairs"] == 3 and stats["matrix"] == 3
+        assert calls == []
+        assert asyncio.run(score_stack(["React"], llm_pairs=10))["compatibility_score"] == 1.0
+
+    def test_missing_pairs_are_scored_once_and_written_back(self, setup):
+        """Test that only pairs without data reach the LLM, and their scores are reused afterwards"""
+        matrix, store, calls = setup
+        stats = asyncio.run(score_stack(["Express", "postgres", "Mongoose", "Svelte"], llm_pairs=10))
+        assert calls == [[("Express", "postgres"), ("Express", "Svelte"), ("Mongoose", "postgres"),
+                          ("Mongoose", "Svelte"), ("postgres", "Svelte")]]
+        assert stats["llm"] == 2 and stats["unscored"] == 3
+        assert stats["compatibility_score"] == pytest.approx((2 / np.sqrt(6) + 0.4 + 0.4) / 3, abs=1e-4)
+        assert store.get_many([("express", "postgresql")]) == {("express", "postgresql"): 0.4}
+        assert matrix.lookup([("postgresql", "mongoose")]) == [0.4]
+
+        calls.clear()
+        again = asyncio.run(score_stack(["Express", "Postgres", "Mongoose"], llm_pairs=10))
+        assert calls == [] and again["matrix"] == 3
+
+    def test_llm_budget_and_failures(self, setup, monkeypatch):
+        """Test that pairs beyond the LLM budget, or of a failed call, are left unscored"""
+        _, _, calls = setup
+        stats = asyncio.run(score_stack(["Vue", "Vite", "Pinia"], llm_pairs=0))
+        assert calls == [] and stats["unscored"] == 3 and stats["compatibility_score"] is None
+
+        class BrokenClient:
+            async def score_pairs(self, pairs):
+                raise Exception("Failed to get completion: upstream 500")
+
+        monkeypatch.setattr(compatibility, "get_ai_client", lambda: BrokenClient())
+        stats = asyncio.run(score_stack(["React", "Redux", "Vue"], llm_pairs=10))
+        assert stats["matrix"] == 1 and stats["unscored"] == 2 and stats["compatibility_score"] == 1.0
+
+    def test_no_matrix(self, monkeypatch):
+        """Test that scoring is skipped until a matrix is built"""
+        async def no_matrix():
+            return None
+
+        monkeypatch.setattr(compatibility, "get_compatibility_matrix", no_matrix)
+        assert asyncio.run(score_stack(["React", "Redux"], llm_pairs=10)) is None
@@ -0,0 +1,70 @@
+"""Test suite for lib.disk_cache LRU disk cache"""
+import os
+import pytest
+from lib.disk_cache import DiskCache
+
+
+def put(cache, key, data, etag="etag"):
+    with cache.new_temp_file() as tmp:
+        tmp.write(data)
+    return cache.commit(key, tmp.name, etag)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path), max_bytes=100, metrics_prefix=f"test_cache_{id(tmp_path)}")
+
+
+class TestDiskCache:
+    """Test cases for DiskCache"""
+
+    def test_commit_and_lookup(self, cache):
+        """Test that committed objects are found with their ETag"""
+        put(cache, "logos/react.svg", b"<svg/>", etag="abc")
+        entry = cache.lookup("logos/react.svg")
+        assert entry.etag == "abc"
+        assert entry.size == 6
+        with open(entry.path, "rb") as f:
+            assert f.read() == b"<svg/>"
+
+    def test_lru_eviction_respects_budget(self, cache):
+        """Test that least recently used entries are evicted over budget"""
+        put(cache, "a", b"x" * 40)
+        put(cache, "b", b"x" * 40)
+        cache.lookup("a")  # a becomes most recently used
+        put(cache, "c", b"x" * 40)
+        assert cache.lookup("b") is None
+        assert cache.lookup("a") is not None
+        assert cache.lookup("c") is not None
+        assert cache.stats()["bytes"] <= 100
+
+    def test_oversized_object_not_cached(self, cache):
+        """Test that objects larger than the whole budget are rejected"""
+        assert put(cache, "huge", b"x" * 101) is None
+        assert cache.lookup("huge") is None
+
+    def test_invalidate_removes_files(self, cache):
+        """Test that invalidation drops the entry and its file"""
+        entry = put(cache, "templates/saas.json", b"{}")
+        cache.invalidate("templates/saas.json")
+        assert cache.lookup("templates/saas.json") is None
+        assert not os.path.exists(entry.path)
+
+    def test_index_survives_restart(self, tmp_path):
+        """Test that a new cache instance picks up existing entries"""
+        first = DiskCache(str(tmp_path), max_bytes=100)
+        put(first, "a", b"hello", etag="e1")
+        second = DiskCache(str(tmp_path), max_bytes=100)
+        entry = second.lookup("a")
+        assert entry is not None and entry.etag == "e1"
+
+    def test_mmap_and_metrics(self, cache):
+        """Test mmap reads and hit ratio / bytes saved accounting"""
+        entry = put(cache, "a", b"hello")
+        assert bytes(cache.open_mmap(entry)) == b"hello"
+        cache.record_miss(5)
+        cache.record_hit(entry)
+        cache.record_hit(entry)
+        stats = cache.stats()
+        assert stats["hit_ratio"] == pytest.approx(2 / 3)
+        assert stats["bytes_saved"] == 10
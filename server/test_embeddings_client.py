@@ -0,0 +1,211 @@
+"""Test suite for lib.embeddings_client micro-batching and caching"""
+import asyncio
+import numpy as np
+import pytest
+from lib.embeddings_client import MicroBatcher, EmbeddingsClient
+from lib.embedding_backends import EmbeddingBackend, LocalHashingBackend
+from lib.chunking import embed_document, split_markdown
+
+
+class FakeUpstream:
+    """Records batches and returns one-element vectors of the text length"""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [[float(len(text))] for text in texts]
+
+
+class TestMicroBatcher:
+    """Test cases for MicroBatcher"""
+
+    def test_concurrent_requests_share_one_call(self):
+        """Test that requests inside one window are sent as a single batch"""
+        upstream = FakeUpstream()
+        batcher = MicroBatcher(upstream, window_ms=20)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit("x" * i) for i in range(1, 6)))
+
+        results = asyncio.run(run())
+        assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+        assert len(upstream.batches) == 1
+
+    def test_max_batch_size_flushes_early(self):
+        """Test that full batches are sent without waiting for the window"""
+        upstream = FakeUpstream()
+        batcher = MicroBatcher(upstream, window_ms=10_000, max_batch_size=3)
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(*(batcher.submit("t") for _ in range(6))), 1)
+
+        asyncio.run(run())
+        assert [len(batch) for batch in upstream.batches] == [3, 3]
+
+    def test_token_budget_splits_batches(self):
+        """Test that the estimated token budget caps batch size"""
+        upstream = FakeUpstream()
+        batcher = MicroBatcher(upstream, window_ms=5, max_batch_tokens=30)
+
+        async def run():
+            await asyncio.gather(*(batcher.submit("y" * 80) for _ in range(3)))  # ~21 tokens each
+
+        asyncio.run(run())
+        assert all(len(batch) == 1 for batch in upstream.batches)
+
+    def test_errors_reach_every_caller(self):
+        """Test that an upstream failure is raised in all waiting callers"""
+        batcher = MicroBatcher(FakeUpstream(fail=True), window_ms=5)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit("z") for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_window_shrinks_for_lone_requests(self):
+        """Test that the window adapts down when nothing else arrives"""
+        batcher = MicroBatcher(FakeUpstream(), window_ms=8, min_window_ms=1)
+
+        async def run():
+            for _ in range(5):
+                await batcher.submit("solo")
+
+        asyncio.run(run())
+        assert batcher.current_window_ms == pytest.approx(1)
+
+
+class VectorUpstream(EmbeddingBackend):
+    """Remote-style backend returning vectors filled with the text length"""
+
+    def __init__(self, fail: bool = False):
+        super().__init__(dimensions=4)
+        self.batches = []
+        self.fail = fail
+
+    @property
+    def model_id(self):
+        return "fake:4"
+
+    async def embed_batch(self, texts):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+
+def make_client(tmp_path, upstream, version="1", **kwargs):
+    return EmbeddingsClient(upstream, cache_version=version,
+                            cache_path=str(tmp_path / "embeddings.sqlite3"), **kwargs)
+
+
+class TestEmbeddingCache:
+    """Test cases for the two-tier embedding cache in EmbeddingsClient"""
+
+    def test_repeated_and_whitespace_variants_hit_cache(self, tmp_path):
+        """Test that normalized duplicates are embedded once"""
+        upstream = VectorUpstream()
+        client = make_client(tmp_path, upstream)
+        asyncio.run(client.embed_many(["React  UI library", "React UI library", "Vue"]))
+        asyncio.run(client.embed("React UI library"))
+        assert sum(len(batch) for batch in upstream.batches) == 2
+
+    def test_restart_costs_zero_upstream_calls(self, tmp_path):
+        """Test that the persistent tier survives a new client instance"""
+        texts = [f"tech {i}" for i in range(20)]
+        asyncio.run(make_client(tmp_path, VectorUpstream()).embed_many(texts))
+
+        upstream = VectorUpstream()
+        vectors = asyncio.run(make_client(tmp_path, upstream).embed_many(texts))
+        assert upstream.batches == []
+        assert vectors[3].dtype == np.float32
+        assert vectors[3].tolist() == [6.0] * 4
+
+    def test_version_bump_invalidates(self, tmp_path):
+        """Test that a new cache version re-embeds and purges old rows"""
+        asyncio.run(make_client(tmp_path, VectorUpstream()).embed("Django"))
+
+        upstream = VectorUpstream()
+        client = make_client(tmp_path, upstream, version="2")
+        asyncio.run(client.embed("Django"))
+        assert upstream.batches == [["Django"]]
+        assert client.cache.persistent.count() == 1
+
+
+class TestLocalHashingBackend:
+    """Test cases for the offline CPU embedding backend"""
+
+    def test_deterministic_unit_vectors(self):
+        """Test that vectors are reproducible across instances and L2-normalized"""
+        texts = ["FastAPI async Python web framework", "PostgreSQL relational database"]
+        first = LocalHashingBackend(dimensions=256).embed_sync(texts)
+        second = LocalHashingBackend(dimensions=256).embed_sync(texts[::-1])[::-1]
+        assert first.dtype == np.float32 and first.shape == (2, 256)
+        assert np.array_equal(first, second)
+        assert np.allclose(np.linalg.norm(first, axis=1), 1.0, atol=1e-5)
+
+    def test_shared_vocabulary_is_more_similar(self):
+        """Test that related texts score higher than unrelated ones"""
+        backend = LocalHashingBackend(dimensions=256)
+        a, b, c = backend.embed_sync([
+            "React component library for web user interfaces",
+            "Vue component framework for web user interfaces",
+            "Kafka distributed event streaming platform",
+        ])
+        assert a @ b > a @ c
+
+    def test_empty_text_gives_zero_vector(self):
+        """Test that empty input does not produce NaNs"""
+        vector = LocalHashingBackend(dimensions=64).embed_sync([""])[0]
+        assert not np.isnan(vector).any() and not vector.any()
+
+    def test_fallback_used_when_primary_fails(self, tmp_path):
+        """Test degraded mode: a failing primary falls back to the local backend"""
+        fallback = LocalHashingBackend(dimensions=4)
+        client = make_client(tmp_path, VectorUpstream(fail=True), fallback=fallback)
+        vector = asyncio.run(client.embed("Redis"))
+        assert np.array_equal(vector, fallback.embed_sync(["Redis"])[0])
+
+
+README = "\n\n".join(
+    f"## Section {i}\n" + " ".join(f"paragraph {i} sentence {j}." for j in range(60))
+    for i in range(4)
+)
+
+
+class TestChunking:
+    """Test cases for long-document chunking and pooling"""
+
+    def test_chunks_respect_size_and_headings(self):
+        """Test that chunks stay within budget and carry their heading path"""
+        chunks = split_markdown("# Title\n```\n# not a heading\n```\n" + README, max_tokens=120, overlap_tokens=20)
+        assert all(chunk.tokens <= 120 for chunk in chunks)
+        assert chunks[0].heading == "Title" and "# not a heading" in chunks[0].body
+        assert {chunk.heading for chunk in chunks[1:]} == {f"Title > Section {i}" for i in range(4)}
+
+    def test_consecutive_chunks_overlap(self):
+        """Test that a section's next chunk starts with the previous chunk's tail"""
+        chunks = split_markdown(README, max_tokens=120, overlap_tokens=20)
+        first, second = chunks[0], chunks[1]
+        assert first.heading == second.heading
+        assert second.body.split()[0] in first.body.split()[-15:]
+
+    def test_editing_one_section_reembeds_only_its_chunks(self, tmp_path):
+        """Test that unchanged sections are served from the chunk cache"""
+        upstream = VectorUpstream()
+        client = make_client(tmp_path, upstream)
+        vector, chunks, _ = asyncio.run(embed_document(client, README, max_tokens=120, overlap_tokens=20))
+        assert vector.shape == (4,) and abs(np.linalg.norm(vector) - 1) < 1e-5
+
+        upstream.batches.clear()
+        edited = README.replace("paragraph 2 sentence 5.", "paragraph 2 sentence five.")
+        _, edited_chunks, _ = asyncio.run(embed_document(client, edited, max_tokens=120, overlap_tokens=20))
+        changed = [chunk for chunk in edited_chunks if chunk.heading == "Section 2"]
+        reembedded = sum(len(batch) for batch in upstream.batches)
+        assert 0 < reembedded <= len(changed) < len(chunks)
@@ -0,0 +1,48 @@
+"""Test suite for lib.generations published artifact files"""
+import asyncio
+
+import numpy as np
+from lib import generations
+from lib.generations import GenerationReader, load_generation, save_generation
+
+
+class Artifact:
+    def __init__(self, meta):
+        self.meta = meta
+
+
+def load(directory):
+    saved = load_generation(directory, ["values"], ["names"])
+    return Artifact(saved[0]) if saved is not None else None
+
+
+class TestGenerations:
+    """Test cases for generation storage and the shared reader"""
+
+    def test_previous_generation_survives_one_save(self, tmp_path):
+        """Test that a save keeps the generation it replaces and removes older ones"""
+        directory = str(tmp_path)
+        meta = {}
+        for value in range(3):
+            meta = save_generation(directory, meta, {"values": np.full(4, value)}, {"names": [f"v{value}"]})
+        assert meta["generation"] == 2
+        assert sorted(p.name for p in tmp_path.glob("*.*.*")) == [
+            "names.1.json", "names.2.json", "values.1.npy", "values.2.npy"]
+        saved_meta, arrays, documents = load_generation(directory, ["values"], ["names"])
+        assert saved_meta == meta and arrays["values"].tolist() == [2] * 4 and documents == {"names": ["v2"]}
+        assert load_generation(str(tmp_path / "missing"), ["values"], []) is None
+
+    def test_reader_reloads_new_generations(self, tmp_path, monkeypatch):
+        """Test that the reader loads nothing until a save, then follows new generations once due"""
+        directory = str(tmp_path)
+        reader = GenerationReader(load)
+        assert asyncio.run(reader.get(directory)) is None
+
+        meta = save_generation(directory, {}, {"values": np.zeros(2)}, {"names": []})
+        first = asyncio.run(reader.get(directory))
+        assert first.meta["generation"] == 0
+
+        save_generation(directory, meta, {"values": np.ones(2)}, {"names": []})
+        assert asyncio.run(reader.get(directory)) is first
+        monkeypatch.setattr(generations, "RELOAD_SECONDS", 0.0)
+        assert asyncio.run(reader.get(directory)).meta["generation"] == 1
@@ -0,0 +1,94 @@
+"""Test suite for lib.ingest streaming catalog ingestion"""
+import asyncio
+import json
+import numpy as np
+import pytest
+from lib.ingest import Checkpoint, IngestError, ingest_stream, iter_ndjson
+
+
+def ndjson(lines, chunk_size=37):
+    data = ("\n".join(lines) + "\n").encode()
+
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+    return iter_ndjson(chunks())
+
+
+def catalog(count):
+    return [json.dumps({"tech_name": f"Tech {i}", "description": "framework"}) for i in range(count)]
+
+
+async def embed_many(texts):
+    await asyncio.sleep(0)
+    return [np.ones(4, dtype=np.float32) for _ in texts]
+
+
+class TestIngest:
+    """Test cases for ingest_stream"""
+
+    def test_invalid_lines_are_reported_and_skipped(self):
+        """Test that bad records do not stop the run"""
+        stored = []
+
+        async def sink(records, vectors):
+            stored.extend(r.tech_id for r in records)
+
+        lines = catalog(10)
+        lines[3] = "not json"
+        lines[7] = json.dumps({"description": "missing name"})
+        stats = asyncio.run(ingest_stream(ndjson(lines), embed_many, sink, batch_size=4, concurrency=2))
+
+        assert stats.ingested == 8
+        assert [error["line"] for error in stats.errors] == [4, 8]
+        assert sorted(stored) == sorted(f"tech-{i}" for i in range(10) if i not in (3, 7))
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        """Test that a failed run resumes after the last stored line"""
+        checkpoint = Checkpoint(str(tmp_path / "source.json"))
+        stored = []
+        state = {"fail_after": 2}
+
+        async def sink(records, vectors):
+            if state["fail_after"] == 0:
+                raise RuntimeError("database unavailable")
+            state["fail_after"] -= 1
+            stored.extend(r.line for r in records)
+
+        with pytest.raises(IngestError) as exc_info:
+            asyncio.run(ingest_stream(ndjson(catalog(50)), embed_many, sink, batch_size=10, concurrency=1,
+                                      checkpoint=checkpoint))
+        assert exc_info.value.stats.checkpoint == 20
+        assert checkpoint.load() == 20
+
+        state["fail_after"] = 100
+        stats = asyncio.run(ingest_stream(ndjson(catalog(50)), embed_many, sink, batch_size=10, concurrency=3,
+                                          checkpoint=checkpoint))
+        assert stats.skipped == 20
+        assert stats.ingested == 30
+        assert sorted(stored) == list(range(1, 51))
+        assert checkpoint.load() == 0  # cleared once the source is fully ingested
+
+    def test_sink_failure_partway_stops_every_worker(self):
+        """Test that a failing batch aborts the run with its checkpoint instead of leaving it waiting on the queue"""
+        stored = []
+
+        async def sink(records, vectors):
+            if records[0].line > 30:
+                raise RuntimeError("database unavailable")
+            await asyncio.sleep(0.001)
+            stored.extend(r.line for r in records)
+
+        async def run(concurrency):
+            return await asyncio.wait_for(
+                ingest_stream(ndjson(catalog(60)), embed_many, sink, batch_size=5, concurrency=concurrency), 5
+            )
+
+        for concurrency in (1, 2, 4):
+            stored.clear()
+            with pytest.raises(IngestError) as exc_info:
+                asyncio.run(run(concurrency))
+            # Batches still in flight when the failure surfaces are cancelled
+            checkpoint = exc_info.value.stats.checkpoint
+            assert 0 < checkpoint <= 30 and checkpoint % 5 == 0
+            assert set(range(1, checkpoint + 1)) <= set(stored) and max(stored) <= 30
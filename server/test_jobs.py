@@ -0,0 +1,454 @@
+"""Test suite for lib.jobs stores and the background job runner"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+import httpx
+import numpy as np
+import pytest
+from lib.jobs import (CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobRunner, MemoryJobStore, QueueFull,
+                      RedisJobStore, batched, sign)
+
+
+def _bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio calls RedisJobStore makes (single client, so no WATCH conflicts)"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiry = {}
+        self.lists = defaultdict(list)
+        self.zsets = defaultdict(dict)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = _bytes(value)
+        if ex is None:
+            self.expiry.pop(key, None)
+        else:
+            self.expiry[key] = ex
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def ttl(self, key):
+        return self.expiry.get(key, -1) if key in self.values else -2
+
+    async def lpush(self, key, value):
+        self.lists[key].insert(0, _bytes(value))
+
+    async def rpush(self, key, value):
+        self.lists[key].append(_bytes(value))
+
+    async def lpop(self, key):
+        return self.lists[key].pop(0) if self.lists[key] else None
+
+    async def lindex(self, key, index):
+        return self.lists[key][index] if self.lists[key] else None
+
+    async def llen(self, key):
+        return len(self.lists[key])
+
+    async def zadd(self, key, mapping, xx=False):
+        for member, score in mapping.items():
+            if not xx or _bytes(member) in self.zsets[key]:
+                self.zsets[key][_bytes(member)] = score
+
+    async def zrem(self, key, member):
+        self.zsets[key].pop(_bytes(member), None)
+
+    async def zrangebyscore(self, key, low, high, start=0, num=None):
+        members = sorted((score, member) for member, score in self.zsets[key].items()
+                         if float(low) <= score <= float(high))
+        return [member for _, member in members][start:None if num is None else start + num]
+
+    async def transaction(self, func, *watches, value_from_callable=False):
+        pipe = FakePipeline(self)
+        value = await func(pipe)
+        results = [await command() for command in pipe.queued or []]
+        return value if value_from_callable else results
+
+    async def aclose(self):
+        pass
+
+
+class FakePipeline:
+    """Commands run at once until multi(), then are queued for the transaction"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = None
+
+    def multi(self):
+        self.queued = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        if self.queued is None:
+            return method
+
+        def queue(*args, **kwargs):
+            self.queued.append(lambda: method(*args, **kwargs))
+            return self
+        return queue
+
+
+def job(job_id, priority="normal", status=QUEUED):
+    return {"id": job_id, "priority": priority, "status": status}
+
+
+async def wait_finished(runner, job_id, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        record = await runner.get(job_id)
+        if record["status"] not in (QUEUED, RUNNING):
+            return record
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class TestMemoryJobStore:
+    """Test cases for MemoryJobStore"""
+
+    def test_priority_then_fifo(self):
+        """Test that higher priorities are popped first and each priority in submission order"""
+        async def run():
+            store = MemoryJobStore()
+            for job_id, priority in [("a", "low"), ("b", "normal"), ("c", "high"), ("d", "normal")]:
+                await store.push(job_id, priority)
+            await store.push("e", "low", front=True)
+            assert await store.queued() == 5
+            popped = [await store.pop(timeout=0.1) for _ in range(5)]
+            assert popped == ["c", "b", "d", "e", "a"]
+            assert await store.pop(timeout=0.01) is None
+
+        asyncio.run(run())
+
+    def test_records_are_copies_and_finished_jobs_expire(self):
+        """Test that stored records do not share state with callers and expire once finished"""
+        async def run():
+            store = MemoryJobStore(ttl_seconds=0)
+            record = job("a")
+            await store.put(record)
+            record["status"] = RUNNING
+            assert (await store.get("a"))["status"] == QUEUED
+            await store.put(record)
+            assert (await store.get("a"))["status"] == RUNNING
+            await store.put(job("a", status=SUCCEEDED))
+            assert await store.get("a") is None
+
+        asyncio.run(run())
+
+
+class TestRedisJobStore:
+    """Test cases for RedisJobStore against an in-memory Redis stand-in"""
+
+    def test_priority_then_fifo_and_ttl(self):
+        """Test that higher priorities are popped first, popped jobs leave queued(), and only finished jobs expire"""
+        async def run():
+            redis = FakeRedis()
+            store = RedisJobStore(client=redis, ttl_seconds=60, poll_seconds=0.01)
+            for job_id, priority in [("a", "low"), ("b", "normal"), ("c", "high"), ("d", "normal")]:
+                await store.push(job_id, priority)
+            await store.push("e", "low", front=True)
+            assert await store.queued() == 5
+            popped = [await store.pop(timeout=0.1) for _ in range(5)]
+            assert popped == ["c", "b", "d", "e", "a"]
+            assert await store.queued() == 0 and await store.pop(timeout=0.02) is None
+
+            await store.put(job("a", status=RUNNING))
+            assert await redis.ttl("jobs:job:a") == -1
+            await store.put(job("a", status=SUCCEEDED))
+            assert await redis.ttl("jobs:job:a") == 60
+            assert (await store.get("a"))["status"] == SUCCEEDED and await store.get("missing") is None
+
+        asyncio.run(run())
+
+    def test_expired_lease_is_handed_out_again(self):
+        """Test that a popped job comes back once its lease lapses, unless renewed or released"""
+        async def run():
+            store = RedisJobStore(client=FakeRedis(), lease_seconds=0.2, poll_seconds=0.01)
+            await store.push("a", "normal")
+            assert await store.pop(timeout=0.1) == "a"
+            assert await store.pop(timeout=0.01) is None
+            await asyncio.sleep(0.12)
+            await store.renew("a")
+            await asyncio.sleep(0.12)
+            assert await store.pop(timeout=0.01) is None
+            assert await store.pop(timeout=0.5) == "a"
+            await store.ack("a")
+            await asyncio.sleep(0.25)
+            assert await store.pop(timeout=0.01) is None
+
+        asyncio.run(run())
+
+    def test_abandoned_job_runs_again(self):
+        """Test that a job left running by a dead worker is finished by another once its lease expires"""
+        async def handler(payload, progress):
+            return "done"
+
+        async def run():
+            store = RedisJobStore(client=FakeRedis(), lease_seconds=0.05, poll_seconds=0.01)
+            runner = JobRunner(store, {"work": handler}, workers=1)
+            submitted = await runner.submit("work", {})
+            # A worker takes the job, marks it running and dies
+            assert await store.pop(timeout=0.1) == submitted["id"]
+            await store.put(dict(submitted, status=RUNNING, started_at=time.time()))
+            runner.start()
+            finished = await wait_finished(runner, submitted["id"])
+            await runner.stop()
+            return finished
+
+        finished = asyncio.run(run())
+        assert finished["status"] == SUCCEEDED and finished["result"] == "done"
+
+    def test_cancel_and_start_are_compare_and_set(self):
+        """Test that a job read as queued but cancelled since does not run, and a running job is not cancelled"""
+        ran = []
+
+        async def handler(payload, progress):
+            ran.append(payload)
+            return None
+
+        async def run():
+            store = RedisJobStore(client=FakeRedis(), poll_seconds=0.01)
+            runner = JobRunner(store, {"work": handler})
+            first = await runner.submit("work", {"n": 1})
+            assert (await runner.cancel(first["id"]))["status"] == CANCELLED
+            assert (await runner.run(first))["status"] == CANCELLED
+
+            second = await runner.submit("work", {"n": 2})
+            await store.replace(dict(second, status=RUNNING), QUEUED)
+            assert (await runner.cancel(second["id"]))["status"] == RUNNING
+            assert (await runner.get(second["id"]))["status"] == RUNNING
+
+        asyncio.run(run())
+        assert ran == []
+
+    def test_stop_requeues_and_releases(self):
+        """Test that a job interrupted by shutdown is queued again at the front and no longer leased"""
+        async def run():
+            began = asyncio.Event()
+
+            async def handler(payload, progress):
+                began.set()
+                await asyncio.sleep(10)
+
+            redis = FakeRedis()
+            store = RedisJobStore(client=redis, poll_seconds=0.01)
+            runner = JobRunner(store, {"work": handler}, workers=1)
+            submitted = await runner.submit("work", {})
+            runner.start()
+            await began.wait()
+            assert redis.zsets["jobs:leases"]
+            await runner.stop()
+            assert (await runner.get(submitted["id"]))["status"] == QUEUED
+            assert not redis.zsets["jobs:leases"] and await store.queued() == 1
+
+        asyncio.run(run())
+
+
+class TestJobRunner:
+    """Test cases for JobRunner"""
+
+    def test_run_records_progress_and_result(self):
+        """Test that a handler's progress and result end up on the job record"""
+        seen = []
+
+        async def double(items):
+            return [item * 2 for item in items]
+
+        async def handler(payload, progress):
+            results = await batched(payload["items"], 2, double, progress)
+            seen.append((await runner.get(current["id"]))["progress"])
+            return {"results": results}
+
+        runner = JobRunner(MemoryJobStore(), {"double": handler})
+        current = {}
+
+        async def run():
+            current.update(await runner.submit("double", {"items": [1, 2, 3]}))
+            assert current["status"] == QUEUED and current["progress"]["total"] == 0
+            return await runner.run(await runner.get(current["id"]))
+
+        finished = asyncio.run(run())
+        assert finished["status"] == SUCCEEDED and finished["result"] == {"results": [2, 4, 6]}
+        assert seen == [{"done": 3, "total": 3, "message": None}]
+        assert finished["started_at"] <= finished["finished_at"] and finished["webhook"] is None
+
+    def test_failures_and_timeouts(self):
+        """Test that handler errors, timeouts and unserializable results fail the job"""
+        async def broken(payload, progress):
+            raise Exception("Failed to get completion: upstream 500")
+
+        async def slow(payload, progress):
+            await asyncio.sleep(1)
+
+        async def unserializable(payload, progress):
+            return {"value": object()}
+
+        runner = JobRunner(MemoryJobStore(), {"broken": broken, "slow": slow, "bad": unserializable},
+                           timeout_seconds=0.05)
+
+        async def run(kind):
+            submitted = await runner.submit(kind, {})
+            return await runner.run(submitted)
+
+        assert asyncio.run(run("broken"))["error"] == "Failed to get completion: upstream 500"
+        assert asyncio.run(run("slow"))["error"] == "Timed out after 0.05s"
+        assert asyncio.run(run("bad"))["status"] == FAILED
+
+    def test_workers_are_bounded_and_respect_priority(self):
+        """Test that no more than `workers` jobs run at once and queued high-priority jobs go first"""
+        running = []
+        peak = []
+        order = []
+
+        async def handler(payload, progress):
+            running.append(payload["name"])
+            peak.append(len(running))
+            order.append(payload["name"])
+            await asyncio.sleep(0.02)
+            running.remove(payload["name"])
+            return payload["name"]
+
+        async def run():
+            runner = JobRunner(MemoryJobStore(), {"work": handler}, workers=2)
+            jobs = [await runner.submit("work", {"name": f"low-{i}"}, "low") for i in range(4)]
+            jobs.append(await runner.submit("work", {"name": "high"}, "high"))
+            runner.start()
+            finished = [await wait_finished(runner, submitted["id"]) for submitted in jobs]
+            await runner.stop()
+            return finished
+
+        finished = asyncio.run(run())
+        assert all(record["status"] == SUCCEEDED for record in finished)
+        assert max(peak) == 2 and order[0] == "high"
+
+    def test_cancel_and_validation(self):
+        """Test that only queued jobs can be cancelled, cancelled jobs never run, and bad submissions are refused"""
+        ran = []
+
+        async def handler(payload, progress):
+            ran.append(payload)
+            return None
+
+        async def run():
+            runner = JobRunner(MemoryJobStore(), {"work": handler}, workers=1, max_queued=2)
+            first = await runner.submit("work", {"n": 1})
+            second = await runner.submit("work", {"n": 2})
+            with pytest.raises(QueueFull):
+                await runner.submit("work", {"n": 3})
+            with pytest.raises(ValueError):
+                await runner.submit("missing", {})
+            assert (await runner.cancel(first["id"]))["status"] == "cancelled"
+            assert await runner.cancel("unknown") is None
+            runner.start()
+            finished = await wait_finished(runner, second["id"])
+            await runner.stop()
+            assert (await runner.cancel(second["id"]))["status"] == SUCCEEDED
+            return finished
+
+        asyncio.run(run())
+        assert ran == [{"n": 2}]
+        with pytest.raises(ValueError):
+            asyncio.run(JobRunner(MemoryJobStore(), {"work": handler}).submit("work", {}, "urgent"))
+
+    def test_stop_requeues_running_jobs(self):
+        """Test that a job interrupted by shutdown goes back to the front of its queue"""
+        async def run():
+            began = asyncio.Event()
+
+            async def handler(payload, progress):
+                began.set()
+                await asyncio.sleep(10)
+
+            store = MemoryJobStore()
+            runner = JobRunner(store, {"work": handler}, workers=1)
+            submitted = await runner.submit("work", {})
+            runner.start()
+            await began.wait()
+            await runner.stop()
+            record = await runner.get(submitted["id"])
+            assert record["status"] == QUEUED and record["started_at"] is None
+            assert await store.pop(timeout=0.1) == submitted["id"]
+
+        asyncio.run(run())
+
+    def test_webhook_is_signed_and_retried(self):
+        """Test that the finished job is POSTed with a signature, retrying server errors but not client errors"""
+        calls = []
+        statuses = []
+
+        def respond(request):
+            calls.append(request)
+            return httpx.Response(statuses.pop(0))
+
+        async def handler(payload, progress):
+            return {"ok": True}
+
+        runner = JobRunner(MemoryJobStore(), {"work": handler}, webhook_secret="secret", webhook_backoff=0,
+                           transport=httpx.MockTransport(respond))
+
+        async def run():
+            submitted = await runner.submit("work", {"private": 1}, webhook_url="https://n8n.example/hook")
+            return await runner.run(submitted)
+
+        statuses.extend([500, 200])
+        finished = asyncio.run(run())
+        assert finished["webhook"] == "delivered" and len(calls) == 2
+        body = json.loads(calls[-1].content)
+        assert body["status"] == SUCCEEDED and body["result"] == {"ok": True}
+        assert "payload" not in body and "webhook_url" not in body
+        assert calls[-1].headers["X-Job-Signature"] == sign("secret", calls[-1].content)
+
+        calls.clear()
+        statuses.extend([404])
+        assert asyncio.run(run())["webhook"] == "failed" and len(calls) == 1
+
+
+class TestIngestJob:
+    """Test cases for the ingest job kind"""
+
+    def test_sink_failure_fails_the_job(self, monkeypatch):
+        """Test that a failing sink ends the job as failed promptly instead of holding a worker until the timeout"""
+        from api import jobs as jobs_api
+
+        class FakeEmbeddings:
+            model_id = "test"
+
+            async def embed_many(self, texts):
+                return [np.ones(4, dtype=np.float32) for _ in texts]
+
+        async def sink(records, vectors, model_id):
+            if records[0].line > 10:
+                raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(jobs_api, "get_embeddings_client", lambda: FakeEmbeddings())
+        monkeypatch.setattr(jobs_api, "db_sink", sink)
+        runner = JobRunner(MemoryJobStore(), {"ingest": jobs_api._ingest}, timeout_seconds=30)
+        records = [{"tech_name": f"Tech {i}", "description": "framework"} for i in range(40)]
+
+        async def run():
+            submitted = await runner.submit("ingest", {"records": records, "batch_size": 5})
+            return await asyncio.wait_for(runner.run(submitted), 5)
+
+        finished = asyncio.run(run())
+        assert finished["status"] == FAILED
+        assert finished["error"].startswith("Failed to ingest catalog; stored through line ")
+        assert finished["finished_at"] - finished["started_at"] < 5
+
+    def test_batch_size_bounds(self):
+        """Test that the payload enforces the same batch_size bounds as /api/embeddings/ingest"""
+        from pydantic import ValidationError
+        from schemas.jobs import IngestJobRequest
+
+        records = [{"tech_name": "React", "description": "UI library"}]
+        assert IngestJobRequest(records=records).batch_size == 256
+        for batch_size in (0, -1, 2049):
+            with pytest.raises(ValidationError):
+                IngestJobRequest(records=records, batch_size=batch_size)
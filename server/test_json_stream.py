@@ -0,0 +1,54 @@
+"""Test suite for lib.json_stream incremental object parsing"""
+import json
+
+import pytest
+from lib.json_stream import ObjectStream
+
+DOCUMENT = {
+    "compatibility_score": 0.8,
+    "strengths": ['Shared "event" model, one schema]', "Mature drivers"],
+    "weaknesses": [],
+    "meta": {"sources": [1, {"depth": 2}]},
+    "recommendations": ["Add tracing", {"step": [1]}],
+    "note": None,
+}
+
+
+def feed_in_chunks(text, size):
+    parser = ObjectStream()
+    events = []
+    for start in range(0, len(text), size):
+        events += parser.feed(text[start:start + size])
+    return parser, events
+
+
+class TestObjectStream:
+    """Test cases for ObjectStream"""
+
+    @pytest.mark.parametrize("size", [1, 2, 5, 1000])
+    def test_any_chunking_yields_the_document(self, size):
+        """Test that every field is reported whole however the text is split"""
+        parser, events = feed_in_chunks("```json\n" + json.dumps(DOCUMENT) + "\n```", size)
+        assert parser.done
+        assert {key: value for kind, key, value in events if kind == "field"} == DOCUMENT
+
+    def test_items_are_reported_before_the_array_closes(self):
+        """Test that an array item is reported as soon as its text is complete"""
+        parser = ObjectStream()
+        assert parser.feed('{"compatibility_score": 0.9, "strengths": ["Fa') == [
+            ("field", "compatibility_score", 0.9)]
+        assert parser.feed('st", "Sim') == [("item", "strengths", "Fast")]
+        assert parser.feed('ple"]') == [("item", "strengths", "Simple"), ("field", "strengths", ["Fast", "Simple"])]
+        assert not parser.done
+        assert parser.feed("}") == [] and parser.done
+
+    def test_escapes_inside_strings(self):
+        """Test that escaped quotes and backslashes do not end a string early"""
+        _, events = feed_in_chunks(r'{"tips": ["a \"quoted\" ] item", "c:\\dir\\"]}', 1)
+        assert [value for kind, _, value in events if kind == "item"] == ['a "quoted" ] item', "c:\\dir\\"]
+
+    @pytest.mark.parametrize("text", ['{"a": tru}', '{1: 2}', '{"a": 1 2}', '{"a" 1}', '{"a": [1] 2}'])
+    def test_malformed_text_raises(self, text):
+        """Test that text that cannot be a JSON object raises ValueError"""
+        with pytest.raises(ValueError):
+            ObjectStream().feed(text)
@@ -0,0 +1,61 @@
+"""Test suite for lib.knn_graph precomputed neighbours"""
+import numpy as np
+from lib.knn_graph import KnnGraph, update_graph
+from lib.vector_index import VectorIndex
+
+
+def records(ids):
+    return [{"id": f"tech-{i}", "name": f"Tech {i}", "description": "", "category": "Backend", "metadata": {}}
+            for i in ids]
+
+
+def expected_scores(index, k):
+    """Brute-force top-k neighbour scores per live id"""
+    rows = np.flatnonzero(index.live_mask())
+    matrix = index.matrix()[rows]
+    scores = matrix @ matrix.T
+    np.fill_diagonal(scores, -np.inf)
+    top = -np.sort(-scores, axis=1)[:, :k]
+    return {index.record(row)["id"]: top[i] for i, row in enumerate(rows)}
+
+
+def assert_exact(graph, index, k):
+    expected = expected_scores(index, k)
+    assert sorted(graph.ids) == sorted(expected)
+    for tech_id, scores in expected.items():
+        found = [score for _, score in graph.similar(tech_id)]
+        # Scores are stored as float16
+        np.testing.assert_allclose(found, scores, atol=2e-3)
+
+
+class TestKnnGraph:
+    """Test cases for the similar-technology graph"""
+
+    def test_full_build_matches_brute_force(self, tmp_path):
+        """Test that the blocked build finds every exact neighbour list"""
+        index = VectorIndex(str(tmp_path / "index"), 16)
+        index.upsert(records(range(600)), np.random.default_rng(0).standard_normal((600, 16)))
+        stats = update_graph(str(tmp_path / "knn"), index, k=5)
+        graph = KnnGraph.load(str(tmp_path / "knn"))
+        assert stats["full"] and graph.neighbors.dtype == np.int32 and graph.scores.dtype == np.float16
+        assert_exact(graph, index, 5)
+        assert all(tech_id != "tech-1" for tech_id, _ in graph.similar("tech-1"))
+
+    def test_incremental_update_stays_exact(self, tmp_path):
+        """Test that adds, re-embeds and deletes recompute only affected technologies"""
+        rng = np.random.default_rng(1)
+        index = VectorIndex(str(tmp_path / "index"), 16)
+        index.upsert(records(range(1000)), rng.standard_normal((1000, 16)))
+        update_graph(str(tmp_path / "knn"), index, k=5)
+
+        index.upsert(records(range(1000, 1020)), rng.standard_normal((20, 16)))
+        index.upsert(records(range(10)), rng.standard_normal((10, 16)))
+        index.delete([f"tech-{i}" for i in range(500, 505)])
+        stats = update_graph(str(tmp_path / "knn"), index, k=5)
+        assert not stats["full"] and stats["recomputed"] < 200
+
+        graph = KnnGraph.load(str(tmp_path / "knn"))
+        assert_exact(graph, index, 5)
+        assert graph.similar("tech-500") is None
+        assert sorted(p.name for p in (tmp_path / "knn").glob("neighbors.*.npy")) == [
+            "neighbors.0.npy", "neighbors.1.npy"]
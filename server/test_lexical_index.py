@@ -0,0 +1,95 @@
+"""Test suite for lib.lexical_index BM25 retrieval and rank fusion"""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from lib import recommender
+from lib.lexical_index import LexicalIndex, tokenize
+from lib.recommender import Candidate, fuse_rankings
+
+CATALOG = [
+    {"id": "kafka", "name": "Kafka", "description": "Distributed event streaming platform",
+     "category": "Messaging", "metadata": {"license": "Apache-2.0"}},
+    {"id": "kafka-connect", "name": "Debezium", "description": "Change data capture that streams into Kafka",
+     "category": "Messaging", "metadata": {"license": "Apache-2.0"}},
+    {"id": "nodejs", "name": "Node.js", "description": "JavaScript runtime",
+     "category": "Backend", "metadata": {"license": "MIT", "aliases": ["node"]}},
+    {"id": "postgresql", "name": "PostgreSQL", "description": "Relational database",
+     "category": "Database", "metadata": {"license": "PostgreSQL", "aliases": ["postgres"]}},
+]
+
+
+def candidate(tech_id, similarity=None):
+    return Candidate(tech_id, tech_id, "", None, {}, similarity)
+
+
+class TestLexicalIndex:
+    """Test cases for LexicalIndex"""
+
+    def test_tokenize_keeps_technology_names(self):
+        """Test that punctuated names survive tokenization and stopwords are dropped"""
+        assert tokenize("We must use Node.js and C++ with C#") == ["node.js", "nodejs", "c++", "c#"]
+
+    def test_name_and_alias_matches_rank_first(self):
+        """Test that a name or alias outranks a mention in another description"""
+        index = LexicalIndex(CATALOG)
+        assert [record["id"] for record, _ in index.search("must use Kafka", k=2)] == ["kafka", "kafka-connect"]
+        assert {record["id"] for record, _ in index.search("postgres or nodejs", k=5)} == {"postgresql", "nodejs"}
+        assert index.search("cobol", k=5) == []
+
+    def test_filters(self):
+        """Test that constraint filters apply before the top-k cut"""
+        index = LexicalIndex(CATALOG)
+        hits = index.search("kafka", k=1, filters={"license": {"apache-2.0"}, "category": {"messaging"}})
+        assert [record["id"] for record, _ in hits] == ["kafka"]
+        assert index.search("kafka", k=5, filters={"license": {"mit"}}) == []
+
+    def test_count_ignores_the_top_k_cut(self):
+        """Test that count covers every matching record, with filters applied"""
+        index = LexicalIndex(CATALOG)
+        assert index.count("kafka node") == 3
+        assert index.count("kafka node", filters={"license": {"apache-2.0"}}) == 2
+        assert index.count("cobol") == 0
+
+
+class TestFusion:
+    """Test cases for reciprocal rank fusion"""
+
+    def test_agreement_outranks_single_retriever(self):
+        """Test that results from both retrievers rank first and record their sources"""
+        fused = fuse_rankings(
+            {"vector": [candidate("a", 0.9), candidate("b", 0.8)], "lexical": [candidate("c"), candidate("b")]},
+            {"vector": 1.0, "lexical": 1.0}
+        )
+        assert [c.tech_id for c in fused] == ["b", "a", "c"]
+        assert fused[0].retrievers == ["vector", "lexical"]
+        assert fused[0].similarity == 0.8 and fused[2].similarity is None
+
+    def test_weights(self):
+        """Test that a heavier lexical weight lets its top hit win"""
+        fused = fuse_rankings({"vector": [candidate("a", 0.9)], "lexical": [candidate("c")]},
+                              {"vector": 1.0, "lexical": 2.0})
+        assert [c.tech_id for c in fused] == ["c", "a"]
+
+    def test_lexical_fallback_reports_candidates_before_the_cut(self, monkeypatch):
+        """Test that a lexical-only answer reports every lexical match, not the truncated result count"""
+        settings = SimpleNamespace(hybrid_vector_weight=1.0, hybrid_lexical_weight=1.0, rrf_k=60,
+                                   hybrid_depth=1, hybrid_budget_ms=1000)
+
+        async def failing_vector_search(*args):
+            raise Exception("Failed to search: index unavailable")
+
+        async def lexical_index():
+            return LexicalIndex(CATALOG)
+
+        async def scored(query_vector, candidates):
+            pass
+
+        monkeypatch.setattr(recommender, "get_settings", lambda: settings)
+        monkeypatch.setattr(recommender, "vector_search", failing_vector_search)
+        monkeypatch.setattr(recommender, "get_lexical_index", lexical_index)
+        monkeypatch.setattr(recommender, "_score_missing", scored)
+        candidates, engine, total = asyncio.run(recommender.hybrid_search("kafka node", np.zeros(4), limit=1))
+        assert len(candidates) == 1
+        assert engine == "lexical" and total == 3
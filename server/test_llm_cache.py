@@ -0,0 +1,129 @@
+"""Test suite for lib.llm_cache persistent single-flight response caching"""
+import asyncio
+import time
+
+from lib.llm_cache import LLMCache, response_key
+
+
+class Generator:
+    """Counts calls; each takes `delay` seconds"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise Exception("Failed to get completion: upstream 500")
+        return {"tagline": f"generated {self.calls}"}
+
+
+class TestLLMCache:
+    """Test cases for LLMCache"""
+
+    def test_key_normalization(self):
+        """Test that case and whitespace do not change the key, while model and prompt version do"""
+        key = response_key("gpt-4o-mini", "1", tech_name="React", context=None)
+        assert key == response_key("gpt-4o-mini", "1", tech_name="  react ", context=None)
+        assert key != response_key("gpt-4o-mini", "2", tech_name="React", context=None)
+        assert key != response_key("gpt-4o", "1", tech_name="React", context=None)
+        assert key != response_key("gpt-4o-mini", "1", tech_name="React", context="mobile app")
+
+    def test_concurrent_misses_share_one_generation(self):
+        """Test that concurrent callers for one key wait on a single generation"""
+        cache = LLMCache(ttl_seconds=60)
+        generate = Generator(delay=0.05)
+
+        async def run():
+            return await asyncio.gather(*(cache.get_or_create("k", generate) for _ in range(5)))
+
+        results = asyncio.run(run())
+        assert generate.calls == 1
+        assert sorted(status for _, status in results) == ["miss", "wait", "wait", "wait", "wait"]
+        assert all(value == {"tagline": "generated 1"} for value, _ in results)
+        assert asyncio.run(cache.get_or_create("k", generate)) == ({"tagline": "generated 1"}, "hit")
+
+    def test_failures_are_shared_and_not_cached(self):
+        """Test that a failed generation reaches every waiter and the next call retries"""
+        cache = LLMCache(ttl_seconds=60)
+        failing = Generator(delay=0.01, fail=True)
+
+        async def run():
+            return await asyncio.gather(*(cache.get_or_create("k", failing) for _ in range(3)),
+                                        return_exceptions=True)
+
+        assert all(isinstance(result, Exception) for result in asyncio.run(run()))
+        assert failing.calls == 1
+        assert asyncio.run(cache.get_or_create("k", Generator()))[1] == "miss"
+
+    def test_ttl(self, monkeypatch):
+        """Test that expired entries are regenerated"""
+        cache = LLMCache(ttl_seconds=10)
+        generate = Generator()
+        asyncio.run(cache.get_or_create("k", generate))
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        assert asyncio.run(cache.get_or_create("k", generate)) == ({"tagline": "generated 2"}, "miss")
+
+    def test_persistent_tier_survives_restart(self, tmp_path):
+        """Test that a new cache on the same file serves stored responses"""
+        path = str(tmp_path / "llm.sqlite")
+        first = LLMCache(ttl_seconds=60, path=path)
+        asyncio.run(first.get_or_create("k", Generator()))
+        first.persistent.close()
+
+        second = LLMCache(ttl_seconds=60, path=path)
+        generate = Generator()
+        assert asyncio.run(second.get_or_create("k", generate)) == ({"tagline": "generated 1"}, "hit")
+        assert generate.calls == 0
+
+    def test_lease_makes_other_workers_wait(self, tmp_path):
+        """Test that a second process's cache waits for the lease holder's result instead of generating"""
+        path = str(tmp_path / "llm.sqlite")
+        holder = LLMCache(ttl_seconds=60, path=path)
+        other = LLMCache(ttl_seconds=60, path=path, lease_seconds=5)
+        generate = Generator()
+
+        async def run():
+            assert holder.persistent.acquire("k", "holder", 5)
+
+            async def finish():
+                await asyncio.sleep(0.15)
+                await holder.put("k", {"tagline": "from holder"})
+
+            waiter = asyncio.create_task(other.get_or_create("k", generate))
+            await finish()
+            return await waiter
+
+        assert asyncio.run(run()) == ({"tagline": "from holder"}, "wait")
+        assert generate.calls == 0
+
+    def test_stale_lease_is_taken_over(self, tmp_path):
+        """Test that an expired lease from a crashed worker does not block generation"""
+        cache = LLMCache(ttl_seconds=60, path=str(tmp_path / "llm.sqlite"))
+        assert cache.persistent.acquire("k", "crashed", -1)
+        assert asyncio.run(cache.get_or_create("k", Generator()))[1] == "miss"
+
+    def test_claimed_keys_are_shared_and_released(self, tmp_path):
+        """Test that claimed keys skip leased ones, waiters get the settled value, and a failure frees the lease"""
+        path = str(tmp_path / "llm.sqlite")
+        cache = LLMCache(ttl_seconds=60, path=path)
+        other = LLMCache(ttl_seconds=60, path=path)
+        generate = Generator()
+
+        async def run():
+            assert other.persistent.acquire("leased", "other", 5)
+            claimed = await cache.claim(["a", "b", "leased"])
+            waiters = [asyncio.create_task(cache.get_or_create(key, generate)) for key in ("a", "b")]
+            await asyncio.sleep(0.05)
+            await cache.settle("a", {"tagline": "batched"})
+            await cache.settle("b", None)
+            return claimed, await asyncio.gather(*waiters, return_exceptions=True)
+
+        claimed, (settled, failed) = asyncio.run(run())
+        assert claimed == {"a", "b"} and generate.calls == 0
+        assert settled == ({"tagline": "batched"}, "wait") and isinstance(failed, Exception)
+        assert other.persistent.acquire("b", "other", 5)
@@ -0,0 +1,48 @@
+"""Test suite for lib.quantization compressed vector search"""
+import numpy as np
+from lib.quantization import QuantizedVectors, dequantize_int8, normalize, quantize_int8, truncate
+
+
+def corpus(count=2000, dimensions=64, seed=0):
+    rng = np.random.default_rng(seed)
+    return normalize(rng.standard_normal((count, dimensions)).astype(np.float32))
+
+
+class TestQuantization:
+    """Test cases for truncation, int8 codes and quantized search"""
+
+    def test_truncate_renormalizes(self):
+        """Test that truncated vectors are unit length"""
+        short = truncate(corpus(10), 16)
+        assert short.shape == (10, 16)
+        assert np.allclose(np.linalg.norm(short, axis=1), 1.0, atol=1e-5)
+
+    def test_int8_round_trip_error_is_small(self):
+        """Test that per-vector scales keep quantization error within half a step"""
+        vectors = corpus(100)
+        codes, scales = quantize_int8(vectors)
+        assert codes.dtype == np.int8
+        error = np.abs(dequantize_int8(codes, scales) - vectors)
+        assert (error <= scales[:, None] / 2 + 1e-7).all()
+
+    def test_rerank_restores_exact_results(self):
+        """Test that re-ranking the coarse candidates matches a full-precision scan"""
+        vectors = corpus()
+        queries = corpus(20, seed=1)
+        exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+
+        index = QuantizedVectors.build(vectors, dimensions=32, quantization="int8")
+        found, scores = index.search(queries, k=10, rerank=len(vectors))
+        assert (found == exact).all()
+        assert (np.diff(scores, axis=1) <= 0).all()
+
+    def test_save_and_load(self, tmp_path):
+        """Test that saved codes reload memory-mapped with identical results"""
+        vectors = corpus()
+        index = QuantizedVectors.build(vectors, dimensions=16, quantization="float16")
+        index.save(str(tmp_path))
+        loaded = QuantizedVectors.load(str(tmp_path), full=vectors)
+        assert loaded.dimensions == 16
+        query = vectors[5]
+        assert (loaded.search(query, k=5)[0] == index.search(query, k=5)[0]).all()
+        assert loaded.search(query, k=1)[0][0, 0] == 5
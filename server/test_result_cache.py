@@ -0,0 +1,52 @@
+"""Test suite for lib.result_cache exact and semantic recommendation caching"""
+import time
+
+import numpy as np
+from lib.result_cache import ResultCache, request_keys
+
+PARAMS = {"constraints": {}, "limit": 10, "ef_search": None, "weights": {}}
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestResultCache:
+    """Test cases for ResultCache"""
+
+    def test_exact_key_normalization(self):
+        """Test that case, whitespace and requirement order do not change the key"""
+        a = request_keys("SaaS  dashboard with auth", ["Stripe", "SSO"], PARAMS)
+        b = request_keys(" saas dashboard with AUTH", ["sso", "stripe", "SSO"], PARAMS)
+        c = request_keys("saas dashboard with auth", ["sso", "stripe"], dict(PARAMS, limit=5))
+        assert a == b
+        assert a[0] != c[0] and a[1] != c[1]
+
+    def test_semantic_hit_within_threshold_and_scope(self):
+        """Test that only close embeddings with the same parameters share a result"""
+        cache = ResultCache(max_entries=2, ttl_seconds=60, threshold=0.95)
+        cache.put("k1", "scope", unit(1, 0, 0), "result", version=1)
+        value, similarity = cache.get_similar(unit(1, 0.1, 0), "scope", version=1)
+        assert value == "result" and similarity > 0.99
+        assert cache.get_similar(unit(1, 1, 0), "scope", version=1) is None
+        assert cache.get_similar(unit(1, 0, 0), "other", version=1) is None
+
+        # LRU eviction frees the embedding row
+        cache.put("k2", "scope", unit(0, 1, 0), "second", version=1)
+        cache.put("k3", "scope", unit(0, 0, 1), "third", version=1)
+        assert cache.get_exact("k1", version=1) is None
+        assert cache.get_similar(unit(1, 0, 0), "scope", version=1) is None
+        assert cache.get_exact("k3", version=1) == "third"
+
+    def test_expiry_and_catalog_invalidation(self):
+        """Test that entries expire and a new catalog version drops them"""
+        cache = ResultCache(max_entries=4, ttl_seconds=0.05, threshold=0.9)
+        cache.put("k", "scope", unit(1, 0), "result", version=1)
+        assert cache.get_exact("k", version=2) is None
+        assert cache.get_exact("k", version=1) is None
+
+        cache.put("k", "scope", unit(1, 0), "result", version=1)
+        time.sleep(0.06)
+        assert cache.get_exact("k", version=1) is None
+        assert cache.get_similar(unit(1, 0), "scope", version=1) is None
@@ -0,0 +1,109 @@
+"""Test suite for lib.vector_codec wire formats"""
+import numpy as np
+import pytest
+from lib import vector_codec
+from lib.vector_codec import negotiate, MEDIA_JSON, MEDIA_OCTET, MEDIA_MSGPACK
+
+
+class TestNegotiate:
+    """Test cases for content negotiation"""
+
+    def test_json_float_list_is_default(self):
+        """Test that missing or generic Accept keeps the JSON list"""
+        for accept in (None, "", "*/*", "application/json"):
+            fmt = negotiate(accept)
+            assert (fmt.media_type, fmt.encoding, fmt.dtype) == (MEDIA_JSON, "float", "float32")
+
+    def test_base64_query_encoding(self):
+        """Test that encoding=base64 returns JSON with a base64 string"""
+        fmt = negotiate("application/json", encoding="base64", dtype="float16")
+        assert (fmt.media_type, fmt.encoding, fmt.dtype) == (MEDIA_JSON, "base64", "float16")
+
+    def test_binary_accept_types(self):
+        """Test octet-stream and msgpack selection, with dtype parameter"""
+        fmt = negotiate("application/octet-stream; dtype=float16")
+        assert (fmt.media_type, fmt.dtype) == (MEDIA_OCTET, "float16")
+        assert negotiate("application/x-msgpack").media_type == MEDIA_MSGPACK
+
+    def test_quality_ordering(self):
+        """Test that q-values decide between acceptable types"""
+        assert negotiate("application/octet-stream;q=0.5, application/json").media_type == MEDIA_JSON
+        assert negotiate("application/json;q=0.1, application/octet-stream").media_type == MEDIA_OCTET
+
+    def test_invalid_options_rejected(self):
+        """Test that unknown encodings/dtypes raise ValueError"""
+        with pytest.raises(ValueError):
+            negotiate(None, encoding="hex")
+        with pytest.raises(ValueError):
+            negotiate(None, dtype="int8")
+        with pytest.raises(ValueError):
+            negotiate(None, dtype="float16")  # float16 needs a compact encoding
+
+
+class TestCodec:
+    """Test cases for encoding and zero-copy decoding"""
+
+    def test_base64_roundtrip_float32_exact(self):
+        """Test that float32 base64 round-trips bit-exactly"""
+        vector = np.random.default_rng(0).standard_normal(1536).astype(np.float32)
+        encoded = vector_codec.encode_base64(vector)
+        assert np.array_equal(vector_codec.decode_base64(encoded), vector)
+        assert len(encoded) < len(str(vector.tolist())) / 3
+
+    def test_float16_halves_payload(self):
+        """Test float16 size and precision"""
+        vector = np.random.default_rng(1).standard_normal(1536).astype(np.float32)
+        raw = vector_codec.to_bytes(vector, "float16")
+        assert len(raw) == 1536 * 2
+        assert np.allclose(vector_codec.from_bytes(raw, "float16"), vector, atol=1e-2)
+
+    def test_from_bytes_is_zero_copy(self):
+        """Test that decoding views the input buffer"""
+        raw = vector_codec.to_bytes(np.arange(8, dtype=np.float32))
+        decoded = vector_codec.from_bytes(raw, dimensions=4)
+        assert decoded.shape == (2, 4)
+        assert not decoded.flags.owndata
+
+    def test_msgpack_body(self):
+        """Test that msgpack bodies carry metadata and raw vector bytes"""
+        msgpack = pytest.importorskip("msgpack")
+        vector = np.ones(4, dtype=np.float32)
+        body = vector_codec.binary_body(vector, negotiate("application/msgpack"), {"tech_name": "Go"})
+        decoded = msgpack.unpackb(body)
+        assert decoded["tech_name"] == "Go"
+        assert np.array_equal(vector_codec.from_bytes(decoded["embedding"], decoded["dtype"]), vector)
+
+
+class TestVectorType:
+    """Test cases for the schemas.vector.Vector pydantic type"""
+
+    def test_validates_to_contiguous_float32(self):
+        """Test that lists and arrays become contiguous float32 arrays"""
+        from schemas.embeddings import ProjectEmbeddingResponse
+        model = ProjectEmbeddingResponse(embedding=[1, 2.5, 3], dimensions=3)
+        assert model.embedding.dtype == np.float32
+        assert model.embedding.flags.c_contiguous
+        strided = np.arange(8, dtype=np.float64)[::2]
+        assert ProjectEmbeddingResponse(embedding=strided, dimensions=4).embedding.flags.c_contiguous
+
+    def test_rejects_bad_shapes_and_values(self):
+        """Test that nested, non-numeric and non-finite inputs are rejected"""
+        from pydantic import BaseModel, ValidationError
+        from schemas.vector import Vector
+
+        class Model(BaseModel):
+            embedding: Vector
+
+        for bad in ([[1.0, 2.0]], ["a", "b"], [1.0, float("nan")], "1,2"):
+            with pytest.raises(ValidationError):
+                Model(embedding=bad)
+
+    def test_json_serialization(self):
+        """Test that JSON output is a float list that parses back to the same float32 vector, small components included"""
+        import json
+        from schemas.embeddings import ProjectEmbeddingResponse
+        embedding = np.array([0.1, -0.25, 1.2345678e-5, -3.3333333e-9, 0.012345679], dtype=np.float32)
+        model = ProjectEmbeddingResponse(embedding=embedding, dimensions=5)
+        body = json.loads(model.model_dump_json())
+        assert body["dimensions"] == 5 and body["embedding"][1] == -0.25
+        assert np.array_equal(np.array(body["embedding"], dtype=np.float32), embedding)
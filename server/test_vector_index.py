@@ -0,0 +1,115 @@
+"""Test suite for lib.vector_index memory-mapped exact search"""
+import numpy as np
+import pytest
+from lib.metadata_index import normalize_constraints
+from lib.vector_index import VectorIndex
+
+
+def records(count, start=0):
+    return [{"id": f"tech-{i}", "name": f"Tech {i}", "description": "", "category": "Backend", "metadata": {}}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((3000, 16)).astype(np.float32)
+
+
+class TestVectorIndex:
+    """Test cases for VectorIndex"""
+
+    def test_exact_top_k_across_growth(self, tmp_path, vectors):
+        """Test that appends past the initial capacity keep search exact"""
+        index = VectorIndex(str(tmp_path), 16)
+        index.upsert(records(1000), vectors[:1000])
+        index.upsert(records(2000, start=1000), vectors[1000:])
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        query = vectors[123] + 0.1
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+        hits = index.search(query, k=5)
+        assert [hit.record["id"] for hit in hits] == [f"tech-{i}" for i in expected]
+        assert index.stats()["capacity"] >= 3000
+
+    def test_readers_see_appends_and_tombstones(self, tmp_path, vectors):
+        """Test that another instance (worker) picks up writes without reloading"""
+        writer = VectorIndex(str(tmp_path), 16)
+        reader = VectorIndex(str(tmp_path), 16)
+        writer.upsert(records(10), vectors[:10])
+        assert reader.search(vectors[3], k=1)[0].record["id"] == "tech-3"
+
+        writer.delete(["tech-3"])
+        assert "tech-3" not in [hit.record["id"] for hit in reader.search(vectors[3], k=10)]
+
+        # Re-upserting an id replaces its vector
+        writer.upsert(records(1, start=4), [vectors[3]])
+        assert reader.search(vectors[3], k=1)[0].record["id"] == "tech-4"
+        assert reader.live_count == 9
+
+    def test_compaction_drops_tombstones(self, tmp_path, vectors):
+        """Test that compaction rewrites only live rows and readers follow"""
+        writer = VectorIndex(str(tmp_path), 16)
+        reader = VectorIndex(str(tmp_path), 16)
+        writer.upsert(records(100), vectors[:100])
+        writer.delete([f"tech-{i}" for i in range(50)])
+        assert writer.compact()
+        assert reader.stats()["rows"] == 50
+        assert reader.search(vectors[70], k=1)[0].record["id"] == "tech-70"
+        assert sorted(p.name for p in tmp_path.glob("vectors.*.npy")) == ["vectors.0.npy", "vectors.1.npy"]
+        writer.delete([f"tech-{i}" for i in range(50, 60)])
+        assert writer.compact(force=True)
+        assert sorted(p.name for p in tmp_path.glob("vectors.*.npy")) == ["vectors.1.npy", "vectors.2.npy"]
+
+    def test_growth_keeps_tombstones(self, tmp_path, vectors):
+        """Test that rows deleted or replaced before the index grows stay deleted after it"""
+        writer = VectorIndex(str(tmp_path), 16)
+        reader = VectorIndex(str(tmp_path), 16)
+        writer.upsert(records(1000), vectors[:1000])
+        writer.delete(["tech-0", "tech-1"])
+        writer.upsert(records(1, start=5), [vectors[5]])
+        writer.upsert(records(100, start=1000), vectors[1000:1100])
+        assert writer.stats()["generation"] == 1 and writer.stats()["deleted_rows"] == 3
+        for index in (writer, reader):
+            ids = [hit.record["id"] for hit in index.search(vectors[0], k=1100)]
+            assert int(index.live_mask().sum()) == index.live_count == len(ids) == 1098
+            assert "tech-0" not in ids and ids.count("tech-5") == 1
+
+    def test_row_subset_search(self, tmp_path, vectors):
+        """Test that search can be restricted to candidate rows"""
+        index = VectorIndex(str(tmp_path), 16)
+        index.upsert(records(100), vectors[:100])
+        rows = np.array([index.row_for("tech-10"), index.row_for("tech-20")])
+        hits = index.search(vectors[5], k=5, rows=rows)
+        assert sorted(hit.record["id"] for hit in hits) == ["tech-10", "tech-20"]
+
+
+class TestMetadataIndex:
+    """Test cases for metadata pre-filtering"""
+
+    def test_filters_match_across_appends(self, tmp_path, vectors):
+        """Test that bitmaps follow appends, deletes and list-valued metadata"""
+        index = VectorIndex(str(tmp_path), 16)
+        batch = records(20)
+        for i, record in enumerate(batch):
+            record["metadata"] = {"license": "MIT" if i % 2 else "Apache-2.0", "language": ["Go", "Rust"][: i % 3]}
+        index.upsert(batch, vectors[:20])
+
+        filters = normalize_constraints({"license": "mit", "language": ["rust"]})
+        mask, total = index.metadata.match(filters)
+        expected = {f"tech-{i}" for i in range(20) if i % 2 and i % 3 == 2}
+        assert total == len(expected)
+        assert {index.record(row)["id"] for row in np.flatnonzero(mask)} == expected
+
+        index.upsert(records(5, start=20), vectors[20:25])
+        index.delete(["tech-5"])
+        _, total = index.metadata.match(filters)
+        assert total == len(expected) - 1
+
+        hits = index.search(vectors[0], k=10, rows=np.flatnonzero(index.metadata.match(filters)[0]))
+        assert {hit.record["id"] for hit in hits} == expected - {"tech-5"}
+
+    def test_invalid_constraint(self):
+        """Test that non-string filter values are rejected and unknown keys ignored"""
+        assert normalize_constraints({"budget": 10, "category": " Backend "}) == {"category": {"backend"}}
+        with pytest.raises(ValueError):
+            normalize_constraints({"license": 3})
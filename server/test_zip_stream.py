@@ -0,0 +1,78 @@
+"""Test suite for lib.zip_stream incremental ZIP streaming"""
+import asyncio
+import io
+import zipfile
+import pytest
+from lib.zip_stream import ZipEntry, stream_zip
+
+
+def make_source(blobs, active=None, peak=None):
+    """Build an open_source callable serving blobs in small chunks"""
+    async def open_source(key):
+        if active is not None:
+            active.add(key)
+            peak.append(len(active))
+        data = blobs[key]
+        try:
+            for i in range(0, len(data), 7):
+                await asyncio.sleep(0)
+                yield data[i:i + 7]
+        finally:
+            if active is not None:
+                active.discard(key)
+    return open_source
+
+
+async def collect(entries, open_source, **kwargs):
+    chunks = []
+    async for chunk in stream_zip(entries, open_source, **kwargs):
+        chunks.append(chunk)
+    return chunks
+
+
+class TestStreamZip:
+    """Test cases for stream_zip"""
+
+    def test_roundtrip_contents(self):
+        """Test that every entry is readable with its original content"""
+        blobs = {f"stacks/{i}.json": f'{{"id": {i}}}'.encode() * (i + 1) for i in range(5)}
+        entries = [ZipEntry(key, key) for key in blobs]
+        chunks = asyncio.run(collect(entries, make_source(blobs)))
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        assert archive.testzip() is None
+        assert archive.namelist() == list(blobs)
+        for key, data in blobs.items():
+            assert archive.read(key) == data
+
+    def test_output_is_incremental(self):
+        """Test that bytes are yielded before the archive is complete"""
+        blobs = {"a.bin": b"x" * 100, "b.bin": b"y" * 100}
+        entries = [ZipEntry(key, key) for key in blobs]
+        chunks = asyncio.run(collect(entries, make_source(blobs)))
+        assert len(chunks) > 2
+
+    def test_prefetch_bounds_concurrent_fetches(self):
+        """Test that no more than `prefetch` sources are open at once"""
+        blobs = {f"f{i}": bytes([i]) * 50 for i in range(10)}
+        entries = [ZipEntry(key, key) for key in blobs]
+        active, peak = set(), []
+        asyncio.run(collect(entries, make_source(blobs, active, peak), prefetch=3))
+        assert max(peak) <= 3
+
+    def test_compressed_archive(self):
+        """Test that deflated archives round-trip"""
+        blobs = {"big.txt": b"stack compare " * 1000}
+        entries = [ZipEntry("big.txt", "big.txt")]
+        data = b''.join(asyncio.run(collect(entries, make_source(blobs), compress=True)))
+        assert len(data) < len(blobs["big.txt"])
+        assert zipfile.ZipFile(io.BytesIO(data)).read("big.txt") == blobs["big.txt"]
+
+    def test_source_error_propagates(self):
+        """Test that a failing fetch aborts the stream"""
+        async def open_source(key):
+            raise RuntimeError("boom")
+            yield b""
+
+        with pytest.raises(RuntimeError, match="boom"):
+            asyncio.run(collect([ZipEntry("a", "a")], open_source))
@@ -2,7 +2,12 @@
 Utility functions for file operations
 """
 import re
-from fastapi import HTTPException
+import hashlib
+from typing import Tuple
+from fastapi import HTTPException, UploadFile
+
+# Read uploads in 1MB chunks
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 
 def sanitize_filename(filename: str) -> str:
@@ -60,3 +65,36 @@ def sanitize_filename(filename: str) -> str:
         raise HTTPException(status_code=400, detail="Filename contains only invalid characters")
     
     return safe_filename
+
+
+async def hash_upload(file: UploadFile, max_size: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+    """
+    Compute the SHA-256 digest of an upload while streaming through it
+    
+    The upload is read chunk by chunk (never fully into memory) and rewound
+    afterwards so it can be streamed again to storage.
+    
+    Args:
+        file: Incoming upload
+        max_size: Maximum allowed size in bytes
+        chunk_size: Read size per iteration
+        
+    Returns:
+        Tuple of (hex digest, size in bytes)
+        
+    Raises:
+        HTTPException: If the upload exceeds max_size
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {max_size // (1024 * 1024)}MB")
+        hasher.update(chunk)
+    
+    await file.seek(0)
+    return hasher.hexdigest(), size